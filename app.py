@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, make_response, send_file
+from flask import Flask, render_template, request, redirect, url_for, jsonify, session, make_response, send_file, g, has_request_context, Response, stream_with_context, before_render_template, template_rendered
 import pyodbc
 import pandas as pd
 import warnings
@@ -8,10 +8,45 @@ from datetime import datetime, date
 import io
 import tempfile
 import os
+import logging
+import time
+import gzip
+import functools
+
+from reportes.atributos import asegurar_atributos_producto, get_atributos_producto, set_atributo_override
+from reportes.rollup import asegurar_rollup, mes_cerrado, suscribir_refresco
+from reportes.conjuntos import CONJUNTO_REPORTABLES, asegurar_conjuntos, get_conjunto, set_conjunto, version_conjuntos
+from reportes.pool import ConnectionPool, SharedConnection
+from reportes.paginacion import sql_paginado, separar_total, info_paginacion, pagina_de
+from reportes.consultas import (ConsultaReporte, limite_tiempo, open_cursor, run_query, plan_cache_stats,
+                                estadisticas as estadisticas_consultas)
+from reportes.exportar import (CSV_MIMETYPE, HTML_MIMETYPE, XLSX_MIMETYPE, comprimir_gzip, escribir_xlsx,
+                               generar_csv, generar_html, leer_y_borrar)
+from reportes.fechas import rangos_filtro, rangos_cerrados, rango_anios, movimientos_en
+from reportes.cache import (CacheReportes, refrescar_antes, resultados_vencidos, seguir_vencidos, versiones_servidas,
+                            CONTEXTO_PETICION as cache_contexto_peticion)
+from reportes.cache_compartida import CacheCompartida
+from reportes.paralelo import EjecutorReportes
+from reportes.coberturas import detalle_cobertura, matriz_cobertura
+from reportes.objetivos import (ANIOS_OBJETIVOS, calcular_objetivos, invalidar_objetivos, resumen_objetivos,
+                                serie_mensual)
+from reportes import snapshot as reportes_snapshot
+from reportes.snapshot import SNAPSHOT_DISPONIBLE, SnapshotVentas
+from reportes import metricas
+from reportes.metricas import medir_reporte
+from reportes.columnar import JSON_MIMETYPE, json_columnar
+from reportes.versiones import VersionDatos
+from reportes.precalentador import Precalentador
+from reportes.incremental import COLUMNA_MARCA, AcumuladoIncremental
+from reportes.tipos import ESQUEMAS, compactador, registros, estadisticas as estadisticas_compactacion
+from reportes.referencia import (AGENTES_REPORTE, CursorConNombres, adjuntar_nombres, asegurar_referencia,
+                                 documentos_venta, id_agente, ids_agentes, opciones_agente)
 
 # Ignorar advertencias específicas de pandas
 warnings.filterwarnings('ignore', message='pandas only supports SQLAlchemy connectable')
 
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # Change this to a random secret key
 
@@ -38,6 +73,7 @@ LANGUAGES = {
             'total_records': 'Total de registros',
             'export_excel': 'Excel',
             'export_csv': 'CSV',
+            'stale_results': 'Estos datos no están actualizados: la consulta tardó demasiado y se muestra el último resultado calculado',
             'export_pdf': 'PDF',
             'print': 'Imprimir',
             'search_table': 'Buscar en la tabla...',
@@ -68,6 +104,7 @@ LANGUAGES = {
             'total_records': 'Total records',
             'export_excel': 'Excel',
             'export_csv': 'CSV',
+            'stale_results': 'This data is not current: the query took too long, so the last computed result is shown',
             'export_pdf': 'PDF',
             'print': 'Print',
             'search_table': 'Search in table...',
@@ -98,6 +135,7 @@ LANGUAGES = {
             'total_records': '総記録数',
             'export_excel': 'Excel',
             'export_csv': 'CSV',
+            'stale_results': 'このデータは最新ではありません。クエリに時間がかかりすぎたため、最後に計算された結果を表示しています',
             'export_pdf': 'PDF',
             'print': '印刷',
             'search_table': 'テーブルで検索...',
@@ -128,6 +166,7 @@ LANGUAGES = {
             'total_records': '总记录数',
             'export_excel': 'Excel',
             'export_csv': 'CSV',
+            'stale_results': '此数据不是最新的：查询耗时过长，显示的是最近一次计算的结果',
             'export_pdf': 'PDF',
             'print': '打印',
             'search_table': '在表格中搜索...',
@@ -158,6 +197,7 @@ LANGUAGES = {
             'total_records': 'Gesamtdatensätze',
             'export_excel': 'Excel',
             'export_csv': 'CSV',
+            'stale_results': 'Diese Daten sind nicht aktuell: Die Abfrage dauerte zu lange, daher wird das zuletzt berechnete Ergebnis angezeigt',
             'export_pdf': 'PDF',
             'print': 'Drucken',
             'search_table': 'In Tabelle suchen...',
@@ -179,7 +219,7 @@ def get_translations():
     return LANGUAGES.get(lang, LANGUAGES['es'])
 
 # Configuración de la conexión a la base de datos
-def get_db_connection():
+def create_db_connection():
     server = "localhost,1433"
     database = "adMOLIENDAS_Y_ALIMENTO"
     username = "SA"
@@ -196,1215 +236,715 @@ def get_db_connection():
     )
     return conn
 
-# Consulta para el reporte por año
-def get_reporte_anio(agente=None):
+# Pool de conexiones compartido por todas las consultas de reportes
+db_pool = ConnectionPool(
+    create_db_connection,
+    max_size=int(os.environ.get('DB_POOL_SIZE', 8)),
+    min_size=int(os.environ.get('DB_POOL_MIN', 2)),
+    max_idle=int(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+    checkout_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 30))
+)
+
+def create_shared_cache():
+    """SQLite cache shared by the gunicorn workers of this host (REPORT_SHARED_CACHE=path enables it)"""
+    ruta = os.environ.get('REPORT_SHARED_CACHE')
+    if not ruta:
+        return None
+    try:
+        return CacheCompartida(ruta, max_bytes=int(os.environ.get('REPORT_SHARED_CACHE_MB', 1024)) * 1024 * 1024)
+    except PermissionError as e:
+        logger.error(f"Caché compartida desactivada: {e}")
+        return None
+
+cache_reportes = CacheReportes(
+    max_bytes=int(os.environ.get('REPORT_CACHE_MB', 256)) * 1024 * 1024,
+    ttl_abierto=int(os.environ.get('REPORT_CACHE_TTL', 120)),
+    compartida=create_shared_cache(),
+    espera_excedido=float(os.environ.get('REPORT_BUDGET_BACKOFF', 30))
+)
+
+def parse_report_budgets(texto):
+    """'objetivos=20,coberturas=15' -> {'objetivos': 20.0, 'coberturas': 15.0}"""
+    presupuestos = {}
+    for parte in (texto or '').split(','):
+        nombre, _, segundos = parte.partition('=')
+        if nombre.strip() and segundos.strip():
+            presupuestos[nombre.strip()] = float(segundos)
+    return presupuestos
+
+# Tiempo máximo de cálculo por reporte; al agotarse se cancela la consulta y se sirve el último resultado
+DEFAULT_REPORT_BUDGET = float(os.environ.get('REPORT_BUDGET_SECONDS', 60))
+REPORT_BUDGETS = parse_report_budgets(os.environ.get('REPORT_BUDGETS'))
+
+def report_budget(nombre):
+    """Time budget decorator for a report (REPORT_BUDGETS entry or REPORT_BUDGET_SECONDS)"""
+    return limite_tiempo(REPORT_BUDGETS.get(nombre, DEFAULT_REPORT_BUDGET))
+
+def _invalidar_por_rollup(rangos):
+    """Late movements in closed months change results cached without expiry"""
+    if any(desde < date.today().replace(day=1) for desde, _ in rangos):
+        cache_reportes.invalidar()
+
+suscribir_refresco(_invalidar_por_rollup)
+
+def _invalidar_objetivos_por_rollup(rangos):
+    """Stored closed-month objectives are recomputed when the rollup rebuilds those months"""
+    cerrados = [(desde, hasta) for desde, hasta in rangos if desde < date.today().replace(day=1)]
+    if not cerrados:
+        return
+    conn = db_pool.acquire()
+    try:
+        invalidar_objetivos(conn, cerrados)
+    finally:
+        conn.close()
+
+suscribir_refresco(_invalidar_objetivos_por_rollup)
+
+# Hilos para las consultas independientes de una misma página (cada hilo toma su propia conexión del pool)
+ejecutor_reportes = EjecutorReportes(max_workers=int(os.environ.get('REPORT_WORKERS', 4)),
+                                     propagar=metricas.CONTEXTO_PETICION + cache_contexto_peticion)
+
+def create_snapshot():
+    """Local Parquet copy of the sales fact; REPORT_SOURCE=snapshot makes the reports read it"""
+    if os.environ.get('REPORT_SOURCE', 'sqlserver') != 'snapshot':
+        return None
+    if not SNAPSHOT_DISPONIBLE:
+        logger.warning("REPORT_SOURCE=snapshot necesita pyarrow; los reportes seguirán leyendo SQL Server")
+        return None
+    return SnapshotVentas(os.environ.get('REPORT_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'moli_snapshot')))
+
+snapshot_ventas = create_snapshot()
+
+def use_snapshot():
+    """True when the reports should aggregate the local snapshot (enabled and synced at least once)"""
+    return snapshot_ventas is not None and snapshot_ventas.estado() is not None
+
+def snapshot_hechos_en(rangos):
+    """Snapshot facts covering `rangos` (only the monthly files they touch are read)"""
+    if not rangos:
+        return snapshot_ventas.hechos()
+    return snapshot_ventas.hechos(min(desde for desde, _ in rangos), max(hasta for _, hasta in rangos))
+
+def sync_snapshot():
+    """Extract the changed months into the snapshot; returns the (anio, mes) rebuilt"""
+    conn = db_pool.acquire()
+    try:
+        prepare_report_tables(conn)
+        meses = snapshot_ventas.sincronizar(conn, CONJUNTO_REPORTABLES,
+                                            version_conjuntos().get(CONJUNTO_REPORTABLES))
+    finally:
+        conn.close()
+    if meses:
+        cache_reportes.invalidar()
+    return meses
+
+def _anio_cerrado(anio):
+    return bool(anio) and int(anio) < date.today().year
+
+def _dias_cerrados(params):
+    return rangos_cerrados(rangos_filtro(params.get('fecha'), params['anio1'], params['mes1'], params['dia_inicio'],
+                                         params['dia_fin'], params['anio2'], params['mes2']))
+
+def acquire_connection():
+    """db_pool.acquire() with the checkout wait recorded in the report metrics"""
+    inicio = time.perf_counter()
+    conn = db_pool.acquire()
+    metricas.registrar_adquisicion(time.perf_counter() - inicio)
+    return conn
+
+def get_db_connection():
+    """Borrow a pooled connection; inside a request the same one is reused until teardown"""
+    if has_request_context():
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = g._db_conn = acquire_connection()
+        return SharedConnection(conn)
+    return acquire_connection()
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        conn.close()
+
+def run_parallel(**tareas):
+    """Run independent report calls concurrently; returns their results keyed by name.
+
+    The per-query timings are logged and sent back in the Server-Timing header.
+    """
+    resultados, tiempos = ejecutor_reportes.ejecutar(tareas)
+    g.setdefault('_tiempos_consultas', {}).update(tiempos)
+    detalle = ', '.join(f"{nombre}={segundos * 1000:.0f}ms" for nombre, segundos in tiempos.items())
+    logger.info(f"{request.path}: consultas en paralelo {detalle}")
+    return resultados
+
+# Peticiones más lentas que esto se registran con las huellas de sus consultas
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 5))
+
+@app.before_request
+def start_request_metrics():
+    g._inicio_peticion = time.perf_counter()
+    metricas.iniciar_peticion()
+    seguir_vencidos()
+
+@app.context_processor
+def inject_stale_results():
+    """Reports served from an older cached result because their query ran out of time"""
+    return {'stale_results': resultados_vencidos()}
+
+@app.after_request
+def record_request_metrics(response):
+    inicio = g.pop('_inicio_peticion', None)
+    consultas = metricas.terminar_peticion()
+    if inicio is None:
+        return response
+    segundos = time.perf_counter() - inicio
+    endpoint = request.endpoint or 'none'
+    metricas.PETICION.observar(segundos, endpoint, request.method, str(response.status_code))
+    if not response.is_streamed:
+        metricas.RESPUESTA.observar(response.calculate_content_length() or 0, endpoint)
+    if segundos >= SLOW_REQUEST_SECONDS:
+        logger.warning(f"Petición lenta {request.method} {request.full_path} {segundos:.2f}s "
+                       f"({response.status_code}): {metricas.resumen_consultas(consultas)}")
+    return response
+
+def _start_template_timer(sender, template, context, **extra):
+    g.setdefault('_inicio_render', {})[template.name] = time.perf_counter()
+
+def _record_template_render(sender, template, context, **extra):
+    inicio = g.get('_inicio_render', {}).pop(template.name, None)
+    if inicio is not None:
+        metricas.RENDER.observar(time.perf_counter() - inicio, template.name or 'string')
+
+before_render_template.connect(_start_template_timer, app)
+template_rendered.connect(_record_template_render, app)
+
+@app.after_request
+def add_server_timing(response):
+    tiempos = g.pop('_tiempos_consultas', None)
+    if tiempos:
+        response.headers['Server-Timing'] = ', '.join(f"{nombre};dur={segundos * 1000:.1f}"
+                                                      for nombre, segundos in tiempos.items())
+    return response
+
+# Conditional GET: ETag / Last-Modified from the data version, 304 before any report query runs
+CLOSED_REPORT_MAX_AGE = int(os.environ.get('CLOSED_REPORT_MAX_AGE', 86400))
+
+def read_watermark():
+    """(max CIDMOVIMIENTO, max CFECHA) of admMovimientos: both are index seeks"""
     conn = get_db_connection()
-    
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(CIDMOVIMIENTO), MAX(CFECHA) FROM admMovimientos WITH (NOLOCK)")
+        return tuple(cursor.fetchone())
+    finally:
+        conn.close()
+
+def code_version():
+    """Build token from the modification times of app.py and the templates"""
+    rutas = [os.path.abspath(__file__)]
+    for carpeta in getattr(app.jinja_loader, 'searchpath', []):
+        for raiz, _, archivos in os.walk(carpeta):
+            rutas.extend(os.path.join(raiz, archivo) for archivo in archivos)
+    return str(max((int(os.path.getmtime(ruta)) for ruta in rutas if os.path.exists(ruta)), default=0))
+
+version_datos = VersionDatos(read_watermark, cache_reportes.version,
+                             ttl=float(os.environ.get('REPORT_ETAG_TTL', 30)), codigo=code_version())
+suscribir_refresco(lambda rangos: version_datos.invalidar())
+# Cada resultado guarda la versión de los datos con la que se calculó (ETag de lo servido)
+cache_reportes.etiquetar = version_datos.etiqueta
+
+def _args_dias_cerrados(args):
+    if not args.get('fecha') and not (args.get('anio1') and args.get('mes1')):
+        return False
+    try:
+        return rangos_cerrados(rangos_filtro(args.get('fecha'), args.get('anio1'), args.get('mes1'),
+                                             args.get('dia_inicio'), args.get('dia_fin'), args.get('anio2'),
+                                             args.get('mes2')))
+    except ValueError:
+        return False
+
+def _args_mes_cerrado(args):
+    try:
+        return bool(args.get('anio') and args.get('mes')) and mes_cerrado(args['anio'], args['mes'])
+    except ValueError:
+        return False
+
+def _args_anio_cerrado(args):
+    try:
+        return _anio_cerrado(args.get('anio'))
+    except ValueError:
+        return False
+
+def set_validators(response, huella, cerrado):
+    """ETag, Last-Modified and Cache-Control of a report response (none if a stale result was served)"""
+    if huella is None or resultados_vencidos():
+        return response
+    etag, modificado = huella
+    response.set_etag(etag, weak=True)
+    response.last_modified = modificado
+    response.cache_control.private = True
+    if cerrado:
+        response.cache_control.max_age = CLOSED_REPORT_MAX_AGE
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+def conditional_report(nombre, periodo_cerrado=None):
+    """Conditional GET for a report route; its parameters are the query string.
+
+    `periodo_cerrado(request.args)` says whether the response only covers
+    closed periods. A matching If-None-Match (or If-Modified-Since) gets a 304
+    without computing the report; otherwise the validators are those of the
+    data version the served results were computed from.
+    """
+    def decorador(vista):
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            if request.method != 'GET':
+                return vista(*args, **kwargs)
+            cerrado = bool(periodo_cerrado and periodo_cerrado(request.args))
+            params = {**request.args.to_dict(), '_lang': get_language(), '_path': request.path}
+            huella = version_datos.huella(nombre, params, cerrado)
+            if huella is not None:
+                etag, modificado = huella
+                if request.if_none_match:
+                    vigente = request.if_none_match.contains_weak(etag)
+                else:
+                    vigente = request.if_modified_since is not None and modificado <= request.if_modified_since
+                if vigente:
+                    return set_validators(Response(status=304), huella, cerrado)
+            respuesta = make_response(vista(*args, **kwargs))
+            servidas = versiones_servidas()
+            if servidas:
+                huella = version_datos.huella(nombre, params, cerrado, servidas=servidas)
+            return set_validators(respuesta, huella, cerrado)
+        return envoltura
+    return decorador
+
+def read_report(query, conn, order_by, page=None, per_page=None, ctes='', params=None):
+    """Run a report query (without ORDER BY) with its :name parameters bound.
+
+    Without `page` the whole result is returned as a DataFrame. With `page`,
+    SQL Server returns only that page and the result is (df, total_records).
+    """
+    params = params or {}
+    if page is None:
+        return run_query(conn, f"{ctes}\n{query}\nORDER BY {order_by};", params)
+    sql, params_pagina = sql_paginado(query, order_by, page, per_page, ctes)
+    df, total = separar_total(run_query(conn, sql, {**params, **params_pagina}))
+    if df.empty and page > 1:
+        # Página fuera de rango: el total se obtiene de la primera fila
+        sql, params_pagina = sql_paginado(query, order_by, 1, 1, ctes)
+        _, total = separar_total(run_query(conn, sql, {**params, **params_pagina}))
+    return df, total
+
+def page_frame(df, page=None, per_page=None):
+    """Whole frame or (page, total) for a report computed in-process"""
+    return df if page is None else pagina_de(df, page, per_page)
+
+def read_report_query(consulta, conn, page=None, per_page=None):
+    """read_report for a ConsultaReporte built by one of the build_*_query functions"""
+    return read_report(consulta.sql, conn, consulta.order_by, page, per_page, ctes=consulta.ctes, params=consulta.params)
+
+def with_names(result, conn):
+    """Agent, product and client names in place of their ids, for a whole frame or a (page, total) result"""
+    if isinstance(result, tuple):
+        return adjuntar_nombres(result[0], conn), result[1]
+    return adjuntar_nombres(result, conn)
+
+def prepare_report_tables(conn, rollup=False):
+    """Make sure the reference catalogs and lookup tables (and optionally the daily rollup) are fresh"""
+    asegurar_referencia(conn)
+    asegurar_atributos_producto(conn)
+    asegurar_conjuntos(conn)
+    if rollup:
+        asegurar_rollup(conn)
+
+# Consulta para el reporte por año
+def build_reporte_anio_query(agente=None):
     # Agent filtering condition
     agente_condition = ""
     if agente and agente != 'Todos':
-        agente_condition = f"AND a.CNOMBREAGENTE = '{agente}'"
+        agente_condition = "AND r.CIDAGENTE = :cid_agente"
     
     # Tu consulta completa para reporte por año aquí
     query = f"""SELECT
-	YEAR(m.CFECHA) AS Año,
-    MONTH(m.CFECHA) AS Mes,
-    SUM(
-        CASE
-            WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' OR p.CNOMBREPRODUCTO LIKE '%1KG%' OR p.CNOMBREPRODUCTO LIKE '%1. KG%' THEN m.CUNIDADES * 1
-            WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' OR p.CNOMBREPRODUCTO LIKE '%25KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 25%' THEN m.CUNIDADES * 25
-            WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' OR p.CNOMBREPRODUCTO LIKE '%50KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 50%' THEN m.CUNIDADES * 50
-            WHEN p.CNOMBREPRODUCTO LIKE '%907 GR%' OR p.CNOMBREPRODUCTO LIKE '%2 LB%' THEN m.CUNIDADES * 0.907
-            WHEN p.CNOMBREPRODUCTO LIKE '%500 GR%' OR p.CNOMBREPRODUCTO LIKE '%0.5 KG%' THEN m.CUNIDADES * 0.5
-            WHEN p.CNOMBREPRODUCTO LIKE '%5 KG%' OR p.CNOMBREPRODUCTO LIKE '%5KG%' THEN m.CUNIDADES * 5
-            WHEN p.CNOMBREPRODUCTO LIKE '%2 KG%' OR p.CNOMBREPRODUCTO LIKE '%2KG%' THEN m.CUNIDADES * 2
-            WHEN p.CNOMBREPRODUCTO LIKE '%20 KG%' OR p.CNOMBREPRODUCTO LIKE '%20KG%' THEN m.CUNIDADES * 20
-            WHEN p.CNOMBREPRODUCTO LIKE '%26 KG%' OR p.CNOMBREPRODUCTO LIKE '%26KG%' THEN m.CUNIDADES * 26
-            WHEN p.CNOMBREPRODUCTO LIKE '%27 KG%' OR p.CNOMBREPRODUCTO LIKE '%27KG%' THEN m.CUNIDADES * 27
-            WHEN p.CNOMBREPRODUCTO LIKE '%50 LB%' THEN m.CUNIDADES * 22.68
-            WHEN p.CNOMBREPRODUCTO LIKE '%900 KG%' THEN m.CUNIDADES * 900
-            WHEN p.CNOMBREPRODUCTO LIKE '%1000 KG%' THEN m.CUNIDADES * 1000
-            ELSE 0
-        END
-    ) AS KilosTotales,
-    SUM(
-        CASE
-            WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' OR p.CNOMBREPRODUCTO LIKE '%1KG%' OR p.CNOMBREPRODUCTO LIKE '%1. KG%' THEN m.CUNIDADES * 1
-            WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' OR p.CNOMBREPRODUCTO LIKE '%25KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 25%' THEN m.CUNIDADES * 25
-            WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' OR p.CNOMBREPRODUCTO LIKE '%50KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 50%' THEN m.CUNIDADES * 50
-            WHEN p.CNOMBREPRODUCTO LIKE '%907 GR%' OR p.CNOMBREPRODUCTO LIKE '%2 LB%' THEN m.CUNIDADES * 0.907
-            WHEN p.CNOMBREPRODUCTO LIKE '%500 GR%' OR p.CNOMBREPRODUCTO LIKE '%0.5 KG%' THEN m.CUNIDADES * 0.5
-            WHEN p.CNOMBREPRODUCTO LIKE '%5 KG%' OR p.CNOMBREPRODUCTO LIKE '%5KG%' THEN m.CUNIDADES * 5
-            WHEN p.CNOMBREPRODUCTO LIKE '%2 KG%' OR p.CNOMBREPRODUCTO LIKE '%2KG%' THEN m.CUNIDADES * 2
-            WHEN p.CNOMBREPRODUCTO LIKE '%20 KG%' OR p.CNOMBREPRODUCTO LIKE '%20KG%' THEN m.CUNIDADES * 20
-            WHEN p.CNOMBREPRODUCTO LIKE '%26 KG%' OR p.CNOMBREPRODUCTO LIKE '%26KG%' THEN m.CUNIDADES * 26
-            WHEN p.CNOMBREPRODUCTO LIKE '%27 KG%' OR p.CNOMBREPRODUCTO LIKE '%27KG%' THEN m.CUNIDADES * 27
-            WHEN p.CNOMBREPRODUCTO LIKE '%50 LB%' THEN m.CUNIDADES * 22.68
-            WHEN p.CNOMBREPRODUCTO LIKE '%900 KG%' THEN m.CUNIDADES * 900
-            WHEN p.CNOMBREPRODUCTO LIKE '%1000 KG%' THEN m.CUNIDADES * 1000
-            ELSE 0
-        END
-    ) / 1000.0 AS ToneladasTotales
+	r.Anio AS Año,
+    r.Mes AS Mes,
+    SUM(r.Unidades * pa.KilosPorUnidad) AS KilosTotales,
+    SUM(r.Unidades * pa.KilosPorUnidad) / 1000.0 AS ToneladasTotales
 FROM 
-    admMovimientos m
-JOIN 
-    admProductos p ON m.CIDPRODUCTO = p.CIDPRODUCTO
-JOIN
-    admDocumentosModelo dm ON m.CIDDOCUMENTODE = dm.CIDDOCUMENTODE
+    rptVentasDiarias r
 JOIN
-    admDocumentos d ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
+    rptAtributosProducto pa ON pa.CIDPRODUCTO = r.CIDPRODUCTO
 JOIN
-    admAgentes a ON d.CIDAGENTE = a.CIDAGENTE
+    rptConjuntosProducto cp ON cp.CIDPRODUCTO = r.CIDPRODUCTO
 WHERE
-    p.CCODIGOPRODUCTO IN (('MESCO25'),
-	('MESCO30'),
-	('MESPU07'),
-	('MREGR26'),
-	('MREGR30'),
-	('MREP613'),
-	('MREP614'),
-	('MREP620'),
-	('PAL0007'),
-	('PAL0008'),
-	('PAL0009'),
-	('PBSMZ04'),
-	('PBSMZ05'),
-	('PBSMZ06'),
-	('PBSMZ08'),
-	('PBSMZ09'),
-	('PBSMZ11'),
-	('PBSMZ14'),
-	('PCAGF02'),
-	('PCAGF03'),
-	('PCAGF04'),
-	('PCFAI03'),
-	('PCFAM03'),
-	('PCFAZ03'),
-	('PCFMO03'),
-	('PCFMO05'),
-	('PCFNA03'),
-	('PCFNE03'),
-	('PCFRS03'),
-	('PCFVA03'),
-	('PCFVE03'),
-	('PCFVI03'),
-	('PCFVL03'),
-	('PCGAI03'),
-	('PCGAM03'),
-	('PCGAZ03'),
-	('PCGMO03'),
-	('PCGNA03'),
-	('PCGNE03'),
-	('PCGRF03'),
-	('PCGRO03'),
-	('PCGRS03'),
-	('PCGVA03'),
-	('PCGVE03'),
-	('PCGVI03'),
-	('PCGVL01'),
-	('PCGVL03'),
-	('PESCO25'),
-	('PESEM17'),
-	('PESGR07'),
-	('PESGR10'),
-	('PESGR21'),
-	('PESGR22'),
-	('PESP607'),
-	('PESP610'),
-	('PG3EN01'),
-	('PG3EN08'),
-	('PM5EN04'),
-	('PREBS07'),
-	('PRECE01'),
-	('PRECE02'),
-	('PRECS01'),
-	('PREEF26'),
-	('PREEM17'),
-	('PREFS11'),
-	('PREFS12'),
-	('PREGG12'),
-	('PREGR07'),
-	('PREGR10'),
-	('PREGR23'),
-	('PREGR24'),
-	('PREGR25'),
-	('PRELG02'),
-	('PREMC11'),
-	('PREO407'),
-	('PREP107'),
-	('PREP108'),
-	('PREP112'),
-	('PREP113'),
-	('PREP607'),
-	('PBAR002'),
-	('PCMNE01'),
-	('PREP111'),
-	('PCFVV03'),
-	('MAREGR11'),
-	('RMREP614'),
-	('PESEM11'),
-	('MREP621'),
-	('MREP622'),
-	('RREGR10'),
-	('RPREP607'),
-	('CSER026'),
-	('PREGR27'),
-	('PREGR29'),
-	('PBSMZ22'),
-	('RMREP620'),
-	('CSER208'),
-	('PESEM12'),
-	('AREGR10'),
-	('AE1GR01'),
-	('AR1GR10'),
-	('ABEGR01'),
-	('PBAR003'),
-	('MAM5ESCNI'),
-	('PESGG12'),
-	('RPREBS07'),
-	('RPBSMZ08'),
-	('PRECCN2'),
-	('MGSMDLZ'),
-	('ZTAR003'),
-	('ZTAR004'),
-	('ZTAR005'),
-	('CSER209'),
-	('MGL01'),
-	('PREEF27'),
-	('FEUR10'),
-	('JS109'),
-	('EX45'),
-	('SEÑ1600'),
-	('PCGEAZ1'),
-	('MREGR23'),
-	('ZEMP006'),
-	('MAREGR15'),
-	('PESCO40'),
-	('PPIL001'),
-	('ZBES010'),
-	('ZBES005'),
-	('ZBESM907'),
-	('ZBRE010'),
-	('ZBRE005'),
-	('PPIL002'),
-	('PPIL003'),
-	('ZSAC004'),
-	('MAM5CESGR2'),
-	('RSERMAQ04'),
-	('RSERMAQ05'),
-	('RSERMAQ06'),
-	('PILCJA01'),
-	('PILCJA02'),
-	('FLSER001'),
-	('LBACE01'),
-	('ZEDU007'))
-    AND m.CIDDOCUMENTODE = 4
-    AND dm.CMODULO = 1
+    cp.Conjunto = :conjunto
+    AND r.CIDDOCUMENTODE = 4
     {agente_condition}
 GROUP BY
-    YEAR(m.CFECHA),
-    MONTH(m.CFECHA) 
-ORDER BY 
-    YEAR(m.CFECHA),
-    MONTH(m.CFECHA); """  # Mantén tu consulta
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+    r.Anio,
+    r.Mes"""  # Mantén tu consulta
+    return ConsultaReporte(query, 'Año, Mes', {'cid_agente': id_agente(agente), 'conjunto': CONJUNTO_REPORTABLES})
+
+@cache_reportes.report('reporte_anio', preparar=compactador('reporte_anio'))
+@medir_reporte('reporte_anio')
+@report_budget('reporte_anio')
+def get_reporte_anio(agente=None, page=None, per_page=None):
+    if use_snapshot():
+        return page_frame(reportes_snapshot.reporte_anio(snapshot_ventas.hechos(), agente), page, per_page)
+    conn = get_db_connection()
+    try:
+        prepare_report_tables(conn, rollup=True)
+        return read_report_query(build_reporte_anio_query(agente), conn, page, per_page)
+    finally:
+        conn.close()
 
 # Function to get year report data for graphs
+@cache_reportes.report('reporte_anio_grafica',
+                       lambda p: bool(p['year1']) and _anio_cerrado(max(p['year1'], p['year2'] or 0)),
+                       preparar=compactador('reporte_anio_grafica'))
+@medir_reporte('reporte_anio_grafica')
+@report_budget('reporte_anio_grafica')
 def get_reporte_anio_for_graph(year1=None, year2=None, start_month=1, end_month=12, agente=None):
-    conn = get_db_connection()
-    
+    if use_snapshot():
+        return reportes_snapshot.reporte_anio_grafica(snapshot_ventas.hechos(), year1, year2, start_month, end_month,
+                                                      agente)
     year_filter = ""
     if year1 and year2:
-        year_filter = f"AND YEAR(m.CFECHA) IN ({year1}, {year2})"
+        year_filter = "AND r.Anio IN (:year1, :year2)"
     elif year1:
-        year_filter = f"AND YEAR(m.CFECHA) = {year1}"
+        year_filter = "AND r.Anio = :year1"
     
-    month_filter = f"AND MONTH(m.CFECHA) BETWEEN {start_month} AND {end_month}"
+    month_filter = "AND r.Mes BETWEEN :start_month AND :end_month"
     
     agente_condition = ""
     if agente and agente != 'Todos':
-        agente_condition = f"AND a.CNOMBREAGENTE = '{agente}'"
+        agente_condition = "AND r.CIDAGENTE = :cid_agente"
     
     query = f"""SELECT
-	YEAR(m.CFECHA) AS Anio,
-    MONTH(m.CFECHA) AS Mes,
-    SUM(
-        CASE
-            WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' OR p.CNOMBREPRODUCTO LIKE '%1KG%' OR p.CNOMBREPRODUCTO LIKE '%1. KG%' THEN m.CUNIDADES * 1
-            WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' OR p.CNOMBREPRODUCTO LIKE '%25KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 25%' THEN m.CUNIDADES * 25
-            WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' OR p.CNOMBREPRODUCTO LIKE '%50KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 50%' THEN m.CUNIDADES * 50
-            WHEN p.CNOMBREPRODUCTO LIKE '%907 GR%' OR p.CNOMBREPRODUCTO LIKE '%2 LB%' THEN m.CUNIDADES * 0.907
-            WHEN p.CNOMBREPRODUCTO LIKE '%500 GR%' OR p.CNOMBREPRODUCTO LIKE '%0.5 KG%' THEN m.CUNIDADES * 0.5
-            WHEN p.CNOMBREPRODUCTO LIKE '%5 KG%' OR p.CNOMBREPRODUCTO LIKE '%5KG%' THEN m.CUNIDADES * 5
-            WHEN p.CNOMBREPRODUCTO LIKE '%2 KG%' OR p.CNOMBREPRODUCTO LIKE '%2KG%' THEN m.CUNIDADES * 2
-            WHEN p.CNOMBREPRODUCTO LIKE '%20 KG%' OR p.CNOMBREPRODUCTO LIKE '%20KG%' THEN m.CUNIDADES * 20
-            WHEN p.CNOMBREPRODUCTO LIKE '%26 KG%' OR p.CNOMBREPRODUCTO LIKE '%26KG%' THEN m.CUNIDADES * 26
-            WHEN p.CNOMBREPRODUCTO LIKE '%27 KG%' OR p.CNOMBREPRODUCTO LIKE '%27KG%' THEN m.CUNIDADES * 27
-            WHEN p.CNOMBREPRODUCTO LIKE '%50 LB%' THEN m.CUNIDADES * 22.68
-            WHEN p.CNOMBREPRODUCTO LIKE '%900 KG%' THEN m.CUNIDADES * 900
-            WHEN p.CNOMBREPRODUCTO LIKE '%1000 KG%' THEN m.CUNIDADES * 1000
-            ELSE 0
-        END
-    ) / 1000.0 AS ToneladasTotales
+	r.Anio AS Anio,
+    r.Mes AS Mes,
+    SUM(r.Unidades * pa.KilosPorUnidad) / 1000.0 AS ToneladasTotales
 FROM 
-    admMovimientos m
-JOIN 
-    admProductos p ON m.CIDPRODUCTO = p.CIDPRODUCTO
+    rptVentasDiarias r
 JOIN
-    admDocumentosModelo dm ON m.CIDDOCUMENTODE = dm.CIDDOCUMENTODE
+    rptAtributosProducto pa ON pa.CIDPRODUCTO = r.CIDPRODUCTO
 JOIN
-    admDocumentos d ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
-JOIN
-    admAgentes a ON d.CIDAGENTE = a.CIDAGENTE
+    rptConjuntosProducto cp ON cp.CIDPRODUCTO = r.CIDPRODUCTO
 WHERE
-    p.CCODIGOPRODUCTO IN (('MESCO25'),('MESCO30'),('MESPU07'),('MREGR26'),('MREGR30'),('MREP613'),('MREP614'),('MREP620'),('PAL0007'),('PAL0008'),('PAL0009'),('PBSMZ04'),('PBSMZ05'),('PBSMZ06'),('PBSMZ08'),('PBSMZ09'),('PBSMZ11'),('PBSMZ14'),('PCAGF02'),('PCAGF03'),('PCAGF04'),('PCFAI03'),('PCFAM03'),('PCFAZ03'),('PCFMO03'),('PCFMO05'),('PCFNA03'),('PCFNE03'),('PCFRS03'),('PCFVA03'),('PCFVE03'),('PCFVI03'),('PCFVL03'),('PCGAI03'),('PCGAM03'),('PCGAZ03'),('PCGMO03'),('PCGNA03'),('PCGNE03'),('PCGRF03'),('PCGRO03'),('PCGRS03'),('PCGVA03'),('PCGVE03'),('PCGVI03'),('PCGVL01'),('PCGVL03'),('PESCO25'),('PESEM17'),('PESGR07'),('PESGR10'),('PESGR21'),('PESGR22'),('PESP607'),('PESP610'),('PG3EN01'),('PG3EN08'),('PM5EN04'),('PREBS07'),('PRECE01'),('PRECE02'),('PRECS01'),('PREEF26'),('PREEM17'),('PREFS11'),('PREFS12'),('PREGG12'),('PREGR07'),('PREGR10'),('PREGR23'),('PREGR24'),('PREGR25'),('PRELG02'),('PREMC11'),('PREO407'),('PREP107'),('PREP108'),('PREP112'),('PREP113'),('PREP607'),('PBAR002'),('PCMNE01'),('PREP111'),('PCFVV03'),('MAREGR11'),('RMREP614'),('PESEM11'),('MREP621'),('MREP622'),('RREGR10'),('RPREP607'),('CSER026'),('PREGR27'),('PREGR29'),('PBSMZ22'),('RMREP620'),('CSER208'),('PESEM12'),('AREGR10'),('AE1GR01'),('AR1GR10'),('ABEGR01'),('PBAR003'),('MAM5ESCNI'),('PESGG12'),('RPREBS07'),('RPBSMZ08'),('PRECCN2'),('MGSMDLZ'),('ZTAR003'),('ZTAR004'),('ZTAR005'),('CSER209'),('MGL01'),('PREEF27'),('FEUR10'),('JS109'),('EX45'),('SEÑ1600'),('PCGEAZ1'),('MREGR23'),('ZEMP006'),('MAREGR15'),('PESCO40'),('PPIL001'),('ZBES010'),('ZBES005'),('ZBESM907'),('ZBRE010'),('ZBRE005'),('PPIL002'),('PPIL003'),('ZSAC004'),('MAM5CESGR2'),('RSERMAQ04'),('RSERMAQ05'),('RSERMAQ06'),('PILCJA01'),('PILCJA02'),('FLSER001'),('LBACE01'),('ZEDU007'))
-    AND m.CIDDOCUMENTODE = 4
-    AND dm.CMODULO = 1
+    cp.Conjunto = :conjunto
+    AND r.CIDDOCUMENTODE = 4
     {year_filter}
     {month_filter}
     {agente_condition}
 GROUP BY
-    YEAR(m.CFECHA),
-    MONTH(m.CFECHA) 
+    r.Anio,
+    r.Mes 
 ORDER BY 
-    YEAR(m.CFECHA),
-    MONTH(m.CFECHA);"""
+    r.Anio,
+    r.Mes;"""
     
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+    conn = get_db_connection()
+    try:
+        prepare_report_tables(conn, rollup=True)
+        return run_query(conn, query, {'year1': year1, 'year2': year2, 'start_month': start_month,
+                                       'end_month': end_month, 'cid_agente': id_agente(agente),
+                                       'conjunto': CONJUNTO_REPORTABLES})
+    finally:
+        conn.close()
 
 # Consulta para ventas por agente día (CORREGIDA)
-def get_ventas_agente_dia(agente=None, fecha=None, anio1=None, mes1=None, dia_inicio=None, dia_fin=None, anio2=None, mes2=None):
-    conn = get_db_connection()
-    
-    # Construir las condiciones dinámicamente
-    agente_condition = ""
-    if agente and agente != 'Todos':
-        agente_condition = f"AND a.CNOMBREAGENTE = '{agente}'"
-    
-    fecha_condition = ""
-    if fecha:
-        fecha_condition = f"AND CONVERT(DATE, m.CFECHA) = '{fecha}'"
-    elif anio1 and mes1:  # Range mode
-        if dia_inicio and dia_fin:
-            if anio2 and mes2:  # Comparison mode
-                fecha_condition = f"""AND (
-                    (YEAR(m.CFECHA) = {anio1} AND MONTH(m.CFECHA) = {mes1} AND DAY(m.CFECHA) BETWEEN {dia_inicio} AND {dia_fin})
-                    OR (YEAR(m.CFECHA) = {anio2} AND MONTH(m.CFECHA) = {mes2} AND DAY(m.CFECHA) BETWEEN {dia_inicio} AND {dia_fin})
-                )"""
-            else:  # Single month range
-                fecha_condition = f"AND YEAR(m.CFECHA) = {anio1} AND MONTH(m.CFECHA) = {mes1} AND DAY(m.CFECHA) BETWEEN {dia_inicio} AND {dia_fin}"
-        else:  # Full month
-            if anio2 and mes2:  # Comparison mode
-                fecha_condition = f"""AND (
-                    (YEAR(m.CFECHA) = {anio1} AND MONTH(m.CFECHA) = {mes1})
-                    OR (YEAR(m.CFECHA) = {anio2} AND MONTH(m.CFECHA) = {mes2})
-                )"""
-            else:  # Single month
-                fecha_condition = f"AND YEAR(m.CFECHA) = {anio1} AND MONTH(m.CFECHA) = {mes1}"
+def build_ventas_agente_dia_query(agente=None, fecha=None, anio1=None, mes1=None, dia_inicio=None, dia_fin=None,
+                                  anio2=None, mes2=None, incremental=False, desde_movimiento=None):
+    """Daily detail query; `incremental` adds each group's highest CIDMOVIMIENTO and, with
+    `desde_movimiento`, reads only the movements above it (see reportes.incremental)"""
+    # Rangos de fecha semiabiertos sobre CFECHA (una búsqueda por rango)
+    movimientos, params_fechas = movimientos_en(
+        rangos_filtro(fecha, anio1, mes1, dia_inicio, dia_fin, anio2, mes2))
+    marca_select = ",\n        MAX(m.CIDMOVIMIENTO) AS UltimoMovimiento" if incremental else ""
+    marca_condition = "AND m.CIDMOVIMIENTO > :desde_movimiento" if desde_movimiento is not None else ""
+    # Agentes y tipos de documento por id (catálogos en memoria); los nombres se agregan en pandas
     query = f"""
     SELECT
         d.CRAZONSOCIAL,
-        p.CCODIGOPRODUCTO,
-        p.CNOMBREPRODUCTO,
+        m.CIDPRODUCTO AS CIDPRODUCTO,
         CONVERT(DATE, m.CFECHA) AS Fecha,
-        a.CNOMBREAGENTE AS Agente,
+        d.CIDAGENTE AS CIDAGENTE,
+        pa.Categoria AS Categoria,
         CASE
-            WHEN p.CNOMBREPRODUCTO LIKE '%BOLSA%' THEN 'Empaquetado'
-            WHEN p.CNOMBREPRODUCTO LIKE '%GLUCOSA%' THEN 'Glucosa'
-            WHEN p.CNOMBREPRODUCTO LIKE '%ALMIDON%' THEN 'Almidon'
-            WHEN p.CNOMBREPRODUCTO LIKE '%PILONCILLO%' THEN 'Piloncillo'
-            WHEN p.CNOMBREPRODUCTO LIKE '%PULVER%' THEN 'Pulverizada'
-            WHEN p.CNOMBREPRODUCTO LIKE '%CASTER%' THEN 'Confeccion'
-            WHEN p.CNOMBREPRODUCTO LIKE '%MIX%' THEN 'Confeccion'
-            WHEN p.CNOMBREPRODUCTO LIKE '%EXTRA%' THEN 'Confeccion'
-            WHEN p.CNOMBREPRODUCTO LIKE '%ENDULZANTE%' THEN 'Sucralosa'
-            WHEN p.CNOMBREPRODUCTO LIKE '%SERVICIO%' THEN 'Servicio de Maniobras'
-            WHEN p.CCODIGOPRODUCTO LIKE '%CO%' THEN 'Confeccion'
-            WHEN p.CCODIGOPRODUCTO LIKE '%PREGR%' THEN 'Refinada Granulada'
-            WHEN p.CCODIGOPRODUCTO LIKE '%PESGR%' THEN 'Estandar Granulada'
-            ELSE 'otro'
-        END AS Categoria,
-        CASE
-            WHEN a.CNOMBREAGENTE = 'MOLIENDAS' THEN 'Moliendas'
-            ELSE 'Switen'
+            WHEN d.CIDAGENTE = :cid_moliendas THEN 'Moliendas'
+            ELSE pa.Empresa
         END AS TipoAgente,
         SUM(m.CUNIDADES) AS Unidades,
-        SUM(
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' OR p.CNOMBREPRODUCTO LIKE '%1KG%' OR p.CNOMBREPRODUCTO LIKE '%1. KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' OR p.CNOMBREPRODUCTO LIKE '%25KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 25%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' OR p.CNOMBREPRODUCTO LIKE '%50KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 50%' THEN m.CUNIDADES * 50
-                WHEN p.CNOMBREPRODUCTO LIKE '%907 GR%' OR p.CNOMBREPRODUCTO LIKE '%2 LB%' THEN m.CUNIDADES * 0.907
-                WHEN p.CNOMBREPRODUCTO LIKE '%500 GR%' OR p.CNOMBREPRODUCTO LIKE '%0.5 KG%' THEN m.CUNIDADES * 0.5
-                WHEN p.CNOMBREPRODUCTO LIKE '%5 KG%' OR p.CNOMBREPRODUCTO LIKE '%5KG%' THEN m.CUNIDADES * 5
-                WHEN p.CNOMBREPRODUCTO LIKE '%2 KG%' OR p.CNOMBREPRODUCTO LIKE '%2KG%' THEN m.CUNIDADES * 2
-                WHEN p.CNOMBREPRODUCTO LIKE '%20 KG%' OR p.CNOMBREPRODUCTO LIKE '%20KG%' THEN m.CUNIDADES * 20
-                WHEN p.CNOMBREPRODUCTO LIKE '%26 KG%' OR p.CNOMBREPRODUCTO LIKE '%26KG%' THEN m.CUNIDADES * 26
-                WHEN p.CNOMBREPRODUCTO LIKE '%27 KG%' OR p.CNOMBREPRODUCTO LIKE '%27KG%' THEN m.CUNIDADES * 27
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 LB%' THEN m.CUNIDADES * 22.68
-                WHEN p.CNOMBREPRODUCTO LIKE '%900 KG%' THEN m.CUNIDADES * 900
-                WHEN p.CNOMBREPRODUCTO LIKE '%1000 KG%' THEN m.CUNIDADES * 1000
-                ELSE 0
-            END
-        ) / 1000.0 AS Toneladas
-    FROM admMovimientos m
-    JOIN admProductos p ON m.CIDPRODUCTO = p.CIDPRODUCTO
-    JOIN admDocumentosModelo dm ON m.CIDDOCUMENTODE = dm.CIDDOCUMENTODE
+        SUM(m.CUNIDADES * pa.KilosPorUnidad) / 1000.0 AS Toneladas{marca_select}
+    FROM {movimientos} m
+    JOIN rptAtributosProducto pa ON pa.CIDPRODUCTO = m.CIDPRODUCTO
+    JOIN rptConjuntosProducto cp ON cp.CIDPRODUCTO = m.CIDPRODUCTO
     JOIN admDocumentos d ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
-    JOIN admAgentes a ON d.CIDAGENTE = a.CIDAGENTE
     WHERE
-        p.CCODIGOPRODUCTO IN (
-        'MESCO25','MESCO30','MESPU07','MREGR26','MREGR30','MREP613','MREP614','MREP620',
-        'PAL0007','PAL0008','PAL0009','PBSMZ04','PBSMZ05','PBSMZ06','PBSMZ08','PBSMZ09',
-        'PBSMZ11','PBSMZ14','PCAGF02','PCAGF03','PCAGF04','PCFAI03','PCFAM03','PCFAZ03',
-        'PCFMO03','PCFMO05','PCFNA03','PCFNE03','PCFRS03','PCFVA03','PCFVE03','PCFVI03',
-        'PCFVL03','PCGAI03','PCGAM03','PCGAZ03','PCGMO03','PCGNA03','PCGNE03','PCGRF03',
-        'PCGRO03','PCGRS03','PCGVA03','PCGVE03','PCGVI03','PCGVL01','PCGVL03','PESCO25',
-        'PESEM17','PESGR07','PESGR10','PESGR21','PESGR22','PESP607','PESP610','PG3EN01',
-        'PG3EN08','PM5EN04','PREBS07','PRECE01','PRECE02','PRECS01','PREEF26','PREEM17',
-        'PREFS11','PREFS12','PREGG12','PREGR07','PREGR10','PREGR23','PREGR24','PREGR25',
-        'PRELG02','PREMC11','PREO407','PREP107','PREP108','PREP112','PREP113','PREP607',
-        'PBAR002','PCMNE01','PREP111','PCFVV03','MAREGR11','RMREP614','PESEM11','MREP621',
-        'MREP622','RREGR10','RPREP607','CSER026','PREGR27','PREGR29','PBSMZ22','RMREP620',
-        'CSER208','PESEM12','AREGR10','AE1GR01','AR1GR10','ABEGR01','PBAR003','MAM5ESCNI',
-        'PESGG12','RPREBS07','RPBSMZ08','PRECCN2','MGSMDLZ','ZTAR003','ZTAR004','ZTAR005',
-        'CSER209','MGL01','PREEF27','FEUR10','JS109','EX45','SEÑ1600','PCGEAZ1','MREGR23',
-        'ZEMP006','MAREGR15','PESCO40','PPIL001','ZBES010','ZBES005','ZBESM907','ZBRE010',
-        'ZBRE005','PPIL002','PPIL003','ZSAC004','MAM5CESGR2','RSERMAQ04','RSERMAQ05',
-        'RSERMAQ06','PILCJA01','PILCJA02','FLSER001','LBACE01','ZEDU007'
-        )
-        AND (
-            m.CIDDOCUMENTODE = 4
-            OR (m.CIDDOCUMENTODE = 3 AND dm.CMODULO = 1)
-        )
-        AND a.CNOMBREAGENTE IN (
-            'MAYOREO / SPOT',
-            'MOLIENDAS',
-            'JAVIER ARROYO',
-            'MOLIENDAS MAQ MDLZ',
-            'MDLZ P2',
-            'MOSTRADOR 1',
-            'MOSTRADOR 2',
-            'MOSTRADOR 3'
-        )
-        {agente_condition}
-        {fecha_condition}
+        cp.Conjunto = :conjunto
+        AND m.CIDDOCUMENTODE IN (:documentos)
+        AND d.CIDAGENTE IN (:agentes)
+        {marca_condition}
     GROUP BY
         d.CRAZONSOCIAL,
-        p.CCODIGOPRODUCTO,
-        p.CNOMBREPRODUCTO,
+        m.CIDPRODUCTO,
         CONVERT(DATE, m.CFECHA),
-        a.CNOMBREAGENTE,
-        -- Columnas CASE
-        CASE
-            WHEN p.CNOMBREPRODUCTO LIKE '%BOLSA%' THEN 'Empaquetado'
-            WHEN p.CNOMBREPRODUCTO LIKE '%GLUCOSA%' THEN 'Glucosa'
-            WHEN p.CNOMBREPRODUCTO LIKE '%ALMIDON%' THEN 'Almidon'
-            WHEN p.CNOMBREPRODUCTO LIKE '%PILONCILLO%' THEN 'Piloncillo'
-            WHEN p.CNOMBREPRODUCTO LIKE '%PULVER%' THEN 'Pulverizada'
-            WHEN p.CNOMBREPRODUCTO LIKE '%CASTER%' THEN 'Confeccion'
-            WHEN p.CNOMBREPRODUCTO LIKE '%MIX%' THEN 'Confeccion'
-            WHEN p.CNOMBREPRODUCTO LIKE '%EXTRA%' THEN 'Confeccion'
-            WHEN p.CNOMBREPRODUCTO LIKE '%ENDULZANTE%' THEN 'Sucralosa'
-            WHEN p.CNOMBREPRODUCTO LIKE '%SERVICIO%' THEN 'Servicio de Maniobras'
-            WHEN p.CCODIGOPRODUCTO LIKE '%CO%' THEN 'Confeccion'
-            WHEN p.CCODIGOPRODUCTO LIKE '%PREGR%' THEN 'Refinada Granulada'
-            WHEN p.CCODIGOPRODUCTO LIKE '%PESGR%' THEN 'Estandar Granulada'
-            ELSE 'otro'
-        END,
-        CASE
-            WHEN a.CNOMBREAGENTE = 'MOLIENDAS' THEN 'Moliendas'
-            ELSE 'Switen'
-        END
-    ORDER BY Fecha DESC, Agente;
+        d.CIDAGENTE,
+        -- Atributos del producto (uno por CIDPRODUCTO)
+        pa.Categoria,
+        pa.Empresa
     """
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+    params = {'cid_moliendas': id_agente('MOLIENDAS'), 'documentos': documentos_venta(),
+              'agentes': ids_agentes(agente), 'desde_movimiento': desde_movimiento,
+              'conjunto': CONJUNTO_REPORTABLES, **params_fechas}
+    return ConsultaReporte(query, 'Fecha DESC, CIDAGENTE, CRAZONSOCIAL, CIDPRODUCTO', params)
 
-# Función para obtener datos de ventas por día para gráfico de comparación
-def get_ventas_dia_for_graph(agente=None, anio1=None, mes1=None, dia_inicio=None, dia_fin=None, anio2=None, mes2=None):
+@cache_reportes.report('ventas_dia', _dias_cerrados, preparar=compactador('ventas_dia'))
+@medir_reporte('ventas_dia')
+@report_budget('ventas_dia')
+def get_ventas_agente_dia(agente=None, fecha=None, anio1=None, mes1=None, dia_inicio=None, dia_fin=None, anio2=None, mes2=None,
+                          page=None, per_page=None):
+    if use_snapshot():
+        rangos = rangos_filtro(fecha, anio1, mes1, dia_inicio, dia_fin, anio2, mes2)
+        df = reportes_snapshot.ventas_dia(snapshot_hechos_en(rangos), rangos, agente)
+        return page_frame(df, page, per_page)
     conn = get_db_connection()
-    
-    # Construir las condiciones dinámicamente
-    agente_condition = ""
-    if agente and agente != 'Todos':
-        agente_condition = f"AND a.CNOMBREAGENTE = '{agente}'"
-    
-    fecha_condition = ""
-    if anio1 and mes1:
-        if dia_inicio and dia_fin:
-            if anio2 and mes2:  # Comparison mode
-                fecha_condition = f"""AND (
-                    (YEAR(m.CFECHA) = {anio1} AND MONTH(m.CFECHA) = {mes1} AND DAY(m.CFECHA) BETWEEN {dia_inicio} AND {dia_fin})
-                    OR (YEAR(m.CFECHA) = {anio2} AND MONTH(m.CFECHA) = {mes2} AND DAY(m.CFECHA) BETWEEN {dia_inicio} AND {dia_fin})
-                )"""
-            else:  # Single month range
-                fecha_condition = f"AND YEAR(m.CFECHA) = {anio1} AND MONTH(m.CFECHA) = {mes1} AND DAY(m.CFECHA) BETWEEN {dia_inicio} AND {dia_fin}"
-        else:  # Full month
-            if anio2 and mes2:  # Comparison mode
-                fecha_condition = f"""AND (
-                    (YEAR(m.CFECHA) = {anio1} AND MONTH(m.CFECHA) = {mes1})
-                    OR (YEAR(m.CFECHA) = {anio2} AND MONTH(m.CFECHA) = {mes2})
-                )"""
-            else:  # Single month
-                fecha_condition = f"AND YEAR(m.CFECHA) = {anio1} AND MONTH(m.CFECHA) = {mes1}"
-    
-    query = f"""
-    SELECT
-        YEAR(m.CFECHA) AS Anio,
-        MONTH(m.CFECHA) AS Mes,
-        DAY(m.CFECHA) AS Dia,
-        SUM(
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' OR p.CNOMBREPRODUCTO LIKE '%1KG%' OR p.CNOMBREPRODUCTO LIKE '%1. KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' OR p.CNOMBREPRODUCTO LIKE '%25KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 25%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' OR p.CNOMBREPRODUCTO LIKE '%50KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 50%' THEN m.CUNIDADES * 50
-                WHEN p.CNOMBREPRODUCTO LIKE '%907 GR%' OR p.CNOMBREPRODUCTO LIKE '%2 LB%' THEN m.CUNIDADES * 0.907
-                WHEN p.CNOMBREPRODUCTO LIKE '%500 GR%' OR p.CNOMBREPRODUCTO LIKE '%0.5 KG%' THEN m.CUNIDADES * 0.5
-                WHEN p.CNOMBREPRODUCTO LIKE '%5 KG%' OR p.CNOMBREPRODUCTO LIKE '%5KG%' THEN m.CUNIDADES * 5
-                WHEN p.CNOMBREPRODUCTO LIKE '%2 KG%' OR p.CNOMBREPRODUCTO LIKE '%2KG%' THEN m.CUNIDADES * 2
-                WHEN p.CNOMBREPRODUCTO LIKE '%20 KG%' OR p.CNOMBREPRODUCTO LIKE '%20KG%' THEN m.CUNIDADES * 20
-                WHEN p.CNOMBREPRODUCTO LIKE '%26 KG%' OR p.CNOMBREPRODUCTO LIKE '%26KG%' THEN m.CUNIDADES * 26
-                WHEN p.CNOMBREPRODUCTO LIKE '%27 KG%' OR p.CNOMBREPRODUCTO LIKE '%27KG%' THEN m.CUNIDADES * 27
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 LB%' THEN m.CUNIDADES * 22.68
-                WHEN p.CNOMBREPRODUCTO LIKE '%900 KG%' THEN m.CUNIDADES * 900
-                WHEN p.CNOMBREPRODUCTO LIKE '%1000 KG%' THEN m.CUNIDADES * 1000
-                ELSE 0
-            END
-        ) / 1000.0 AS ToneladasTotales
-    FROM admMovimientos m
-    JOIN admProductos p ON m.CIDPRODUCTO = p.CIDPRODUCTO
-    JOIN admDocumentosModelo dm ON m.CIDDOCUMENTODE = dm.CIDDOCUMENTODE
-    JOIN admDocumentos d ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
-    JOIN admAgentes a ON d.CIDAGENTE = a.CIDAGENTE
-    WHERE
-        p.CCODIGOPRODUCTO IN (
-        'MESCO25','MESCO30','MESPU07','MREGR26','MREGR30','MREP613','MREP614','MREP620',
-        'PAL0007','PAL0008','PAL0009','PBSMZ04','PBSMZ05','PBSMZ06','PBSMZ08','PBSMZ09',
-        'PBSMZ11','PBSMZ14','PCAGF02','PCAGF03','PCAGF04','PCFAI03','PCFAM03','PCFAZ03',
-        'PCFMO03','PCFMO05','PCFNA03','PCFNE03','PCFRS03','PCFVA03','PCFVE03','PCFVI03',
-        'PCFVL03','PCGAI03','PCGAM03','PCGAZ03','PCGMO03','PCGNA03','PCGNE03','PCGRF03',
-        'PCGRO03','PCGRS03','PCGVA03','PCGVE03','PCGVI03','PCGVL01','PCGVL03','PESCO25',
-        'PESEM17','PESGR07','PESGR10','PESGR21','PESGR22','PESP607','PESP610','PG3EN01',
-        'PG3EN08','PM5EN04','PREBS07','PRECE01','PRECE02','PRECS01','PREEF26','PREEM17',
-        'PREFS11','PREFS12','PREGG12','PREGR07','PREGR10','PREGR23','PREGR24','PREGR25',
-        'PRELG02','PREMC11','PREO407','PREP107','PREP108','PREP112','PREP113','PREP607',
-        'PBAR002','PCMNE01','PREP111','PCFVV03','MAREGR11','RMREP614','PESEM11','MREP621',
-        'MREP622','RREGR10','RPREP607','CSER026','PREGR27','PREGR29','PBSMZ22','RMREP620',
-        'CSER208','PESEM12','AREGR10','AE1GR01','AR1GR10','ABEGR01','PBAR003','MAM5ESCNI',
-        'PESGG12','RPREBS07','RPBSMZ08','PRECCN2','MGSMDLZ','ZTAR003','ZTAR004','ZTAR005',
-        'CSER209','MGL01','PREEF27','FEUR10','JS109','EX45','SEÑ1600','PCGEAZ1','MREGR23',
-        'ZEMP006','MAREGR15','PESCO40','PPIL001','ZBES010','ZBES005','ZBESM907','ZBRE010',
-        'ZBRE005','PPIL002','PPIL003','ZSAC004','MAM5CESGR2','RSERMAQ04','RSERMAQ05',
-        'RSERMAQ06','PILCJA01','PILCJA02','FLSER001','LBACE01','ZEDU007'
-        )
-        AND (
-            m.CIDDOCUMENTODE = 4
-            OR (m.CIDDOCUMENTODE = 3 AND dm.CMODULO = 1)
-        )
-        AND a.CNOMBREAGENTE IN (
-            'MAYOREO / SPOT',
-            'MOLIENDAS',
-            'JAVIER ARROYO',
-            'MOLIENDAS MAQ MDLZ',
-            'MDLZ P2',
-            'MOSTRADOR 1',
-            'MOSTRADOR 2',
-            'MOSTRADOR 3'
-        )
-        {agente_condition}
-        {fecha_condition}
-    GROUP BY
-        YEAR(m.CFECHA),
-        MONTH(m.CFECHA),
-        DAY(m.CFECHA)
-    ORDER BY Anio, Mes, Dia;
-    """
-    
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+    try:
+        prepare_report_tables(conn)
+        consulta = build_ventas_agente_dia_query(agente, fecha, anio1, mes1, dia_inicio, dia_fin, anio2, mes2)
+        return with_names(read_report_query(consulta, conn, page, per_page), conn)
+    finally:
+        conn.close()
 
-# Consulta para ventas por agente mes (CORREGIDA)
-def get_ventas_agente_mes(agente=None, anio=None, mes=None):
+def read_open_month_daily(periodo, desde_movimiento):
+    """Daily detail of every report agent for `periodo` (anio, mes), by ids, with each group's last movement"""
+    import calendar
+    anio, mes = periodo
     conn = get_db_connection()
-    
-    # Construir las condiciones dinámicamente
-    agente_condition = ""
+    try:
+        prepare_report_tables(conn)
+        consulta = build_ventas_agente_dia_query('Todos', None, anio, mes, 1, calendar.monthrange(anio, mes)[1],
+                                                 incremental=True, desde_movimiento=desde_movimiento)
+        return read_report_query(consulta, conn)
+    finally:
+        conn.close()
+
+def create_daily_delta():
+    """Delta-merged open month frame behind the default daily view; REPORT_DELTA_FULL_SECONDS=0 disables it"""
+    completo_cada = float(os.environ.get('REPORT_DELTA_FULL_SECONDS', 900))
+    if completo_cada <= 0:
+        return None
+    return AcumuladoIncremental(
+        read_open_month_daily,
+        grano=['CRAZONSOCIAL', 'CIDPRODUCTO', 'Fecha', 'CIDAGENTE', 'Categoria', 'TipoAgente'],
+        sumas=['Unidades', 'Toneladas'],
+        # El mismo orden que la consulta paginada
+        orden=(['Fecha', 'CIDAGENTE', 'CRAZONSOCIAL', 'CIDPRODUCTO'], [False, True, True, True]),
+        completo_cada=completo_cada,
+        intervalo_minimo=float(os.environ.get('REPORT_DELTA_MIN_SECONDS', 5)),
+        reintentar_cada=float(os.environ.get('REPORT_DELTA_RETRY_SECONDS', 60)),
+        preparar=compactador('ventas_dia_incremental', ESQUEMAS['ventas_dia']),
+        etiquetar=version_datos.etiqueta, nombre='ventas_dia')
+
+ventas_dia_incremental = create_daily_delta()
+
+def is_open_month_view(fecha, anio1, mes1, dia_inicio, dia_fin, anio2, mes2):
+    """Whether the daily filters are the default view: the whole current month, no comparison"""
+    import calendar
+    hoy = date.today()
+    return (not fecha and not (anio2 and mes2) and (anio1, mes1) == (hoy.year, hoy.month)
+            and dia_inicio == 1 and dia_fin == calendar.monthrange(hoy.year, hoy.month)[1])
+
+@medir_reporte('ventas_dia_incremental')
+@report_budget('ventas_dia')
+def get_open_month_daily(agente=None, page=None, per_page=None):
+    """Current month daily detail from the delta-merged frame, filtered to `agente` in-process"""
+    hoy = date.today()
+    df = ventas_dia_incremental.obtener((hoy.year, hoy.month), cache_reportes.version())
     if agente and agente != 'Todos':
-        agente_condition = f"AND a.CNOMBREAGENTE = '{agente}'"
-    
+        df = df[df['CIDAGENTE'].isin(ids_agentes(agente))]
+    df = adjuntar_nombres(df.drop(columns=COLUMNA_MARCA).reset_index(drop=True))
+    return page_frame(df, page, per_page)
+
+def daily_detail(agente, fecha, anio1, mes1, dia_inicio, dia_fin, anio2, mes2, page=None, per_page=None):
+    """get_ventas_agente_dia, except the default open month view, which is kept current by delta reads"""
+    if ventas_dia_incremental is not None and not use_snapshot() \
+            and is_open_month_view(fecha, anio1, mes1, dia_inicio, dia_fin, anio2, mes2):
+        return get_open_month_daily(agente, page=page, per_page=per_page)
+    return get_ventas_agente_dia(agente, fecha, anio1, mes1, dia_inicio, dia_fin, anio2, mes2,
+                                 page=page, per_page=per_page)
+
+# Función para obtener datos de ventas por día para gráfico de comparación
+def daily_graph_from_detail(detalle):
+    """Tonnage per (Anio, Mes, Dia) summed from the ventas_dia detail frame"""
+    fecha = pd.to_datetime(detalle['Fecha']).dt
+    df = detalle.groupby([fecha.year.rename('Anio'), fecha.month.rename('Mes'), fecha.day.rename('Dia')]) \
+        ['Toneladas'].sum().rename('ToneladasTotales').reset_index()
+    return df.sort_values(['Anio', 'Mes', 'Dia']).reset_index(drop=True)
+
+@cache_reportes.report('ventas_dia_grafica', _dias_cerrados, preparar=compactador('ventas_dia_grafica'))
+@medir_reporte('ventas_dia_grafica')
+def get_ventas_dia_for_graph(agente=None, anio1=None, mes1=None, dia_inicio=None, dia_fin=None, anio2=None, mes2=None):
+    # Misma consulta (y entrada de caché) que el detalle, agrupada por día en pandas
+    return daily_graph_from_detail(get_ventas_agente_dia(agente, None, anio1, mes1, dia_inicio, dia_fin, anio2, mes2))
+
+# Consulta para ventas por agente mes (CORREGIDA)
+def build_ventas_agente_mes_query(agente=None, anio=None, mes=None):
     fecha_condition = ""
     if anio and mes:
-        fecha_condition = f"AND YEAR(m.CFECHA) = {anio} AND MONTH(m.CFECHA) = {mes}"
+        fecha_condition = "AND r.Anio = :anio AND r.Mes = :mes"
     
     query = f"""
     SELECT
-        YEAR(m.CFECHA) AS Anio,
-        MONTH(m.CFECHA) AS Mes,
-        a.CNOMBREAGENTE AS Agente,
-        SUM(
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' OR p.CNOMBREPRODUCTO LIKE '%1KG%' OR p.CNOMBREPRODUCTO LIKE '%1. KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' OR p.CNOMBREPRODUCTO LIKE '%25KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 25%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' OR p.CNOMBREPRODUCTO LIKE '%50KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 50%' THEN m.CUNIDADES * 50
-                WHEN p.CNOMBREPRODUCTO LIKE '%907 GR%' OR p.CNOMBREPRODUCTO LIKE '%2 LB%' THEN m.CUNIDADES * 0.907
-                WHEN p.CNOMBREPRODUCTO LIKE '%500 GR%' OR p.CNOMBREPRODUCTO LIKE '%0.5 KG%' THEN m.CUNIDADES * 0.5
-                WHEN p.CNOMBREPRODUCTO LIKE '%5 KG%' OR p.CNOMBREPRODUCTO LIKE '%5KG%' THEN m.CUNIDADES * 5
-                WHEN p.CNOMBREPRODUCTO LIKE '%2 KG%' OR p.CNOMBREPRODUCTO LIKE '%2KG%' THEN m.CUNIDADES * 2
-                WHEN p.CNOMBREPRODUCTO LIKE '%20 KG%' OR p.CNOMBREPRODUCTO LIKE '%20KG%' THEN m.CUNIDADES * 20
-                WHEN p.CNOMBREPRODUCTO LIKE '%26 KG%' OR p.CNOMBREPRODUCTO LIKE '%26KG%' THEN m.CUNIDADES * 26
-                WHEN p.CNOMBREPRODUCTO LIKE '%27 KG%' OR p.CNOMBREPRODUCTO LIKE '%27KG%' THEN m.CUNIDADES * 27
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 LB%' THEN m.CUNIDADES * 22.68
-                WHEN p.CNOMBREPRODUCTO LIKE '%900 KG%' THEN m.CUNIDADES * 900
-                WHEN p.CNOMBREPRODUCTO LIKE '%1000 KG%' THEN m.CUNIDADES * 1000
-                ELSE 0
-            END
-        ) AS KilosTotales,
-        SUM(
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' OR p.CNOMBREPRODUCTO LIKE '%1KG%' OR p.CNOMBREPRODUCTO LIKE '%1. KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' OR p.CNOMBREPRODUCTO LIKE '%25KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 25%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' OR p.CNOMBREPRODUCTO LIKE '%50KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 50%' THEN m.CUNIDADES * 50
-                WHEN p.CNOMBREPRODUCTO LIKE '%907 GR%' OR p.CNOMBREPRODUCTO LIKE '%2 LB%' THEN m.CUNIDADES * 0.907
-                WHEN p.CNOMBREPRODUCTO LIKE '%500 GR%' OR p.CNOMBREPRODUCTO LIKE '%0.5 KG%' THEN m.CUNIDADES * 0.5
-                WHEN p.CNOMBREPRODUCTO LIKE '%5 KG%' OR p.CNOMBREPRODUCTO LIKE '%5KG%' THEN m.CUNIDADES * 5
-                WHEN p.CNOMBREPRODUCTO LIKE '%2 KG%' OR p.CNOMBREPRODUCTO LIKE '%2KG%' THEN m.CUNIDADES * 2
-                WHEN p.CNOMBREPRODUCTO LIKE '%20 KG%' OR p.CNOMBREPRODUCTO LIKE '%20KG%' THEN m.CUNIDADES * 20
-                WHEN p.CNOMBREPRODUCTO LIKE '%26 KG%' OR p.CNOMBREPRODUCTO LIKE '%26KG%' THEN m.CUNIDADES * 26
-                WHEN p.CNOMBREPRODUCTO LIKE '%27 KG%' OR p.CNOMBREPRODUCTO LIKE '%27KG%' THEN m.CUNIDADES * 27
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 LB%' THEN m.CUNIDADES * 22.68
-                WHEN p.CNOMBREPRODUCTO LIKE '%900 KG%' THEN m.CUNIDADES * 900
-                WHEN p.CNOMBREPRODUCTO LIKE '%1000 KG%' THEN m.CUNIDADES * 1000
-                ELSE 0
-            END
-        ) / 1000.0 AS ToneladasTotales
-    FROM admMovimientos m
-    JOIN admProductos p ON m.CIDPRODUCTO = p.CIDPRODUCTO
-    JOIN admDocumentosModelo dm ON m.CIDDOCUMENTODE = dm.CIDDOCUMENTODE
-    JOIN admDocumentos d ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
-    JOIN admAgentes a ON d.CIDAGENTE = a.CIDAGENTE
+        r.Anio AS Anio,
+        r.Mes AS Mes,
+        r.CIDAGENTE AS CIDAGENTE,
+        SUM(r.Unidades * pa.KilosPorUnidad) AS KilosTotales,
+        SUM(r.Unidades * pa.KilosPorUnidad) / 1000.0 AS ToneladasTotales
+    FROM rptVentasDiarias r
+    JOIN rptAtributosProducto pa ON pa.CIDPRODUCTO = r.CIDPRODUCTO
+    JOIN rptConjuntosProducto cp ON cp.CIDPRODUCTO = r.CIDPRODUCTO
     WHERE
-        p.CCODIGOPRODUCTO IN (
-                    'MESCO25','MESCO30','MESPU07','MREGR26','MREGR30','MREP613','MREP614','MREP620',
-                    'PAL0007','PAL0008','PAL0009','PBSMZ04','PBSMZ05','PBSMZ06','PBSMZ08','PBSMZ09',
-                    'PBSMZ11','PBSMZ14','PCAGF02','PCAGF03','PCAGF04','PCFAI03','PCFAM03','PCFAZ03',
-                    'PCFMO03','PCFMO05','PCFNA03','PCFNE03','PCFRS03','PCFVA03','PCFVE03','PCFVI03',
-                    'PCFVL03','PCGAI03','PCGAM03','PCGAZ03','PCGMO03','PCGNA03','PCGNE03','PCGRF03',
-                    'PCGRO03','PCGRS03','PCGVA03','PCGVE03','PCGVI03','PCGVL01','PCGVL03','PESCO25',
-                    'PESEM17','PESGR07','PESGR10','PESGR21','PESGR22','PESP607','PESP610','PG3EN01',
-                    'PG3EN08','PM5EN04','PREBS07','PRECE01','PRECE02','PRECS01','PREEF26','PREEM17',
-                    'PREFS11','PREFS12','PREGG12','PREGR07','PREGR10','PREGR23','PREGR24','PREGR25',
-                    'PRELG02','PREMC11','PREO407','PREP107','PREP108','PREP112','PREP113','PREP607',
-                    'PBAR002','PCMNE01','PREP111','PCFVV03','MAREGR11','RMREP614','PESEM11','MREP621',
-                    'MREP622','RREGR10','RPREP607','CSER026','PREGR27','PREGR29','PBSMZ22','RMREP620',
-                    'CSER208','PESEM12','AREGR10','AE1GR01','AR1GR10','ABEGR01','PBAR003','MAM5ESCNI',
-                    'PESGG12','RPREBS07','RPBSMZ08','PRECCN2','MGSMDLZ','ZTAR003','ZTAR004','ZTAR005',
-                    'CSER209','MGL01','PREEF27','FEUR10','JS109','EX45','SEÑ1600','PCGEAZ1','MREGR23',
-                    'ZEMP006','MAREGR15','PESCO40','PPIL001','ZBES010','ZBES005','ZBESM907','ZBRE010',
-                    'ZBRE005','PPIL002','PPIL003','ZSAC004','MAM5CESGR2','RSERMAQ04','RSERMAQ05',
-                    'RSERMAQ06','PILCJA01','PILCJA02','FLSER001','LBACE01','ZEDU007'
-        )
-        AND (
-            m.CIDDOCUMENTODE = 4
-            OR (m.CIDDOCUMENTODE = 4 AND dm.CMODULO = 1)
-        )
-        AND a.CNOMBREAGENTE IN (
-            'MAYOREO / SPOT',
-            'MOLIENDAS',
-            'JAVIER ARROYO',
-            'MOLIENDAS MAQ MDLZ',
-            'MDLZ P2',
-            'MOSTRADOR 1',
-            'MOSTRADOR 2',
-            'MOSTRADOR 3'
-        )
-        {agente_condition}
+        cp.Conjunto = :conjunto
+        AND r.CIDDOCUMENTODE = 4
+        AND r.CIDAGENTE IN (:agentes)
         {fecha_condition}
     GROUP BY
-        YEAR(m.CFECHA),
-        MONTH(m.CFECHA),
-        a.CNOMBREAGENTE
-    ORDER BY Anio, Mes, Agente;
+        r.Anio,
+        r.Mes,
+        r.CIDAGENTE
     """
     
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+    return ConsultaReporte(query, 'Anio, Mes, CIDAGENTE',
+                           {'agentes': ids_agentes(agente), 'anio': anio, 'mes': mes,
+                            'conjunto': CONJUNTO_REPORTABLES})
+
+@cache_reportes.report('ventas_mes', lambda p: bool(p['anio'] and p['mes']) and mes_cerrado(p['anio'], p['mes']),
+                       preparar=compactador('ventas_mes'))
+@medir_reporte('ventas_mes')
+@report_budget('ventas_mes')
+def get_ventas_agente_mes(agente=None, anio=None, mes=None, page=None, per_page=None):
+    if use_snapshot():
+        return page_frame(reportes_snapshot.ventas_mes(snapshot_ventas.hechos(), agente, anio, mes), page, per_page)
+    conn = get_db_connection()
+    try:
+        prepare_report_tables(conn, rollup=True)
+        consulta = build_ventas_agente_mes_query(agente, anio, mes)
+        return with_names(read_report_query(consulta, conn, page, per_page), conn)
+    finally:
+        conn.close()
 
 # Consulta para objetivos de venta
-def get_objetivos_venta(agente=None):
+@cache_reportes.report('objetivos', preparar=compactador('objetivos'))
+@medir_reporte('objetivos')
+@report_budget('objetivos')
+def get_objetivos_base():
+    """Objectives of every agent for the last two years (one pass over the monthly series)"""
+    hoy = date.today()
+    if use_snapshot():
+        hechos = snapshot_ventas.hechos(desde=date(hoy.year - ANIOS_OBJETIVOS, 1, 1))
+        return calcular_objetivos(reportes_snapshot.serie_objetivos(hechos), hoy)
     conn = get_db_connection()
-    
-    # Construir la condición del agente dinámicamente
-    agente_condition = ""
+    try:
+        prepare_report_tables(conn, rollup=True)
+        serie = serie_mensual(conn, CONJUNTO_REPORTABLES, date(hoy.year - ANIOS_OBJETIVOS, 1, 1), hoy)
+    finally:
+        conn.close()
+    return calcular_objetivos(serie, hoy)
+
+@medir_reporte('objetivos_venta')
+def get_objetivos_venta(agente=None, page=None, per_page=None):
+    df = get_objetivos_base()
     if agente and agente != 'Todos':
-        agente_condition = f"AND a.CNOMBREAGENTE = '{agente}'"
-    
-    # No usar filtro de mes en la función principal de objetivos
-    mes_condition = ""
-    # Consulta corregida para objetivos - usando datos históricos del mismo periodo del año anterior como objetivo
-    query = f"""SELECT 
-    actual.Agente,
-    actual.Anio,
-    actual.Mes,
-    ISNULL(objetivo.ToneladasTotales, 0) AS Objetivo,
-    actual.ToneladasTotales AS Avance,
-    CASE 
-        WHEN ISNULL(objetivo.ToneladasTotales, 0) > 0 
-        THEN (actual.ToneladasTotales * 100.0) / objetivo.ToneladasTotales 
-        ELSE NULL 
-    END AS PorcAvance,
-    AVG(actual.ToneladasTotales) OVER (PARTITION BY actual.Agente, actual.Mes) AS Tendencia,
-    actual.ToneladasTotales / DAY(EOMONTH(DATEFROMPARTS(actual.Anio, actual.Mes, 1))) AS PromedioDiario
-FROM (
-    -- Datos actuales (últimos 2 años)
-    SELECT
-        YEAR(m.CFECHA) AS Anio,
-        MONTH(m.CFECHA) AS Mes,
-        a.CNOMBREAGENTE AS Agente,
-        SUM(
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' OR p.CNOMBREPRODUCTO LIKE '%1KG%' OR p.CNOMBREPRODUCTO LIKE '%1. KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' OR p.CNOMBREPRODUCTO LIKE '%25KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 25%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' OR p.CNOMBREPRODUCTO LIKE '%50KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 50%' THEN m.CUNIDADES * 50
-                WHEN p.CNOMBREPRODUCTO LIKE '%907 GR%' OR p.CNOMBREPRODUCTO LIKE '%2 LB%' THEN m.CUNIDADES * 0.907
-                WHEN p.CNOMBREPRODUCTO LIKE '%500 GR%' OR p.CNOMBREPRODUCTO LIKE '%0.5 KG%' THEN m.CUNIDADES * 0.5
-                WHEN p.CNOMBREPRODUCTO LIKE '%5 KG%' OR p.CNOMBREPRODUCTO LIKE '%5KG%' THEN m.CUNIDADES * 5
-                WHEN p.CNOMBREPRODUCTO LIKE '%2 KG%' OR p.CNOMBREPRODUCTO LIKE '%2KG%' THEN m.CUNIDADES * 2
-                WHEN p.CNOMBREPRODUCTO LIKE '%20 KG%' OR p.CNOMBREPRODUCTO LIKE '%20KG%' THEN m.CUNIDADES * 20
-                WHEN p.CNOMBREPRODUCTO LIKE '%26 KG%' OR p.CNOMBREPRODUCTO LIKE '%26KG%' THEN m.CUNIDADES * 26
-                WHEN p.CNOMBREPRODUCTO LIKE '%27 KG%' OR p.CNOMBREPRODUCTO LIKE '%27KG%' THEN m.CUNIDADES * 27
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 LB%' THEN m.CUNIDADES * 22.68
-                WHEN p.CNOMBREPRODUCTO LIKE '%900 KG%' THEN m.CUNIDADES * 900
-                WHEN p.CNOMBREPRODUCTO LIKE '%1000 KG%' THEN m.CUNIDADES * 1000
-                ELSE 0
-            END
-        ) / 1000.0 AS ToneladasTotales
-    FROM admMovimientos m WITH (NOLOCK)
-    JOIN admProductos p WITH (NOLOCK) ON m.CIDPRODUCTO = p.CIDPRODUCTO
-    JOIN admDocumentos d WITH (NOLOCK) ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
-    JOIN admAgentes a WITH (NOLOCK) ON d.CIDAGENTE = a.CIDAGENTE
-    WHERE p.CCODIGOPRODUCTO IN (
-        'MESCO25','MESCO30','MESPU07','MREGR26','MREGR30','MREP613','MREP614','MREP620',
-        'PAL0007','PAL0008','PAL0009','PBSMZ04','PBSMZ05','PBSMZ06','PBSMZ08','PBSMZ09',
-        'PBSMZ11','PBSMZ14','PCAGF02','PCAGF03','PCAGF04','PCFAI03','PCFAM03','PCFAZ03',
-        'PCFMO03','PCFMO05','PCFNA03','PCFNE03','PCFRS03','PCFVA03','PCFVE03','PCFVI03',
-        'PCFVL03','PCGAI03','PCGAM03','PCGAZ03','PCGMO03','PCGNA03','PCGNE03','PCGRF03',
-        'PCGRO03','PCGRS03','PCGVA03','PCGVE03','PCGVI03','PCGVL01','PCGVL03','PESCO25',
-        'PESEM17','PESGR07','PESGR10','PESGR21','PESGR22','PESP607','PESP610','PG3EN01',
-        'PG3EN08','PM5EN04','PREBS07','PRECE01','PRECE02','PRECS01','PREEF26','PREEM17',
-        'PREFS11','PREFS12','PREGG12','PREGR07','PREGR10','PREGR23','PREGR24','PREGR25',
-        'PRELG02','PREMC11','PREO407','PREP107','PREP108','PREP112','PREP113','PREP607',
-        'PBAR002','PCMNE01','PREP111','PCFVV03','MAREGR11','RMREP614','PESEM11','MREP621',
-        'MREP622','RREGR10','RPREP607','CSER026','PREGR27','PREGR29','PBSMZ22','RMREP620',
-        'CSER208','PESEM12','AREGR10','AE1GR01','AR1GR10','ABEGR01','PBAR003','MAM5ESCNI',
-        'PESGG12','RPREBS07','RPBSMZ08','PRECCN2','MGSMDLZ','ZTAR003','ZTAR004','ZTAR005',
-        'CSER209','MGL01','PREEF27','FEUR10','JS109','EX45','SEÑ1600','PCGEAZ1','MREGR23',
-        'ZEMP006','MAREGR15','PESCO40','PPIL001','ZBES010','ZBES005','ZBESM907','ZBRE010',
-        'ZBRE005','PPIL002','PPIL003','ZSAC004','MAM5CESGR2','RSERMAQ04','RSERMAQ05',
-        'RSERMAQ06','PILCJA01','PILCJA02','FLSER001','LBACE01','ZEDU007'
-    )
-    AND m.CIDDOCUMENTODE = 4
-    AND a.CNOMBREAGENTE IN (
-        'MAYOREO / SPOT','MOLIENDAS','JAVIER ARROYO','MOLIENDAS MAQ MDLZ',
-        'MDLZ P2','MOSTRADOR 1','MOSTRADOR 2','MOSTRADOR 3'
-    )
-    {agente_condition}
-    {mes_condition}
-    AND m.CFECHA >= DATEADD(year, -2, GETDATE())  -- Last 2 years for current data
-    GROUP BY YEAR(m.CFECHA), MONTH(m.CFECHA), a.CNOMBREAGENTE
-) actual
-LEFT JOIN (
-    -- Datos históricos para objetivos (mismo mes del año anterior)
-    SELECT
-        YEAR(m.CFECHA) AS AnioObjetivo,  -- Year of historical data
-        MONTH(m.CFECHA) AS Mes,
-        a.CNOMBREAGENTE AS Agente,
-        SUM(
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' OR p.CNOMBREPRODUCTO LIKE '%1KG%' OR p.CNOMBREPRODUCTO LIKE '%1. KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' OR p.CNOMBREPRODUCTO LIKE '%25KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 25%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' OR p.CNOMBREPRODUCTO LIKE '%50KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 50%' THEN m.CUNIDADES * 50
-                WHEN p.CNOMBREPRODUCTO LIKE '%907 GR%' OR p.CNOMBREPRODUCTO LIKE '%2 LB%' THEN m.CUNIDADES * 0.907
-                WHEN p.CNOMBREPRODUCTO LIKE '%500 GR%' OR p.CNOMBREPRODUCTO LIKE '%0.5 KG%' THEN m.CUNIDADES * 0.5
-                WHEN p.CNOMBREPRODUCTO LIKE '%5 KG%' OR p.CNOMBREPRODUCTO LIKE '%5KG%' THEN m.CUNIDADES * 5
-                WHEN p.CNOMBREPRODUCTO LIKE '%2 KG%' OR p.CNOMBREPRODUCTO LIKE '%2KG%' THEN m.CUNIDADES * 2
-                WHEN p.CNOMBREPRODUCTO LIKE '%20 KG%' OR p.CNOMBREPRODUCTO LIKE '%20KG%' THEN m.CUNIDADES * 20
-                WHEN p.CNOMBREPRODUCTO LIKE '%26 KG%' OR p.CNOMBREPRODUCTO LIKE '%26KG%' THEN m.CUNIDADES * 26
-                WHEN p.CNOMBREPRODUCTO LIKE '%27 KG%' OR p.CNOMBREPRODUCTO LIKE '%27KG%' THEN m.CUNIDADES * 27
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 LB%' THEN m.CUNIDADES * 22.68
-                WHEN p.CNOMBREPRODUCTO LIKE '%900 KG%' THEN m.CUNIDADES * 900
-                WHEN p.CNOMBREPRODUCTO LIKE '%1000 KG%' THEN m.CUNIDADES * 1000
-                ELSE 0
-            END
-        ) / 1000.0 AS ToneladasTotales
-    FROM admMovimientos m WITH (NOLOCK)
-    JOIN admProductos p WITH (NOLOCK) ON m.CIDPRODUCTO = p.CIDPRODUCTO
-    JOIN admDocumentos d WITH (NOLOCK) ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
-    JOIN admAgentes a WITH (NOLOCK) ON d.CIDAGENTE = a.CIDAGENTE
-    WHERE p.CCODIGOPRODUCTO IN (
-        'MESCO25','MESCO30','MESPU07','MREGR26','MREGR30','MREP613','MREP614','MREP620',
-        'PAL0007','PAL0008','PAL0009','PBSMZ04','PBSMZ05','PBSMZ06','PBSMZ08','PBSMZ09',
-        'PBSMZ11','PBSMZ14','PCAGF02','PCAGF03','PCAGF04','PCFAI03','PCFAM03','PCFAZ03',
-        'PCFMO03','PCFMO05','PCFNA03','PCFNE03','PCFRS03','PCFVA03','PCFVE03','PCFVI03',
-        'PCFVL03','PCGAI03','PCGAM03','PCGAZ03','PCGMO03','PCGNA03','PCGNE03','PCGRF03',
-        'PCGRO03','PCGRS03','PCGVA03','PCGVE03','PCGVI03','PCGVL01','PCGVL03','PESCO25',
-        'PESEM17','PESGR07','PESGR10','PESGR21','PESGR22','PESP607','PESP610','PG3EN01',
-        'PG3EN08','PM5EN04','PREBS07','PRECE01','PRECE02','PRECS01','PREEF26','PREEM17',
-        'PREFS11','PREFS12','PREGG12','PREGR07','PREGR10','PREGR23','PREGR24','PREGR25',
-        'PRELG02','PREMC11','PREO407','PREP107','PREP108','PREP112','PREP113','PREP607',
-        'PBAR002','PCMNE01','PREP111','PCFVV03','MAREGR11','RMREP614','PESEM11','MREP621',
-        'MREP622','RREGR10','RPREP607','CSER026','PREGR27','PREGR29','PBSMZ22','RMREP620',
-        'CSER208','PESEM12','AREGR10','AE1GR01','AR1GR10','ABEGR01','PBAR003','MAM5ESCNI',
-        'PESGG12','RPREBS07','RPBSMZ08','PRECCN2','MGSMDLZ','ZTAR003','ZTAR004','ZTAR005',
-        'CSER209','MGL01','PREEF27','FEUR10','JS109','EX45','SEÑ1600','PCGEAZ1','MREGR23',
-        'ZEMP006','MAREGR15','PESCO40','PPIL001','ZBES010','ZBES005','ZBESM907','ZBRE010',
-        'ZBRE005','PPIL002','PPIL003','ZSAC004','MAM5CESGR2','RSERMAQ04','RSERMAQ05',
-        'RSERMAQ06','PILCJA01','PILCJA02','FLSER001','LBACE01','ZEDU007'
-    )
-    AND m.CIDDOCUMENTODE = 4
-    AND a.CNOMBREAGENTE IN (
-        'MAYOREO / SPOT','MOLIENDAS','JAVIER ARROYO','MOLIENDAS MAQ MDLZ',
-        'MDLZ P2','MOSTRADOR 1','MOSTRADOR 2','MOSTRADOR 3'
-    )
-    {agente_condition}
-    {mes_condition}
-    AND YEAR(m.CFECHA) >= YEAR(GETDATE()) - 2  -- Get data from 2 years ago
-    AND YEAR(m.CFECHA) < YEAR(GETDATE())       -- Up to last year
-    GROUP BY YEAR(m.CFECHA), MONTH(m.CFECHA), a.CNOMBREAGENTE
-) objetivo ON actual.Agente = objetivo.Agente 
-                AND actual.Mes = objetivo.Mes 
-                AND actual.Anio = objetivo.AnioObjetivo + 1
-ORDER BY actual.Agente, actual.Anio DESC, actual.Mes DESC;"""  # Mantén tu consulta
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+        df = df[df['Agente'] == agente].reset_index(drop=True)
+    if page is None:
+        return df
+    return pagina_de(df, page, per_page)
 
 # Función para obtener resumen de avance por agente
+@medir_reporte('objetivos_resumen')
 def get_objetivos_summary(agente=None, mes=None):
-    conn = get_db_connection()
-    
-    # Construir la condición del agente dinámicamente
-    agente_condition = ""
+    df = get_objetivos_base()
     if agente and agente != 'Todos':
-        agente_condition = f"AND a.CNOMBREAGENTE = '{agente}'"
-    
-    # Construir la condición del mes dinámicamente
-    mes_condition = ""
-    if mes and mes != 'Todos':
-        mes_condition = f"AND MONTH(m.CFECHA) = {mes}"
-    
-    query = f"""SELECT 
-    actual.Agente,
-    ISNULL(AVG(CASE WHEN ISNULL(objetivo.ToneladasTotales, 0) > 0 
-                    THEN (actual.ToneladasTotales * 100.0) / objetivo.ToneladasTotales 
-                    ELSE NULL END), 0) AS PromedioAvance,
-    COUNT(*) AS TotalRegistros,
-    SUM(actual.ToneladasTotales) AS TotalVentas,
-    SUM(ISNULL(objetivo.ToneladasTotales, 0)) AS TotalObjetivos
-FROM (
-    -- Datos actuales (últimos 2 años)
-    SELECT
-        YEAR(m.CFECHA) AS Anio,
-        MONTH(m.CFECHA) AS Mes,
-        a.CNOMBREAGENTE AS Agente,
-        SUM(
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' OR p.CNOMBREPRODUCTO LIKE '%1KG%' OR p.CNOMBREPRODUCTO LIKE '%1. KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' OR p.CNOMBREPRODUCTO LIKE '%25KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 25%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' OR p.CNOMBREPRODUCTO LIKE '%50KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 50%' THEN m.CUNIDADES * 50
-                WHEN p.CNOMBREPRODUCTO LIKE '%907 GR%' OR p.CNOMBREPRODUCTO LIKE '%2 LB%' THEN m.CUNIDADES * 0.907
-                WHEN p.CNOMBREPRODUCTO LIKE '%500 GR%' OR p.CNOMBREPRODUCTO LIKE '%0.5 KG%' THEN m.CUNIDADES * 0.5
-                WHEN p.CNOMBREPRODUCTO LIKE '%5 KG%' OR p.CNOMBREPRODUCTO LIKE '%5KG%' THEN m.CUNIDADES * 5
-                WHEN p.CNOMBREPRODUCTO LIKE '%2 KG%' OR p.CNOMBREPRODUCTO LIKE '%2KG%' THEN m.CUNIDADES * 2
-                WHEN p.CNOMBREPRODUCTO LIKE '%20 KG%' OR p.CNOMBREPRODUCTO LIKE '%20KG%' THEN m.CUNIDADES * 20
-                WHEN p.CNOMBREPRODUCTO LIKE '%26 KG%' OR p.CNOMBREPRODUCTO LIKE '%26KG%' THEN m.CUNIDADES * 26
-                WHEN p.CNOMBREPRODUCTO LIKE '%27 KG%' OR p.CNOMBREPRODUCTO LIKE '%27KG%' THEN m.CUNIDADES * 27
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 LB%' THEN m.CUNIDADES * 22.68
-                WHEN p.CNOMBREPRODUCTO LIKE '%900 KG%' THEN m.CUNIDADES * 900
-                WHEN p.CNOMBREPRODUCTO LIKE '%1000 KG%' THEN m.CUNIDADES * 1000
-                ELSE 0
-            END
-        ) / 1000.0 AS ToneladasTotales
-    FROM admMovimientos m WITH (NOLOCK)
-    JOIN admProductos p WITH (NOLOCK) ON m.CIDPRODUCTO = p.CIDPRODUCTO
-    JOIN admDocumentos d WITH (NOLOCK) ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
-    JOIN admAgentes a WITH (NOLOCK) ON d.CIDAGENTE = a.CIDAGENTE
-    WHERE p.CCODIGOPRODUCTO IN (
-        'MESCO25','MESCO30','MESPU07','MREGR26','MREGR30','MREP613','MREP614','MREP620',
-        'PAL0007','PAL0008','PAL0009','PBSMZ04','PBSMZ05','PBSMZ06','PBSMZ08','PBSMZ09',
-        'PBSMZ11','PBSMZ14','PCAGF02','PCAGF03','PCAGF04','PCFAI03','PCFAM03','PCFAZ03',
-        'PCFMO03','PCFMO05','PCFNA03','PCFNE03','PCFRS03','PCFVA03','PCFVE03','PCFVI03',
-        'PCFVL03','PCGAI03','PCGAM03','PCGAZ03','PCGMO03','PCGNA03','PCGNE03','PCGRF03',
-        'PCGRO03','PCGRS03','PCGVA03','PCGVE03','PCGVI03','PCGVL01','PCGVL03','PESCO25',
-        'PESEM17','PESGR07','PESGR10','PESGR21','PESGR22','PESP607','PESP610','PG3EN01',
-        'PG3EN08','PM5EN04','PREBS07','PRECE01','PRECE02','PRECS01','PREEF26','PREEM17',
-        'PREFS11','PREFS12','PREGG12','PREGR07','PREGR10','PREGR23','PREGR24','PREGR25',
-        'PRELG02','PREMC11','PREO407','PREP107','PREP108','PREP112','PREP113','PREP607',
-        'PBAR002','PCMNE01','PREP111','PCFVV03','MAREGR11','RMREP614','PESEM11','MREP621',
-        'MREP622','RREGR10','RPREP607','CSER026','PREGR27','PREGR29','PBSMZ22','RMREP620',
-        'CSER208','PESEM12','AREGR10','AE1GR01','AR1GR10','ABEGR01','PBAR003','MAM5ESCNI',
-        'PESGG12','RPREBS07','RPBSMZ08','PRECCN2','MGSMDLZ','ZTAR003','ZTAR004','ZTAR005',
-        'CSER209','MGL01','PREEF27','FEUR10','JS109','EX45','SEÑ1600','PCGEAZ1','MREGR23',
-        'ZEMP006','MAREGR15','PESCO40','PPIL001','ZBES010','ZBES005','ZBESM907','ZBRE010',
-        'ZBRE005','PPIL002','PPIL003','ZSAC004','MAM5CESGR2','RSERMAQ04','RSERMAQ05',
-        'RSERMAQ06','PILCJA01','PILCJA02','FLSER001','LBACE01','ZEDU007'
-    )
-    AND m.CIDDOCUMENTODE = 4
-    AND a.CNOMBREAGENTE IN (
-        'MAYOREO / SPOT','MOLIENDAS','JAVIER ARROYO','MOLIENDAS MAQ MDLZ',
-        'MDLZ P2','MOSTRADOR 1','MOSTRADOR 2','MOSTRADOR 3'
-    )
-    {agente_condition}
-    {mes_condition}
-    AND m.CFECHA >= DATEADD(year, -2, GETDATE())  -- Last 2 years for current data
-    GROUP BY YEAR(m.CFECHA), MONTH(m.CFECHA), a.CNOMBREAGENTE
-) actual
-LEFT JOIN (
-    -- Datos históricos para objetivos (mismo mes del año anterior)
-    SELECT
-        YEAR(m.CFECHA) AS AnioObjetivo,  -- Year of historical data
-        MONTH(m.CFECHA) AS Mes,
-        a.CNOMBREAGENTE AS Agente,
-        SUM(
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' OR p.CNOMBREPRODUCTO LIKE '%1KG%' OR p.CNOMBREPRODUCTO LIKE '%1. KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' OR p.CNOMBREPRODUCTO LIKE '%25KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 25%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' OR p.CNOMBREPRODUCTO LIKE '%50KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 50%' THEN m.CUNIDADES * 50
-                WHEN p.CNOMBREPRODUCTO LIKE '%907 GR%' OR p.CNOMBREPRODUCTO LIKE '%2 LB%' THEN m.CUNIDADES * 0.907
-                WHEN p.CNOMBREPRODUCTO LIKE '%500 GR%' OR p.CNOMBREPRODUCTO LIKE '%0.5 KG%' THEN m.CUNIDADES * 0.5
-                WHEN p.CNOMBREPRODUCTO LIKE '%5 KG%' OR p.CNOMBREPRODUCTO LIKE '%5KG%' THEN m.CUNIDADES * 5
-                WHEN p.CNOMBREPRODUCTO LIKE '%2 KG%' OR p.CNOMBREPRODUCTO LIKE '%2KG%' THEN m.CUNIDADES * 2
-                WHEN p.CNOMBREPRODUCTO LIKE '%20 KG%' OR p.CNOMBREPRODUCTO LIKE '%20KG%' THEN m.CUNIDADES * 20
-                WHEN p.CNOMBREPRODUCTO LIKE '%26 KG%' OR p.CNOMBREPRODUCTO LIKE '%26KG%' THEN m.CUNIDADES * 26
-                WHEN p.CNOMBREPRODUCTO LIKE '%27 KG%' OR p.CNOMBREPRODUCTO LIKE '%27KG%' THEN m.CUNIDADES * 27
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 LB%' THEN m.CUNIDADES * 22.68
-                WHEN p.CNOMBREPRODUCTO LIKE '%900 KG%' THEN m.CUNIDADES * 900
-                WHEN p.CNOMBREPRODUCTO LIKE '%1000 KG%' THEN m.CUNIDADES * 1000
-                ELSE 0
-            END
-        ) / 1000.0 AS ToneladasTotales
-    FROM admMovimientos m WITH (NOLOCK)
-    JOIN admProductos p WITH (NOLOCK) ON m.CIDPRODUCTO = p.CIDPRODUCTO
-    JOIN admDocumentos d WITH (NOLOCK) ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
-    JOIN admAgentes a WITH (NOLOCK) ON d.CIDAGENTE = a.CIDAGENTE
-    WHERE p.CCODIGOPRODUCTO IN (
-        'MESCO25','MESCO30','MESPU07','MREGR26','MREGR30','MREP613','MREP614','MREP620',
-        'PAL0007','PAL0008','PAL0009','PBSMZ04','PBSMZ05','PBSMZ06','PBSMZ08','PBSMZ09',
-        'PBSMZ11','PBSMZ14','PCAGF02','PCAGF03','PCAGF04','PCFAI03','PCFAM03','PCFAZ03',
-        'PCFMO03','PCFMO05','PCFNA03','PCFNE03','PCFRS03','PCFVA03','PCFVE03','PCFVI03',
-        'PCFVL03','PCGAI03','PCGAM03','PCGAZ03','PCGMO03','PCGNA03','PCGNE03','PCGRF03',
-        'PCGRO03','PCGRS03','PCGVA03','PCGVE03','PCGVI03','PCGVL01','PCGVL03','PESCO25',
-        'PESEM17','PESGR07','PESGR10','PESGR21','PESGR22','PESP607','PESP610','PG3EN01',
-        'PG3EN08','PM5EN04','PREBS07','PRECE01','PRECE02','PRECS01','PREEF26','PREEM17',
-        'PREFS11','PREFS12','PREGG12','PREGR07','PREGR10','PREGR23','PREGR24','PREGR25',
-        'PRELG02','PREMC11','PREO407','PREP107','PREP108','PREP112','PREP113','PREP607',
-        'PBAR002','PCMNE01','PREP111','PCFVV03','MAREGR11','RMREP614','PESEM11','MREP621',
-        'MREP622','RREGR10','RPREP607','CSER026','PREGR27','PREGR29','PBSMZ22','RMREP620',
-        'CSER208','PESEM12','AREGR10','AE1GR01','AR1GR10','ABEGR01','PBAR003','MAM5ESCNI',
-        'PESGG12','RPREBS07','RPBSMZ08','PRECCN2','MGSMDLZ','ZTAR003','ZTAR004','ZTAR005',
-        'CSER209','MGL01','PREEF27','FEUR10','JS109','EX45','SEÑ1600','PCGEAZ1','MREGR23',
-        'ZEMP006','MAREGR15','PESCO40','PPIL001','ZBES010','ZBES005','ZBESM907','ZBRE010',
-        'ZBRE005','PPIL002','PPIL003','ZSAC004','MAM5CESGR2','RSERMAQ04','RSERMAQ05',
-        'RSERMAQ06','PILCJA01','PILCJA02','FLSER001','LBACE01','ZEDU007'
-    )
-    AND m.CIDDOCUMENTODE = 4
-    AND a.CNOMBREAGENTE IN (
-        'MAYOREO / SPOT','MOLIENDAS','JAVIER ARROYO','MOLIENDAS MAQ MDLZ',
-        'MDLZ P2','MOSTRADOR 1','MOSTRADOR 2','MOSTRADOR 3'
-    )
-    {agente_condition}
-    {mes_condition}
-    AND YEAR(m.CFECHA) >= YEAR(GETDATE()) - 2  -- Get data from 2 years ago
-    AND YEAR(m.CFECHA) < YEAR(GETDATE())       -- Up to last year
-    GROUP BY YEAR(m.CFECHA), MONTH(m.CFECHA), a.CNOMBREAGENTE
-) objetivo ON actual.Agente = objetivo.Agente 
-                AND actual.Mes = objetivo.Mes 
-                AND actual.Anio = objetivo.AnioObjetivo + 1
-GROUP BY actual.Agente
-ORDER BY PromedioAvance DESC;"""
-    
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+        df = df[df['Agente'] == agente]
+    return resumen_objetivos(df, mes)
 
 # Función para obtener datos de cobertura de clientes
-def get_cobertura_clientes(anio=None, agente=None):
-    conn = get_db_connection()
-    
-    if not anio:
-        anio = datetime.now().year
+# La clave lleva el id del cliente: las entradas guardadas sin él (años cerrados, caché compartida) no se reutilizan
+@cache_reportes.report('coberturas_cliente', lambda p: _anio_cerrado(p['anio']),
+                       preparar=compactador('coberturas'))
+@medir_reporte('coberturas')
+@report_budget('coberturas')
+def read_cobertura_base(anio=None, agente=None):
+    """Kilos per client, agent and month of `anio`: the single scan behind both coverage views"""
+    if use_snapshot():
+        desde, hasta = rango_anios(anio)
+        return reportes_snapshot.cobertura_base(snapshot_ventas.hechos(desde, hasta), agente)
+    movimientos, params_fechas = movimientos_en([rango_anios(anio)])
     
-    query = f"""WITH VentasMensuales AS (
+    query = f"""
     SELECT
-        d.CRAZONSOCIAL AS RazonSocial,
-        a.CNOMBREAGENTE AS Agente,
-        DATENAME(MONTH, m.CFECHA) AS Mes,
-        YEAR(m.CFECHA) AS Anio,
-        SUM(
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' OR p.CNOMBREPRODUCTO LIKE '%1KG%' OR p.CNOMBREPRODUCTO LIKE '%1. KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' OR p.CNOMBREPRODUCTO LIKE '%25KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 25%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' OR p.CNOMBREPRODUCTO LIKE '%50KG%' OR p.CNOMBREPRODUCTO LIKE '%SACO 50%' THEN m.CUNIDADES * 50
-                WHEN p.CNOMBREPRODUCTO LIKE '%907 GR%' OR p.CNOMBREPRODUCTO LIKE '%2 LB%' THEN m.CUNIDADES * 0.907
-                WHEN p.CNOMBREPRODUCTO LIKE '%500 GR%' OR p.CNOMBREPRODUCTO LIKE '%0.5 KG%' THEN m.CUNIDADES * 0.5
-                WHEN p.CNOMBREPRODUCTO LIKE '%5 KG%' OR p.CNOMBREPRODUCTO LIKE '%5KG%' THEN m.CUNIDADES * 5
-                WHEN p.CNOMBREPRODUCTO LIKE '%2 KG%' OR p.CNOMBREPRODUCTO LIKE '%2KG%' THEN m.CUNIDADES * 2
-                WHEN p.CNOMBREPRODUCTO LIKE '%20 KG%' OR p.CNOMBREPRODUCTO LIKE '%20KG%' THEN m.CUNIDADES * 20
-                WHEN p.CNOMBREPRODUCTO LIKE '%26 KG%' OR p.CNOMBREPRODUCTO LIKE '%26KG%' THEN m.CUNIDADES * 26
-                WHEN p.CNOMBREPRODUCTO LIKE '%27 KG%' OR p.CNOMBREPRODUCTO LIKE '%27KG%' THEN m.CUNIDADES * 27
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 LB%' THEN m.CUNIDADES * 22.68
-                WHEN p.CNOMBREPRODUCTO LIKE '%900 KG%' THEN m.CUNIDADES * 900
-                WHEN p.CNOMBREPRODUCTO LIKE '%1000 KG%' THEN m.CUNIDADES * 1000
-                ELSE 0
-            END
-        ) AS KilosTotales,
-        'Vendido' AS Estado
+        d.CIDCLIENTEPROVEEDOR AS CIDCLIENTEPROVEEDOR,
+        d.CIDAGENTE AS CIDAGENTE,
+        MONTH(m.CFECHA) AS NumMes,
+        SUM(m.CUNIDADES * pa.KilosPorUnidad) AS KilosTotales
     FROM 
-        admMovimientos m
-    JOIN 
-        admProductos p ON m.CIDPRODUCTO = p.CIDPRODUCTO
+        {movimientos} m
+    JOIN
+        rptAtributosProducto pa ON pa.CIDPRODUCTO = m.CIDPRODUCTO
     JOIN
-        admDocumentosModelo dm ON m.CIDDOCUMENTODE = dm.CIDDOCUMENTODE
+        rptConjuntosProducto cp ON cp.CIDPRODUCTO = m.CIDPRODUCTO
     JOIN 
         admDocumentos d ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
-    JOIN 
-        admAgentes a ON d.CIDAGENTE = a.CIDAGENTE
     WHERE
-        p.CCODIGOPRODUCTO IN (
-            'MESCO25','MESCO30','MESPU07','MREGR26','MREGR30','MREP613','MREP614','MREP620',
-            'PAL0007','PAL0008','PAL0009','PBSMZ04','PBSMZ05','PBSMZ06','PBSMZ08','PBSMZ09',
-            'PBSMZ11','PBSMZ14','PCAGF02','PCAGF03','PCAGF04','PCFAI03','PCFAM03','PCFAZ03',
-            'PCFMO03','PCFMO05','PCFNA03','PCFNE03','PCFRS03','PCFVA03','PCFVE03','PCFVI03',
-            'PCFVL03','PCGAI03','PCGAM03','PCGAZ03','PCGMO03','PCGNA03','PCGNE03','PCGRF03',
-            'PCGRO03','PCGRS03','PCGVA03','PCGVE03','PCGVI03','PCGVL01','PCGVL03','PESCO25',
-            'PESEM17','PESGR07','PESGR10','PESGR21','PESGR22','PESP607','PESP610','PG3EN01',
-            'PG3EN08','PM5EN04','PREBS07','PRECE01','PRECE02','PRECS01','PREEF26','PREEM17',
-            'PREFS11','PREFS12','PREGG12','PREGR07','PREGR10','PREGR23','PREGR24','PREGR25',
-            'PRELG02','PREMC11','PREO407','PREP107','PREP108','PREP112','PREP113','PREP607',
-            'PBAR002','PCMNE01','PREP111','PCFVV03','MAREGR11','RMREP614','PESEM11','MREP621',
-            'MREP622','RREGR10','RPREP607','CSER026','PREGR27','PREGR29','PBSMZ22','RMREP620',
-            'CSER208','PESEM12','AREGR10','AE1GR01','AR1GR10','ABEGR01','PBAR003','MAM5ESCNI',
-            'PESGG12','RPREBS07','RPBSMZ08','PRECCN2','MGSMDLZ','ZTAR003','ZTAR004','ZTAR005',
-            'CSER209','MGL01','PREEF27','FEUR10','JS109','EX45','SEÑ1600','PCGEAZ1','MREGR23',
-            'ZEMP006','MAREGR15','PESCO40','PPIL001','ZBES010','ZBES005','ZBESM907','ZBRE010',
-            'ZBRE005','PPIL002','PPIL003','ZSAC004','MAM5CESGR2','RSERMAQ04','RSERMAQ05',
-            'RSERMAQ06','PILCJA01','PILCJA02','FLSER001','LBACE01','ZEDU007'
-        )
-        AND (
-            m.CIDDOCUMENTODE = 4
-            OR (m.CIDDOCUMENTODE = 4 AND dm.CMODULO = 1)
-        )
-        AND a.CNOMBREAGENTE IN (
-            'MAYOREO / SPOT',
-            'MOLIENDAS',
-            'JAVIER ARROYO',
-            'MOLIENDAS MAQ MDLZ',
-            'MDLZ P2',
-            'MOSTRADOR 1',
-            'MOSTRADOR 2',
-            'MOSTRADOR 3'
-        )
-        AND YEAR(m.CFECHA) = {anio}
-        {f"AND a.CNOMBREAGENTE = '{agente}'" if agente and agente != 'Todos' else ""}
+        cp.Conjunto = :conjunto
+        AND m.CIDDOCUMENTODE = 4
+        AND d.CIDAGENTE IN (:agentes)
     GROUP BY
-        d.CRAZONSOCIAL,
-        a.CNOMBREAGENTE,
-        DATENAME(MONTH, m.CFECHA),
-        YEAR(m.CFECHA)
-),
-ClientesUnicos AS (
-    SELECT DISTINCT CRAZONSOCIAL
-    FROM admDocumentos
-    WHERE CRAZONSOCIAL IN (SELECT RazonSocial FROM VentasMensuales)
-),
-Meses AS (
-    SELECT 'Enero' AS Mes, 1 AS Orden
-    UNION SELECT 'Febrero', 2
-    UNION SELECT 'Marzo', 3
-    UNION SELECT 'Abril', 4
-    UNION SELECT 'Mayo', 5
-    UNION SELECT 'Junio', 6
-    UNION SELECT 'Julio', 7
-    UNION SELECT 'Agosto', 8
-    UNION SELECT 'Septiembre', 9
-    UNION SELECT 'Octubre', 10
-    UNION SELECT 'Noviembre', 11
-    UNION SELECT 'Diciembre', 12
-),
-ClientesMeses AS (
-    SELECT 
-        c.CRAZONSOCIAL AS RazonSocial,
-        m.Mes,
-        {anio} AS Anio,
-        'Pendiente' AS Estado
-    FROM 
-        ClientesUnicos c
-    CROSS JOIN 
-        Meses m
-)
-SELECT 
-    COALESCE(v.RazonSocial, cm.RazonSocial) AS RazonSocial,
-    COALESCE(v.Mes, cm.Mes) AS Mes,
-    COALESCE(v.Estado, cm.Estado) AS Estado,
-    COALESCE(v.Anio, cm.Anio) AS Anio,
-    v.Agente,
-    ISNULL(v.KilosTotales, 0) AS KilosTotales
-FROM 
-    VentasMensuales v
-FULL OUTER JOIN 
-    ClientesMeses cm ON v.RazonSocial = cm.RazonSocial AND v.Mes = cm.Mes AND v.Anio = cm.Anio
-WHERE 
-    COALESCE(v.RazonSocial, cm.RazonSocial) IS NOT NULL
-ORDER BY 
-    COALESCE(v.RazonSocial, cm.RazonSocial),
-    (SELECT Orden FROM Meses WHERE Mes = COALESCE(v.Mes, cm.Mes));"""
+        d.CIDCLIENTEPROVEEDOR,
+        d.CIDAGENTE,
+        MONTH(m.CFECHA)
+    """
     
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+    # Razón social del catálogo de clientes y nombre del agente; el id se conserva para distinguir homónimos
+    # (CIDCLIENTEPROVEEDOR, RazonSocial, Agente, NumMes, KilosTotales)
+    conn = get_db_connection()
+    try:
+        prepare_report_tables(conn)
+        df = run_query(conn, query, {'agentes': ids_agentes(agente), 'conjunto': CONJUNTO_REPORTABLES,
+                                     **params_fechas})
+        nombres = adjuntar_nombres(df, conn)
+        nombres.insert(0, 'CIDCLIENTEPROVEEDOR', df['CIDCLIENTEPROVEEDOR'])
+        return nombres
+    finally:
+        conn.close()
+
+@medir_reporte('coberturas_detalle')
+def get_cobertura_clientes(anio=None, agente=None, page=None, per_page=None):
+    """'Vendido'/'Pendiente' rows per client and month, derived from get_cobertura_base"""
+    anio = anio or datetime.now().year
+    detalle = detalle_cobertura(get_cobertura_base(anio, agente), anio)
+    if page is None:
+        return detalle
+    return pagina_de(detalle, page, per_page)
+
+def get_cobertura_base(anio=None, agente=None):
+    """read_cobertura_base; a report agent's rows are cut from the 'Todos' scan, so every agent shares one query"""
+    if agente and agente != 'Todos' and agente in AGENTES_REPORTE:
+        todos = read_cobertura_base(anio, 'Todos')
+        return todos[todos['Agente'] == agente].reset_index(drop=True)
+    return read_cobertura_base(anio, agente)
 
 # Función para obtener datos de cobertura en formato matricial
+@medir_reporte('coberturas_matriz')
 def get_cobertura_matricial(anio=None, agente=None):
-    conn = get_db_connection()
-    
-    if not anio:
-        anio = datetime.now().year
-    
-    query = f"""
-    SELECT
-        d.CRAZONSOCIAL AS RazonSocial,
-        a.CNOMBREAGENTE AS Agente,
-        ISNULL(SUM(CASE WHEN MONTH(m.CFECHA) = 1 THEN 
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END 
-        END), 0) AS Enero,
-        ISNULL(SUM(CASE WHEN MONTH(m.CFECHA) = 2 THEN 
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END 
-        END), 0) AS Febrero,
-        ISNULL(SUM(CASE WHEN MONTH(m.CFECHA) = 3 THEN 
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END 
-        END), 0) AS Marzo,
-        ISNULL(SUM(CASE WHEN MONTH(m.CFECHA) = 4 THEN 
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END 
-        END), 0) AS Abril,
-        ISNULL(SUM(CASE WHEN MONTH(m.CFECHA) = 5 THEN 
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END 
-        END), 0) AS Mayo,
-        ISNULL(SUM(CASE WHEN MONTH(m.CFECHA) = 6 THEN 
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END 
-        END), 0) AS Junio,
-        ISNULL(SUM(CASE WHEN MONTH(m.CFECHA) = 7 THEN 
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END 
-        END), 0) AS Julio,
-        ISNULL(SUM(CASE WHEN MONTH(m.CFECHA) = 8 THEN 
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END 
-        END), 0) AS Agosto,
-        ISNULL(SUM(CASE WHEN MONTH(m.CFECHA) = 9 THEN 
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END 
-        END), 0) AS Septiembre,
-        ISNULL(SUM(CASE WHEN MONTH(m.CFECHA) = 10 THEN 
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END 
-        END), 0) AS Octubre,
-        ISNULL(SUM(CASE WHEN MONTH(m.CFECHA) = 11 THEN 
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END 
-        END), 0) AS Noviembre,
-        ISNULL(SUM(CASE WHEN MONTH(m.CFECHA) = 12 THEN 
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END 
-        END), 0) AS Diciembre,
-        ISNULL(SUM(
-            CASE
-                WHEN p.CNOMBREPRODUCTO LIKE '%1 KG%' THEN m.CUNIDADES * 1
-                WHEN p.CNOMBREPRODUCTO LIKE '%25 KG%' THEN m.CUNIDADES * 25
-                WHEN p.CNOMBREPRODUCTO LIKE '%50 KG%' THEN m.CUNIDADES * 50
-                ELSE m.CUNIDADES
-            END
-        ), 0) AS TotalAnual
-    FROM 
-        admMovimientos m
-    JOIN admProductos p ON m.CIDPRODUCTO = p.CIDPRODUCTO
-    JOIN admDocumentos d ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
-    JOIN admAgentes a ON d.CIDAGENTE = a.CIDAGENTE
-    WHERE
-        YEAR(m.CFECHA) = {anio}
-        AND a.CNOMBREAGENTE IN (
-            'MAYOREO / SPOT', 'MOLIENDAS', 'JAVIER ARROYO',
-            'MOLIENDAS MAQ MDLZ', 'MDLZ P2', 'MOSTRADOR 1',
-            'MOSTRADOR 2', 'MOSTRADOR 3'
-        )
-        {f"AND a.CNOMBREAGENTE = '{agente}'" if agente and agente != 'Todos' else ""}
-    GROUP BY d.CRAZONSOCIAL, a.CNOMBREAGENTE
-    ORDER BY d.CRAZONSOCIAL
-    """
-    
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+    """Client x agent matrix with one column per month, derived from get_cobertura_base"""
+    anio = anio or datetime.now().year
+    return matriz_cobertura(get_cobertura_base(anio, agente))
 
 @app.route('/set_language/<language>')
 def set_language(language):
@@ -1418,6 +958,7 @@ def index():
     return redirect(url_for('reporte_anio'))
 
 @app.route('/reporte_anio')
+@conditional_report('reporte_anio')
 def reporte_anio():
     # Get pagination parameters
     page = int(request.args.get('page', 1))
@@ -1432,48 +973,32 @@ def reporte_anio():
     # Get agent parameter
     selected_agente = request.args.get('agente', 'Todos')
     
-    df = get_reporte_anio(selected_agente)
-    
-    # Calculate pagination
-    total_records = len(df)
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-    
-    # Slice dataframe for current page
-    df_page = df.iloc[start_idx:end_idx]
+    # Table page and graph are independent queries: run them concurrently
+    tareas = {'detalle': lambda: get_reporte_anio(selected_agente, page=page, per_page=per_page)}
+    if year1 or year2:
+        tareas['grafica'] = lambda: get_reporte_anio_for_graph(year1, year2, start_month, end_month, selected_agente)
+    resultados = run_parallel(**tareas)
+    df_page, total_records = resultados['detalle']
     
-    # Pagination info
-    total_pages = math.ceil(total_records / per_page)
-    pagination_info = {
-        'page': page,
-        'per_page': per_page,
-        'total': total_records,
-        'pages': total_pages,
-        'has_prev': page > 1,
-        'has_next': page < total_pages
-    }
+    # Pagination info (the page itself is fetched by SQL Server)
+    pagination_info = info_paginacion(page, per_page, total_records)
     
     # Get graph data if parameters provided
     graph_data = None
-    if year1 or year2:
-        graph_df = get_reporte_anio_for_graph(year1, year2, start_month, end_month, selected_agente)
-        graph_data = graph_df.to_dict('records')
+    if 'grafica' in resultados:
+        graph_data = resultados['grafica'].to_dict('records')
     
     # Get available years for dropdowns
     available_years = list(range(2020, 2026))  # Adjust range as needed
     
     # Agent list
-    agentes = [
-        'MAYOREO / SPOT', 'MOLIENDAS', 'JAVIER ARROYO',
-        'MOLIENDAS MAQ MDLZ', 'MDLZ P2', 'MOSTRADOR 1',
-        'MOSTRADOR 2', 'MOSTRADOR 3', 'Todos'
-    ]
+    agentes = opciones_agente()
     
     translations = get_translations()
     return render_template('enhanced_table_with_graph.html', 
                            title=translations['ui']['year_report'],
-                           data=df_page.to_dict('records'),
-                           columns=df.columns.tolist(),
+                           data=registros(df_page),
+                           columns=df_page.columns.tolist(),
                            pagination=pagination_info,
                            graph_data=graph_data,
                            available_years=available_years,
@@ -1487,217 +1012,169 @@ def reporte_anio():
                            languages=LANGUAGES,
                            current_lang=get_language())
 
+def open_export_cursor(conn, construir, rollup):
+    """Cursor of an export query with names in place of ids; the query is built once the catalogs are loaded"""
+    prepare_report_tables(conn, rollup=rollup)
+    consulta = construir()
+    return CursorConNombres(open_cursor(conn, consulta.ordenada(), consulta.params))
+
+def stream_xlsx_export(construir, hoja, filename, rollup=False):
+    """Stream a report as XLSX with flat memory: fetchmany -> write-only sheet -> temp file -> chunks"""
+    conn = get_db_connection()
+    try:
+        cursor = open_export_cursor(conn, construir, rollup)
+    except Exception:
+        conn.close()
+        raise
+    try:
+        ruta, filas = escribir_xlsx(cursor, hoja)
+    finally:
+        cursor.close()
+        conn.close()
+    
+    response = Response(leer_y_borrar(ruta), mimetype=XLSX_MIMETYPE)
+    response.headers['Content-Length'] = str(os.path.getsize(ruta))
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+    response.headers['X-Export-Rows'] = str(filas)
+    return response
+
+def stream_text_export(construir, formato, filename, titulo=None, detalles=(), rollup=False):
+    """Stream a report as CSV or HTML straight from the cursor (chunked, gzip when the client accepts it)"""
+    conn = get_db_connection()
+    try:
+        cursor = open_export_cursor(conn, construir, rollup)
+    except Exception:
+        conn.close()
+        raise
+    
+    def generar():
+        try:
+            if formato == 'csv':
+                yield from generar_csv(cursor)
+            else:
+                yield from generar_html(cursor, titulo, detalles)
+        finally:
+            cursor.close()
+            conn.close()
+    
+    cuerpo = generar()
+    usar_gzip = request.args.get('gzip', '1') != '0' and 'gzip' in request.accept_encodings
+    if usar_gzip:
+        cuerpo = comprimir_gzip(cuerpo)
+    
+    response = Response(stream_with_context(cuerpo), mimetype=CSV_MIMETYPE if formato == 'csv' else HTML_MIMETYPE)
+    if usar_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{formato}'
+    return response
+
+def export_details(agente):
+    return [('Agente', agente), ('Fecha de Exportación', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))]
+
 # Export routes for yearly report
 @app.route('/export_reporte_anio_excel')
+@conditional_report('reporte_anio')
 def export_reporte_anio_excel():
     agente = request.args.get('agente', 'Todos')
-    df = get_reporte_anio(agente)
-    
-    # Create Excel file in memory
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Reporte Anual', index=False)
-    
-    output.seek(0)
-    
-    # Create response
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    response.headers['Content-Disposition'] = f'attachment; filename=reporte_anual_{agente}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    
-    return response
+    return stream_xlsx_export(lambda: build_reporte_anio_query(agente), 'Reporte Anual', f'reporte_anual_{agente}', rollup=True)
 
 @app.route('/export_reporte_anio_html')
+@conditional_report('reporte_anio')
 def export_reporte_anio_html():
     agente = request.args.get('agente', 'Todos')
-    df = get_reporte_anio(agente)
-    translations = get_translations()
-    
-    # Generate HTML table
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Reporte Anual - {agente}</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; margin: 20px; }}
-            table {{ border-collapse: collapse; width: 100%; }}
-            th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-            th {{ background-color: #e65100; color: white; }}
-            tr:nth-child(even) {{ background-color: #f2f2f2; }}
-            .header {{ margin-bottom: 20px; }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>Reporte Anual</h1>
-            <p><strong>Agente:</strong> {agente}</p>
-            <p><strong>Fecha de Exportación:</strong> {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>
-            <p><strong>Total de Registros:</strong> {len(df)}</p>
-        </div>
-        {df.to_html(classes='table table-striped', table_id='reporte-table', escape=False, index=False)}
-    </body>
-    </html>
-    """
-    
-    response = make_response(html_content)
-    response.headers['Content-Type'] = 'text/html'
-    response.headers['Content-Disposition'] = f'attachment; filename=reporte_anual_{agente}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.html'
-    
-    return response
+    return stream_text_export(lambda: build_reporte_anio_query(agente), 'html', f'reporte_anual_{agente}',
+                              'Reporte Anual', export_details(agente), rollup=True)
+
+@app.route('/export_reporte_anio_csv')
+@conditional_report('reporte_anio')
+def export_reporte_anio_csv():
+    agente = request.args.get('agente', 'Todos')
+    return stream_text_export(lambda: build_reporte_anio_query(agente), 'csv', f'reporte_anual_{agente}', rollup=True)
 
 # Export routes for Daily Sales
+def daily_export_query():
+    """build_ventas_agente_dia_query from the export request arguments"""
+    return build_ventas_agente_dia_query(request.args.get('agente', 'Todos'),
+                                         request.args.get('fecha', ''),
+                                         request.args.get('anio1', ''),
+                                         request.args.get('mes1', ''),
+                                         request.args.get('dia_inicio', ''),
+                                         request.args.get('dia_fin', ''),
+                                         request.args.get('anio2', ''),
+                                         request.args.get('mes2', ''))
+
 @app.route('/export_ventas_dia_excel')
+@conditional_report('ventas_dia', _args_dias_cerrados)
 def export_ventas_dia_excel():
     agente = request.args.get('agente', 'Todos')
-    fecha = request.args.get('fecha', '')
-    anio1 = request.args.get('anio1', '')
-    mes1 = request.args.get('mes1', '')
-    dia_inicio = request.args.get('dia_inicio', '')
-    dia_fin = request.args.get('dia_fin', '')
-    anio2 = request.args.get('anio2', '')
-    mes2 = request.args.get('mes2', '')
-    
-    # Get complete dataset without pagination
-    df, _ = get_ventas_agente_dia(agente, fecha, anio1, mes1, dia_inicio, dia_fin, anio2, mes2, page=1, per_page=999999)
-    
-    # Create Excel file in memory
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Ventas Diarias', index=False)
-    
-    output.seek(0)
-    
-    # Create response
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    response.headers['Content-Disposition'] = f'attachment; filename=ventas_diarias_{agente}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    
-    return response
+    # Complete dataset without pagination, streamed from the cursor
+    return stream_xlsx_export(daily_export_query, 'Ventas Diarias', f'ventas_diarias_{agente}')
 
 @app.route('/export_ventas_dia_html')
+@conditional_report('ventas_dia', _args_dias_cerrados)
 def export_ventas_dia_html():
     agente = request.args.get('agente', 'Todos')
-    fecha = request.args.get('fecha', '')
-    anio1 = request.args.get('anio1', '')
-    mes1 = request.args.get('mes1', '')
-    dia_inicio = request.args.get('dia_inicio', '')
-    dia_fin = request.args.get('dia_fin', '')
-    anio2 = request.args.get('anio2', '')
-    mes2 = request.args.get('mes2', '')
-    
-    # Get complete dataset without pagination
-    df, _ = get_ventas_agente_dia(agente, fecha, anio1, mes1, dia_inicio, dia_fin, anio2, mes2, page=1, per_page=999999)
-    
-    # Create HTML content
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Ventas Diarias - {agente}</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; margin: 20px; }}
-            table {{ border-collapse: collapse; width: 100%; }}
-            th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-            th {{ background-color: #e65100; color: white; }}
-            tr:nth-child(even) {{ background-color: #f2f2f2; }}
-            .header {{ margin-bottom: 20px; }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>Ventas Diarias</h1>
-            <p><strong>Agente:</strong> {agente}</p>
-            <p><strong>Fecha de Exportación:</strong> {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>
-            <p><strong>Total de Registros:</strong> {len(df)}</p>
-        </div>
-        {df.to_html(classes='table table-striped', table_id='ventas-table', escape=False, index=False)}
-    </body>
-    </html>
-    """
-    
-    response = make_response(html_content)
-    response.headers['Content-Type'] = 'text/html'
-    response.headers['Content-Disposition'] = f'attachment; filename=ventas_diarias_{agente}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.html'
-    
-    return response
+    return stream_text_export(daily_export_query, 'html', f'ventas_diarias_{agente}',
+                              'Ventas Diarias', export_details(agente))
+
+@app.route('/export_ventas_dia_csv')
+@conditional_report('ventas_dia', _args_dias_cerrados)
+def export_ventas_dia_csv():
+    agente = request.args.get('agente', 'Todos')
+    return stream_text_export(daily_export_query, 'csv', f'ventas_diarias_{agente}')
 
 # Export routes for Monthly Sales
 @app.route('/export_ventas_mes_excel')
+@conditional_report('ventas_mes', _args_mes_cerrado)
 def export_ventas_mes_excel():
     agente = request.args.get('agente', 'Todos')
     anio = request.args.get('anio', '')
     mes = request.args.get('mes', '')
     
-    # Get complete dataset without pagination
-    df, _ = get_ventas_agente_mes(agente, anio, mes, page=1, per_page=999999)
-    
-    # Create Excel file in memory
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Ventas Mensuales', index=False)
-    
-    output.seek(0)
-    
-    # Create response
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    response.headers['Content-Disposition'] = f'attachment; filename=ventas_mensuales_{agente}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    
-    return response
+    # Complete dataset without pagination, streamed from the cursor
+    return stream_xlsx_export(lambda: build_ventas_agente_mes_query(agente, anio, mes), 'Ventas Mensuales',
+                              f'ventas_mensuales_{agente}', rollup=True)
 
 @app.route('/export_ventas_mes_html')
+@conditional_report('ventas_mes', _args_mes_cerrado)
 def export_ventas_mes_html():
     agente = request.args.get('agente', 'Todos')
     anio = request.args.get('anio', '')
     mes = request.args.get('mes', '')
-    
-    # Get complete dataset without pagination
-    df, _ = get_ventas_agente_mes(agente, anio, mes, page=1, per_page=999999)
-    
-    # Create HTML content
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Ventas Mensuales - {agente}</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; margin: 20px; }}
-            table {{ border-collapse: collapse; width: 100%; }}
-            th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-            th {{ background-color: #e65100; color: white; }}
-            tr:nth-child(even) {{ background-color: #f2f2f2; }}
-            .header {{ margin-bottom: 20px; }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>Ventas Mensuales</h1>
-            <p><strong>Agente:</strong> {agente}</p>
-            <p><strong>Fecha de Exportación:</strong> {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>
-            <p><strong>Total de Registros:</strong> {len(df)}</p>
-        </div>
-        {df.to_html(classes='table table-striped', table_id='ventas-table', escape=False, index=False)}
-    </body>
-    </html>
+    return stream_text_export(lambda: build_ventas_agente_mes_query(agente, anio, mes), 'html', f'ventas_mensuales_{agente}',
+                              'Ventas Mensuales', export_details(agente), rollup=True)
+
+@app.route('/export_ventas_mes_csv')
+@conditional_report('ventas_mes', _args_mes_cerrado)
+def export_ventas_mes_csv():
+    agente = request.args.get('agente', 'Todos')
+    anio = request.args.get('anio', '')
+    mes = request.args.get('mes', '')
+    return stream_text_export(lambda: build_ventas_agente_mes_query(agente, anio, mes), 'csv', f'ventas_mensuales_{agente}',
+                              rollup=True)
+
+def daily_page_and_graph(agente, anio1, mes1, dia_inicio, dia_fin, anio2, mes2, page, per_page):
+    """Detail page and, in comparison mode, the graph of the daily report.
+
+    In comparison mode the whole detail is read once (and cached); the page is
+    sliced from it and the graph summed from it, instead of a second scan of
+    admMovimientos grouped by day.
     """
-    
-    response = make_response(html_content)
-    response.headers['Content-Type'] = 'text/html'
-    response.headers['Content-Disposition'] = f'attachment; filename=ventas_mensuales_{agente}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.html'
-    
-    return response
+    if not (anio2 and mes2):
+        df_page, total_records = daily_detail(agente, None, anio1, mes1, dia_inicio, dia_fin, anio2, mes2,
+                                              page=page, per_page=per_page)
+        return df_page, total_records, None
+    detalle = get_ventas_agente_dia(agente, None, anio1, mes1, dia_inicio, dia_fin, anio2, mes2)
+    df_page, total_records = pagina_de(detalle, page, per_page)
+    graph_df = daily_graph_from_detail(detalle)
+    graph_data = graph_df.to_dict('records') if not graph_df.empty else None
+    return df_page, total_records, graph_data
 
 @app.route('/ventas_agente_dia', methods=['GET', 'POST'])
+@conditional_report('ventas_dia', _args_dias_cerrados)
 def ventas_agente_dia():
-    agentes = [
-        'MAYOREO / SPOT', 'MOLIENDAS', 'JAVIER ARROYO',
-        'MOLIENDAS MAQ MDLZ', 'MDLZ P2', 'MOSTRADOR 1',
-        'MOSTRADOR 2', 'MOSTRADOR 3', 'Todos'
-    ]
+    agentes = opciones_agente()
     
     selected_agente = request.args.get('agente', 'Todos')
     # Default to current month view
@@ -1729,7 +1206,7 @@ def ventas_agente_dia():
         if request.form.get('fecha'):
             # Single date mode (backwards compatibility)
             selected_fecha = request.form.get('fecha')
-            df = get_ventas_agente_dia(selected_agente, selected_fecha)
+            df_page, total_records = get_ventas_agente_dia(selected_agente, selected_fecha, page=page, per_page=per_page)
         else:
             # Range mode
             selected_anio1 = int(request.form.get('anio1', selected_anio1))
@@ -1744,50 +1221,22 @@ def ventas_agente_dia():
                 selected_anio2 = int(anio2_val)
                 selected_mes2 = int(mes2_val)
             
-            df = get_ventas_agente_dia(selected_agente, None, selected_anio1, selected_mes1, 
-                                     selected_dia_inicio, selected_dia_fin, selected_anio2, selected_mes2)
-            
-            # Get graph data if comparison is enabled
-            if selected_anio2 and selected_mes2:
-                graph_df = get_ventas_dia_for_graph(selected_agente, selected_anio1, selected_mes1,
-                                                  selected_dia_inicio, selected_dia_fin, selected_anio2, selected_mes2)
-                if not graph_df.empty:
-                    graph_data = graph_df.to_dict('records')
+            df_page, total_records, graph_data = daily_page_and_graph(selected_agente, selected_anio1, selected_mes1,
+                                                                      selected_dia_inicio, selected_dia_fin,
+                                                                      selected_anio2, selected_mes2, page, per_page)
     else:
         # GET request or default: show current month
         if selected_fecha:
             # Single date mode (backwards compatibility)
-            df = get_ventas_agente_dia(selected_agente, selected_fecha)
+            df_page, total_records = get_ventas_agente_dia(selected_agente, selected_fecha, page=page, per_page=per_page)
         else:
             # Range mode
-            df = get_ventas_agente_dia(selected_agente, None, selected_anio1, selected_mes1, 
-                                     selected_dia_inicio, selected_dia_fin, selected_anio2, selected_mes2)
-            
-            # Get graph data if comparison is enabled
-            if selected_anio2 and selected_mes2:
-                graph_df = get_ventas_dia_for_graph(selected_agente, selected_anio1, selected_mes1,
-                                                  selected_dia_inicio, selected_dia_fin, selected_anio2, selected_mes2)
-                if not graph_df.empty:
-                    graph_data = graph_df.to_dict('records')
+            df_page, total_records, graph_data = daily_page_and_graph(selected_agente, selected_anio1, selected_mes1,
+                                                                      selected_dia_inicio, selected_dia_fin,
+                                                                      selected_anio2, selected_mes2, page, per_page)
     
-    # Calculate pagination
-    total_records = len(df)
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-    
-    # Slice dataframe for current page
-    df_page = df.iloc[start_idx:end_idx]
-    
-    # Pagination info
-    total_pages = math.ceil(total_records / per_page)
-    pagination_info = {
-        'page': page,
-        'per_page': per_page,
-        'total': total_records,
-        'pages': total_pages,
-        'has_prev': page > 1,
-        'has_next': page < total_pages
-    }
+    # Pagination info (the page itself is fetched by SQL Server)
+    pagination_info = info_paginacion(page, per_page, total_records)
     
     translations = get_translations()
     # Generate year and month options
@@ -1801,8 +1250,8 @@ def ventas_agente_dia():
     
     return render_template('enhanced_table_with_daily_comparison.html', 
                            title=translations['ui']['daily_sales'],
-                           data=df_page.to_dict('records'),
-                           columns=df.columns.tolist(),
+                           data=registros(df_page),
+                           columns=df_page.columns.tolist(),
                            pagination=pagination_info,
                            agentes=agentes,
                            selected_agente=selected_agente,
@@ -1821,17 +1270,15 @@ def ventas_agente_dia():
                            current_lang=get_language())
 
 @app.route('/ventas_agente_mes', methods=['GET', 'POST'])
+@conditional_report('ventas_mes', _args_mes_cerrado)
 def ventas_agente_mes():
-    agentes = [
-        'MAYOREO / SPOT', 'MOLIENDAS', 'JAVIER ARROYO',
-        'MOLIENDAS MAQ MDLZ', 'MDLZ P2', 'MOSTRADOR 1',
-        'MOSTRADOR 2', 'MOSTRADOR 3', 'Todos'
-    ]
+    agentes = opciones_agente()
     
-    selected_agente = 'Todos'
     current_date = datetime.now()
-    selected_anio = current_date.year  # Default to current year
-    selected_mes = current_date.month  # Default to current month
+    # Filtros en la query string (GET) para que un mes cerrado tenga URL propia y se valide con ETag
+    selected_agente = request.args.get('agente', 'Todos')
+    selected_anio = request.args.get('anio', current_date.year, type=int)  # Default to current year
+    selected_mes = request.args.get('mes', current_date.month, type=int)  # Default to current month
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 50))
     
@@ -1840,26 +1287,11 @@ def ventas_agente_mes():
         selected_anio = int(request.form.get('anio', selected_anio))
         selected_mes = int(request.form.get('mes', selected_mes))
     
-    df = get_ventas_agente_mes(selected_agente, selected_anio, selected_mes)
-    
-    # Calculate pagination
-    total_records = len(df)
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
+    df_page, total_records = get_ventas_agente_mes(selected_agente, selected_anio, selected_mes,
+                                                   page=page, per_page=per_page)
     
-    # Slice dataframe for current page
-    df_page = df.iloc[start_idx:end_idx]
-    
-    # Pagination info
-    total_pages = math.ceil(total_records / per_page)
-    pagination_info = {
-        'page': page,
-        'per_page': per_page,
-        'total': total_records,
-        'pages': total_pages,
-        'has_prev': page > 1,
-        'has_next': page < total_pages
-    }
+    # Pagination info (the page itself is fetched by SQL Server)
+    pagination_info = info_paginacion(page, per_page, total_records)
     
     translations = get_translations()
     # Generate year options (last 5 years)
@@ -1872,8 +1304,8 @@ def ventas_agente_mes():
     
     return render_template('enhanced_table_with_month_filter.html', 
                            title=translations['ui']['monthly_sales'],
-                           data=df_page.to_dict('records'),
-                           columns=df.columns.tolist(),
+                           data=registros(df_page),
+                           columns=df_page.columns.tolist(),
                            pagination=pagination_info,
                            agentes=agentes,
                            selected_agente=selected_agente,
@@ -1887,11 +1319,7 @@ def ventas_agente_mes():
 
 @app.route('/objetivos_venta', methods=['GET', 'POST'])
 def objetivos_venta():
-    agentes = [
-        'MAYOREO / SPOT', 'MOLIENDAS', 'JAVIER ARROYO',
-        'MOLIENDAS MAQ MDLZ', 'MDLZ P2', 'MOSTRADOR 1',
-        'MOSTRADOR 2', 'MOSTRADOR 3', 'Todos'
-    ]
+    agentes = opciones_agente()
     
     # Meses para el filtro
     meses = [
@@ -1912,51 +1340,31 @@ def objetivos_venta():
         selected_mes = request.form.get('mes', 'Todos')
     
     try:
-        df = get_objetivos_venta(selected_agente)
+        df_page, total_records = get_objetivos_venta(selected_agente, page=page, per_page=per_page)
         
         # Get summary data for dashboard
         summary_df = get_objetivos_summary(selected_agente, selected_mes)
         
-        # If dataframe is very large, limit it for performance
-        if len(df) > 10000:
-            # Take only the most recent data for performance
-            df = df.tail(5000)  # Keep only last 5000 records for performance
-        
-        # Calculate pagination
-        total_records = len(df)
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        
-        # Slice dataframe for current page
-        df_page = df.iloc[start_idx:end_idx]
-        
-        # Pagination info
-        total_pages = math.ceil(total_records / per_page)
-        pagination_info = {
-            'page': page,
-            'per_page': per_page,
-            'total': total_records,
-            'pages': total_pages,
-            'has_prev': page > 1,
-            'has_next': page < total_pages
-        }
+        # Pagination info (the page itself is fetched by SQL Server)
+        pagination_info = info_paginacion(page, per_page, total_records)
         
         translations = get_translations()
         return render_template('enhanced_table_objectives_with_filter.html', 
                                title=translations['ui']['sales_objectives'],
-                               data=df_page.to_dict('records'),
-                               columns=df.columns.tolist(),
+                               data=registros(df_page),
+                               columns=df_page.columns.tolist(),
                                pagination=pagination_info,
                                agentes=agentes,
                                selected_agente=selected_agente,
                                meses=meses,
                                selected_mes=selected_mes,
-                               summary_data=summary_df.to_dict('records') if not summary_df.empty else [],
+                               summary_data=registros(summary_df) if not summary_df.empty else [],
                                translations=translations,
                                languages=LANGUAGES,
                                current_lang=get_language())
     except Exception as e:
         # If query fails or takes too long, show error page
+        logger.exception(f"Falló el reporte de objetivos ({selected_agente}, {selected_mes})")
         translations = get_translations()
         return render_template('error_page.html',
                                error_message="La consulta está tomando demasiado tiempo. Por favor, inténtelo más tarde.",
@@ -1976,54 +1384,30 @@ def reporte_coberturas():
         selected_agente = request.form.get('agente', selected_agente)
     
     try:
-        # Get detailed coverage data
-        df_detalle = get_cobertura_clientes(selected_anio, selected_agente)
-        
-        # Get matrix coverage data
+        # Detailed coverage page and matrix, both derived from one grouped (cached) scan
+        df_detalle_page, total_records = get_cobertura_clientes(selected_anio, selected_agente,
+                                                                page=page, per_page=per_page)
         df_matriz = get_cobertura_matricial(selected_anio, selected_agente)
         
-        # Calculate pagination for detailed data
-        total_records = len(df_detalle)
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        
-        # Slice dataframe for current page
-        df_detalle_page = df_detalle.iloc[start_idx:end_idx]
-        
-        # Pagination info
-        total_pages = math.ceil(total_records / per_page)
-        pagination_info = {
-            'page': page,
-            'per_page': per_page,
-            'total': total_records,
-            'pages': total_pages,
-            'has_prev': page > 1,
-            'has_next': page < total_pages
-        }
+        # Pagination info (the page itself is fetched by SQL Server)
+        pagination_info = info_paginacion(page, per_page, total_records)
         
         # Generate year options (last 5 years)
         current_year = datetime.now().year
         years = list(range(current_year - 4, current_year + 1))
         
         # Agent options
-        agentes = ['Todos', 'MAYOREO / SPOT', 'MOLIENDAS', 'JAVIER ARROYO', 'MOLIENDAS MAQ MDLZ', 'MDLZ P2', 'MOSTRADOR 1', 'MOSTRADOR 2', 'MOSTRADOR 3']
+        agentes = opciones_agente(todos_primero=True)
         
         translations = get_translations()
-        
-        print(f"Debug - Detailed data shape: {df_detalle.shape}")
-        print(f"Debug - Matrix data shape: {df_matriz.shape}")
-        print(f"Debug - Detailed columns: {df_detalle.columns.tolist()}")
-        print(f"Debug - Matrix columns: {df_matriz.columns.tolist()}")
-        if len(df_detalle) > 0:
-            print(f"Debug - First detailed record: {df_detalle.iloc[0].to_dict()}")
-        if len(df_matriz) > 0:
-            print(f"Debug - First matrix record: {df_matriz.iloc[0].to_dict()}")
+        logger.debug(f"Coberturas {selected_anio}/{selected_agente}: detalle {df_detalle_page.shape} "
+                     f"de {total_records}, matriz {df_matriz.shape}")
         
         return render_template('reporte_coberturas.html', 
                                title=translations['ui']['coverage_report'],
-                               data_detalle=df_detalle_page.to_dict('records'),
-                               columns_detalle=df_detalle.columns.tolist(),
-                               data_matriz=df_matriz.to_dict('records'),
+                               data_detalle=registros(df_detalle_page),
+                               columns_detalle=df_detalle_page.columns.tolist(),
+                               data_matriz=registros(df_matriz),
                                columns_matriz=df_matriz.columns.tolist(),
                                pagination=pagination_info,
                                selected_anio=selected_anio,
@@ -2035,6 +1419,7 @@ def reporte_coberturas():
                                current_lang=get_language())
     except Exception as e:
         # If query fails, show error page
+        logger.exception(f"Falló el reporte de coberturas ({selected_anio}, {selected_agente})")
         translations = get_translations()
         return render_template('error_page.html',
                                error_message="Error al cargar el reporte de coberturas. Intente más tarde.",
@@ -2042,10 +1427,278 @@ def reporte_coberturas():
                                languages=LANGUAGES,
                                current_lang=get_language())
 
+# JSON API: whole reports in columnar form, paged, sorted and searched by the templates
+API_GZIP_MIN_BYTES = 1024
+
+def columnar_response(nombre, calcular):
+    """Columnar JSON of a whole report (gzip when the client accepts it); errors as JSON 500"""
+    try:
+        df = calcular()
+    except Exception as e:
+        logger.exception(f"Falló /api/{nombre}")
+        return jsonify({'report': nombre, 'error': str(e)}), 500
+    meta = {'report': nombre}
+    vencidos = resultados_vencidos()
+    if vencidos:
+        meta['stale'] = vencidos
+    cuerpo = json_columnar(df, **meta)
+    usar_gzip = len(cuerpo) >= API_GZIP_MIN_BYTES and 'gzip' in request.accept_encodings
+    if usar_gzip:
+        cuerpo = gzip.compress(cuerpo, compresslevel=6)
+    response = Response(cuerpo, mimetype=JSON_MIMETYPE)
+    response.headers['Vary'] = 'Accept-Encoding'
+    if usar_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.route('/api/reporte_anio')
+@conditional_report('reporte_anio')
+def api_reporte_anio():
+    agente = request.args.get('agente', 'Todos')
+    return columnar_response('reporte_anio', lambda: get_reporte_anio(agente))
+
+@app.route('/api/ventas_dia')
+@conditional_report('ventas_dia', _args_dias_cerrados)
+def api_ventas_dia():
+    import calendar
+    agente = request.args.get('agente', 'Todos')
+    fecha = request.args.get('fecha')
+    hoy = datetime.now()
+    anio1 = request.args.get('anio1', hoy.year, type=int)
+    mes1 = request.args.get('mes1', hoy.month, type=int)
+    dia_inicio = request.args.get('dia_inicio', 1, type=int)
+    dia_fin = request.args.get('dia_fin', calendar.monthrange(anio1, mes1)[1], type=int)
+    anio2 = request.args.get('anio2', type=int)
+    mes2 = request.args.get('mes2', type=int)
+    if fecha:
+        return columnar_response('ventas_dia', lambda: get_ventas_agente_dia(agente, fecha))
+    return columnar_response('ventas_dia', lambda: daily_detail(agente, None, anio1, mes1, dia_inicio, dia_fin,
+                                                                anio2, mes2))
+
+@app.route('/api/ventas_mes')
+@conditional_report('ventas_mes', _args_mes_cerrado)
+def api_ventas_mes():
+    agente = request.args.get('agente', 'Todos')
+    hoy = datetime.now()
+    anio = request.args.get('anio', hoy.year, type=int)
+    mes = request.args.get('mes', hoy.month, type=int)
+    return columnar_response('ventas_mes', lambda: get_ventas_agente_mes(agente, anio, mes))
+
+@app.route('/api/objetivos')
+@conditional_report('objetivos')
+def api_objetivos():
+    agente = request.args.get('agente', 'Todos')
+    return columnar_response('objetivos', lambda: get_objetivos_venta(agente))
+
+@app.route('/api/coberturas')
+@conditional_report('coberturas', _args_anio_cerrado)
+def api_coberturas():
+    anio = request.args.get('anio', datetime.now().year, type=int)
+    agente = request.args.get('agente', 'Todos')
+    if request.args.get('vista') == 'matriz':
+        return columnar_response('coberturas_matriz', lambda: get_cobertura_matricial(anio, agente))
+    return columnar_response('coberturas', lambda: get_cobertura_clientes(anio, agente))
+
+@app.route('/pool_stats')
+def pool_stats():
+    """Connection pool counters (in use, idle, waits, created...)"""
+    return jsonify(db_pool.stats())
+
+@app.route('/query_stats')
+def query_stats():
+    """Statement counters and plan reuse (app side, plus the server plan cache when permitted)"""
+    result = {'app': estadisticas_consultas.stats(), 'parallel': ejecutor_reportes.stats()}
+    conn = get_db_connection()
+    try:
+        result['plan_cache'] = plan_cache_stats(conn)
+    except Exception as e:
+        result['plan_cache_error'] = str(e)
+    finally:
+        conn.close()
+    return jsonify(result)
+
+@app.route('/metrics')
+def metrics():
+    """Report and request histograms in the Prometheus text format"""
+    return Response(metricas.registro.render(), mimetype=metricas.PROMETHEUS_MIMETYPE)
+
+@app.route('/cache_reportes', methods=['GET', 'POST'])
+def cache_reportes_view():
+    """Report cache counters; POST drops every entry or those of {"reporte": name}"""
+    if request.method == 'POST':
+        payload = request.get_json(silent=True) or request.form
+        eliminadas = cache_reportes.invalidar(payload.get('reporte') or None)
+        return jsonify({'invalidated': eliminadas, **cache_reportes.stats()})
+    result = {**cache_reportes.stats(), 'compaction': estadisticas_compactacion.stats()}
+    if ventas_dia_incremental is not None:
+        result['daily_delta'] = ventas_dia_incremental.stats()
+    return jsonify(result)
+
+@app.route('/precalentamiento')
+def precalentamiento():
+    """Cache warmer jobs: last start, duration and result of each, and when it runs next"""
+    if precalentador is None:
+        return jsonify({'enabled': False}), 404
+    return jsonify({'enabled': True, **precalentador.estado()})
+
+@app.route('/atributos_producto', methods=['GET', 'POST'])
+def atributos_producto():
+    """List the product attribute table or save a manual override"""
+    conn = get_db_connection()
+    try:
+        asegurar_atributos_producto(conn)
+        if request.method == 'POST':
+            payload = request.get_json(silent=True) or request.form
+            try:
+                atributos = set_atributo_override(conn,
+                                                  int(payload['cid_producto']),
+                                                  kilos=payload.get('kilos') or None,
+                                                  categoria=payload.get('categoria') or None,
+                                                  empresa=payload.get('empresa') or None)
+            except (KeyError, ValueError) as e:
+                return jsonify({'error': str(e)}), 400
+            # Los kilos/categorías cambiaron: los resultados guardados ya no valen
+            cache_reportes.invalidar()
+            invalidar_objetivos(conn)
+            return jsonify({'cid_producto': int(payload['cid_producto']),
+                            'kilos': atributos[0],
+                            'categoria': atributos[1],
+                            'empresa': atributos[2]})
+    finally:
+        conn.close()
+
+    return jsonify([
+        {'cid_producto': cid, 'kilos': kilos, 'categoria': categoria, 'empresa': empresa}
+        for cid, (kilos, categoria, empresa) in sorted(get_atributos_producto().items())
+    ])
+
+@app.route('/conjuntos_producto', methods=['GET', 'POST'])
+def conjuntos_producto():
+    """List the named product sets or (re)define one from product codes"""
+    conn = get_db_connection()
+    try:
+        asegurar_conjuntos(conn)
+        if request.method == 'POST':
+            payload = request.get_json(silent=True) or {}
+            try:
+                nombre = payload['nombre']
+                codigos = payload['codigos']
+                if isinstance(codigos, str):
+                    codigos = [codigo.strip() for codigo in codigos.split(',') if codigo.strip()]
+                version, faltantes = set_conjunto(conn, nombre, codigos, payload.get('descripcion'))
+            except (KeyError, ValueError) as e:
+                return jsonify({'error': str(e)}), 400
+            cache_reportes.invalidar()
+            invalidar_objetivos(conn)
+            return jsonify({'nombre': nombre, 'version': version, 'productos': len(get_conjunto(nombre)),
+                            'codigos_sin_producto': faltantes})
+    finally:
+        conn.close()
+
+    return jsonify({
+        nombre: {'version': version, 'productos': len(get_conjunto(nombre))}
+        for nombre, version in sorted(version_conjuntos().items())
+    })
+
+@app.route('/snapshot', methods=['GET', 'POST'])
+def snapshot_view():
+    """Snapshot state; POST runs an incremental sync"""
+    if snapshot_ventas is None:
+        return jsonify({'enabled': False, 'available': SNAPSHOT_DISPONIBLE}), 404
+    if request.method == 'POST':
+        meses = sync_snapshot()
+        return jsonify({'synced_months': [f'{anio}-{mes:02d}' for anio, mes in meses], **snapshot_ventas.stats()})
+    return jsonify({'enabled': True, 'in_use': use_snapshot(), **snapshot_ventas.stats()})
+
+@app.cli.command('sync-snapshot')
+def sync_snapshot_command():
+    """Incremental snapshot sync, meant for an off-hours cron job"""
+    if snapshot_ventas is None:
+        raise SystemExit("Snapshot deshabilitado: defina REPORT_SOURCE=snapshot (y instale pyarrow)")
+    meses = sync_snapshot()
+    print(f"{len(meses)} meses extraídos en {snapshot_ventas.directorio}")
+
+def refresh_reference_data():
+    """Load (or re-read once their TTL is over) the agent, product, document model and client catalogs"""
+    conn = get_db_connection()
+    try:
+        asegurar_referencia(conn)
+    finally:
+        conn.close()
+
+def warm_up():
+    """Open the minimum pool connections and compute the landing reports before the first request"""
+    db_pool.prewarm()
+    for nombre, calcular in (('referencia', refresh_reference_data),
+                             ('reporte_anio', lambda: get_reporte_anio('Todos', page=1, per_page=50)),
+                             ('objetivos', get_objetivos_base),
+                             ('coberturas', lambda: get_cobertura_base(date.today().year, 'Todos'))):
+        try:
+            calcular()
+        except Exception as e:
+            logger.warning(f"No se pudo precalentar {nombre}: {e}")
+
+# Agentes cuyas vistas por defecto mantiene calientes el precalentador (los del selector más 'Todos')
+WARM_AGENTS = AGENTES_REPORTE + ('Todos',)
+
+def warm_daily(agente):
+    """Current month daily view: the first page the route shows and the full frame the API serves"""
+    import calendar
+    hoy = date.today()
+    ultimo_dia = calendar.monthrange(hoy.year, hoy.month)[1]
+    daily_detail(agente, None, hoy.year, hoy.month, 1, ultimo_dia, None, None, page=1, per_page=50)
+    daily_detail(agente, None, hoy.year, hoy.month, 1, ultimo_dia, None, None)
+
+def warm_monthly(agente):
+    hoy = date.today()
+    get_ventas_agente_mes(agente, hoy.year, hoy.month, page=1, per_page=50)
+    get_ventas_agente_mes(agente, hoy.year, hoy.month)
+
+def warm_coverage():
+    # Las vistas por agente se filtran de la de todos
+    get_cobertura_base(date.today().year, 'Todos')
+
+def create_precalentador():
+    """Background warmer of the default views; REPORT_WARM_INTERVAL=0 disables it"""
+    intervalo = float(os.environ.get('REPORT_WARM_INTERVAL', 300))
+    if intervalo <= 0:
+        return None
+    precalentador = Precalentador(intervalo=intervalo,
+                                  max_concurrentes=int(os.environ.get('REPORT_WARM_CONCURRENCY', 2)),
+                                  jitter=float(os.environ.get('REPORT_WARM_JITTER', 0.1)))
+    # Recalcular lo que está por vencer: una fracción del TTL, para no rehacer en cada pasada lo recién calculado
+    # (y para que la caché compartida acepte lo que otro worker calculó hace poco)
+    margen = cache_reportes.ttl_abierto * float(os.environ.get('REPORT_WARM_MARGIN', 0.25))
+
+    def trabajo(calcular, *args):
+        def ejecutar():
+            with refrescar_antes(margen):
+                calcular(*args)
+        return ejecutar
+
+    precalentador.agregar('referencia', refresh_reference_data)
+    precalentador.agregar('objetivos', trabajo(get_objetivos_base))
+    precalentador.agregar('coberturas', trabajo(warm_coverage))
+    for agente in WARM_AGENTS:
+        precalentador.agregar(f'ventas_dia:{agente}', trabajo(warm_daily, agente))
+        precalentador.agregar(f'ventas_mes:{agente}', trabajo(warm_monthly, agente))
+    return precalentador
+
+precalentador = create_precalentador()
+
 if __name__ == '__main__':
     # SSL context for HTTPS
     import ssl
     context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
     context.load_cert_chain('cert.pem', 'key.pem')
     
-    app.run(host='0.0.0.0', port=5000, debug=True, ssl_context=context)
+    debug = True
+    # Con el recargador de debug este bloque corre también en el proceso que vigila los archivos;
+    # sólo el que atiende las peticiones (WERKZEUG_RUN_MAIN) abre conexiones y precalienta
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Abrir las conexiones mínimas antes de la primera petición
+        db_pool.prewarm()
+        if precalentador is not None:
+            precalentador.iniciar()
+    
+    app.run(host='0.0.0.0', port=5000, debug=debug, ssl_context=context)
@@ -0,0 +1,3 @@
+"""
+Benchmarks locales de las funciones de reportes (datos sintéticos del ERP sobre SQLite)
+"""
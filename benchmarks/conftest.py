@@ -0,0 +1,96 @@
+"""
+Fixtures of the report benchmarks.
+
+    BENCH_SCALES=100k,1m python -m pytest benchmarks
+
+BENCH_SCALES picks the dataset sizes (100k by default; 1m and 10m take a
+while to generate the first time) and BENCH_DATA_DIR where the generated
+SQLite files are kept between runs. With pytest-benchmark installed its
+`benchmark` fixture is used; otherwise a minimal one times a few rounds and
+prints a summary at the end of the session.
+"""
+
+import os
+import statistics
+import tempfile
+import time
+
+import pytest
+
+from benchmarks.datos_sinteticos import asegurar_dataset
+from benchmarks.dialecto import conectar_local
+
+ESCALAS_ACTIVAS = [e.strip() for e in os.environ.get('BENCH_SCALES', '100k').split(',') if e.strip()]
+DIRECTORIO_DATOS = os.environ.get('BENCH_DATA_DIR', os.path.join(tempfile.gettempdir(), 'moli_bench'))
+RONDAS = int(os.environ.get('BENCH_ROUNDS', 5))
+
+# Sin presupuesto de tiempo: un reporte lento debe medirse, no caer al resultado en caché
+os.environ.setdefault('REPORT_BUDGET_SECONDS', '0')
+
+_resultados = []
+
+
+@pytest.fixture(scope='session', params=ESCALAS_ACTIVAS)
+def escala(request):
+    return request.param
+
+
+@pytest.fixture(scope='session')
+def app_local(escala):
+    """app.py with its connection pool pointed at the synthetic dataset of `escala`"""
+    pytest.importorskip('pyodbc')  # app.py lo importa al cargar el módulo
+    import app as aplicacion
+    from reportes import atributos, conjuntos, objetivos, referencia, rollup
+    from reportes.pool import ConnectionPool
+
+    ruta = asegurar_dataset(DIRECTORIO_DATOS, escala)
+    anterior = aplicacion.db_pool
+    aplicacion.db_pool = ConnectionPool(lambda: conectar_local(ruta), max_size=4, min_size=0)
+
+    # Estado por proceso de las tablas auxiliares: se recalcula contra este dataset
+    atributos._cache = {}
+    referencia._datos = referencia._VACIA
+    conjuntos._cache = {}
+    rollup._ultimo_refresco = 0.0
+    objetivos._tabla_creada = False
+    aplicacion.cache_reportes.invalidar()
+
+    conn = aplicacion.db_pool.acquire()
+    try:
+        inicio = time.perf_counter()
+        aplicacion.prepare_report_tables(conn, rollup=True)
+        print(f"\n[{escala}] tablas auxiliares y rollup en {time.perf_counter() - inicio:.1f} s")
+    finally:
+        conn.close()
+
+    yield aplicacion
+
+    aplicacion.db_pool.close()
+    aplicacion.db_pool = anterior
+
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+    @pytest.fixture
+    def benchmark(request):
+        """Minimal stand-in for pytest-benchmark: RONDAS timed calls, result of the last one"""
+        def medir(funcion, *args, **kwargs):
+            tiempos = []
+            resultado = None
+            for _ in range(RONDAS):
+                inicio = time.perf_counter()
+                resultado = funcion(*args, **kwargs)
+                tiempos.append(time.perf_counter() - inicio)
+            _resultados.append((request.node.name, min(tiempos), statistics.median(tiempos), max(tiempos)))
+            return resultado
+        return medir
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _resultados:
+        return
+    terminalreporter.section('benchmarks de reportes')
+    terminalreporter.write_line(f"{'prueba':55} {'min ms':>9} {'mediana ms':>11} {'max ms':>9}")
+    for nombre, minimo, mediana, maximo in _resultados:
+        terminalreporter.write_line(f"{nombre:55} {minimo * 1000:9.1f} {mediana * 1000:11.1f} {maximo * 1000:9.1f}")
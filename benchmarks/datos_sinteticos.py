@@ -0,0 +1,202 @@
+"""
+Synthetic CONTPAQi sales data for the local benchmarks.
+
+generar() writes admAgentes, admProductos, admDocumentosModelo, admClientes,
+admDocumentos and admMovimientos into a SQLite file with the columns the reports read.
+
+- Agents: the real report agents plus a few that the reports leave out.
+- Products: the reportable product codes with names the kilos rules
+  recognise ("AZUCAR REFINADA SACO 25 KG", ...), plus services and
+  packaging outside the reportable set.
+- Documents: spread over the last `anios` years up to today, so there is an
+  open month. Mostly invoices (type 4), then remisiones (type 3) and some
+  orders and returns the reports must ignore. Documents are numbered in date
+  order, like the ERP capture order that the CIDMOVIMIENTO watermark relies on.
+
+    python -m benchmarks.datos_sinteticos --escala 1m --destino /tmp/moli_bench
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from reportes.conjuntos import CODIGOS_REPORTABLES
+
+ESCALAS = {'100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+AGENTES = ['MAYOREO / SPOT', 'MOLIENDAS', 'JAVIER ARROYO', 'MOLIENDAS MAQ MDLZ', 'MDLZ P2', 'MOSTRADOR 1',
+           'MOSTRADOR 2', 'MOSTRADOR 3', 'OFICINA', 'VENTAS FORANEAS', '(Ninguno)']
+PESO_AGENTES = [18, 22, 10, 8, 8, 8, 6, 6, 6, 5, 3]
+
+# (CIDDOCUMENTODE, descripción, módulo, peso entre los documentos generados)
+DOCUMENTOS_MODELO = [
+    (2, 'Pedido', 1, 4),
+    (3, 'Remisión', 1, 20),
+    (4, 'Factura', 1, 70),
+    (5, 'Devolución', 1, 4),
+    (6, 'Nota de Crédito', 1, 2),
+    (19, 'Compra', 2, 0),
+]
+
+PRESENTACIONES = ['SACO 25 KG', 'SACO 50 KG', '1 KG', 'BOLSA 2 KG', '5 KG', '20 KG', '907 GR', '500 GR',
+                  '50 LB', 'SUPER SACO 900 KG', 'SUPER SACO 1000 KG', '26 KG', '27 KG']
+PRODUCTOS_BASE = ['AZUCAR REFINADA', 'AZUCAR ESTANDAR', 'AZUCAR PULVERIZADA', 'GLUCOSA', 'ALMIDON DE MAIZ',
+                  'PILONCILLO', 'AZUCAR CASTER', 'MIX PANADERO', 'AZUCAR EXTRA FINA', 'ENDULZANTE SUCRALOSA']
+NO_REPORTABLES = ['SERVICIO DE FLETE', 'TARIMA DE MADERA', 'SERVICIO DE MANIOBRAS', 'EMPAQUE VACIO',
+                  'MUESTRA SIN VALOR']
+
+GIROS = ['PANADERIA', 'DULCERIA', 'TORTILLERIA', 'ABARROTES', 'PASTELERIA', 'REFRESQUERA', 'CAFETERIA',
+         'DISTRIBUIDORA', 'COMERCIALIZADORA', 'NEVERIA']
+NOMBRES = ['SAN JOSE', 'LA ESPERANZA', 'EL SOL', 'LA LUNA', 'HERMANOS LOPEZ', 'DEL BAJIO', 'LA GUADALUPANA',
+           'DEL NORTE', 'SANTA FE', 'LA ESTRELLA', 'EL TRIUNFO', 'LOS ALAMOS', 'LA MODERNA', 'DEL VALLE']
+RAZONES = ['', ' SA DE CV', ' S DE RL DE CV', ' SC']
+
+DDL_ERP = """
+CREATE TABLE admAgentes (CIDAGENTE INTEGER PRIMARY KEY, CCODIGOAGENTE TEXT, CNOMBREAGENTE TEXT NOT NULL);
+CREATE TABLE admProductos (CIDPRODUCTO INTEGER PRIMARY KEY, CCODIGOPRODUCTO TEXT NOT NULL,
+                           CNOMBREPRODUCTO TEXT NOT NULL);
+CREATE UNIQUE INDEX IX_admProductos_Codigo ON admProductos (CCODIGOPRODUCTO);
+CREATE TABLE admDocumentosModelo (CIDDOCUMENTODE INTEGER PRIMARY KEY, CDESCRIPCION TEXT, CMODULO INTEGER);
+CREATE TABLE admClientes (CIDCLIENTEPROVEEDOR INTEGER PRIMARY KEY, CCODIGOCLIENTE TEXT, CRAZONSOCIAL TEXT);
+CREATE TABLE admDocumentos (CIDDOCUMENTO INTEGER PRIMARY KEY, CIDDOCUMENTODE INTEGER NOT NULL,
+                            CFECHA TEXT NOT NULL, CIDAGENTE INTEGER NOT NULL,
+                            CIDCLIENTEPROVEEDOR INTEGER NOT NULL, CRAZONSOCIAL TEXT);
+CREATE TABLE admMovimientos (CIDMOVIMIENTO INTEGER PRIMARY KEY, CIDDOCUMENTO INTEGER NOT NULL,
+                             CIDDOCUMENTODE INTEGER NOT NULL, CIDPRODUCTO INTEGER NOT NULL,
+                             CFECHA TEXT NOT NULL, CUNIDADES REAL NOT NULL);
+CREATE INDEX IX_admMovimientos_CFECHA ON admMovimientos (CFECHA);
+CREATE INDEX IX_admMovimientos_Documento ON admMovimientos (CIDDOCUMENTO);
+CREATE TABLE benchDataset (Movimientos INTEGER, Anios INTEGER, Semilla INTEGER, Hoy TEXT, Generado TEXT);
+"""
+
+TAMANO_LOTE = 200_000
+
+
+def productos():
+    """[(codigo, nombre)]: every reportable code with a recognisable name, then the other products"""
+    lista = []
+    for i, codigo in enumerate(CODIGOS_REPORTABLES):
+        base = PRODUCTOS_BASE[i % len(PRODUCTOS_BASE)]
+        presentacion = PRESENTACIONES[(i // len(PRODUCTOS_BASE) + i) % len(PRESENTACIONES)]
+        lista.append((codigo, f"{base} {presentacion}"))
+    for i, nombre in enumerate(NO_REPORTABLES):
+        lista.append((f"ZOTR{i:03d}", nombre))
+    return lista
+
+
+def clientes(rng, cantidad):
+    return [f"{GIROS[rng.integers(len(GIROS))]} {NOMBRES[rng.integers(len(NOMBRES))]}"
+            f"{RAZONES[rng.integers(len(RAZONES))]} {i:05d}" for i in range(1, cantidad + 1)]
+
+
+def _pesos(valores):
+    valores = np.asarray(valores, dtype=float)
+    return valores / valores.sum()
+
+
+def generar(ruta, movimientos, anios=3, semilla=42, hoy=None):
+    """Write a dataset with `movimientos` movement rows into a new SQLite file at `ruta`"""
+    hoy = hoy or date.today()
+    rng = np.random.default_rng(semilla)
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    conn = sqlite3.connect(ruta)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.executescript(DDL_ERP)
+
+    conn.executemany("INSERT INTO admAgentes VALUES (?, ?, ?)",
+                     [(i, f"AG{i:03d}", nombre) for i, nombre in enumerate(AGENTES, start=1)])
+    lista_productos = productos()
+    conn.executemany("INSERT INTO admProductos VALUES (?, ?, ?)",
+                     [(i, codigo, nombre) for i, (codigo, nombre) in enumerate(lista_productos, start=1)])
+    conn.executemany("INSERT INTO admDocumentosModelo VALUES (?, ?, ?)",
+                     [(cid, descripcion, modulo) for cid, descripcion, modulo, _ in DOCUMENTOS_MODELO])
+
+    # Documentos (unos 3 movimientos cada uno), numerados en orden de fecha
+    n_documentos = max(movimientos // 3, 1)
+    n_clientes = int(min(max(n_documentos // 40, 50), 5000))
+    nombres_clientes = np.array(clientes(rng, n_clientes), dtype=object)
+    conn.executemany("INSERT INTO admClientes VALUES (?, ?, ?)",
+                     [(i, f"CL{i:05d}", nombre) for i, nombre in enumerate(nombres_clientes.tolist(), start=1)])
+    inicio = date(hoy.year - anios, hoy.month, 1)
+    dias = (hoy - inicio).days + 1
+    fechas = np.array([(inicio + timedelta(days=d)).isoformat() + ' 00:00:00' for d in range(dias)], dtype=object)
+
+    doc_dia = np.sort(rng.integers(0, dias, n_documentos))
+    modelos = [m for m in DOCUMENTOS_MODELO if m[3]]
+    doc_tipo = rng.choice([m[0] for m in modelos], n_documentos, p=_pesos([m[3] for m in modelos]))
+    doc_agente = rng.choice(np.arange(1, len(AGENTES) + 1), n_documentos, p=_pesos(PESO_AGENTES))
+    # Pocos clientes concentran la mayor parte de las ventas
+    doc_cliente = np.minimum(rng.zipf(1.3, n_documentos), n_clientes)
+
+    for desde in range(0, n_documentos, TAMANO_LOTE):
+        hasta = min(desde + TAMANO_LOTE, n_documentos)
+        conn.executemany("INSERT INTO admDocumentos VALUES (?, ?, ?, ?, ?, ?)", zip(
+            range(desde + 1, hasta + 1), doc_tipo[desde:hasta].tolist(), fechas[doc_dia[desde:hasta]].tolist(),
+            doc_agente[desde:hasta].tolist(), doc_cliente[desde:hasta].tolist(),
+            nombres_clientes[doc_cliente[desde:hasta] - 1].tolist()))
+
+    # Movimientos: 90 % productos reportables
+    n_reportables = len(CODIGOS_REPORTABLES)
+    mov_doc = np.sort(rng.integers(0, n_documentos, movimientos))
+    reportable = rng.random(movimientos) < 0.9
+    mov_producto = np.where(reportable, rng.integers(1, n_reportables + 1, movimientos),
+                            rng.integers(n_reportables + 1, len(lista_productos) + 1, movimientos))
+    mov_unidades = np.maximum(np.round(rng.lognormal(2.5, 1.0, movimientos)), 1.0)
+
+    for desde in range(0, movimientos, TAMANO_LOTE):
+        hasta = min(desde + TAMANO_LOTE, movimientos)
+        documentos = mov_doc[desde:hasta]
+        conn.executemany("INSERT INTO admMovimientos VALUES (?, ?, ?, ?, ?, ?)", zip(
+            range(desde + 1, hasta + 1), (documentos + 1).tolist(), doc_tipo[documentos].tolist(),
+            mov_producto[desde:hasta].tolist(), fechas[doc_dia[documentos]].tolist(),
+            mov_unidades[desde:hasta].tolist()))
+
+    conn.execute("INSERT INTO benchDataset VALUES (?, ?, ?, ?, ?)",
+                 (movimientos, anios, semilla, hoy.isoformat(), time.strftime('%Y-%m-%d %H:%M:%S')))
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return ruta
+
+
+def asegurar_dataset(directorio, escala, semilla=42):
+    """Path of the dataset for `escala` ('100k', '1m', '10m'), generated on first use.
+
+    The file is regenerated when it was built on another day, so the open
+    month always matches today's.
+    """
+    movimientos = ESCALAS[escala]
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f"erp_{escala}_{semilla}.sqlite")
+    if os.path.exists(ruta):
+        try:
+            with sqlite3.connect(ruta) as conn:
+                fila = conn.execute("SELECT Movimientos, Semilla, Hoy FROM benchDataset").fetchone()
+                # Archivos de una versión anterior del generador (sin catálogo de clientes)
+                conn.execute("SELECT 1 FROM admClientes LIMIT 1")
+            if fila == (movimientos, semilla, date.today().isoformat()):
+                return ruta
+        except sqlite3.Error:
+            pass
+    return generar(ruta, movimientos, semilla=semilla)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos del ERP para los benchmarks")
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default='100k')
+    parser.add_argument('--destino', default='bench_data')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+    inicio = time.perf_counter()
+    ruta = asegurar_dataset(args.destino, args.escala, args.semilla)
+    print(f"{ruta}: {ESCALAS[args.escala]:,} movimientos en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
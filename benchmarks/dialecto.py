@@ -0,0 +1,212 @@
+"""
+T-SQL to SQLite shim for running the report SQL locally.
+
+conectar_local() returns a DB-API connection over a SQLite file whose
+cursors translate each statement before executing it, so app.py, the
+rollup and the lookup tables run their SQL Server statements unchanged:
+
+- ``WITH (NOLOCK)`` hints and the ``dbo.`` schema prefix are dropped.
+- ``IF OBJECT_ID(...) IS NULL [BEGIN] CREATE ... [END]`` scripts become
+  ``CREATE ... IF NOT EXISTS`` (index INCLUDE lists are dropped).
+- ``CONVERT(DATE, x)`` becomes ``date(x)``; ``OFFSET ? ROWS FETCH NEXT ?
+  ROWS ONLY`` becomes ``LIMIT ?, ?`` (same parameter order).
+- ``ISNULL(a, b)`` becomes ``IFNULL(a, b)`` (ISNULL is an operator in SQLite).
+- ``YEAR``, ``MONTH``, ``DAY``, ``DATENAME``, ``DATEPART``, ``EOMONTH``,
+  ``DATEADD`` and ``GETDATE`` are registered as SQL functions.
+- ``EXEC sp_getapplock`` is a no-op (SQLite serializes writers itself).
+
+Dates are stored as ISO text ('YYYY-MM-DD HH:MM:SS'), so the half-open
+``CFECHA >= ? AND CFECHA < ?`` ranges compare correctly as strings.
+"""
+
+import calendar
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+
+NOMBRES_MES = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+               'October', 'November', 'December']
+NOMBRES_DIA = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+sqlite3.register_adapter(date, lambda valor: valor.isoformat())
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(' '))
+
+_NOLOCK = re.compile(r'\s+WITH\s*\(\s*NOLOCK\s*\)', re.IGNORECASE)
+_DBO = re.compile(r'\bdbo\.', re.IGNORECASE)
+_IF_OBJECT_ID = re.compile(r"IF\s+OBJECT_ID\([^)]*\)\s+IS\s+NULL\s*", re.IGNORECASE)
+_BEGIN_END = re.compile(r'^\s*(BEGIN|END)\s*;?\s*$', re.IGNORECASE | re.MULTILINE)
+_CREATE_TABLE = re.compile(r'\bCREATE\s+TABLE\s+', re.IGNORECASE)
+_CREATE_INDEX = re.compile(r'\bCREATE\s+(UNIQUE\s+)?(?:NONCLUSTERED\s+|CLUSTERED\s+)?INDEX\s+', re.IGNORECASE)
+_INCLUDE = re.compile(r'\)\s*INCLUDE\s*\([^)]*\)', re.IGNORECASE)
+_DEFAULT_GETDATE = re.compile(r'DEFAULT\s+GETDATE\(\)', re.IGNORECASE)
+_CONVERT_DATE = re.compile(r'\bCONVERT\(\s*DATE\s*,', re.IGNORECASE)
+_OFFSET_FETCH = re.compile(r'OFFSET\s+(\?)\s+ROWS\s+FETCH\s+NEXT\s+(\?)\s+ROWS\s+ONLY', re.IGNORECASE)
+_PARTE_FECHA = re.compile(r'\b(DATENAME|DATEADD|DATEPART)\(\s*(\w+)\s*,', re.IGNORECASE)
+_ISNULL = re.compile(r'\bISNULL\s*\(', re.IGNORECASE)
+_EXEC = re.compile(r'^\s*EXEC\s', re.IGNORECASE)
+
+
+def _fecha(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, (date, datetime)):
+        return valor if isinstance(valor, datetime) else datetime(valor.year, valor.month, valor.day)
+    texto = str(valor)
+    return datetime.fromisoformat(texto if len(texto) > 10 else texto[:10])
+
+
+def _year(valor):
+    return None if valor is None else _fecha(valor).year
+
+
+def _month(valor):
+    return None if valor is None else _fecha(valor).month
+
+
+def _day(valor):
+    return None if valor is None else _fecha(valor).day
+
+
+def _datename(parte, valor):
+    fecha = _fecha(valor)
+    if fecha is None:
+        return None
+    parte = parte.lower()
+    if parte in ('month', 'mm', 'm'):
+        return NOMBRES_MES[fecha.month - 1]
+    if parte in ('weekday', 'dw'):
+        return NOMBRES_DIA[fecha.weekday()]
+    return str(_datepart(parte, valor))
+
+
+def _datepart(parte, valor):
+    fecha = _fecha(valor)
+    if fecha is None:
+        return None
+    parte = parte.lower()
+    return {'year': fecha.year, 'yy': fecha.year, 'yyyy': fecha.year, 'month': fecha.month, 'mm': fecha.month,
+            'm': fecha.month, 'day': fecha.day, 'dd': fecha.day, 'd': fecha.day,
+            'weekday': fecha.isoweekday() % 7 + 1, 'dw': fecha.isoweekday() % 7 + 1}[parte]
+
+
+def _dateadd(parte, cantidad, valor):
+    fecha = _fecha(valor)
+    if fecha is None:
+        return None
+    parte = parte.lower()
+    if parte in ('day', 'dd', 'd'):
+        return (fecha + timedelta(days=cantidad)).isoformat(' ')
+    if parte in ('month', 'mm', 'm', 'year', 'yy', 'yyyy'):
+        meses = cantidad * (12 if parte.startswith('y') else 1)
+        indice = fecha.year * 12 + fecha.month - 1 + meses
+        anio, mes = divmod(indice, 12)
+        dia = min(fecha.day, calendar.monthrange(anio, mes + 1)[1])
+        return fecha.replace(year=anio, month=mes + 1, day=dia).isoformat(' ')
+    raise ValueError(f"DATEADD({parte}) no soportado en el dialecto local")
+
+
+def _eomonth(valor, meses=0):
+    fecha = _fecha(valor)
+    if fecha is None:
+        return None
+    indice = fecha.year * 12 + fecha.month - 1 + int(meses)
+    anio, mes = divmod(indice, 12)
+    return date(anio, mes + 1, calendar.monthrange(anio, mes + 1)[1]).isoformat()
+
+
+def _getdate():
+    return datetime.now().isoformat(' ', timespec='seconds')
+
+
+def traducir(sql):
+    """(sqlite_sql, es_script): T-SQL statement rewritten for SQLite; scripts run with executescript"""
+    sql = _NOLOCK.sub('', sql)
+    sql = _DBO.sub('', sql)
+    es_script = bool(_IF_OBJECT_ID.search(sql))
+    if es_script:
+        sql = _IF_OBJECT_ID.sub('', sql)
+        sql = _BEGIN_END.sub('', sql)
+        sql = _INCLUDE.sub(')', sql)
+        sql = _DEFAULT_GETDATE.sub('DEFAULT CURRENT_TIMESTAMP', sql)
+        sql = _CREATE_TABLE.sub(';\nCREATE TABLE IF NOT EXISTS ', sql)
+        sql = _CREATE_INDEX.sub(lambda m: f";\nCREATE {m.group(1) or ''}INDEX IF NOT EXISTS ", sql)
+        sql = re.sub(r';\s*;', ';', sql).strip().lstrip(';') + ';'
+    sql = _CONVERT_DATE.sub('date(', sql)
+    sql = _ISNULL.sub('IFNULL(', sql)
+    sql = _OFFSET_FETCH.sub(r'LIMIT \1, \2', sql)
+    sql = _PARTE_FECHA.sub(lambda m: f"{m.group(1).upper()}('{m.group(2).lower()}',", sql)
+    return sql, es_script
+
+
+class CursorLocal:
+    """sqlite3 cursor that translates every statement (see traducir)"""
+
+    def __init__(self, conexion):
+        self._conexion = conexion
+        self._cursor = conexion._sqlite.cursor()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=()):
+        if _EXEC.match(sql):
+            return self
+        texto, es_script = traducir(sql)
+        if es_script:
+            self._cursor.executescript(texto)
+        else:
+            self._cursor.execute(texto, tuple(params))
+        return self
+
+    def executemany(self, sql, filas):
+        texto, _ = traducir(sql)
+        self._cursor.executemany(texto, filas)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, tamano=1):
+        return self._cursor.fetchmany(tamano)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def cancel(self):
+        self._conexion._sqlite.interrupt()
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexionLocal:
+    """DB-API connection over SQLite that accepts the app's T-SQL"""
+
+    def __init__(self, ruta):
+        self._sqlite = sqlite3.connect(ruta, check_same_thread=False, timeout=60)
+        for nombre, aridad, funcion in (('YEAR', 1, _year), ('MONTH', 1, _month), ('DAY', 1, _day),
+                                        ('DATENAME', 2, _datename), ('DATEPART', 2, _datepart),
+                                        ('DATEADD', 3, _dateadd), ('EOMONTH', 1, _eomonth),
+                                        ('EOMONTH', 2, _eomonth), ('GETDATE', 0, _getdate)):
+            self._sqlite.create_function(nombre, aridad, funcion, deterministic=nombre != 'GETDATE')
+
+    def cursor(self):
+        return CursorLocal(self)
+
+    def commit(self):
+        self._sqlite.commit()
+
+    def rollback(self):
+        self._sqlite.rollback()
+
+    def close(self):
+        self._sqlite.close()
+
+
+def conectar_local(ruta):
+    return ConexionLocal(ruta)
@@ -0,0 +1,36 @@
+"""
+Benchmarks de cada función de reporte de app.py sobre el dataset sintético.
+
+Se mide la función sin la caché de resultados (``.sin_cache``); los objetivos
+leen los meses cerrados que guardó la primera ronda, como en producción.
+"""
+
+from datetime import date
+
+import pytest
+
+HOY = date.today()
+MES_ANTERIOR = (HOY.year - 1, 12) if HOY.month == 1 else (HOY.year, HOY.month - 1)
+
+REPORTES = {
+    'reporte_anio': lambda app: app.get_reporte_anio.sin_cache('Todos', page=1, per_page=50),
+    'reporte_anio_grafica': lambda app: app.get_reporte_anio_for_graph.sin_cache(HOY.year - 1, HOY.year, 1, 12,
+                                                                                   'Todos'),
+    'ventas_dia': lambda app: app.get_ventas_agente_dia.sin_cache('Todos', None, HOY.year, HOY.month,
+                                                                  page=1, per_page=50),
+    # Modo comparación: detalle completo, del que salen la página y la gráfica
+    'ventas_dia_comparacion': lambda app: app.daily_graph_from_detail(app.get_ventas_agente_dia.sin_cache(
+        'Todos', None, HOY.year, HOY.month, 1, 15, MES_ANTERIOR[0], MES_ANTERIOR[1])),
+    'ventas_dia_grafica': lambda app: app.daily_graph_from_detail(
+        app.get_ventas_agente_dia.sin_cache('Todos', None, HOY.year, HOY.month)),
+    'ventas_mes': lambda app: app.get_ventas_agente_mes.sin_cache('Todos', page=1, per_page=50),
+    'objetivos': lambda app: app.get_objetivos_base.sin_cache(),
+    'coberturas': lambda app: app.read_cobertura_base.sin_cache(HOY.year - 1, 'Todos'),
+}
+
+
+@pytest.mark.parametrize('reporte', sorted(REPORTES))
+def test_reporte(benchmark, app_local, reporte):
+    resultado = benchmark(REPORTES[reporte], app_local)
+    df = resultado[0] if isinstance(resultado, tuple) else resultado
+    assert len(df) > 0
@@ -14,6 +14,8 @@ import os
 import sys
 import logging
 
+from reportes.fechas import rango_anios
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -488,19 +490,24 @@ class CyberiaRealSQLHandler(http.server.SimpleHTTPRequestHandler):
             WHERE 1=1
             """
             
-            # Agregar filtros según parámetros
+            # Agregar filtros según parámetros (valores ligados con ? para reutilizar el plan)
+            sql_params = []
             if 'agente' in params and params['agente'][0]:
-                base_query += f" AND a.CCODIGOAGENTE = '{params['agente'][0]}'"
+                base_query += " AND a.CCODIGOAGENTE = ?"
+                sql_params.append(params['agente'][0])
             
             if 'concepto' in params and params['concepto'][0]:
-                base_query += f" AND c.CCODIGOCONCEPTO = '{params['concepto'][0]}'"
+                base_query += " AND c.CCODIGOCONCEPTO = ?"
+                sql_params.append(params['concepto'][0])
             
             if 'año' in params and params['año'][0]:
-                base_query += f" AND YEAR(m.CFECHA) = {params['año'][0]}"
+                # Rango semiabierto para que el índice de CFECHA se pueda usar
+                base_query += " AND m.CFECHA >= ? AND m.CFECHA < ?"
+                sql_params.extend(rango_anios(int(params['año'][0])))
             
             base_query += " ORDER BY m.CFECHA DESC"
             
-            result = self.execute_query(base_query, use_admoliendas=True)
+            result = self.execute_query(base_query, sql_params, use_admoliendas=True)
             return result if result else []
             
         except Exception as e:
@@ -0,0 +1,62 @@
+"""
+Production serving configuration.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master (preload_app) and forked into the
+workers, which share the report cache through the SQLite file in
+REPORT_SHARED_CACHE. Every worker gets its own connection pool; keep
+workers * DB_POOL_SIZE within what SQL Server allows for this login.
+"""
+
+import multiprocessing
+import os
+
+from reportes.cache_compartida import ruta_predeterminada
+
+# Caché compartida entre workers (antes de importar la app, que la lee al cargar), en un directorio
+# propio del usuario de la app y no en el temporal del sistema, donde otro usuario podría plantar el archivo
+os.environ.setdefault('REPORT_SHARED_CACHE', ruta_predeterminada())
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count() * 2 + 1)))
+# Los reportes esperan sobre todo a SQL Server: varios hilos por worker
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = True
+
+# Exportaciones y reportes anuales pueden tardar; las conexiones lentas no bloquean un hilo para siempre
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclar workers de vez en cuando para acotar la memoria de pandas
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+if os.path.exists('cert.pem') and os.path.exists('key.pem'):
+    certfile = 'cert.pem'
+    keyfile = 'key.pem'
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+def post_worker_init(worker):
+    # Precalentar en segundo plano para no retrasar el arranque; con la caché compartida solo un worker
+    # calcula cada reporte y los demás lo leen de ella
+    import threading
+    from app import precalentador, warm_up
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+    # Mantener calientes las vistas por defecto de cada agente (REPORT_WARM_INTERVAL=0 lo apaga)
+    if precalentador is not None:
+        precalentador.iniciar()
+
+
+def worker_exit(server, worker):
+    from app import db_pool, ejecutor_reportes, precalentador
+    if precalentador is not None:
+        precalentador.detener()
+    ejecutor_reportes.shutdown()
+    db_pool.close()
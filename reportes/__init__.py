@@ -0,0 +1,3 @@
+"""
+Soporte para los reportes de ventas de app.py (Moliendas y Alimentos)
+"""
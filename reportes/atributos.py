@@ -0,0 +1,202 @@
+"""
+Product attributes for the sales reports: kilos per unit, category and company.
+
+Each admProductos row is classified once (same rules as the old LIKE cascades)
+and stored in rptAtributosProducto, so the report queries only have to join by
+CIDPRODUCTO instead of evaluating dozens of string matches per movement.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TABLA_ATRIBUTOS = 'rptAtributosProducto'
+
+# Segundos entre sincronizaciones automáticas con admProductos
+ATRIBUTOS_TTL = 600
+
+# Patrones de kilos por unidad, en el mismo orden que el CASE original
+REGLAS_KILOS = [
+    (('1 KG', '1KG', '1. KG'), 1),
+    (('25 KG', '25KG', 'SACO 25'), 25),
+    (('50 KG', '50KG', 'SACO 50'), 50),
+    (('907 GR', '2 LB'), 0.907),
+    (('500 GR', '0.5 KG'), 0.5),
+    (('5 KG', '5KG'), 5),
+    (('2 KG', '2KG'), 2),
+    (('20 KG', '20KG'), 20),
+    (('26 KG', '26KG'), 26),
+    (('27 KG', '27KG'), 27),
+    (('50 LB',), 22.68),
+    (('900 KG',), 900),
+    (('1000 KG',), 1000),
+]
+
+# Categorías por nombre de producto y después por código
+REGLAS_CATEGORIA_NOMBRE = [
+    ('BOLSA', 'Empaquetado'),
+    ('GLUCOSA', 'Glucosa'),
+    ('ALMIDON', 'Almidon'),
+    ('PILONCILLO', 'Piloncillo'),
+    ('PULVER', 'Pulverizada'),
+    ('CASTER', 'Confeccion'),
+    ('MIX', 'Confeccion'),
+    ('EXTRA', 'Confeccion'),
+    ('ENDULZANTE', 'Sucralosa'),
+    ('SERVICIO', 'Servicio de Maniobras'),
+]
+REGLAS_CATEGORIA_CODIGO = [
+    ('CO', 'Confeccion'),
+    ('PREGR', 'Refinada Granulada'),
+    ('PESGR', 'Estandar Granulada'),
+]
+
+CATEGORIA_DEFAULT = 'otro'
+EMPRESA_DEFAULT = 'Switen'
+
+DDL_ATRIBUTOS = f"""
+IF OBJECT_ID('dbo.{TABLA_ATRIBUTOS}', 'U') IS NULL
+CREATE TABLE dbo.{TABLA_ATRIBUTOS} (
+    CIDPRODUCTO INT NOT NULL PRIMARY KEY,
+    KilosPorUnidad DECIMAL(18, 4) NOT NULL,
+    Categoria VARCHAR(60) NOT NULL,
+    Empresa VARCHAR(20) NOT NULL,
+    EsManual BIT NOT NULL DEFAULT 0,
+    FechaActualizacion DATETIME NOT NULL DEFAULT GETDATE()
+)
+"""
+
+_cache = {}
+_ultima_sincronizacion = 0.0
+_lock = threading.Lock()
+
+
+def clasificar_producto(nombre, codigo=''):
+    """Return (kilos_por_unidad, categoria, empresa) for a product name/code"""
+    nombre = (nombre or '').upper()
+    codigo = (codigo or '').upper()
+
+    kilos = 0
+    for patrones, factor in REGLAS_KILOS:
+        if any(patron in nombre for patron in patrones):
+            kilos = factor
+            break
+
+    categoria = CATEGORIA_DEFAULT
+    for patron, valor in REGLAS_CATEGORIA_NOMBRE:
+        if patron in nombre:
+            categoria = valor
+            break
+    else:
+        for patron, valor in REGLAS_CATEGORIA_CODIGO:
+            if patron in codigo:
+                categoria = valor
+                break
+
+    return kilos, categoria, EMPRESA_DEFAULT
+
+
+def get_atributos_producto():
+    """Get the in-process cache {CIDPRODUCTO: (kilos, categoria, empresa)}"""
+    return dict(_cache)
+
+
+def sync_atributos_producto(conn):
+    """Classify admProductos and upsert the results into the lookup table.
+
+    Rows marked as manual overrides (EsManual = 1) are never recalculated.
+    Returns the number of inserted or updated rows.
+    """
+    global _cache, _ultima_sincronizacion
+
+    cursor = conn.cursor()
+    cursor.execute(DDL_ATRIBUTOS)
+
+    cursor.execute(f"SELECT CIDPRODUCTO, KilosPorUnidad, Categoria, Empresa, EsManual FROM {TABLA_ATRIBUTOS}")
+    existentes = {
+        row[0]: ((float(row[1]), row[2], row[3]), bool(row[4]))
+        for row in cursor.fetchall()
+    }
+
+    cursor.execute("SELECT CIDPRODUCTO, CCODIGOPRODUCTO, CNOMBREPRODUCTO FROM admProductos")
+    nuevos = []
+    cambiados = []
+    cache = {}
+    for cid, codigo, nombre in cursor.fetchall():
+        actual = existentes.get(cid)
+        if actual and actual[1]:
+            cache[cid] = actual[0]
+            continue
+        atributos = clasificar_producto(nombre, codigo)
+        cache[cid] = atributos
+        if actual is None:
+            nuevos.append((cid,) + atributos)
+        elif actual[0] != atributos:
+            cambiados.append(atributos + (cid,))
+
+    if nuevos:
+        cursor.executemany(
+            f"INSERT INTO {TABLA_ATRIBUTOS} (CIDPRODUCTO, KilosPorUnidad, Categoria, Empresa) VALUES (?, ?, ?, ?)",
+            nuevos
+        )
+    if cambiados:
+        cursor.executemany(
+            f"UPDATE {TABLA_ATRIBUTOS} SET KilosPorUnidad = ?, Categoria = ?, Empresa = ?, "
+            f"FechaActualizacion = GETDATE() WHERE CIDPRODUCTO = ? AND EsManual = 0",
+            cambiados
+        )
+    conn.commit()
+    cursor.close()
+
+    _cache = cache
+    _ultima_sincronizacion = time.monotonic()
+    logger.info(f"Atributos de producto sincronizados: {len(nuevos)} nuevos, {len(cambiados)} actualizados")
+    return len(nuevos) + len(cambiados)
+
+
+def asegurar_atributos_producto(conn):
+    """Make sure the lookup table exists and is fresh before a report query"""
+    if _cache and time.monotonic() - _ultima_sincronizacion < ATRIBUTOS_TTL:
+        return
+    with _lock:
+        if _cache and time.monotonic() - _ultima_sincronizacion < ATRIBUTOS_TTL:
+            return
+        sync_atributos_producto(conn)
+
+
+def set_atributo_override(conn, cid_producto, kilos=None, categoria=None, empresa=None):
+    """Manually fix the attributes of one product; overrides survive every sync"""
+    if cid_producto not in _cache:
+        sync_atributos_producto(conn)
+    if cid_producto not in _cache:
+        raise ValueError(f"Producto {cid_producto} no existe en admProductos")
+
+    actual = _cache[cid_producto]
+    atributos = (
+        actual[0] if kilos is None else float(kilos),
+        actual[1] if categoria is None else categoria,
+        actual[2] if empresa is None else empresa,
+    )
+
+    cursor = conn.cursor()
+    cursor.execute(
+        f"UPDATE {TABLA_ATRIBUTOS} SET KilosPorUnidad = ?, Categoria = ?, Empresa = ?, "
+        f"EsManual = 1, FechaActualizacion = GETDATE() WHERE CIDPRODUCTO = ?",
+        atributos + (cid_producto,)
+    )
+    conn.commit()
+    cursor.close()
+
+    _cache[cid_producto] = atributos
+    return atributos
+
+
+def clear_atributo_override(conn, cid_producto):
+    """Drop a manual override so the product is classified by the rules again"""
+    cursor = conn.cursor()
+    cursor.execute(f"UPDATE {TABLA_ATRIBUTOS} SET EsManual = 0 WHERE CIDPRODUCTO = ?", (cid_producto,))
+    conn.commit()
+    cursor.close()
+    sync_atributos_producto(conn)
@@ -0,0 +1,397 @@
+"""
+In-process result cache for the report functions.
+
+Results are keyed by (report, normalized params) and evicted LRU-first once
+the cached DataFrames exceed a byte budget. Reports over the open month get a
+short TTL; reports whose period is fully closed (past months and years) are
+kept until evicted or explicitly invalidated. Expired entries are not dropped
+straight away: they stay available through get_stale() as a fallback.
+
+Cached frames are shared between requests, so callers must not modify them
+in place.
+
+When a computation runs out of its time budget (PresupuestoExcedido, see
+reportes.consultas.limite_tiempo) the last cached value is served instead,
+even if expired, and recorded in resultados_vencidos() so the page can say
+the figures are not current. For the next `espera_excedido` seconds the key
+is not computed again: the requests that were waiting for it, and any that
+arrive in that window, get the same fallback (or the same error when there
+is no previous value) instead of each spending a full budget on the query.
+
+With several worker processes an optional CacheCompartida (see
+reportes.cache_compartida) sits behind the in-process LRU: misses are looked
+up there before computing, only one worker computes a given key, and an
+invalidation in any worker clears the in-process copies of all of them.
+
+Inside refrescar_antes(segundos) open-period entries that would expire within
+`segundos` count as misses, so the background warmer (reportes.precalentador)
+recomputes a result before it expires rather than after a user has hit the
+miss.
+
+With `etiquetar` set, every entry also records the data version it was
+computed from (read just before computing, so the data is at least that
+recent), and each value served in a request adds its version to
+versiones_servidas(). The response validators (reportes.versiones) are built
+from those versions rather than from the data version at response time, which
+may be newer than a cached result.
+"""
+
+import contextlib
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from reportes.consultas import PresupuestoExcedido
+
+logger = logging.getLogger(__name__)
+
+_vencidos = contextvars.ContextVar('reportes_vencidos', default=None)
+_margen = contextvars.ContextVar('reportes_margen_refresco', default=0.0)
+_servidas = contextvars.ContextVar('reportes_versiones_servidas', default=None)
+
+# Variables que los hilos de EjecutorReportes heredan de la petición
+CONTEXTO_PETICION = (_vencidos, _servidas)
+
+
+def seguir_vencidos():
+    """Start recording the stale results and the data versions served in the current request"""
+    _vencidos.set([])
+    _servidas.set([])
+
+
+def resultados_vencidos():
+    """[{'report': name, 'age': seconds}] served because a computation ran out of time"""
+    return list(_vencidos.get() or [])
+
+
+def registrar_vencido(reporte, edad):
+    """Record a stale result served in the current request (`edad` in seconds)"""
+    vencidos = _vencidos.get()
+    if vencidos is not None:
+        vencidos.append({'report': reporte, 'age': edad})
+
+
+def registrar_version(etiqueta):
+    """Record the data version of a result served in the current request"""
+    servidas = _servidas.get()
+    if servidas is not None:
+        servidas.append(etiqueta)
+
+
+def versiones_servidas():
+    """Data versions of the results served in the current request (None where it was not recorded)"""
+    return list(_servidas.get() or [])
+
+
+@contextlib.contextmanager
+def refrescar_antes(segundos):
+    """Within the block, treat open-period entries expiring in the next `segundos` as expired"""
+    token = _margen.set(segundos)
+    try:
+        yield
+    finally:
+        _margen.reset(token)
+
+
+def _vigente(entrada):
+    return entrada.expira is None or entrada.expira >= time.monotonic() + _margen.get()
+
+
+def tamano_resultado(valor):
+    """Approximate size in bytes of a report result (DataFrame or tuple of them)"""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    if isinstance(valor, (tuple, list)):
+        return sum(tamano_resultado(v) for v in valor) + 64
+    return 64
+
+
+def normalizar_params(params):
+    """Stable, hashable form of the report arguments; None and 'Todos' mean no filter"""
+    normalizados = []
+    for nombre, valor in sorted(params.items()):
+        if valor is None or valor == '' or valor == 'Todos':
+            continue
+        if isinstance(valor, str) and valor.isdigit():
+            valor = int(valor)
+        normalizados.append((nombre, valor))
+    return tuple(normalizados)
+
+
+class _Entrada:
+    __slots__ = ('valor', 'bytes', 'expira', 'creada', 'etiqueta')
+
+    def __init__(self, valor, tamano, expira, etiqueta=None):
+        self.valor = valor
+        self.etiqueta = etiqueta
+        self.bytes = tamano
+        self.expira = expira
+        self.creada = time.time()
+
+
+class CacheReportes:
+    """LRU cache with a byte budget and a TTL that only applies to open periods"""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, ttl_abierto=120, compartida=None, revisar_generacion=2.0,
+                 etiquetar=None, espera_excedido=30):
+        self.max_bytes = max_bytes
+        self.ttl_abierto = ttl_abierto
+        self.compartida = compartida
+        self.revisar_generacion = revisar_generacion
+        # etiquetar(cerrado): versión de los datos con la que se calcula un resultado (ver versiones_servidas)
+        self.etiquetar = etiquetar
+        self.espera_excedido = espera_excedido
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._cargando = {}
+        # clave -> (momento del último intento que agotó el presupuesto, su PresupuestoExcedido)
+        self._excedidos = {}
+        self._generacion = None
+        self._generacion_revisada = 0.0
+        self._version = 0
+        self._arranque = int(time.time())
+
+        self._hits = 0
+        self._misses = 0
+        self._stale_hits = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._budget_fallbacks = 0
+
+    def _quitar(self, clave):
+        entrada = self._entradas.pop(clave)
+        self._bytes -= entrada.bytes
+
+    def _sincronizar(self):
+        """Drop the in-process entries when another worker invalidated the shared tier"""
+        if self.compartida is None or time.monotonic() - self._generacion_revisada < self.revisar_generacion:
+            return
+        try:
+            generacion = self.compartida.generacion()
+        except Exception as e:
+            logger.warning(f"No se pudo leer la generación de la caché compartida: {e}")
+            return
+        with self._lock:
+            self._generacion_revisada = time.monotonic()
+            if self._generacion is not None and generacion != self._generacion:
+                for clave in list(self._entradas):
+                    self._quitar(clave)
+                self._invalidations += 1
+                self._version += 1
+            self._generacion = generacion
+
+    def _fresca(self, clave):
+        self._sincronizar()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or not _vigente(entrada):
+                self._misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self._hits += 1
+            return entrada
+
+    def get(self, clave):
+        """Fresh cached value or None"""
+        entrada = self._fresca(clave)
+        return None if entrada is None else entrada.valor
+
+    def get_stale(self, clave):
+        """Cached value even if expired, with its age in seconds: (valor, edad) or (None, None)"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._stale_hits += 1
+                return entrada.valor, time.time() - entrada.creada
+        if self.compartida is not None:
+            try:
+                valor, edad, _ = self.compartida.get(clave, incluir_vencida=True)
+            except Exception as e:
+                logger.warning(f"Error leyendo la caché compartida: {e}")
+                return None, None
+            if valor is not None:
+                with self._lock:
+                    self._stale_hits += 1
+                return valor, edad
+        return None, None
+
+    def set(self, clave, valor, cerrado=False, etiqueta=None):
+        tamano = tamano_resultado(valor)
+        if tamano > self.max_bytes:
+            logger.info(f"Resultado de {tamano} bytes no cabe en la caché de reportes: {clave[0]}")
+            return
+        expira = None if cerrado else time.monotonic() + self.ttl_abierto
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            self._entradas[clave] = _Entrada(valor, tamano, expira, etiqueta)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                antigua = next(iter(self._entradas))
+                self._quitar(antigua)
+                self._evictions += 1
+
+    def invalidar(self, reporte=None):
+        """Drop every entry (or only those of one report); returns how many were dropped"""
+        with self._lock:
+            claves = [clave for clave in self._entradas if reporte is None or clave[0] == reporte]
+            for clave in claves:
+                self._quitar(clave)
+            self._invalidations += len(claves)
+            self._version += 1
+        if self.compartida is not None:
+            try:
+                self.compartida.invalidar(reporte)
+                with self._lock:
+                    self._generacion = self.compartida.generacion()
+            except Exception as e:
+                logger.warning(f"Error invalidando la caché compartida: {e}")
+        logger.info(f"Caché de reportes invalidada ({reporte or 'todos'}): {len(claves)} entradas")
+        return len(claves)
+
+    def version(self):
+        """Changes on every invalidation; with a shared tier it is the generation all workers see"""
+        self._sincronizar()
+        with self._lock:
+            if self.compartida is not None and self._generacion is not None:
+                return f"g{self._generacion}"
+            return f"l{self._arranque}.{self._version}"
+
+    def obtener(self, clave, calcular, cerrado=False):
+        """Return the cached value for `clave` or compute it once (concurrent callers wait)"""
+        entrada = self._fresca(clave)
+        if entrada is not None:
+            registrar_version(entrada.etiqueta)
+            return entrada.valor
+        with self._lock:
+            candado = self._cargando.setdefault(clave, threading.Lock())
+        with candado:
+            with self._lock:
+                entrada = self._entradas.get(clave)
+                if entrada is not None and _vigente(entrada):
+                    self._entradas.move_to_end(clave)
+                    registrar_version(entrada.etiqueta)
+                    return entrada.valor
+                excedido = self._excedidos.get(clave)
+            if excedido is not None and time.monotonic() - excedido[0] < self.espera_excedido:
+                # Otra petición acaba de agotar el presupuesto con esta clave
+                return self._respaldo(clave, excedido[1])
+            try:
+                valor, etiqueta = self._calcular(clave, calcular, cerrado)
+            except PresupuestoExcedido as e:
+                with self._lock:
+                    self._excedidos[clave] = (time.monotonic(), e)
+                return self._respaldo(clave, e)
+            else:
+                self.set(clave, valor, cerrado, etiqueta)
+                with self._lock:
+                    self._excedidos.pop(clave, None)
+            finally:
+                with self._lock:
+                    self._cargando.pop(clave, None)
+        registrar_version(etiqueta)
+        return valor
+
+    def _respaldo(self, clave, error):
+        """Last known value for a computation that ran out of time; re-raises if there is none"""
+        valor, edad = self.get_stale(clave)
+        if valor is None:
+            raise error
+        with self._lock:
+            self._budget_fallbacks += 1
+        logger.warning(f"{clave[0]} superó su presupuesto de tiempo; se sirve el resultado de hace {edad:.0f} s")
+        registrar_vencido(clave[0], edad)
+        return valor
+
+    def _etiquetar_y_calcular(self, calcular, cerrado):
+        """(valor, etiqueta): the data version is read before computing, so the value is at least that recent"""
+        etiqueta = None
+        if self.etiquetar is not None:
+            try:
+                etiqueta = self.etiquetar(cerrado)
+            except Exception as e:
+                logger.warning(f"No se pudo leer la versión de los datos: {e}")
+        return calcular(), etiqueta
+
+    def _calcular(self, clave, calcular, cerrado):
+        """(valor, etiqueta) from the shared tier, or computed (only one worker at a time per key)"""
+        if self.compartida is None:
+            return self._etiquetar_y_calcular(calcular, cerrado)
+        try:
+            leida = self.compartida.leer(clave)
+            if leida.vigente and (cerrado or leida.edad + _margen.get() <= self.ttl_abierto):
+                return leida.valor, leida.etiqueta
+            propia = self.compartida.tomar_carga(clave)
+            if not propia:
+                leida = self.compartida.esperar(clave)
+                if leida is not None:
+                    return leida.valor, leida.etiqueta
+        except Exception as e:
+            logger.warning(f"Caché compartida no disponible, se calcula localmente: {e}")
+            return self._etiquetar_y_calcular(calcular, cerrado)
+
+        try:
+            valor, etiqueta = self._etiquetar_y_calcular(calcular, cerrado)
+            try:
+                self.compartida.set(clave, valor, None if cerrado else self.ttl_abierto, etiqueta)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar {clave[0]} en la caché compartida: {e}")
+            return valor, etiqueta
+        finally:
+            if propia:
+                try:
+                    self.compartida.soltar_carga(clave)
+                except Exception:
+                    pass
+
+    def report(self, nombre, periodo_cerrado=None, preparar=None):
+        """Decorator caching a report function under `nombre`.
+
+        `periodo_cerrado(params)` receives the bound arguments and says whether the
+        report only covers closed months; those results never expire.
+        `preparar(valor)` runs on every computed value before it is cached
+        (see reportes.tipos.compactador).
+        """
+        def decorador(funcion):
+            firma = inspect.signature(funcion)
+
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                enlazados = firma.bind(*args, **kwargs)
+                enlazados.apply_defaults()
+                params = dict(enlazados.arguments)
+                clave = (nombre, normalizar_params(params))
+                cerrado = bool(periodo_cerrado and periodo_cerrado(params))
+                if preparar is None:
+                    return self.obtener(clave, lambda: funcion(*args, **kwargs), cerrado)
+                return self.obtener(clave, lambda: preparar(funcion(*args, **kwargs)), cerrado)
+
+            envoltura.sin_cache = funcion
+            envoltura.nombre_reporte = nombre
+            return envoltura
+        return decorador
+
+    def stats(self):
+        with self._lock:
+            consultas = self._hits + self._misses
+            return {
+                'entries': len(self._entradas),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_open_period': self.ttl_abierto,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / consultas, 4) if consultas else 0.0,
+                'stale_hits': self._stale_hits,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'budget_fallbacks': self._budget_fallbacks,
+                'shared': self.compartida.stats() if self.compartida is not None else None,
+            }
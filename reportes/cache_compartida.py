@@ -0,0 +1,278 @@
+"""
+Report cache tier shared by every gunicorn worker of the host.
+
+Each worker keeps its own in-process CacheReportes; with several workers they
+would each compute and hold a copy of the same report. CacheCompartida stores
+the results in a SQLite database (WAL mode, memory-mapped reads) that all
+workers open, so a report computed by one worker is served to the others
+from there.
+
+Results are encoded with reportes.serializacion, not pickle, and the file
+must live in a directory only the app user can write: preparar_ruta()
+creates the default one with mode 0700 and refuses a directory or file owned
+by another user or writable by group or others.
+
+Cross-worker coordination:
+
+- A lease row in `cargando` makes only one worker compute a missing key; the
+  others poll for the result until the lease expires.
+- `generacion` is bumped on every invalidation so that the workers can drop
+  their in-process copies (see CacheReportes).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import stat
+import threading
+import time
+from collections import namedtuple
+
+from reportes.serializacion import a_bytes, de_bytes
+
+logger = logging.getLogger(__name__)
+
+ARCHIVO_PREDETERMINADO = 'reportes_cache.sqlite'
+
+Leida = namedtuple('Leida', 'valor edad vigente etiqueta')
+"""A shared entry: value, age in seconds, whether it is fresh and the data version it was computed from"""
+
+_AUSENTE = Leida(None, None, False, None)
+
+DDL_COMPARTIDA = """
+CREATE TABLE IF NOT EXISTS entradas (
+    clave TEXT PRIMARY KEY,
+    reporte TEXT NOT NULL,
+    valor BLOB NOT NULL,
+    bytes INTEGER NOT NULL,
+    expira REAL,
+    creada REAL NOT NULL,
+    usada REAL NOT NULL,
+    etiqueta TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_entradas_usada ON entradas (usada);
+CREATE TABLE IF NOT EXISTS cargando (
+    clave TEXT PRIMARY KEY,
+    hasta REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS estado (
+    nombre TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO estado (nombre, valor) VALUES ('generacion', 0);
+"""
+
+
+def ruta_predeterminada():
+    """Default cache file: XDG_CACHE_HOME (or ~/.cache)/moliendas/reportes_cache.sqlite"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'moliendas', ARCHIVO_PREDETERMINADO)
+
+
+def _verificar(ruta):
+    """PermissionError unless `ruta` belongs to the process user and only it can write it"""
+    info = os.lstat(ruta)
+    if stat.S_ISLNK(info.st_mode):
+        raise PermissionError(f"{ruta} es un enlace simbólico")
+    if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        raise PermissionError(f"{ruta} pertenece a otro usuario (uid {info.st_uid})")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{ruta} tiene permiso de escritura para el grupo u otros usuarios")
+
+
+def preparar_ruta(ruta):
+    """Create the cache directory (mode 0700) if missing and check the directory and database files"""
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(directorio, mode=0o700, exist_ok=True)
+    if not hasattr(os, 'getuid'):
+        return
+    _verificar(directorio)
+    for archivo in (ruta, ruta + '-wal', ruta + '-shm'):
+        if os.path.lexists(archivo):
+            _verificar(archivo)
+
+
+def _etiqueta_texto(etiqueta):
+    return None if etiqueta is None else json.dumps(etiqueta)
+
+
+def _etiqueta_de_texto(texto):
+    def tuplas(valor):
+        return tuple(tuplas(v) for v in valor) if isinstance(valor, list) else valor
+    return None if texto is None else tuplas(json.loads(texto))
+
+
+def clave_texto(clave):
+    """Stable text form of a (report, normalized params) key"""
+    return repr(clave)
+
+
+class CacheCompartida:
+    """Encoded report results in a SQLite file with a byte budget (LRU by last use)"""
+
+    def __init__(self, ruta, max_bytes=1024 * 1024 * 1024, lease=120, espera=0.1, mmap_bytes=256 * 1024 * 1024):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self.lease = lease
+        self.espera = espera
+        self.mmap_bytes = mmap_bytes
+        self._local = threading.local()
+
+        self._hits = 0
+        self._misses = 0
+        self._esperas = 0
+        self._lock = threading.Lock()
+
+        preparar_ruta(ruta)
+        with self._conexion() as conn:
+            conn.executescript(DDL_COMPARTIDA)
+            # Archivos creados antes de guardar la versión de los datos de cada entrada
+            if 'etiqueta' not in {fila[1] for fila in conn.execute("PRAGMA table_info(entradas)")}:
+                conn.execute("ALTER TABLE entradas ADD COLUMN etiqueta TEXT")
+
+    def _conexion(self):
+        # Una conexión por hilo y por proceso (las conexiones no sobreviven a un fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            anterior = os.umask(0o077)
+            try:
+                conn = sqlite3.connect(self.ruta, timeout=30, isolation_level=None, check_same_thread=False)
+            finally:
+                os.umask(anterior)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA mmap_size={int(self.mmap_bytes)}')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _contar(self, atributo):
+        with self._lock:
+            setattr(self, atributo, getattr(self, atributo) + 1)
+
+    def leer(self, clave, incluir_vencida=False):
+        """Leida(valor, edad, vigente, etiqueta); Leida(None, None, False, None) on a miss"""
+        texto = clave_texto(clave)
+        conn = self._conexion()
+        fila = conn.execute("SELECT valor, expira, creada, etiqueta FROM entradas WHERE clave = ?",
+                            (texto,)).fetchone()
+        if fila is None:
+            self._contar('_misses')
+            return _AUSENTE
+        valor, expira, creada, etiqueta = fila
+        vigente = expira is None or expira >= time.time()
+        if not vigente and not incluir_vencida:
+            self._contar('_misses')
+            return _AUSENTE
+        try:
+            valor = de_bytes(valor)
+        except Exception as e:
+            # Entrada de otro formato (p. ej. de una versión anterior): se descarta
+            logger.warning(f"Entrada ilegible en la caché compartida ({clave[0]}): {e}")
+            conn.execute("DELETE FROM entradas WHERE clave = ?", (texto,))
+            self._contar('_misses')
+            return _AUSENTE
+        conn.execute("UPDATE entradas SET usada = ? WHERE clave = ?", (time.time(), texto))
+        self._contar('_hits')
+        return Leida(valor, time.time() - creada, vigente, _etiqueta_de_texto(etiqueta))
+
+    def get(self, clave, incluir_vencida=False):
+        """(valor, edad en segundos, vigente) or (None, None, False)"""
+        return tuple(self.leer(clave, incluir_vencida)[:3])
+
+    def set(self, clave, valor, ttl=None, etiqueta=None):
+        """Store a result; ttl None means it never expires (closed periods); `etiqueta` is its data version"""
+        datos = a_bytes(valor)
+        if len(datos) > self.max_bytes:
+            return
+        ahora = time.time()
+        conn = self._conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entradas (clave, reporte, valor, bytes, expira, creada, usada, etiqueta) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (clave_texto(clave), clave[0], sqlite3.Binary(datos), len(datos),
+                 None if ttl is None else ahora + ttl, ahora, ahora, _etiqueta_texto(etiqueta))
+            )
+            total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM entradas").fetchone()[0]
+            while total > self.max_bytes:
+                fila = conn.execute("SELECT clave, bytes FROM entradas ORDER BY usada LIMIT 1").fetchone()
+                if fila is None:
+                    break
+                conn.execute("DELETE FROM entradas WHERE clave = ?", (fila[0],))
+                total -= fila[1]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def tomar_carga(self, clave):
+        """Try to become the worker that computes `clave`; False if another one holds the lease"""
+        texto = clave_texto(clave)
+        ahora = time.time()
+        conn = self._conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fila = conn.execute("SELECT hasta FROM cargando WHERE clave = ?", (texto,)).fetchone()
+            if fila is not None and fila[0] > ahora:
+                conn.execute("COMMIT")
+                return False
+            conn.execute("INSERT OR REPLACE INTO cargando (clave, hasta) VALUES (?, ?)", (texto, ahora + self.lease))
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def soltar_carga(self, clave):
+        self._conexion().execute("DELETE FROM cargando WHERE clave = ?", (clave_texto(clave),))
+
+    def esperar(self, clave):
+        """Wait while another worker computes `clave`; returns its Leida or None if the lease ran out"""
+        self._contar('_esperas')
+        texto = clave_texto(clave)
+        conn = self._conexion()
+        while True:
+            leida = self.leer(clave)
+            if leida.vigente:
+                return leida
+            fila = conn.execute("SELECT hasta FROM cargando WHERE clave = ?", (texto,)).fetchone()
+            if fila is None or fila[0] <= time.time():
+                return None
+            time.sleep(self.espera)
+
+    def invalidar(self, reporte=None):
+        """Drop every entry (or one report's) and bump the generation; returns how many were dropped"""
+        conn = self._conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if reporte is None:
+                eliminadas = conn.execute("DELETE FROM entradas").rowcount
+            else:
+                eliminadas = conn.execute("DELETE FROM entradas WHERE reporte = ?", (reporte,)).rowcount
+            conn.execute("UPDATE estado SET valor = valor + 1 WHERE nombre = 'generacion'")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return eliminadas
+
+    def generacion(self):
+        return self._conexion().execute("SELECT valor FROM estado WHERE nombre = 'generacion'").fetchone()[0]
+
+    def stats(self):
+        conn = self._conexion()
+        entradas, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM entradas").fetchone()
+        with self._lock:
+            return {
+                'path': self.ruta,
+                'entries': entradas,
+                'bytes': total,
+                'max_bytes': self.max_bytes,
+                'generation': self.generacion(),
+                'hits': self._hits,
+                'misses': self._misses,
+                'waits': self._esperas,
+            }
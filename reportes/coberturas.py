@@ -0,0 +1,77 @@
+"""
+Client coverage report built from a single grouped scan.
+
+The database returns kilos at (client, agent, month) grain for one year;
+both views of the coverage page are derived from that frame in-process:
+
+- detalle_cobertura(): one 'Vendido' row per client/month/agent with sales
+  and one 'Pendiente' row for every month a client bought nothing.
+- matriz_cobertura(): client x agent rows with one column per month and
+  TotalAnual.
+
+Clients are identified by CIDCLIENTEPROVEEDOR; RazonSocial is only shown, so
+two clients with the same name stay apart, as in the grouped scan.
+"""
+
+import numpy as np
+import pandas as pd
+
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+         'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+# Columnas del resultado agrupado
+COLUMNAS_GRANO = ['CIDCLIENTEPROVEEDOR', 'RazonSocial', 'Agente', 'NumMes', 'KilosTotales']
+
+COLUMNAS_DETALLE = ['CIDCLIENTEPROVEEDOR', 'RazonSocial', 'Mes', 'Estado', 'Anio', 'Agente', 'KilosTotales']
+
+
+def detalle_cobertura(grano, anio):
+    """Sold and pending months per client, ordered by client, month and agent"""
+    grano = grano[grano['CIDCLIENTEPROVEEDOR'].notna()]
+    meses = np.asarray(grano['NumMes'], dtype=np.int64)
+
+    vendido = pd.DataFrame({
+        'CIDCLIENTEPROVEEDOR': np.asarray(grano['CIDCLIENTEPROVEEDOR'], dtype=np.int64),
+        'RazonSocial': np.asarray(grano['RazonSocial'], dtype=object),
+        'NumMes': meses,
+        'Estado': 'Vendido',
+        'Agente': grano['Agente'].to_numpy(),
+        'KilosTotales': grano['KilosTotales'].to_numpy(dtype=float),
+    })
+
+    # Meses sin venta: producto cliente x 12 meses menos los meses vendidos
+    clientes, primera, codigos = np.unique(vendido['CIDCLIENTEPROVEEDOR'].to_numpy(), return_index=True,
+                                           return_inverse=True)
+    nombres = vendido['RazonSocial'].to_numpy()[primera]
+    con_venta = np.zeros((len(clientes), 12), dtype=bool)
+    con_venta[codigos, meses - 1] = True
+    fila, columna = np.nonzero(~con_venta)
+    pendiente = pd.DataFrame({
+        'CIDCLIENTEPROVEEDOR': clientes[fila],
+        'RazonSocial': nombres[fila],
+        'NumMes': columna + 1,
+        'Estado': 'Pendiente',
+        'Agente': None,
+        'KilosTotales': 0.0,
+    })
+
+    detalle = pd.concat([vendido, pendiente], ignore_index=True)
+    detalle = detalle.sort_values(['RazonSocial', 'CIDCLIENTEPROVEEDOR', 'NumMes', 'Agente'], na_position='first',
+                                  kind='stable')
+    detalle['Mes'] = np.asarray(MESES, dtype=object)[detalle['NumMes'].to_numpy() - 1]
+    detalle['Anio'] = int(anio)
+    return detalle[COLUMNAS_DETALLE].reset_index(drop=True)
+
+
+def matriz_cobertura(grano):
+    """Client x agent kilos with one column per month plus TotalAnual"""
+    if grano.empty:
+        return pd.DataFrame(columns=['CIDCLIENTEPROVEEDOR', 'RazonSocial', 'Agente'] + MESES + ['TotalAnual'])
+    # El cliente es su id; la razón social va en el índice para mostrarse como columna
+    matriz = pd.pivot_table(grano, index=['CIDCLIENTEPROVEEDOR', 'RazonSocial', 'Agente'], columns='NumMes',
+                            values='KilosTotales', aggfunc='sum', fill_value=0.0, observed=True)
+    matriz = matriz.reindex(columns=range(1, 13), fill_value=0.0).astype(float)
+    matriz.columns = MESES
+    matriz['TotalAnual'] = matriz.to_numpy().sum(axis=1)
+    matriz = matriz.reset_index().sort_values(['RazonSocial', 'CIDCLIENTEPROVEEDOR'], kind='stable')
+    return matriz.reset_index(drop=True)
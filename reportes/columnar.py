@@ -0,0 +1,102 @@
+"""
+Columnar JSON payloads for the /api report endpoints.
+
+A report is sent whole, as column names plus one array per column, instead of
+a list of row dicts that repeats every key on every row. Object columns whose
+values repeat (agent, client, product, category, dates) are dictionary-encoded:
+the distinct values go once in `dictionaries` and the column carries integer
+codes. The report templates decode it (_tabla_columnar.html) and then page,
+sort and search it in the browser without going back to the server.
+
+    {"report": "ventas_mes", "columns": ["Agente", "Toneladas"], "rows": 3,
+     "data": [[0, 1, 0], [1.5, 2.0, 0.25]],
+     "dictionaries": {"Agente": ["MOLIENDAS", "MOSTRADOR 1"]}}
+"""
+
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+JSON_MIMETYPE = 'application/json'
+
+# Una columna se codifica con diccionario si cada valor aparece, en promedio, al menos estas veces
+REPETICION_MINIMA = 2
+
+
+def _discreta(serie):
+    return serie.dtype == object or isinstance(serie.dtype, (pd.CategoricalDtype, pd.StringDtype))
+
+
+def _valores(serie):
+    """Column values as JSON-ready Python scalars (None for missing values)"""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        fechas = serie.dt
+        formato = '%Y-%m-%d' if (fechas.normalize() == serie).all() else '%Y-%m-%dT%H:%M:%S'
+        return [None if pd.isna(v) else v for v in fechas.strftime(formato).tolist()]
+    if pd.api.types.is_bool_dtype(serie) or pd.api.types.is_integer_dtype(serie):
+        return serie.astype(object).where(serie.notna(), None).tolist()
+    if pd.api.types.is_float_dtype(serie):
+        return [None if math.isnan(v) else v for v in serie.astype(float).tolist()]
+    return [None if v is None or (isinstance(v, float) and math.isnan(v)) else v
+            for v in serie.astype(object).tolist()]
+
+
+def codificar_columna(serie):
+    """(codes, distinct values) for an object column with repeated values, else (values, None)"""
+    if _discreta(serie) and len(serie):
+        codigos, distintos = pd.factorize(serie, use_na_sentinel=True)
+        if len(distintos) * REPETICION_MINIMA <= len(serie):
+            valores = [None if c < 0 else c for c in codigos.tolist()]
+            return valores, _valores(pd.Series(distintos, dtype=object))
+    return _valores(serie), None
+
+
+def a_columnar(df, **meta):
+    """Columnar payload (dict) of a DataFrame; `meta` keys are added at the top level"""
+    datos, diccionarios = [], {}
+    for columna in df.columns:
+        valores, diccionario = codificar_columna(df[columna])
+        datos.append(valores)
+        if diccionario is not None:
+            diccionarios[str(columna)] = diccionario
+    return {**meta, 'columns': [str(c) for c in df.columns], 'rows': len(df), 'data': datos,
+            'dictionaries': diccionarios}
+
+
+def _json_default(valor):
+    if isinstance(valor, (datetime, pd.Timestamp)):
+        return valor.isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, np.integer):
+        return int(valor)
+    if isinstance(valor, np.floating):
+        return None if np.isnan(valor) else float(valor)
+    if isinstance(valor, bytes):
+        return valor.decode('utf-8', errors='replace')
+    raise TypeError(f"{type(valor).__name__} no es serializable a JSON")
+
+
+def json_columnar(df, **meta):
+    """Compact UTF-8 JSON bytes of a_columnar(df, **meta)"""
+    return json.dumps(a_columnar(df, **meta), separators=(',', ':'), ensure_ascii=False,
+                      default=_json_default).encode('utf-8')
+
+
+def de_columnar(payload):
+    """DataFrame back from a columnar payload (dict or JSON bytes/str)"""
+    if isinstance(payload, (bytes, str)):
+        payload = json.loads(payload)
+    columnas = {}
+    for columna, valores in zip(payload['columns'], payload['data']):
+        diccionario = payload.get('dictionaries', {}).get(columna)
+        if diccionario is not None:
+            valores = [None if c is None else diccionario[c] for c in valores]
+        columnas[columna] = valores
+    return pd.DataFrame(columnas, columns=payload['columns'])
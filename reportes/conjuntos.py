@@ -0,0 +1,174 @@
+"""
+Named product sets for the sales reports.
+
+The reports used to paste the same list of ~140 product codes into every
+query as a string IN. The sets now live in rptConjuntosProducto keyed by
+CIDPRODUCTO, so a query only joins on the integer id and filters by set name:
+
+    JOIN rptConjuntosProducto cp ON cp.CIDPRODUCTO = m.CIDPRODUCTO
+    WHERE cp.Conjunto = :conjunto
+
+Every set has a version in rptConjuntos that is bumped on each change; the
+in-process cache (and anything keyed on it) is refreshed when it moves.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TABLA_CONJUNTOS = 'rptConjuntos'
+TABLA_MIEMBROS = 'rptConjuntosProducto'
+
+# Conjunto por defecto: productos que entran en los reportes de ventas
+CONJUNTO_REPORTABLES = 'reportables'
+
+# Segundos entre revisiones de la versión de los conjuntos
+CONJUNTOS_TTL = 300
+
+CODIGOS_REPORTABLES = (
+    'MESCO25', 'MESCO30', 'MESPU07', 'MREGR26', 'MREGR30', 'MREP613', 'MREP614', 'MREP620',
+    'PAL0007', 'PAL0008', 'PAL0009', 'PBSMZ04', 'PBSMZ05', 'PBSMZ06', 'PBSMZ08', 'PBSMZ09',
+    'PBSMZ11', 'PBSMZ14', 'PCAGF02', 'PCAGF03', 'PCAGF04', 'PCFAI03', 'PCFAM03', 'PCFAZ03',
+    'PCFMO03', 'PCFMO05', 'PCFNA03', 'PCFNE03', 'PCFRS03', 'PCFVA03', 'PCFVE03', 'PCFVI03',
+    'PCFVL03', 'PCGAI03', 'PCGAM03', 'PCGAZ03', 'PCGMO03', 'PCGNA03', 'PCGNE03', 'PCGRF03',
+    'PCGRO03', 'PCGRS03', 'PCGVA03', 'PCGVE03', 'PCGVI03', 'PCGVL01', 'PCGVL03', 'PESCO25',
+    'PESEM17', 'PESGR07', 'PESGR10', 'PESGR21', 'PESGR22', 'PESP607', 'PESP610', 'PG3EN01',
+    'PG3EN08', 'PM5EN04', 'PREBS07', 'PRECE01', 'PRECE02', 'PRECS01', 'PREEF26', 'PREEM17',
+    'PREFS11', 'PREFS12', 'PREGG12', 'PREGR07', 'PREGR10', 'PREGR23', 'PREGR24', 'PREGR25',
+    'PRELG02', 'PREMC11', 'PREO407', 'PREP107', 'PREP108', 'PREP112', 'PREP113', 'PREP607',
+    'PBAR002', 'PCMNE01', 'PREP111', 'PCFVV03', 'MAREGR11', 'RMREP614', 'PESEM11', 'MREP621',
+    'MREP622', 'RREGR10', 'RPREP607', 'CSER026', 'PREGR27', 'PREGR29', 'PBSMZ22', 'RMREP620',
+    'CSER208', 'PESEM12', 'AREGR10', 'AE1GR01', 'AR1GR10', 'ABEGR01', 'PBAR003', 'MAM5ESCNI',
+    'PESGG12', 'RPREBS07', 'RPBSMZ08', 'PRECCN2', 'MGSMDLZ', 'ZTAR003', 'ZTAR004', 'ZTAR005',
+    'CSER209', 'MGL01', 'PREEF27', 'FEUR10', 'JS109', 'EX45', 'SEÑ1600', 'PCGEAZ1',
+    'MREGR23', 'ZEMP006', 'MAREGR15', 'PESCO40', 'PPIL001', 'ZBES010', 'ZBES005', 'ZBESM907',
+    'ZBRE010', 'ZBRE005', 'PPIL002', 'PPIL003', 'ZSAC004', 'MAM5CESGR2', 'RSERMAQ04', 'RSERMAQ05',
+    'RSERMAQ06', 'PILCJA01', 'PILCJA02', 'FLSER001', 'LBACE01', 'ZEDU007',
+)
+
+DDL_CONJUNTOS = f"""
+IF OBJECT_ID('dbo.{TABLA_CONJUNTOS}', 'U') IS NULL
+CREATE TABLE dbo.{TABLA_CONJUNTOS} (
+    Nombre VARCHAR(50) NOT NULL PRIMARY KEY,
+    Descripcion VARCHAR(255) NULL,
+    Version INT NOT NULL DEFAULT 1,
+    FechaActualizacion DATETIME NOT NULL DEFAULT GETDATE()
+)
+IF OBJECT_ID('dbo.{TABLA_MIEMBROS}', 'U') IS NULL
+CREATE TABLE dbo.{TABLA_MIEMBROS} (
+    Conjunto VARCHAR(50) NOT NULL,
+    CIDPRODUCTO INT NOT NULL,
+    CONSTRAINT PK_{TABLA_MIEMBROS} PRIMARY KEY (Conjunto, CIDPRODUCTO)
+)
+"""
+
+_cache = {}  # nombre -> {'version': int, 'productos': frozenset de CIDPRODUCTO}
+_ultima_carga = 0.0
+_lock = threading.Lock()
+
+
+def _ids_por_codigo(cursor, codigos):
+    codigos = list(dict.fromkeys(codigos))
+    if not codigos:
+        return {}
+    marcadores = ', '.join('?' * len(codigos))
+    cursor.execute(
+        f"SELECT CCODIGOPRODUCTO, CIDPRODUCTO FROM admProductos WHERE CCODIGOPRODUCTO IN ({marcadores})",
+        codigos
+    )
+    return {codigo: cid for codigo, cid in cursor.fetchall()}
+
+
+def _guardar(cursor, nombre, codigos, descripcion=None):
+    """Replace the members of a set and bump its version; returns the codes not found"""
+    ids = _ids_por_codigo(cursor, codigos)
+    cursor.execute(
+        f"UPDATE {TABLA_CONJUNTOS} SET Version = Version + 1, FechaActualizacion = GETDATE(), "
+        f"Descripcion = COALESCE(?, Descripcion) WHERE Nombre = ?",
+        (descripcion, nombre)
+    )
+    if cursor.rowcount == 0:
+        cursor.execute(f"INSERT INTO {TABLA_CONJUNTOS} (Nombre, Descripcion) VALUES (?, ?)", (nombre, descripcion))
+    cursor.execute(f"DELETE FROM {TABLA_MIEMBROS} WHERE Conjunto = ?", (nombre,))
+    if ids:
+        cursor.executemany(
+            f"INSERT INTO {TABLA_MIEMBROS} (Conjunto, CIDPRODUCTO) VALUES (?, ?)",
+            [(nombre, cid) for cid in sorted(set(ids.values()))]
+        )
+    return [codigo for codigo in codigos if codigo not in ids]
+
+
+def cargar_conjuntos(conn):
+    """Create/seed the tables if needed and reload every set whose version changed"""
+    global _cache, _ultima_carga
+
+    cursor = conn.cursor()
+    cursor.execute(DDL_CONJUNTOS)
+    conn.commit()
+
+    cursor.execute(f"SELECT COUNT(*) FROM {TABLA_CONJUNTOS} WHERE Nombre = ?", (CONJUNTO_REPORTABLES,))
+    if cursor.fetchone()[0] == 0:
+        # Serializar la carga inicial entre procesos
+        cursor.execute("EXEC sp_getapplock @Resource = ?, @LockMode = 'Exclusive', @LockOwner = 'Transaction'",
+                       (TABLA_CONJUNTOS,))
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLA_CONJUNTOS} WHERE Nombre = ?", (CONJUNTO_REPORTABLES,))
+        if cursor.fetchone()[0] == 0:
+            faltantes = _guardar(cursor, CONJUNTO_REPORTABLES, CODIGOS_REPORTABLES,
+                                 'Productos que entran en los reportes de ventas')
+            if faltantes:
+                logger.warning(f"Códigos del conjunto {CONJUNTO_REPORTABLES} sin producto: {faltantes}")
+        conn.commit()
+
+    cursor.execute(f"SELECT Nombre, Version FROM {TABLA_CONJUNTOS}")
+    versiones = dict(cursor.fetchall())
+    cache = {}
+    for nombre, version in versiones.items():
+        actual = _cache.get(nombre)
+        if actual and actual['version'] == version:
+            cache[nombre] = actual
+            continue
+        cursor.execute(f"SELECT CIDPRODUCTO FROM {TABLA_MIEMBROS} WHERE Conjunto = ?", (nombre,))
+        cache[nombre] = {'version': version, 'productos': frozenset(row[0] for row in cursor.fetchall())}
+        logger.info(f"Conjunto de productos {nombre} v{version}: {len(cache[nombre]['productos'])} productos")
+    cursor.close()
+
+    _cache = cache
+    _ultima_carga = time.monotonic()
+    return version_conjuntos()
+
+
+def asegurar_conjuntos(conn):
+    """Make sure the product sets exist and the cache is fresh before a report query"""
+    if _cache and time.monotonic() - _ultima_carga < CONJUNTOS_TTL:
+        return
+    with _lock:
+        if _cache and time.monotonic() - _ultima_carga < CONJUNTOS_TTL:
+            return
+        cargar_conjuntos(conn)
+
+
+def get_conjunto(nombre=CONJUNTO_REPORTABLES):
+    """CIDPRODUCTO members of a cached set (empty if unknown)"""
+    entrada = _cache.get(nombre)
+    return entrada['productos'] if entrada else frozenset()
+
+
+def version_conjuntos():
+    """{nombre: version} of the cached sets"""
+    return {nombre: entrada['version'] for nombre, entrada in _cache.items()}
+
+
+def set_conjunto(conn, nombre, codigos, descripcion=None):
+    """Define (or redefine) a set from product codes; returns (version, codes not found)"""
+    if not nombre or len(nombre) > 50:
+        raise ValueError("El nombre del conjunto debe tener entre 1 y 50 caracteres")
+    cursor = conn.cursor()
+    cursor.execute(DDL_CONJUNTOS)
+    faltantes = _guardar(cursor, nombre, list(codigos), descripcion)
+    conn.commit()
+    cursor.close()
+    with _lock:
+        cargar_conjuntos(conn)
+    return _cache[nombre]['version'], faltantes
@@ -0,0 +1,294 @@
+"""
+Parameterized execution of the report queries.
+
+Report SQL is written with named markers (``:agente``, ``:anio``...) instead
+of inlining the filter values. compilar() turns them into pyodbc ``?``
+placeholders plus the bound values in order, so every request with the same
+shape sends the same statement text and SQL Server reuses one cached plan
+instead of compiling an ad-hoc plan per agent/month/day combination.
+
+run_query() is the single execution point for the reports; it keeps per
+statement counters so plan reuse can be checked from the app (/query_stats)
+and, with VIEW SERVER STATE, against the server plan cache.
+
+limite_tiempo() gives a report a time budget: the statements it runs get the
+remaining time as the connection query timeout, and a watchdog cancels the
+statement on the server if execution plus fetch go past the deadline. Either
+way the report raises PresupuestoExcedido.
+"""
+
+import contextlib
+import contextvars
+import functools
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from reportes import metricas
+
+logger = logging.getLogger(__name__)
+
+# Literales y comentarios se copian tal cual; solo se sustituyen marcadores fuera de ellos
+_TOKENS = re.compile(r"'(?:[^']|'')*'|--[^\n]*|(?<![:\w]):([A-Za-z_]\w*)")
+
+PLAN_CACHE_QUERY = """
+SELECT
+    cp.objtype AS Tipo,
+    COUNT(*) AS Planes,
+    SUM(CAST(cp.usecounts AS BIGINT)) AS Usos,
+    SUM(CASE WHEN cp.usecounts = 1 THEN 1 ELSE 0 END) AS PlanesDeUnUso
+FROM sys.dm_exec_cached_plans cp
+CROSS APPLY sys.dm_exec_sql_text(cp.plan_handle) st
+WHERE st.dbid = DB_ID()
+    AND (st.text LIKE '%admMovimientos%' OR st.text LIKE '%rptVentasDiarias%')
+GROUP BY cp.objtype
+"""
+
+
+class ConsultaReporte(namedtuple('ConsultaReporte', 'sql order_by params ctes', defaults=('',))):
+    """A report query without ORDER BY, its sort key, its :name params and optional CTEs"""
+    __slots__ = ()
+
+    def ordenada(self):
+        """Full statement sorted by the report key"""
+        return f"{self.ctes}\n{self.sql}\nORDER BY {self.order_by};"
+
+
+def compilar(sql, params=None):
+    """Replace :name markers with ? and return (sql, values) in placeholder order.
+
+    A marker may appear several times. List/tuple values expand to one
+    placeholder per element (for IN lists).
+    """
+    params = params or {}
+    valores = []
+
+    def sustituir(match):
+        nombre = match.group(1)
+        if nombre is None:
+            return match.group(0)
+        if nombre not in params:
+            raise KeyError(f"Falta el parámetro :{nombre}")
+        valor = params[nombre]
+        if isinstance(valor, (list, tuple, set, frozenset)):
+            valor = list(valor)
+            if not valor:
+                raise ValueError(f"El parámetro :{nombre} no puede ser una lista vacía")
+            valores.extend(valor)
+            return ', '.join('?' * len(valor))
+        valores.append(valor)
+        return '?'
+
+    return _TOKENS.sub(sustituir, sql), valores
+
+
+def huella(sql):
+    """Short fingerprint of a compiled statement (same text, same cached plan)"""
+    return hashlib.sha1(' '.join(sql.split()).encode('utf-8')).hexdigest()[:12]
+
+
+class EstadisticasConsultas:
+    """Thread-safe execution counters per statement fingerprint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_huella = {}
+        self._ejecuciones = 0
+
+    def registrar(self, sql, segundos):
+        clave = huella(sql)
+        with self._lock:
+            self._ejecuciones += 1
+            entrada = self._por_huella.get(clave)
+            if entrada is None:
+                entrada = self._por_huella[clave] = {
+                    'executions': 0,
+                    'time_total': 0.0,
+                    'sample': ' '.join(sql.split())[:200],
+                }
+            entrada['executions'] += 1
+            entrada['time_total'] += segundos
+        return clave
+
+    def stats(self):
+        """Executions, distinct statements and the app-side plan reuse rate"""
+        with self._lock:
+            distintas = len(self._por_huella)
+            ejecuciones = self._ejecuciones
+            return {
+                'executions': ejecuciones,
+                'distinct_statements': distintas,
+                'reuse_rate': round(1 - distintas / ejecuciones, 4) if ejecuciones else 0.0,
+                'statements': {
+                    clave: {**entrada, 'time_total': round(entrada['time_total'], 4)}
+                    for clave, entrada in self._por_huella.items()
+                },
+            }
+
+    def reset(self):
+        with self._lock:
+            self._por_huella.clear()
+            self._ejecuciones = 0
+
+
+estadisticas = EstadisticasConsultas()
+
+
+class PresupuestoExcedido(Exception):
+    """A report query ran past its time budget and was cancelled"""
+
+
+_plazo = contextvars.ContextVar('plazo_consultas', default=None)
+
+
+@contextlib.contextmanager
+def presupuesto(segundos):
+    """Statements run inside the block must finish within `segundos` from now (None or 0: no limit)"""
+    if not segundos:
+        yield
+        return
+    plazo = time.monotonic() + segundos
+    actual = _plazo.get()
+    token = _plazo.set(plazo if actual is None else min(actual, plazo))
+    try:
+        yield
+    finally:
+        _plazo.reset(token)
+
+
+def limite_tiempo(segundos):
+    """Decorator running a report function under presupuesto(segundos)"""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with presupuesto(segundos):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def _fijar_timeout(conn, segundos):
+    """Set the driver query timeout (pyodbc Connection.timeout, 0 = none) on the pooled connection"""
+    raw = getattr(conn, 'raw', conn)
+    if hasattr(raw, 'timeout'):
+        raw.timeout = segundos
+
+
+class _Vigilante:
+    """Cancels a running statement when the deadline passes (cursor.cancel is thread-safe in pyodbc)"""
+
+    def __init__(self, cursor, plazo):
+        self.cancelada = False
+        self._cursor = cursor
+        self._timer = threading.Timer(max(plazo - time.monotonic(), 0.0), self._cancelar)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancelar(self):
+        self.cancelada = True
+        try:
+            self._cursor.cancel()
+        except Exception as e:
+            logger.warning(f"No se pudo cancelar la consulta: {e}")
+
+    def detener(self):
+        self._timer.cancel()
+
+
+def _excedido(plazo, vigilante, error):
+    if plazo is None or not (time.monotonic() >= plazo or (vigilante and vigilante.cancelada)):
+        return error
+    return PresupuestoExcedido(f"La consulta superó su presupuesto de tiempo ({error})")
+
+
+def open_cursor(conn, sql, params=None):
+    """Execute a query with bound parameters and return the open cursor (caller closes it)"""
+    cursor, _, vigilante = _ejecutar(conn, sql, params)
+    if vigilante is not None:
+        vigilante.detener()
+    return cursor
+
+
+def _ejecutar(conn, sql, params):
+    """(cursor, metrics entry of the statement, running _Vigilante or None)"""
+    texto, valores = compilar(sql, params)
+    plazo = _plazo.get()
+    if plazo is not None:
+        restante = plazo - time.monotonic()
+        if restante <= 0:
+            raise PresupuestoExcedido("Presupuesto de tiempo agotado antes de ejecutar la consulta")
+        _fijar_timeout(conn, math.ceil(restante))
+    inicio = time.perf_counter()
+    cursor = conn.cursor()
+    vigilante = _Vigilante(cursor, plazo) if plazo is not None else None
+    try:
+        if valores:
+            cursor.execute(texto, valores)
+        else:
+            cursor.execute(texto)
+    except Exception as e:
+        if vigilante is not None:
+            vigilante.detener()
+        cursor.close()
+        error = _excedido(plazo, vigilante, e)
+        if error is e:
+            raise
+        raise error from e
+    finally:
+        if plazo is not None:
+            _fijar_timeout(conn, 0)
+    segundos = time.perf_counter() - inicio
+    entrada = metricas.registrar_ejecucion(estadisticas.registrar(texto, segundos), segundos)
+    return cursor, entrada, vigilante
+
+
+def iter_lotes(cursor, tamano=2000):
+    """Yield lists of rows with fetchmany so the full result never sits in memory"""
+    while True:
+        filas = cursor.fetchmany(tamano)
+        if not filas:
+            break
+        yield filas
+
+
+def columnas_cursor(cursor):
+    return [columna[0] for columna in cursor.description]
+
+
+def run_query(conn, sql, params=None):
+    """Execute a report query with bound parameters and return a DataFrame"""
+    plazo = _plazo.get()
+    cursor, entrada, vigilante = _ejecutar(conn, sql, params)
+    inicio = time.perf_counter()
+    try:
+        columnas = columnas_cursor(cursor)
+        filas = [tuple(fila) for fila in cursor.fetchall()]
+    except Exception as e:
+        error = _excedido(plazo, vigilante, e)
+        if error is e:
+            raise
+        raise error from e
+    finally:
+        if vigilante is not None:
+            vigilante.detener()
+        cursor.close()
+    df = pd.DataFrame.from_records(filas, columns=columnas, coerce_float=True)
+    metricas.registrar_lectura(time.perf_counter() - inicio, len(df), int(df.memory_usage(deep=True).sum()), entrada)
+    return df
+
+
+def plan_cache_stats(conn):
+    """Plan cache usage for the report tables (needs VIEW SERVER STATE)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(PLAN_CACHE_QUERY)
+        columnas = [columna[0] for columna in cursor.description]
+        return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+    finally:
+        cursor.close()
@@ -0,0 +1,135 @@
+"""
+Streaming exports of the report queries.
+
+Rows are read from the cursor in fetchmany batches and written straight to
+the output, so peak memory depends on the batch size and not on how many rows
+the export has. XLSX is written with an openpyxl write-only workbook spooled
+to a temporary file, which is then streamed back in chunks and deleted.
+
+CSV and HTML are plain row formats, so they are produced as generators
+(header, one chunk per batch, footer) and the first bytes go out as soon as
+the first batch has been fetched. comprimir_gzip() compresses such a stream
+on the fly.
+"""
+
+import csv
+import html
+import io
+import logging
+import os
+import tempfile
+import zlib
+from datetime import datetime
+
+from openpyxl import Workbook
+
+from reportes.consultas import columnas_cursor, iter_lotes
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 2000
+TAMANO_BLOQUE = 64 * 1024
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_MIMETYPE = 'text/csv'
+HTML_MIMETYPE = 'text/html'
+
+ESTILO_HTML = """
+        body { font-family: Arial, sans-serif; margin: 20px; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+        th { background-color: #e65100; color: white; }
+        tr:nth-child(even) { background-color: #f2f2f2; }
+        .header { margin-bottom: 20px; }
+"""
+
+
+def escribir_xlsx(cursor, hoja, tamano_lote=TAMANO_LOTE):
+    """Write the rows of an executed cursor to a temporary .xlsx; returns (path, rows)"""
+    libro = Workbook(write_only=True)
+    ws = libro.create_sheet(title=hoja[:31])
+    ws.append(columnas_cursor(cursor))
+    filas = 0
+    for lote in iter_lotes(cursor, tamano_lote):
+        for fila in lote:
+            ws.append(list(fila))
+        filas += len(lote)
+
+    descriptor, ruta = tempfile.mkstemp(suffix='.xlsx', prefix='export_')
+    os.close(descriptor)
+    try:
+        libro.save(ruta)
+    except Exception:
+        os.remove(ruta)
+        raise
+    return ruta, filas
+
+
+def leer_y_borrar(ruta, tamano_bloque=TAMANO_BLOQUE):
+    """Yield a file in chunks and delete it once it has been sent (or the client went away)"""
+    try:
+        with open(ruta, 'rb') as archivo:
+            while True:
+                bloque = archivo.read(tamano_bloque)
+                if not bloque:
+                    break
+                yield bloque
+    finally:
+        try:
+            os.remove(ruta)
+        except OSError as e:
+            logger.warning(f"No se pudo borrar el archivo temporal {ruta}: {e}")
+
+
+def generar_csv(cursor, tamano_lote=TAMANO_LOTE):
+    """Yield an executed cursor as UTF-8 CSV (with BOM so Excel detects the encoding)"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(columnas_cursor(cursor))
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    for lote in iter_lotes(cursor, tamano_lote):
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(lote)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _celda(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        valor = valor.date() if valor.time() == datetime.min.time() else valor
+    return html.escape(str(valor))
+
+
+def generar_html(cursor, titulo, detalles=(), table_id='reporte-table', tamano_lote=TAMANO_LOTE):
+    """Yield an executed cursor as a standalone HTML document.
+
+    `detalles` are (label, value) pairs shown above the table. The row count
+    is only known at the end, so it goes after the table.
+    """
+    encabezado = ''.join(f"<p><strong>{html.escape(etiqueta)}:</strong> {html.escape(str(valor))}</p>\n"
+                         for etiqueta, valor in detalles)
+    columnas = ''.join(f"<th>{html.escape(columna)}</th>" for columna in columnas_cursor(cursor))
+    yield (f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"UTF-8\">\n"
+           f"<title>{html.escape(titulo)}</title>\n<style>{ESTILO_HTML}</style>\n</head>\n<body>\n"
+           f"<div class=\"header\">\n<h1>{html.escape(titulo)}</h1>\n{encabezado}</div>\n"
+           f"<table class=\"table table-striped\" id=\"{table_id}\">\n"
+           f"<thead><tr>{columnas}</tr></thead>\n<tbody>\n").encode('utf-8')
+    filas = 0
+    for lote in iter_lotes(cursor, tamano_lote):
+        filas += len(lote)
+        yield ''.join('<tr>' + ''.join(f"<td>{_celda(valor)}</td>" for valor in fila) + '</tr>\n'
+                      for fila in lote).encode('utf-8')
+    yield (f"</tbody>\n</table>\n<p><strong>Total de Registros:</strong> {filas}</p>\n"
+           f"</body>\n</html>\n").encode('utf-8')
+
+
+def comprimir_gzip(bloques, nivel=6):
+    """Compress a stream of byte chunks into a single gzip member as it goes"""
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for bloque in bloques:
+        comprimido = compresor.compress(bloque)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
@@ -0,0 +1,111 @@
+"""
+Sargable date filters for the report queries.
+
+The report filters (single date, month, day range within a month, two-month
+comparison, calendar years) are compiled into half-open [desde, hasta) ranges
+and applied as ``CFECHA >= ? AND CFECHA < ?`` so an index on CFECHA can seek.
+Wrapping the column in YEAR()/MONTH()/DAY() forced a scan of admMovimientos.
+
+With more than one range (comparison mode) every range gets its own seek and
+the results are combined with UNION ALL instead of OR-ing the predicates.
+UNION ALL would return a movement once per range that contains it, so
+rangos_filtro() merges overlapping ranges (comparing a month with itself)
+first.
+"""
+
+import calendar
+from datetime import date, datetime, timedelta
+
+# Columnas de admMovimientos que usan los reportes
+COLUMNAS_MOVIMIENTO = 'CIDMOVIMIENTO, CIDDOCUMENTO, CIDDOCUMENTODE, CIDPRODUCTO, CFECHA, CUNIDADES'
+
+
+def _como_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+def rango_dia(fecha):
+    """[fecha, fecha + 1 day)"""
+    fecha = _como_fecha(fecha)
+    return fecha, fecha + timedelta(days=1)
+
+
+def rango_mes(anio, mes, dia_inicio=None, dia_fin=None):
+    """A whole month or the days dia_inicio..dia_fin of it (clamped to the month length)"""
+    anio, mes = int(anio), int(mes)
+    ultimo = calendar.monthrange(anio, mes)[1]
+    inicio = min(int(dia_inicio or 1), ultimo + 1)
+    fin = min(int(dia_fin or ultimo), ultimo)
+    desde = date(anio, mes, 1) + timedelta(days=inicio - 1)
+    hasta = max(date(anio, mes, 1) + timedelta(days=fin), desde)
+    return desde, hasta
+
+
+def rango_anios(anio_desde, anio_hasta=None):
+    """Calendar years anio_desde..anio_hasta, both included"""
+    anio_hasta = anio_desde if anio_hasta is None else anio_hasta
+    return date(int(anio_desde), 1, 1), date(int(anio_hasta) + 1, 1, 1)
+
+
+def unir_rangos(rangos):
+    """`rangos` with the overlapping ones merged, in their original order (each date in at most one range)"""
+    unidos = []
+    for desde, hasta in rangos:
+        solapados = [i for i, (d, h) in enumerate(unidos) if desde < h and d < hasta]
+        if not solapados:
+            unidos.append((desde, hasta))
+            continue
+        desde = min([desde] + [unidos[i][0] for i in solapados])
+        hasta = max([hasta] + [unidos[i][1] for i in solapados])
+        unidos = [r for i, r in enumerate(unidos) if i not in solapados[1:]]
+        unidos[solapados[0]] = (desde, hasta)
+    return unidos
+
+
+def rangos_filtro(fecha=None, anio1=None, mes1=None, dia_inicio=None, dia_fin=None, anio2=None, mes2=None):
+    """Ranges for the daily report filters; an empty list means no date filter"""
+    if fecha:
+        return [rango_dia(fecha)]
+    if not (anio1 and mes1):
+        return []
+    if not (dia_inicio and dia_fin):
+        dia_inicio = dia_fin = None
+    rangos = [rango_mes(anio1, mes1, dia_inicio, dia_fin)]
+    if anio2 and mes2:  # Comparison mode
+        rangos.append(rango_mes(anio2, mes2, dia_inicio, dia_fin))
+        return unir_rangos(rangos)
+    return rangos
+
+
+def rangos_cerrados(rangos, hoy=None):
+    """True when every range ends before the current month starts (no new sales expected)"""
+    inicio = _como_fecha(hoy or date.today()).replace(day=1)
+    return bool(rangos) and all(hasta <= inicio for _, hasta in rangos)
+
+
+def predicado(columna, rango, nombre='fecha'):
+    """`columna >= :nombre_desde AND columna < :nombre_hasta` and its params"""
+    desde, hasta = rango
+    sql = f"{columna} >= :{nombre}_desde AND {columna} < :{nombre}_hasta"
+    return sql, {f'{nombre}_desde': desde, f'{nombre}_hasta': hasta}
+
+
+def movimientos_en(rangos, columnas=COLUMNAS_MOVIMIENTO):
+    """Row source for admMovimientos limited to `rangos` (one seek per range).
+
+    Returns (sql, params); use it as ``FROM {sql} m``.
+    """
+    if not rangos:
+        return 'admMovimientos', {}
+    partes = []
+    params = {}
+    for i, rango in enumerate(rangos, start=1):
+        condicion, params_rango = predicado('CFECHA', rango, f'fecha{i}')
+        partes.append(f"SELECT {columnas} FROM admMovimientos WHERE {condicion}")
+        params.update(params_rango)
+    union = '\n        UNION ALL\n        '.join(partes)
+    return f"(\n        {union}\n    )", params
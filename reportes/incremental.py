@@ -0,0 +1,208 @@
+"""
+Delta-merged report frames for the open period.
+
+The default daily view covers the whole open month, and every refresh used
+to re-read that month although only today's movements had changed.
+AcumuladoIncremental keeps the aggregated frame of one period in memory with
+the highest CIDMOVIMIENTO it has seen (the watermark). A refresh only reads
+the movements above the watermark, aggregated at the same grain, and
+re-aggregates the groups they touch; the untouched groups are kept as they
+are.
+
+Edits and deletions of movements already counted do not raise the watermark,
+so the frame is read in full again every `completo_cada` seconds, whenever
+the period changes (a new month) and whenever the report cache version
+changes (late captures, product attribute or set edits).
+
+With `etiquetar`, the data version is read before every full or delta read
+and the one of the frame served is recorded for the response validators
+(reportes.cache.versiones_servidas), as the report cache does.
+
+If a full read fails (a query over its time budget, a lost connection) the
+previous frame of the same period is served instead and recorded in
+reportes.cache.resultados_vencidos(), like the report cache fallback. The
+full read is not tried again for `reintentar_cada` seconds: meanwhile the
+previous frame keeps being served as stale, still merged with the delta
+reads, so callers do not queue behind one failing full read after another.
+"""
+
+import logging
+import threading
+import time
+
+import pandas as pd
+
+from reportes.cache import registrar_vencido, registrar_version
+
+logger = logging.getLogger(__name__)
+
+COLUMNA_MARCA = 'UltimoMovimiento'
+
+
+def combinar(base, delta, grano, sumas, columna_marca=COLUMNA_MARCA):
+    """Merge the aggregated rows of `delta` into `base`: only the groups present in `delta` are re-aggregated"""
+    if delta.empty:
+        return base
+    if base.empty:
+        return delta.reset_index(drop=True)
+    afectadas = pd.MultiIndex.from_frame(base[grano]).isin(pd.MultiIndex.from_frame(delta[grano]))
+    agregados = {columna: 'sum' for columna in sumas}
+    agregados[columna_marca] = 'max'
+    recalculadas = pd.concat([base[afectadas], delta], ignore_index=True) \
+        .groupby(grano, dropna=False, sort=False, observed=True, as_index=False).agg(agregados)
+    # groupby devuelve NaN en las claves nulas; la lectura completa trae None
+    for columna in grano:
+        if base[columna].dtype == object:
+            recalculadas[columna] = recalculadas[columna].astype(object).where(recalculadas[columna].notna(), None)
+    return pd.concat([base[~afectadas], recalculadas[base.columns]], ignore_index=True)
+
+
+class AcumuladoIncremental:
+    """Aggregated frame of one period, kept current by merging the movements above its watermark.
+
+    `leer(periodo, desde)` runs the report query of `periodo`, only over the
+    movements with CIDMOVIMIENTO > `desde` when it is not None, and returns
+    the rows at `grano` with the `sumas` columns and `columna_marca` (the
+    highest CIDMOVIMIENTO of each group). `orden` is the (columns, ascending)
+    sort applied after every merge. `preparar(df)`, if given, runs on every
+    full read and merged frame before it is kept (see reportes.tipos).
+    `etiquetar(cerrado)` gives the data version recorded with the frame and
+    `nombre` is the report a stale frame is reported as.
+    """
+
+    def __init__(self, leer, grano, sumas, orden=None, completo_cada=900, intervalo_minimo=5,
+                 columna_marca=COLUMNA_MARCA, preparar=None, etiquetar=None,
+                 nombre='incremental', reintentar_cada=60):
+        self.leer = leer
+        self.grano = list(grano)
+        self.sumas = list(sumas)
+        self.orden = orden
+        self.completo_cada = completo_cada
+        self.intervalo_minimo = intervalo_minimo
+        self.columna_marca = columna_marca
+        self.preparar = preparar
+        self.etiquetar = etiquetar
+        self.nombre = nombre
+        self.reintentar_cada = reintentar_cada
+        self._lock = threading.Lock()
+        self._periodo = None
+        self._version = None
+        self._base = None
+        self._marca = None
+        self._etiqueta = None
+        self._leido_completo = 0.0
+        self._fallo_completo = None
+        self._ultimo_delta = 0.0
+
+        self._lecturas_completas = 0
+        self._lecturas_delta = 0
+        self._filas_delta = 0
+        self._errores_delta = 0
+        self._errores_completos = 0
+
+    def _ordenar(self, df):
+        if self.orden is not None and not df.empty:
+            columnas, ascendente = self.orden
+            df = df.sort_values(columnas, ascending=ascendente, kind='stable')
+        df = df.reset_index(drop=True)
+        return df if self.preparar is None else self.preparar(df)
+
+    def _marca_de(self, df, anterior):
+        if df.empty:
+            return anterior
+        marca = int(df[self.columna_marca].max())
+        return marca if anterior is None else max(marca, anterior)
+
+    def _etiqueta_actual(self):
+        """Data version before a read (the frame read is at least that recent)"""
+        if self.etiquetar is None:
+            return None
+        try:
+            return self.etiquetar(False)
+        except Exception as e:
+            logger.warning(f"No se pudo leer la versión de los datos: {e}")
+            return None
+
+    def _leer_completo(self, periodo, version):
+        etiqueta = self._etiqueta_actual()
+        df = self.leer(periodo, None)
+        self._base = self._ordenar(df)
+        self._marca = self._marca_de(df, 0)
+        self._periodo = periodo
+        self._version = version
+        self._etiqueta = etiqueta
+        self._fallo_completo = None
+        self._leido_completo = self._ultimo_delta = time.monotonic()
+        self._lecturas_completas += 1
+
+    def _leer_delta(self):
+        etiqueta = self._etiqueta_actual()
+        delta = self.leer(self._periodo, self._marca)
+        self._etiqueta = etiqueta
+        self._ultimo_delta = time.monotonic()
+        self._lecturas_delta += 1
+        self._filas_delta += len(delta)
+        if len(delta):
+            self._base = self._ordenar(combinar(self._base, delta, self.grano, self.sumas, self.columna_marca))
+            self._marca = self._marca_de(delta, self._marca)
+
+    def _completo_o_anterior(self, periodo, version):
+        try:
+            self._leer_completo(periodo, version)
+        except Exception as e:
+            if self._base is None or periodo != self._periodo:
+                raise
+            self._errores_completos += 1
+            self._fallo_completo = time.monotonic()
+            edad = self._fallo_completo - self._leido_completo
+            logger.warning(f"No se pudo leer {periodo} completo; se sirve el marco de hace {edad:.0f} s "
+                           f"hasta reintentar en {self.reintentar_cada:.0f} s: {e}")
+            registrar_vencido(self.nombre, edad)
+
+    def _esperando_reintento(self, periodo, ahora):
+        """Whether a full read of `periodo` failed less than `reintentar_cada` seconds ago"""
+        return (self._fallo_completo is not None and self._base is not None and periodo == self._periodo
+                and ahora - self._fallo_completo < self.reintentar_cada)
+
+    def obtener(self, periodo, version=None):
+        """Current frame of `periodo` (shared between callers: do not modify it in place)"""
+        with self._lock:
+            ahora = time.monotonic()
+            completo = (self._base is None or periodo != self._periodo or version != self._version
+                        or ahora - self._leido_completo >= self.completo_cada)
+            if completo and self._esperando_reintento(periodo, ahora):
+                # El marco anterior, con los movimientos nuevos, hasta que toque reintentar
+                registrar_vencido(self.nombre, ahora - self._leido_completo)
+                completo = False
+            if completo:
+                self._completo_o_anterior(periodo, version)
+            elif ahora - self._ultimo_delta >= self.intervalo_minimo:
+                try:
+                    self._leer_delta()
+                except Exception as e:
+                    # El marco anterior sigue siendo válido hasta la siguiente lectura
+                    self._errores_delta += 1
+                    self._ultimo_delta = ahora
+                    logger.warning(f"No se pudieron leer los movimientos nuevos de {periodo}: {e}")
+            registrar_version(self._etiqueta)
+            return self._base
+
+    def invalidar(self):
+        """Force a full read on the next call"""
+        with self._lock:
+            self._base = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'period': None if self._periodo is None else str(self._periodo),
+                'rows': 0 if self._base is None else len(self._base),
+                'watermark': self._marca,
+                'full_reads': self._lecturas_completas,
+                'delta_reads': self._lecturas_delta,
+                'delta_rows': self._filas_delta,
+                'delta_errors': self._errores_delta,
+                'full_errors': self._errores_completos,
+                'seconds_since_full_read': None if self._base is None
+                else round(time.monotonic() - self._leido_completo, 1),
+            }
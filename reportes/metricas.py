@@ -0,0 +1,215 @@
+"""
+Timing and volume instrumentation of the reports, exposed as Prometheus text.
+
+medir_reporte() wraps a report function. While it runs, the pooled
+connection checkout (app.get_db_connection), the statement execution
+(consultas.open_cursor) and the fetch (consultas.run_query) record their
+time, rows and bytes into the measurement of that call. Whatever time is
+left after those three is the in-process (pandas) work. Every value ends up
+in a histogram labelled by report; the HTTP layer adds request duration,
+template render time and response size per endpoint.
+
+The current measurement and the current request's query list are kept in
+context variables (CONTEXTO_PETICION), which EjecutorReportes copies into its
+worker threads so parallel queries report into the request that started them.
+
+Each process keeps its own registry: with several gunicorn workers each
+/metrics scrape shows the worker that served it.
+"""
+
+import bisect
+import contextvars
+import functools
+import threading
+import time
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BUCKETS_FILAS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+BUCKETS_BYTES = tuple(1024 * 4 ** i for i in range(10))  # 1 KiB .. 256 MiB
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4'
+
+_medicion_actual = contextvars.ContextVar('medicion_reporte', default=None)
+_consultas_peticion = contextvars.ContextVar('consultas_peticion', default=None)
+
+# Variables que los hilos de EjecutorReportes heredan de la petición
+CONTEXTO_PETICION = (_medicion_actual, _consultas_peticion)
+
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ''
+    pares = ','.join('{}="{}"'.format(nombre, str(valor).replace('\\', '\\\\').replace('"', '\\"'))
+                     for nombre, valor in zip(nombres, valores))
+    return '{' + pares + '}'
+
+
+class Histograma:
+    """Cumulative-bucket histogram with a fixed set of label names"""
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # valores de etiquetas -> [conteos por bucket, suma, total]
+
+    def observar(self, valor, *etiquetas):
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * len(self.buckets), 0.0, 0]
+            if indice < len(self.buckets):
+                serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def contar(self, *etiquetas):
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            return serie[2] if serie else 0
+
+    def render(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} histogram']
+        with self._lock:
+            series = sorted((clave, ([*conteos], suma, total)) for clave, (conteos, suma, total)
+                            in self._series.items())
+        for valores, (conteos, suma, total) in series:
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                etiquetas = _etiquetas(self.etiquetas + ('le',), valores + (f'{limite:g}',))
+                lineas.append(f'{self.nombre}_bucket{etiquetas} {acumulado}')
+            lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas + ("le",), valores + ("+Inf",))} {total}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {suma:.6f}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {total}')
+        return lineas
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._histogramas = []
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        histograma = Histograma(nombre, ayuda, etiquetas, buckets)
+        self._histogramas.append(histograma)
+        return histograma
+
+    def render(self):
+        return '\n'.join(linea for histograma in self._histogramas for linea in histograma.render()) + '\n'
+
+
+registro = RegistroMetricas()
+
+ADQUISICION = registro.histograma('report_db_acquire_seconds', 'Wait for a pooled connection', ('report',))
+EJECUCION = registro.histograma('report_sql_execute_seconds', 'Statement execution until the first row',
+                                ('report',))
+LECTURA = registro.histograma('report_sql_fetch_seconds', 'Fetching the rows of a statement', ('report',))
+FILAS = registro.histograma('report_rows_fetched', 'Rows fetched per statement', ('report',), BUCKETS_FILAS)
+BYTES = registro.histograma('report_bytes_fetched', 'In-memory size of the fetched rows per statement',
+                            ('report',), BUCKETS_BYTES)
+PROCESAMIENTO = registro.histograma('report_processing_seconds',
+                                    'Report time outside the database (pandas post-processing)', ('report',))
+REPORTE = registro.histograma('report_duration_seconds', 'Total time of a report function', ('report',))
+RENDER = registro.histograma('http_template_render_seconds', 'Template render time', ('template',))
+PETICION = registro.histograma('http_request_duration_seconds', 'Request handling time until the response',
+                               ('endpoint', 'method', 'status'))
+RESPUESTA = registro.histograma('http_response_bytes', 'Response body size (not known for streamed bodies)',
+                                ('endpoint',), BUCKETS_BYTES)
+
+
+class Medicion:
+    """Tallies of one report call"""
+
+    __slots__ = ('reporte', 'adquisicion', 'ejecucion', 'lectura', 'anidado')
+
+    def __init__(self, reporte):
+        self.reporte = reporte
+        self.adquisicion = 0.0
+        self.ejecucion = 0.0
+        self.lectura = 0.0
+        self.anidado = 0.0
+
+
+def _reporte_actual():
+    medicion = _medicion_actual.get()
+    return medicion.reporte if medicion is not None else 'none'
+
+
+def medir_reporte(nombre):
+    """Decorator recording the duration of a report function and its database/pandas split"""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            padre = _medicion_actual.get()
+            medicion = Medicion(nombre)
+            token = _medicion_actual.set(medicion)
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                total = time.perf_counter() - inicio
+                _medicion_actual.reset(token)
+                REPORTE.observar(total, nombre)
+                base_de_datos = medicion.adquisicion + medicion.ejecucion + medicion.lectura
+                PROCESAMIENTO.observar(max(total - base_de_datos - medicion.anidado, 0.0), nombre)
+                if padre is not None:
+                    padre.anidado += total
+        return envoltura
+    return decorador
+
+
+def registrar_adquisicion(segundos):
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion.adquisicion += segundos
+    ADQUISICION.observar(segundos, _reporte_actual())
+
+
+def registrar_ejecucion(huella, segundos):
+    """Record a statement execution; returns its entry in the request's list (or None) for registrar_lectura"""
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion.ejecucion += segundos
+    EJECUCION.observar(segundos, _reporte_actual())
+    consultas = _consultas_peticion.get()
+    if consultas is None:
+        return None
+    entrada = {'fingerprint': huella, 'report': _reporte_actual(), 'execute': segundos}
+    consultas.append(entrada)
+    return entrada
+
+
+def registrar_lectura(segundos, filas, bytes_, entrada=None):
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion.lectura += segundos
+    reporte = _reporte_actual()
+    LECTURA.observar(segundos, reporte)
+    FILAS.observar(filas, reporte)
+    BYTES.observar(bytes_, reporte)
+    if entrada is not None:
+        entrada.update(fetch=segundos, rows=filas)
+
+
+def iniciar_peticion():
+    """Start collecting the statements of the current request"""
+    _consultas_peticion.set([])
+
+
+def terminar_peticion():
+    """Stop collecting and return the statements run during the request"""
+    consultas = _consultas_peticion.get() or []
+    _consultas_peticion.set(None)
+    return consultas
+
+
+def resumen_consultas(consultas):
+    """One-line summary of a request's statements for the slow-request log"""
+    return '; '.join(
+        f"{c['report']} {c['fingerprint']} exec={c['execute'] * 1000:.0f}ms"
+        f" fetch={c.get('fetch', 0.0) * 1000:.0f}ms rows={c.get('rows', '?')}"
+        for c in consultas
+    ) or 'sin consultas'
@@ -0,0 +1,211 @@
+"""
+Sales objectives engine.
+
+The objective of a month is what the same agent sold in the same month one
+year earlier. Instead of scanning the rollup twice (actual and objective) and
+joining the two aggregates, the monthly tonnage series per agent is read once
+and target, progress, trend and daily average are derived from it with
+vectorized pandas operations.
+
+Closed months never change (late captures are handled through the rollup
+refresh, which calls invalidar_objetivos), so their tonnage is persisted in
+rptObjetivosMensuales and only the open month and months not stored yet are
+aggregated from rptVentasDiarias.
+"""
+
+import calendar
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from reportes.consultas import run_query
+
+logger = logging.getLogger(__name__)
+
+TABLA_OBJETIVOS = 'rptObjetivosMensuales'
+
+AGENTES_OBJETIVOS = (
+    'MAYOREO / SPOT', 'MOLIENDAS', 'JAVIER ARROYO', 'MOLIENDAS MAQ MDLZ',
+    'MDLZ P2', 'MOSTRADOR 1', 'MOSTRADOR 2', 'MOSTRADOR 3',
+)
+
+# Años de historia que muestra el reporte (el objetivo usa además el año anterior)
+ANIOS_OBJETIVOS = 2
+
+COLUMNAS_OBJETIVOS = ['Agente', 'Anio', 'Mes', 'Objetivo', 'Avance', 'PorcAvance', 'Tendencia', 'PromedioDiario']
+
+DDL_OBJETIVOS = f"""
+IF OBJECT_ID('dbo.{TABLA_OBJETIVOS}', 'U') IS NULL
+CREATE TABLE dbo.{TABLA_OBJETIVOS} (
+    Conjunto VARCHAR(50) NOT NULL,
+    Anio SMALLINT NOT NULL,
+    Mes TINYINT NOT NULL,
+    Agente VARCHAR(100) NOT NULL,
+    Toneladas DECIMAL(18, 4) NOT NULL,
+    FechaCalculo DATETIME NOT NULL DEFAULT GETDATE(),
+    CONSTRAINT PK_{TABLA_OBJETIVOS} PRIMARY KEY (Conjunto, Anio, Mes, Agente)
+)
+"""
+
+# Toneladas por agente y mes desde el rollup (un solo escaneo)
+SERIE_QUERY = """
+SELECT
+    a.CNOMBREAGENTE AS Agente,
+    r.Anio,
+    r.Mes,
+    SUM(r.Unidades * pa.KilosPorUnidad) / 1000.0 AS Toneladas
+FROM rptVentasDiarias r WITH (NOLOCK)
+JOIN rptAtributosProducto pa WITH (NOLOCK) ON pa.CIDPRODUCTO = r.CIDPRODUCTO
+JOIN rptConjuntosProducto cp WITH (NOLOCK) ON cp.CIDPRODUCTO = r.CIDPRODUCTO
+JOIN admAgentes a WITH (NOLOCK) ON r.CIDAGENTE = a.CIDAGENTE
+WHERE cp.Conjunto = :conjunto
+    AND r.CIDDOCUMENTODE = 4
+    AND a.CNOMBREAGENTE IN (:agentes)
+    AND r.Fecha >= :serie_desde AND r.Fecha < :serie_hasta
+GROUP BY a.CNOMBREAGENTE, r.Anio, r.Mes
+"""
+
+_tabla_creada = False
+
+
+def _clave_mes(anio, mes):
+    return int(anio) * 100 + int(mes)
+
+
+def _meses_entre(desde, hasta):
+    """(anio, mes) of every month starting in [desde, hasta)"""
+    meses = []
+    anio, mes = desde.year, desde.month
+    while date(anio, mes, 1) < hasta:
+        meses.append((anio, mes))
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return meses
+
+
+def asegurar_tabla_objetivos(conn):
+    global _tabla_creada
+    if _tabla_creada:
+        return
+    cursor = conn.cursor()
+    cursor.execute(DDL_OBJETIVOS)
+    conn.commit()
+    cursor.close()
+    _tabla_creada = True
+
+
+def invalidar_objetivos(conn, rangos=None):
+    """Forget the stored months touched by `rangos` ((desde, hasta) dates), or all of them"""
+    asegurar_tabla_objetivos(conn)
+    cursor = conn.cursor()
+    if rangos is None:
+        cursor.execute(f"DELETE FROM {TABLA_OBJETIVOS}")
+    else:
+        for desde, hasta in rangos:
+            ultimo = hasta - timedelta(days=1)
+            cursor.execute(f"DELETE FROM {TABLA_OBJETIVOS} WHERE Anio * 100 + Mes BETWEEN ? AND ?",
+                           (_clave_mes(desde.year, desde.month), _clave_mes(ultimo.year, ultimo.month)))
+    conn.commit()
+    cursor.close()
+
+
+def serie_mensual(conn, conjunto, desde, hoy=None):
+    """Tonnage per (Agente, Anio, Mes) from the month of `desde` up to today.
+
+    Closed months come from rptObjetivosMensuales when stored; the rest is
+    aggregated from the rollup and the closed months among them are stored.
+    """
+    hoy = hoy or date.today()
+    desde = desde.replace(day=1)
+    abierto = hoy.replace(day=1)
+    asegurar_tabla_objetivos(conn)
+
+    guardada = run_query(conn, f"""
+SELECT Agente, Anio, Mes, Toneladas FROM {TABLA_OBJETIVOS}
+WHERE Conjunto = :conjunto AND Anio * 100 + Mes >= :desde AND Anio * 100 + Mes < :abierto""",
+                         {'conjunto': conjunto, 'desde': _clave_mes(desde.year, desde.month),
+                          'abierto': _clave_mes(abierto.year, abierto.month)})
+    guardados = set(zip(guardada['Anio'].astype(int), guardada['Mes'].astype(int))) if len(guardada) else set()
+    faltantes = [mes for mes in _meses_entre(desde, abierto) if mes not in guardados]
+
+    inicio = date(*faltantes[0], 1) if faltantes else abierto
+    calculada = run_query(conn, SERIE_QUERY, {'conjunto': conjunto, 'agentes': list(AGENTES_OBJETIVOS),
+                                              'serie_desde': inicio, 'serie_hasta': hoy + timedelta(days=1)})
+    if len(calculada):
+        calculada['Anio'] = calculada['Anio'].astype(int)
+        calculada['Mes'] = calculada['Mes'].astype(int)
+    if faltantes:
+        _guardar_meses(conn, conjunto, faltantes, calculada)
+
+    # Los meses recalculados reemplazan lo guardado para el mismo periodo
+    if len(guardada):
+        clave_guardada = guardada['Anio'].astype(int) * 100 + guardada['Mes'].astype(int)
+        guardada = guardada[clave_guardada < _clave_mes(inicio.year, inicio.month)]
+    serie = pd.concat([guardada, calculada], ignore_index=True)
+    serie = serie.astype({'Anio': int, 'Mes': int, 'Toneladas': float})
+    return serie[serie['Toneladas'] != 0].reset_index(drop=True)
+
+
+def _guardar_meses(conn, conjunto, meses, calculada):
+    """Store closed months; every agent gets a row (0 if it sold nothing) so the month counts as stored"""
+    por_clave = {(agente, anio, mes): toneladas for agente, anio, mes, toneladas
+                 in calculada[['Agente', 'Anio', 'Mes', 'Toneladas']].itertuples(index=False)}
+    filas = [(conjunto, anio, mes, agente, float(por_clave.get((agente, anio, mes), 0.0)))
+             for anio, mes in meses for agente in AGENTES_OBJETIVOS]
+    cursor = conn.cursor()
+    try:
+        for anio, mes in meses:
+            cursor.execute(f"DELETE FROM {TABLA_OBJETIVOS} WHERE Conjunto = ? AND Anio = ? AND Mes = ?",
+                           (conjunto, anio, mes))
+        cursor.executemany(f"INSERT INTO {TABLA_OBJETIVOS} (Conjunto, Anio, Mes, Agente, Toneladas) "
+                           f"VALUES (?, ?, ?, ?, ?)", filas)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"No se pudieron guardar los objetivos de {len(meses)} meses: {e}")
+    finally:
+        cursor.close()
+
+
+def calcular_objetivos(serie, hoy=None, anios=ANIOS_OBJETIVOS):
+    """Target, progress and trend per agent and month for the last `anios` years.
+
+    Objetivo is the tonnage of the same month one year earlier (only years
+    hoy.year - anios .. hoy.year - 1 serve as targets), PorcAvance is NaN
+    without a target, Tendencia is the agent's mean for that calendar month.
+    """
+    hoy = hoy or date.today()
+    desde = date(hoy.year - anios, hoy.month, 1)
+    clave = serie['Anio'].to_numpy() * 100 + serie['Mes'].to_numpy()
+
+    actual = serie[clave >= _clave_mes(desde.year, desde.month)]
+    base = serie[(serie['Anio'] >= hoy.year - anios) & (serie['Anio'] <= hoy.year - 1)]
+    objetivo = pd.DataFrame({'Agente': base['Agente'], 'Anio': base['Anio'] + 1, 'Mes': base['Mes'],
+                             'Objetivo': base['Toneladas']})
+
+    df = actual.rename(columns={'Toneladas': 'Avance'}).merge(objetivo, on=['Agente', 'Anio', 'Mes'], how='left')
+    df['Objetivo'] = df['Objetivo'].fillna(0.0)
+    avance = df['Avance'].to_numpy(dtype=float)
+    meta = df['Objetivo'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['PorcAvance'] = np.where(meta > 0, avance * 100.0 / meta, np.nan)
+    df['Tendencia'] = df.groupby(['Agente', 'Mes'])['Avance'].transform('mean')
+    dias = np.array([calendar.monthrange(a, m)[1] for a, m in zip(df['Anio'], df['Mes'])], dtype=float)
+    df['PromedioDiario'] = avance / dias if len(df) else avance
+    df = df.sort_values(['Agente', 'Anio', 'Mes'], ascending=[True, False, False], kind='stable')
+    return df[COLUMNAS_OBJETIVOS].reset_index(drop=True)
+
+
+def resumen_objetivos(objetivos, mes=None):
+    """Average progress, sales and targets per agent (optionally for one calendar month)"""
+    if mes and mes != 'Todos':
+        objetivos = objetivos[objetivos['Mes'] == int(mes)]
+    resumen = objetivos.groupby('Agente', as_index=False, observed=True).agg(
+        PromedioAvance=('PorcAvance', 'mean'),
+        TotalRegistros=('Avance', 'size'),
+        TotalVentas=('Avance', 'sum'),
+        TotalObjetivos=('Objetivo', 'sum'),
+    )
+    resumen['PromedioAvance'] = resumen['PromedioAvance'].fillna(0.0)
+    return resumen.sort_values('PromedioAvance', ascending=False, kind='stable').reset_index(drop=True)
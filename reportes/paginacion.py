@@ -0,0 +1,62 @@
+"""
+Server-side pagination helpers for the report queries.
+
+Instead of fetching the whole result and slicing it with iloc, the report
+query is wrapped with OFFSET/FETCH on its sort key and the total row count is
+returned in the same round trip through COUNT(*) OVER(). Offset and page size
+are bound parameters (see reportes.consultas), so every page of a report
+shares one cached plan.
+"""
+
+import math
+
+COLUMNA_TOTAL = 'TotalRegistros'
+
+
+def sql_paginado(query, order_by, page, per_page, ctes=''):
+    """Wrap `query` (without ORDER BY) so it returns a single page plus the total.
+
+    Returns (sql, params) where params holds the :filas_omitidas and
+    :filas_pagina markers. `order_by` must only use output column names and
+    should be unique so that pages do not overlap. CTEs, if any, go in `ctes`
+    because a WITH clause cannot live inside a derived table.
+    """
+    page = max(int(page), 1)
+    per_page = max(int(per_page), 1)
+    sql = f"""{ctes}
+SELECT q.*, COUNT(*) OVER() AS {COLUMNA_TOTAL}
+FROM (
+{query}
+) q
+ORDER BY {order_by}
+OFFSET :filas_omitidas ROWS FETCH NEXT :filas_pagina ROWS ONLY;"""
+    return sql, {'filas_omitidas': (page - 1) * per_page, 'filas_pagina': per_page}
+
+
+def separar_total(df):
+    """Drop the TotalRegistros column from a page and return (df, total)"""
+    if COLUMNA_TOTAL not in df.columns:
+        return df, len(df)
+    total = int(df[COLUMNA_TOTAL].iloc[0]) if len(df) else 0
+    return df.drop(columns=[COLUMNA_TOTAL]), total
+
+
+def pagina_de(df, page, per_page):
+    """Slice a page out of a report computed in-process; returns (df, total) like the SQL pages"""
+    page = max(int(page), 1)
+    per_page = max(int(per_page), 1)
+    inicio = (page - 1) * per_page
+    return df.iloc[inicio:inicio + per_page].reset_index(drop=True), len(df)
+
+
+def info_paginacion(page, per_page, total):
+    """Pagination dict used by the enhanced_table templates"""
+    total_pages = math.ceil(total / per_page) if per_page else 0
+    return {
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': total_pages,
+        'has_prev': page > 1,
+        'has_next': page < total_pages
+    }
@@ -0,0 +1,117 @@
+"""
+Concurrent execution of the independent queries behind one page.
+
+Several pages need two report queries that do not depend on each other
+(detail + graph, coverage detail + matrix). Running them one after the other
+makes the page cost the sum of both; EjecutorReportes fans them out over a
+small bounded thread pool so it costs roughly the slowest one.
+
+The first task runs in the calling thread (and so reuses the request's
+connection); the others run in worker threads, which have no request context
+and borrow their own pooled connection through get_db_connection().
+
+Worker threads start from an empty context: only the context variables passed
+as `propagar` (the request's metrics and stale-result list) are copied into
+them. Copying the whole context would carry Flask's request context along,
+and with it the request's connection, which a pyodbc connection cannot share
+between threads.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def _en_contexto(valores, funcion):
+    for variable, valor in valores:
+        variable.set(valor)
+    return _medir(funcion)
+
+
+def _medir(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+
+class EjecutorReportes:
+    """Bounded thread pool shared by all requests; the threads are created on first use"""
+
+    def __init__(self, max_workers=4, propagar=()):
+        self.max_workers = max_workers
+        self.propagar = tuple(propagar)
+        self._ejecutor = None
+        self._lock = threading.Lock()
+
+        self._fan_outs = 0
+        self._tareas = 0
+        self._segundos_secuencial = 0.0
+        self._segundos_paralelo = 0.0
+
+    def _pool(self):
+        with self._lock:
+            if self._ejecutor is None:
+                self._ejecutor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='reportes')
+            return self._ejecutor
+
+    def ejecutar(self, tareas):
+        """Run {nombre: zero-argument callable} concurrently and wait for all of them.
+
+        Returns (resultados, tiempos): both dicts keyed by task name, tiempos in
+        seconds. If a task fails the others are still awaited and the first
+        error is raised.
+        """
+        pendientes = list(tareas.items())
+        if not pendientes:
+            return {}, {}
+        inicio = time.perf_counter()
+        (primer_nombre, primera), resto = pendientes[0], pendientes[1:]
+        # Cada hilo corre en un contexto vacío con solo las variables de `propagar`
+        valores = [(variable, variable.get()) for variable in self.propagar]
+        futuros = [(nombre, self._pool().submit(contextvars.Context().run, _en_contexto, valores, funcion))
+                   for nombre, funcion in resto]
+
+        resultados, tiempos = {}, {}
+        error = None
+        try:
+            resultados[primer_nombre], tiempos[primer_nombre] = _medir(primera)
+        except Exception as e:
+            error = e
+        for nombre, futuro in futuros:
+            try:
+                resultados[nombre], tiempos[nombre] = futuro.result()
+            except Exception as e:
+                logger.error(f"Falló la consulta paralela '{nombre}': {e}")
+                error = error or e
+        if error is not None:
+            raise error
+
+        total = time.perf_counter() - inicio
+        with self._lock:
+            self._fan_outs += 1
+            self._tareas += len(pendientes)
+            self._segundos_secuencial += sum(tiempos.values())
+            self._segundos_paralelo += total
+        return resultados, tiempos
+
+    def shutdown(self):
+        with self._lock:
+            ejecutor, self._ejecutor = self._ejecutor, None
+        if ejecutor is not None:
+            ejecutor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'fan_outs': self._fan_outs,
+                'tasks': self._tareas,
+                'sequential_seconds': round(self._segundos_secuencial, 3),
+                'parallel_seconds': round(self._segundos_paralelo, 3),
+                'saved_seconds': round(self._segundos_secuencial - self._segundos_paralelo, 3),
+            }
@@ -0,0 +1,254 @@
+"""
+Bounded, thread-safe connection pool for the reporting app.
+
+Opening a FreeTDS connection costs a full TDS login and handshake, so the
+report functions borrow connections from here instead. Calling close() on a
+borrowed connection returns it to the pool; it is only really closed when it
+fails a liveness check, stays idle longer than max_idle or the pool is closed.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class PooledConnection:
+    """Proxy around a DB-API connection whose close() gives it back to the pool"""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw)
+
+    def discard(self):
+        """Close the underlying connection instead of returning it (e.g. after a broken link)"""
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw, discard=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SharedConnection:
+    """View of a pooled connection that ignores close(); used for per-request reuse"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        pass
+
+
+class ConnectionPool:
+    """Pool of connections created by `factory` (a zero-argument callable)"""
+
+    def __init__(self, factory, max_size=8, min_size=2, max_idle=300, checkout_timeout=30,
+                 ping_after=5, ping_query='SELECT 1'):
+        self._factory = factory
+        self.max_size = max_size
+        self.min_size = min(min_size, max_size)
+        self.max_idle = max_idle
+        self.checkout_timeout = checkout_timeout
+        self.ping_after = ping_after
+        self.ping_query = ping_query
+
+        self._idle = deque()  # (raw, momento en que quedó libre)
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._created = 0
+        self._destroyed = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._failed_pings = 0
+
+    def _create(self):
+        raw = self._factory()
+        with self._cond:
+            self._created += 1
+        return raw
+
+    def _destroy(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._destroyed += 1
+
+    def _is_alive(self, raw):
+        try:
+            cursor = raw.cursor()
+            cursor.execute(self.ping_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception as e:
+            logger.warning(f"Conexión del pool descartada por ping fallido: {e}")
+            with self._cond:
+                self._failed_pings += 1
+            return False
+
+    def prewarm(self, count=None):
+        """Open connections up to `count` (min_size by default) before the first request"""
+        count = self.min_size if count is None else min(count, self.max_size)
+        opened = 0
+        while True:
+            with self._cond:
+                if self._closed or self._size >= count:
+                    break
+                self._size += 1
+            try:
+                raw = self._create()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+            opened += 1
+        logger.info(f"Pool precalentado con {opened} conexiones nuevas")
+        return opened
+
+    def _evict_idle(self):
+        """Drop connections idle for more than max_idle, keeping min_size open"""
+        expired = []
+        with self._cond:
+            now = time.monotonic()
+            while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+                expired.append(self._idle.popleft()[0])
+                self._size -= 1
+        for raw in expired:
+            self._destroy(raw)
+
+    def acquire(self, timeout=None):
+        """Check out a live connection, waiting up to `timeout` seconds if the pool is exhausted"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        self._evict_idle()
+        deadline = time.monotonic() + timeout
+        waited = False
+        started = time.monotonic()
+
+        while True:
+            raw = None
+            idle_since = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeoutError("El pool de conexiones está cerrado")
+                if self._idle:
+                    # LIFO: la conexión más reciente es la que menos probablemente expiró
+                    raw, idle_since = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    create = True
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"No hay conexiones disponibles después de {timeout} s "
+                            f"({self._in_use} en uso de {self.max_size})"
+                        )
+                    if not waited:
+                        waited = True
+                        self._waits += 1
+                    self._cond.wait(remaining)
+                    continue
+
+            if create:
+                try:
+                    raw = self._create()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif time.monotonic() - idle_since > self.ping_after and not self._is_alive(raw):
+                with self._cond:
+                    self._size -= 1
+                self._destroy(raw)
+                continue
+
+            with self._cond:
+                self._in_use += 1
+                self._checkouts += 1
+                if waited:
+                    self._wait_time += time.monotonic() - started
+            return PooledConnection(self, raw)
+
+    def release(self, raw, discard=False):
+        """Return a raw connection to the pool (rolling back any open transaction)"""
+        if not discard:
+            try:
+                raw.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+        if discard or self._closed:
+            self._destroy(raw)
+
+    def close(self):
+        """Close every idle connection; connections in use are closed when released"""
+        with self._cond:
+            self._closed = True
+            idle = [raw for raw, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for raw in idle:
+            self._destroy(raw)
+
+    def stats(self):
+        """Snapshot of pool counters"""
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self._created,
+                'destroyed': self._destroyed,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_total': round(self._wait_time, 4),
+                'failed_pings': self._failed_pings,
+            }
@@ -0,0 +1,164 @@
+"""
+Background scheduler that keeps the landing views of every agent in the report cache.
+
+In the morning every agent opens the daily view and the objectives for their
+own agent, and each first visit paid the cold query. Precalentador runs
+registered jobs (zero-argument callables that call the cached report
+functions) on a fixed cadence in a daemon thread:
+
+- each job is rescheduled `intervalo` seconds after it finishes, shifted by a
+  random jitter (± `jitter` × intervalo), so jobs and workers do not hit SQL
+  Server in lockstep; the first runs are spread over the first interval;
+- at most `max_concurrentes` jobs run at the same time, on their own threads
+  with their own pooled connections;
+- estado() reports the last start, duration, result and next run of each job.
+
+With the shared cache (reportes.cache_compartida) a result computed by one
+worker is read by the others, so running the scheduler in every worker costs
+little more than running it in one.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class _Trabajo:
+    __slots__ = ('nombre', 'funcion', 'siguiente', 'en_curso', 'ejecuciones', 'fallos', 'ultimo_inicio',
+                 'ultima_duracion', 'ultimo_error')
+
+    def __init__(self, nombre, funcion, siguiente):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.siguiente = siguiente
+        self.en_curso = False
+        self.ejecuciones = 0
+        self.fallos = 0
+        self.ultimo_inicio = None
+        self.ultima_duracion = None
+        self.ultimo_error = None
+
+
+class Precalentador:
+    """Run cache-warming jobs every `intervalo` seconds with jitter and a concurrency cap"""
+
+    def __init__(self, intervalo=300, max_concurrentes=2, jitter=0.1, semilla=None):
+        self.intervalo = intervalo
+        self.max_concurrentes = max_concurrentes
+        self.jitter = jitter
+        self._azar = random.Random(semilla)
+        self._trabajos = {}
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._despertar = threading.Event()
+        self._hilo = None
+        self._ejecutor = None
+
+    def agregar(self, nombre, funcion):
+        """Register a job; its first run is spread randomly over the first interval"""
+        with self._lock:
+            self._trabajos[nombre] = _Trabajo(nombre, funcion,
+                                              time.monotonic() + self._azar.uniform(0, self.intervalo * self.jitter))
+
+    def _proxima(self):
+        desvio = self._azar.uniform(-self.jitter, self.jitter) * self.intervalo
+        return time.monotonic() + max(self.intervalo + desvio, 1.0)
+
+    def _ejecutar(self, trabajo):
+        inicio = time.perf_counter()
+        error = None
+        try:
+            trabajo.funcion()
+        except Exception as e:
+            error = e
+            logger.warning(f"Precalentamiento '{trabajo.nombre}' falló: {e}")
+        duracion = time.perf_counter() - inicio
+        with self._lock:
+            trabajo.en_curso = False
+            trabajo.ejecuciones += 1
+            trabajo.ultima_duracion = duracion
+            trabajo.ultimo_error = None if error is None else str(error)
+            if error is not None:
+                trabajo.fallos += 1
+            trabajo.siguiente = self._proxima()
+        self._despertar.set()
+        return error is None
+
+    def ejecutar_pendientes(self, todos=False):
+        """Start the due jobs (or every idle job) within the concurrency cap; returns their futures"""
+        ahora = time.monotonic()
+        with self._lock:
+            if self._ejecutor is None:
+                self._ejecutor = ThreadPoolExecutor(max_workers=self.max_concurrentes,
+                                                    thread_name_prefix='precalentar')
+            libres = self.max_concurrentes - sum(t.en_curso for t in self._trabajos.values())
+            pendientes = sorted((t for t in self._trabajos.values()
+                                 if not t.en_curso and (todos or t.siguiente <= ahora)),
+                                key=lambda t: t.siguiente)
+            if not todos:
+                pendientes = pendientes[:max(libres, 0)]
+            for trabajo in pendientes:
+                trabajo.en_curso = True
+                trabajo.ultimo_inicio = datetime.now()
+            ejecutor = self._ejecutor
+        return [ejecutor.submit(self._ejecutar, trabajo) for trabajo in pendientes]
+
+    def ejecutar_todos(self):
+        """Run every job once, at most max_concurrentes at a time, and wait; returns how many succeeded"""
+        return sum(futuro.result() for futuro in self.ejecutar_pendientes(todos=True))
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            self.ejecutar_pendientes()
+            with self._lock:
+                esperas = [t.siguiente for t in self._trabajos.values() if not t.en_curso]
+            espera = min(esperas, default=time.monotonic() + self.intervalo) - time.monotonic()
+            self._despertar.wait(timeout=min(max(espera, 0.5), self.intervalo))
+            self._despertar.clear()
+
+    def iniciar(self):
+        """Start the scheduler thread (idempotent)"""
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive():
+                return
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name='precalentador', daemon=True)
+            self._hilo.start()
+        logger.info(f"Precalentador iniciado: {len(self._trabajos)} trabajos cada {self.intervalo:.0f} s")
+
+    def detener(self):
+        self._detener.set()
+        self._despertar.set()
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+            ejecutor, self._ejecutor = self._ejecutor, None
+        if hilo is not None:
+            hilo.join(timeout=5)
+        if ejecutor is not None:
+            ejecutor.shutdown(wait=False)
+
+    def estado(self):
+        """Per-job status for the status page"""
+        ahora = time.monotonic()
+        with self._lock:
+            return {
+                'running': self._hilo is not None and self._hilo.is_alive(),
+                'interval_seconds': self.intervalo,
+                'jitter': self.jitter,
+                'max_concurrent': self.max_concurrentes,
+                'jobs': [{
+                    'name': t.nombre,
+                    'running': t.en_curso,
+                    'runs': t.ejecuciones,
+                    'failures': t.fallos,
+                    'last_start': t.ultimo_inicio.strftime('%Y-%m-%d %H:%M:%S') if t.ultimo_inicio else None,
+                    'last_duration_seconds': None if t.ultima_duracion is None else round(t.ultima_duracion, 3),
+                    'last_error': t.ultimo_error,
+                    'next_run_in_seconds': None if t.en_curso else round(max(t.siguiente - ahora, 0), 1),
+                } for t in self._trabajos.values()],
+            }
@@ -0,0 +1,201 @@
+"""
+In-memory reference data of the reports: agents, products, document models and clients.
+
+The CONTPAQi dimension tables are small and change rarely, so they are read
+once into memory and re-read every REFERENCIA_TTL seconds. Report queries
+filter on the integer ids (CIDAGENTE, CIDDOCUMENTODE) and return ids instead
+of names; adjuntar_nombres() (DataFrames) and CursorConNombres (streaming
+exports) put the names back in-process. That keeps admAgentes, admProductos
+and admDocumentosModelo out of the hot queries, and the routes build their
+agent dropdowns from here instead of hard-coded lists.
+
+An id that is not loaded yet (an agent, product or client created after the
+last read) triggers one early re-read, at most every REFRESCO_MINIMO seconds.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from reportes.consultas import columnas_cursor
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre lecturas automáticas de los catálogos
+REFERENCIA_TTL = 600
+# Segundos mínimos entre relecturas provocadas por ids desconocidos
+REFRESCO_MINIMO = 30
+
+AGENTES_REPORTE = (
+    'MAYOREO / SPOT', 'MOLIENDAS', 'JAVIER ARROYO', 'MOLIENDAS MAQ MDLZ',
+    'MDLZ P2', 'MOSTRADOR 1', 'MOSTRADOR 2', 'MOSTRADOR 3',
+)
+
+# Factura de venta y remisión del módulo de ventas
+DOCUMENTO_FACTURA = 4
+DOCUMENTO_REMISION = 3
+MODULO_VENTAS = 1
+
+# Sin coincidencias: un id que no existe (CONTPAQi usa 0 para "(Ninguno)")
+ID_INEXISTENTE = -1
+
+AGENTES_QUERY = "SELECT CIDAGENTE, CNOMBREAGENTE FROM admAgentes WITH (NOLOCK)"
+PRODUCTOS_QUERY = "SELECT CIDPRODUCTO, CCODIGOPRODUCTO, CNOMBREPRODUCTO FROM admProductos WITH (NOLOCK)"
+MODELOS_QUERY = "SELECT CIDDOCUMENTODE, CDESCRIPCION, CMODULO FROM admDocumentosModelo WITH (NOLOCK)"
+CLIENTES_QUERY = "SELECT CIDCLIENTEPROVEEDOR, CRAZONSOCIAL FROM admClientes WITH (NOLOCK)"
+
+Referencia = namedtuple('Referencia', 'agentes productos modelos clientes')
+"""agentes {CIDAGENTE: nombre}, productos {CIDPRODUCTO: (codigo, nombre)},
+modelos {CIDDOCUMENTODE: (descripcion, modulo)}, clientes {CIDCLIENTEPROVEEDOR: razon social}"""
+
+# Columna de id -> columnas con las que se reemplaza en los resultados
+NOMBRES_POR_ID = {
+    'CIDAGENTE': ('Agente',),
+    'CIDPRODUCTO': ('CCODIGOPRODUCTO', 'CNOMBREPRODUCTO'),
+    'CIDCLIENTEPROVEEDOR': ('RazonSocial',),
+}
+
+_VACIA = Referencia({}, {}, {}, {})
+_datos = _VACIA
+_ultima_sincronizacion = 0.0
+_lock = threading.Lock()
+
+
+def _leer(conn, sql):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def sync_referencia(conn):
+    """Re-read the four catalogs; returns the new Referencia"""
+    global _datos, _ultima_sincronizacion
+    datos = Referencia(
+        agentes={int(cid): nombre for cid, nombre in _leer(conn, AGENTES_QUERY)},
+        productos={int(cid): (codigo, nombre) for cid, codigo, nombre in _leer(conn, PRODUCTOS_QUERY)},
+        modelos={int(cid): (descripcion, int(modulo or 0))
+                 for cid, descripcion, modulo in _leer(conn, MODELOS_QUERY)},
+        clientes={int(cid): razon for cid, razon in _leer(conn, CLIENTES_QUERY)},
+    )
+    _datos = datos
+    _ultima_sincronizacion = time.monotonic()
+    logger.info(f"Catálogos de referencia leídos: {len(datos.agentes)} agentes, {len(datos.productos)} productos, "
+                f"{len(datos.modelos)} modelos, {len(datos.clientes)} clientes")
+    return datos
+
+
+def asegurar_referencia(conn):
+    """Make sure the catalogs are loaded and fresh before a report query"""
+    if _datos is not _VACIA and time.monotonic() - _ultima_sincronizacion < REFERENCIA_TTL:
+        return
+    with _lock:
+        if _datos is not _VACIA and time.monotonic() - _ultima_sincronizacion < REFERENCIA_TTL:
+            return
+        sync_referencia(conn)
+
+
+def get_referencia():
+    """Loaded catalogs (empty until the first asegurar_referencia)"""
+    return _datos
+
+
+def opciones_agente(todos_primero=False):
+    """Agent dropdown: the report agents known to the ERP, in report order, and 'Todos'"""
+    conocidos = set(_datos.agentes.values())
+    agentes = [nombre for nombre in AGENTES_REPORTE if nombre in conocidos] if conocidos else list(AGENTES_REPORTE)
+    return ['Todos'] + agentes if todos_primero else agentes + ['Todos']
+
+
+def id_agente(nombre):
+    """CIDAGENTE of an agent name, or ID_INEXISTENTE so the filter matches nothing"""
+    for cid, agente in _datos.agentes.items():
+        if agente == nombre:
+            return cid
+    return ID_INEXISTENTE
+
+
+def ids_agentes(agente=None):
+    """CIDAGENTE values of one agent, or of every report agent when `agente` is empty or 'Todos'"""
+    if agente and agente != 'Todos':
+        return [id_agente(agente)]
+    ids = [cid for cid, nombre in sorted(_datos.agentes.items()) if nombre in AGENTES_REPORTE]
+    return ids or [ID_INEXISTENTE]
+
+
+def documentos_venta():
+    """CIDDOCUMENTODE of the sales documents: invoices, plus remisiones if their model is in the sales module"""
+    ids = [DOCUMENTO_FACTURA]
+    if _datos.modelos.get(DOCUMENTO_REMISION, (None, None))[1] == MODULO_VENTAS:
+        ids.append(DOCUMENTO_REMISION)
+    return ids
+
+
+def _catalogos(datos):
+    """{id column: [(output column, {id: value})]} in NOMBRES_POR_ID order"""
+    return {
+        'CIDAGENTE': [('Agente', datos.agentes)],
+        'CIDPRODUCTO': [('CCODIGOPRODUCTO', {cid: p[0] for cid, p in datos.productos.items()}),
+                        ('CNOMBREPRODUCTO', {cid: p[1] for cid, p in datos.productos.items()})],
+        'CIDCLIENTEPROVEEDOR': [('RazonSocial', datos.clientes)],
+    }
+
+
+def _faltantes(df, datos):
+    catalogos = {'CIDAGENTE': datos.agentes, 'CIDPRODUCTO': datos.productos, 'CIDCLIENTEPROVEEDOR': datos.clientes}
+    return any(not set(df[columna].dropna().astype(int)) <= catalogos[columna].keys()
+               for columna in NOMBRES_POR_ID if columna in df.columns)
+
+
+def adjuntar_nombres(df, conn=None):
+    """Replace the id columns of a report frame by their names, in the same position.
+
+    With `conn`, ids missing from the catalogs cause one early re-read;
+    names still unknown after it are None.
+    """
+    if not any(columna in df.columns for columna in NOMBRES_POR_ID):
+        return df
+    if conn is not None and len(df) and _faltantes(df, _datos) \
+            and time.monotonic() - _ultima_sincronizacion >= REFRESCO_MINIMO:
+        with _lock:
+            if _faltantes(df, _datos) and time.monotonic() - _ultima_sincronizacion >= REFRESCO_MINIMO:
+                sync_referencia(conn)
+    catalogos = _catalogos(_datos)
+    columnas = {}
+    for columna in df.columns:
+        if columna not in catalogos:
+            columnas[columna] = df[columna]
+            continue
+        for nombre, catalogo in catalogos[columna]:
+            valores = df[columna].map(catalogo).astype(object)
+            columnas[nombre] = valores.where(valores.notna(), None)
+    return pd.DataFrame(columnas, index=df.index)
+
+
+class CursorConNombres:
+    """Cursor of a streaming export with the id columns replaced by their names (see adjuntar_nombres)"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        catalogos = _catalogos(_datos)
+        # (posición en la fila original, catálogo o None si la columna se copia tal cual)
+        self._columnas = []
+        nombres = []
+        for posicion, columna in enumerate(columnas_cursor(cursor)):
+            for nombre, catalogo in catalogos.get(columna, [(columna, None)]):
+                self._columnas.append((posicion, catalogo))
+                nombres.append(nombre)
+        self.description = [(nombre,) for nombre in nombres]
+
+    def fetchmany(self, tamano):
+        return [tuple(fila[posicion] if catalogo is None else catalogo.get(fila[posicion])
+                      for posicion, catalogo in self._columnas)
+                for fila in self.cursor.fetchmany(tamano)]
+
+    def close(self):
+        self.cursor.close()
@@ -0,0 +1,190 @@
+"""
+Pre-aggregated daily sales rollup shared by the year, month and objectives reports.
+
+rptVentasDiarias keeps the units sold at (fecha, agente, producto, cliente,
+tipo de documento) grain. Kilos are not stored: readers multiply Unidades by
+rptAtributosProducto.KilosPorUnidad, so product overrides apply to history too.
+
+Refreshes are incremental. Closed months are never rescanned; only the open
+month (and the previous one right after a month change) is rebuilt, plus any
+day that received movements with CIDMOVIMIENTO above the stored watermark.
+"""
+
+import logging
+import threading
+import time
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+
+TABLA_ROLLUP = 'rptVentasDiarias'
+TABLA_ESTADO = 'rptRollupEstado'
+NOMBRE_ROLLUP = 'ventas_diarias'
+
+# Segundos mínimos entre refrescos del mes abierto
+ROLLUP_TTL = 120
+
+DDL_ROLLUP = f"""
+IF OBJECT_ID('dbo.{TABLA_ROLLUP}', 'U') IS NULL
+BEGIN
+    CREATE TABLE dbo.{TABLA_ROLLUP} (
+        Fecha DATE NOT NULL,
+        Anio SMALLINT NOT NULL,
+        Mes TINYINT NOT NULL,
+        Dia TINYINT NOT NULL,
+        CIDAGENTE INT NOT NULL,
+        CIDPRODUCTO INT NOT NULL,
+        CIDCLIENTEPROVEEDOR INT NOT NULL,
+        CIDDOCUMENTODE INT NOT NULL,
+        RazonSocial VARCHAR(255) NULL,
+        Unidades DECIMAL(18, 4) NOT NULL,
+        Movimientos INT NOT NULL,
+        CONSTRAINT PK_{TABLA_ROLLUP} PRIMARY KEY (Fecha, CIDAGENTE, CIDPRODUCTO, CIDCLIENTEPROVEEDOR, CIDDOCUMENTODE)
+    );
+    CREATE INDEX IX_{TABLA_ROLLUP}_AnioMes ON dbo.{TABLA_ROLLUP} (Anio, Mes, CIDAGENTE) INCLUDE (CIDPRODUCTO, Unidades);
+END
+IF OBJECT_ID('dbo.{TABLA_ESTADO}', 'U') IS NULL
+CREATE TABLE dbo.{TABLA_ESTADO} (
+    Nombre VARCHAR(50) NOT NULL PRIMARY KEY,
+    UltimoMovimiento INT NOT NULL,
+    InicioMesAbierto DATE NOT NULL,
+    FechaActualizacion DATETIME NOT NULL
+)
+"""
+
+# Movimientos de venta (factura/remisión del módulo de ventas) agregados por día
+INSERT_ROLLUP = f"""
+INSERT INTO {TABLA_ROLLUP} (Fecha, Anio, Mes, Dia, CIDAGENTE, CIDPRODUCTO, CIDCLIENTEPROVEEDOR,
+                            CIDDOCUMENTODE, RazonSocial, Unidades, Movimientos)
+SELECT
+    CONVERT(DATE, m.CFECHA),
+    YEAR(m.CFECHA),
+    MONTH(m.CFECHA),
+    DAY(m.CFECHA),
+    d.CIDAGENTE,
+    m.CIDPRODUCTO,
+    d.CIDCLIENTEPROVEEDOR,
+    m.CIDDOCUMENTODE,
+    MAX(d.CRAZONSOCIAL),
+    SUM(m.CUNIDADES),
+    COUNT(*)
+FROM admMovimientos m
+JOIN admDocumentosModelo dm ON m.CIDDOCUMENTODE = dm.CIDDOCUMENTODE
+JOIN admDocumentos d ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
+WHERE m.CIDDOCUMENTODE IN (3, 4)
+    AND dm.CMODULO = 1
+    AND m.CFECHA >= ? AND m.CFECHA < ?
+GROUP BY
+    CONVERT(DATE, m.CFECHA), YEAR(m.CFECHA), MONTH(m.CFECHA), DAY(m.CFECHA),
+    d.CIDAGENTE, m.CIDPRODUCTO, d.CIDCLIENTEPROVEEDOR, m.CIDDOCUMENTODE
+"""
+
+FECHA_MINIMA = date(1900, 1, 1)
+FECHA_MAXIMA = date(9999, 12, 31)
+
+_ultimo_refresco = 0.0
+_lock = threading.Lock()
+_suscriptores = []
+
+
+def inicio_mes(fecha):
+    """First day of the month of a date"""
+    return fecha.replace(day=1)
+
+
+def mes_cerrado(anio, mes, hoy=None):
+    """True when (anio, mes) ended before the current month"""
+    hoy = hoy or date.today()
+    return (int(anio), int(mes)) < (hoy.year, hoy.month)
+
+
+def suscribir_refresco(funcion):
+    """Call funcion(rangos) after every refresh with the rebuilt (desde, hasta) ranges"""
+    _suscriptores.append(funcion)
+
+
+def _reconstruir(cursor, desde, hasta):
+    cursor.execute(f"DELETE FROM {TABLA_ROLLUP} WHERE Fecha >= ? AND Fecha < ?", (desde, hasta))
+    cursor.execute(INSERT_ROLLUP, (desde, hasta))
+
+
+def refresh_rollup(conn, hoy=None):
+    """Bring rptVentasDiarias up to date; returns the list of rebuilt ranges"""
+    global _ultimo_refresco
+
+    hoy = hoy or date.today()
+    abierto = inicio_mes(hoy)
+
+    cursor = conn.cursor()
+    cursor.execute(DDL_ROLLUP)
+    conn.commit()
+
+    # Serializar refrescos entre procesos (varios workers de gunicorn)
+    cursor.execute("EXEC sp_getapplock @Resource = ?, @LockMode = 'Exclusive', @LockOwner = 'Transaction'",
+                   (TABLA_ROLLUP,))
+
+    cursor.execute("SELECT ISNULL(MAX(CIDMOVIMIENTO), 0) FROM admMovimientos")
+    nuevo_watermark = cursor.fetchone()[0]
+
+    cursor.execute(f"SELECT UltimoMovimiento, InicioMesAbierto FROM {TABLA_ESTADO} WHERE Nombre = ?",
+                   (NOMBRE_ROLLUP,))
+    estado = cursor.fetchone()
+
+    rangos = []
+    if estado is None:
+        # Primera carga: todo el histórico
+        rangos.append((FECHA_MINIMA, FECHA_MAXIMA))
+    else:
+        watermark, abierto_anterior = estado[0], estado[1]
+        if isinstance(abierto_anterior, str):
+            abierto_anterior = date.fromisoformat(abierto_anterior[:10])
+        desde = min(abierto_anterior, abierto)
+
+        # Movimientos capturados tarde en meses ya cerrados
+        cursor.execute(
+            "SELECT DISTINCT CONVERT(DATE, CFECHA) FROM admMovimientos "
+            "WHERE CIDMOVIMIENTO > ? AND CFECHA < ? AND CIDDOCUMENTODE IN (3, 4)",
+            (watermark, desde)
+        )
+        for (dia,) in cursor.fetchall():
+            if isinstance(dia, str):
+                dia = date.fromisoformat(dia[:10])
+            rangos.append((dia, dia + timedelta(days=1)))
+        rangos.append((desde, FECHA_MAXIMA))
+
+    for desde, hasta in rangos:
+        _reconstruir(cursor, desde, hasta)
+
+    if estado is None:
+        cursor.execute(
+            f"INSERT INTO {TABLA_ESTADO} (Nombre, UltimoMovimiento, InicioMesAbierto, FechaActualizacion) "
+            f"VALUES (?, ?, ?, GETDATE())",
+            (NOMBRE_ROLLUP, nuevo_watermark, abierto)
+        )
+    else:
+        cursor.execute(
+            f"UPDATE {TABLA_ESTADO} SET UltimoMovimiento = ?, InicioMesAbierto = ?, FechaActualizacion = GETDATE() "
+            f"WHERE Nombre = ?",
+            (nuevo_watermark, abierto, NOMBRE_ROLLUP)
+        )
+    conn.commit()
+    cursor.close()
+
+    _ultimo_refresco = time.monotonic()
+    logger.info(f"Rollup {TABLA_ROLLUP} actualizado: {rangos} (watermark {nuevo_watermark})")
+    for funcion in _suscriptores:
+        try:
+            funcion(rangos)
+        except Exception as e:
+            logger.error(f"Error notificando el refresco del rollup: {e}")
+    return rangos
+
+
+def asegurar_rollup(conn):
+    """Refresh the open month of the rollup if it is older than ROLLUP_TTL"""
+    if _ultimo_refresco and time.monotonic() - _ultimo_refresco < ROLLUP_TTL:
+        return
+    with _lock:
+        if _ultimo_refresco and time.monotonic() - _ultimo_refresco < ROLLUP_TTL:
+            return
+        refresh_rollup(conn)
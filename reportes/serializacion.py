@@ -0,0 +1,157 @@
+"""
+Binary encoding of report results for the shared cache, without pickle.
+
+Unpickling runs code chosen by whoever wrote the bytes, so a cache file other
+local users could write would be a way into every worker. a_bytes() only
+knows how to write what the reports return: DataFrames (numeric, datetime64,
+categorical and object columns, any index), tuples and lists of them, and
+plain scalars. de_bytes() only rebuilds those types.
+
+    MAGIA | header length (4 bytes, big endian) | JSON header | column buffers
+
+Numeric and datetime64 columns (and categorical codes) are stored as their
+raw bytes and read back with numpy.frombuffer; object values go in the
+header as JSON with tags for the types JSON lacks (NaN, dates, Decimal).
+"""
+
+import json
+import math
+import struct
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+MAGIA = b'MOLI\x01'
+
+
+class _Escritor:
+    def __init__(self):
+        self.buffers = []
+        self.tamano = 0
+
+    def buffer(self, arreglo):
+        datos = np.ascontiguousarray(arreglo).tobytes()
+        self.buffers.append(datos)
+        inicio, self.tamano = self.tamano, self.tamano + len(datos)
+        return [inicio, len(datos)]
+
+
+def _escalar(valor):
+    """JSON form of one object value"""
+    if valor is None or isinstance(valor, (bool, str)):
+        return valor
+    if isinstance(valor, np.bool_):
+        return bool(valor)
+    if isinstance(valor, (int, np.integer)):
+        return int(valor)
+    if isinstance(valor, (float, np.floating)):
+        return {'f': 'nan'} if math.isnan(valor) else float(valor)
+    if isinstance(valor, (datetime, pd.Timestamp)):
+        if pd.isna(valor):
+            return {'f': 'nan'}
+        return {'t': pd.Timestamp(valor).isoformat()}
+    if isinstance(valor, date):
+        return {'d': valor.isoformat()}
+    if isinstance(valor, Decimal):
+        return {'n': str(valor)}
+    if valor is pd.NaT:
+        return {'f': 'nan'}
+    raise TypeError(f"{type(valor).__name__} no se puede guardar en la caché compartida")
+
+
+def _de_escalar(valor):
+    if not isinstance(valor, dict):
+        return valor
+    if 'f' in valor:
+        return float('nan')
+    if 't' in valor:
+        return pd.Timestamp(valor['t']).to_pydatetime()
+    if 'd' in valor:
+        return date.fromisoformat(valor['d'])
+    return Decimal(valor['n'])
+
+
+def _arreglo(valores, escritor):
+    """Header entry of a column or index"""
+    dtype = valores.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return {'tipo': 'categoria', 'ordenada': bool(dtype.ordered),
+                'categorias': _arreglo(pd.Index(dtype.categories), escritor),
+                'codigos': _arreglo(pd.Index(np.asarray(valores.codes)), escritor)}
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufM' and dtype.hasobject is False:
+        if dtype.kind == 'M':
+            return {'tipo': 'numpy', 'dtype': dtype.str, 'datos': escritor.buffer(np.asarray(valores).view('i8'))}
+        return {'tipo': 'numpy', 'dtype': dtype.str, 'datos': escritor.buffer(np.asarray(valores))}
+    if dtype == object:
+        return {'tipo': 'objeto', 'valores': [_escalar(v) for v in np.asarray(valores, dtype=object).tolist()]}
+    raise TypeError(f"Columnas {dtype} no se pueden guardar en la caché compartida")
+
+
+def _de_arreglo(entrada, cuerpo):
+    if entrada['tipo'] == 'categoria':
+        categorias = _de_arreglo(entrada['categorias'], cuerpo)
+        codigos = _de_arreglo(entrada['codigos'], cuerpo)
+        return pd.Categorical.from_codes(codigos, categories=categorias, ordered=entrada['ordenada'])
+    if entrada['tipo'] == 'numpy':
+        inicio, tamano = entrada['datos']
+        dtype = np.dtype(entrada['dtype'])
+        lectura = np.dtype('i8') if dtype.kind == 'M' else dtype
+        arreglo = np.frombuffer(cuerpo, dtype=lectura, count=tamano // lectura.itemsize, offset=inicio).copy()
+        return arreglo.view(dtype) if dtype.kind == 'M' else arreglo
+    valores = np.empty(len(entrada['valores']), dtype=object)
+    valores[:] = [_de_escalar(v) for v in entrada['valores']]
+    return valores
+
+
+def _valor(valor, escritor):
+    if isinstance(valor, pd.DataFrame):
+        if isinstance(valor.index, pd.RangeIndex):
+            indice = {'rango': [valor.index.start, valor.index.stop, valor.index.step]}
+        else:
+            indice = _arreglo(valor.index, escritor)
+        return {'frame': {
+            'columnas': [_escalar(c) for c in valor.columns],
+            'datos': [_arreglo(valor.iloc[:, i].array if isinstance(valor.iloc[:, i].dtype, pd.CategoricalDtype)
+                               else valor.iloc[:, i].to_numpy(), escritor) for i in range(valor.shape[1])],
+            'indice': indice,
+        }}
+    if isinstance(valor, (tuple, list)):
+        return {'tupla' if isinstance(valor, tuple) else 'lista': [_valor(v, escritor) for v in valor]}
+    return {'escalar': _escalar(valor)}
+
+
+def _de_valor(entrada, cuerpo):
+    if 'frame' in entrada:
+        frame = entrada['frame']
+        indice = frame['indice']
+        indice = pd.RangeIndex(*indice['rango']) if 'rango' in indice else pd.Index(_de_arreglo(indice, cuerpo))
+        columnas = [_de_escalar(c) for c in frame['columnas']]
+        datos = {i: _de_arreglo(columna, cuerpo) for i, columna in enumerate(frame['datos'])}
+        df = pd.DataFrame(datos, index=indice)
+        df.columns = pd.Index(columnas, dtype=object) if columnas else pd.RangeIndex(0)
+        return df
+    if 'tupla' in entrada:
+        return tuple(_de_valor(v, cuerpo) for v in entrada['tupla'])
+    if 'lista' in entrada:
+        return [_de_valor(v, cuerpo) for v in entrada['lista']]
+    return _de_escalar(entrada['escalar'])
+
+
+def a_bytes(valor):
+    """Encode a report result; TypeError for anything a report does not return"""
+    escritor = _Escritor()
+    cabecera = json.dumps(_valor(valor, escritor), separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return b''.join([MAGIA, struct.pack('>I', len(cabecera)), cabecera, *escritor.buffers])
+
+
+def de_bytes(datos):
+    """Decode a_bytes() output; ValueError if the bytes are not in this format"""
+    datos = bytes(datos)
+    if not datos.startswith(MAGIA):
+        raise ValueError("Entrada de caché en un formato desconocido")
+    inicio = len(MAGIA) + 4
+    (largo,) = struct.unpack('>I', datos[len(MAGIA):inicio])
+    cabecera = json.loads(datos[inicio:inicio + largo].decode('utf-8'))
+    return _de_valor(cabecera, memoryview(datos)[inicio + largo:])
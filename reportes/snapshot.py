@@ -0,0 +1,338 @@
+"""
+Local columnar snapshot of the sales fact.
+
+The reports normally read the ERP tables (and the rollup that lives next to
+them) on the production SQL Server, so BI queries compete with the ERP.
+SnapshotVentas extracts the relevant movements into one Parquet file per
+month under a local directory. These are sales invoices (type 4) and module 1
+remisiones (type 3) of the reportable products, at daily grain per agent,
+product and client. With REPORT_SOURCE=snapshot the report functions
+aggregate those files in-process and do not touch SQL Server.
+
+Sync is incremental, like the rollup. Only the open month, the month that
+just closed and months that received movements above the stored
+CIDMOVIMIENTO watermark are extracted again. If the reportable product set
+changes, or the files were written with an older FORMATO (columns added to
+the extraction), everything is rebuilt. Kilos are not stored: the product dimension
+(productos.parquet) is rewritten on every sync and applied when reading, so
+attribute overrides also apply to history.
+
+Parquet needs pyarrow (optional dependency); without it SNAPSHOT_DISPONIBLE
+is False and the app keeps reading SQL Server.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+
+from reportes.consultas import run_query
+from reportes.referencia import AGENTES_REPORTE
+
+try:
+    import pyarrow  # noqa: F401
+    SNAPSHOT_DISPONIBLE = True
+except ImportError:
+    SNAPSHOT_DISPONIBLE = False
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS_HECHOS = ['Fecha', 'CIDDOCUMENTODE', 'Modulo', 'CIDAGENTE', 'Agente', 'CIDPRODUCTO',
+                   'CIDCLIENTEPROVEEDOR', 'RazonSocial', 'Unidades']
+
+# Versión de las columnas de los archivos mensuales; si cambia, la siguiente sincronización reconstruye todo
+FORMATO = 2
+
+# Movimientos relevantes de un mes, agregados por día
+EXTRACCION_QUERY = """
+SELECT
+    CONVERT(DATE, m.CFECHA) AS Fecha,
+    m.CIDDOCUMENTODE,
+    dm.CMODULO AS Modulo,
+    d.CIDAGENTE,
+    a.CNOMBREAGENTE AS Agente,
+    m.CIDPRODUCTO,
+    d.CIDCLIENTEPROVEEDOR,
+    d.CRAZONSOCIAL AS RazonSocial,
+    SUM(m.CUNIDADES) AS Unidades
+FROM admMovimientos m
+JOIN rptConjuntosProducto cp ON cp.CIDPRODUCTO = m.CIDPRODUCTO
+JOIN admDocumentosModelo dm ON m.CIDDOCUMENTODE = dm.CIDDOCUMENTODE
+JOIN admDocumentos d ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
+JOIN admAgentes a ON d.CIDAGENTE = a.CIDAGENTE
+WHERE cp.Conjunto = :conjunto
+    AND (m.CIDDOCUMENTODE = 4 OR (m.CIDDOCUMENTODE = 3 AND dm.CMODULO = 1))
+    AND m.CFECHA >= :desde AND m.CFECHA < :hasta
+GROUP BY
+    CONVERT(DATE, m.CFECHA), m.CIDDOCUMENTODE, dm.CMODULO, d.CIDAGENTE, a.CNOMBREAGENTE,
+    m.CIDPRODUCTO, d.CIDCLIENTEPROVEEDOR, d.CRAZONSOCIAL
+"""
+
+PRODUCTOS_QUERY = """
+SELECT p.CIDPRODUCTO, p.CCODIGOPRODUCTO, p.CNOMBREPRODUCTO, pa.KilosPorUnidad, pa.Categoria, pa.Empresa
+FROM admProductos p
+JOIN rptAtributosProducto pa ON pa.CIDPRODUCTO = p.CIDPRODUCTO
+JOIN rptConjuntosProducto cp ON cp.CIDPRODUCTO = p.CIDPRODUCTO
+WHERE cp.Conjunto = :conjunto
+"""
+
+
+def _mes_siguiente(anio, mes):
+    return (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+
+def _meses_desde(desde, hoy):
+    meses = []
+    anio, mes = desde.year, desde.month
+    while (anio, mes) <= (hoy.year, hoy.month):
+        meses.append((anio, mes))
+        anio, mes = _mes_siguiente(anio, mes)
+    return meses
+
+
+def _como_fecha(valor):
+    if isinstance(valor, str):
+        return date.fromisoformat(valor[:10])
+    return valor.date() if hasattr(valor, 'date') else valor
+
+
+class SnapshotVentas:
+    """Monthly Parquet files of the sales fact plus the product dimension"""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self._lock = threading.Lock()
+        self._leidos = {}  # ruta -> (mtime, DataFrame)
+        self._ultima_sync = None
+
+    # Rutas
+    def _ruta_mes(self, anio, mes):
+        return os.path.join(self.directorio, f'ventas_{anio:04d}_{mes:02d}.parquet')
+
+    def _ruta_estado(self):
+        return os.path.join(self.directorio, 'estado.json')
+
+    def _ruta_productos(self):
+        return os.path.join(self.directorio, 'productos.parquet')
+
+    def estado(self):
+        try:
+            with open(self._ruta_estado()) as archivo:
+                return json.load(archivo)
+        except FileNotFoundError:
+            return None
+
+    def _guardar(self, df, ruta):
+        temporal = ruta + '.tmp'
+        df.to_parquet(temporal, index=False)
+        os.replace(temporal, ruta)  # los lectores nunca ven un archivo a medias
+
+    def sincronizar(self, conn, conjunto, version_conjunto, hoy=None):
+        """Extract the months that changed since the last sync; returns the list of (anio, mes) rebuilt"""
+        if not SNAPSHOT_DISPONIBLE:
+            raise RuntimeError("El snapshot necesita pyarrow (pip install pyarrow)")
+        hoy = hoy or date.today()
+        os.makedirs(self.directorio, exist_ok=True)
+        inicio = time.perf_counter()
+
+        with self._lock:
+            estado = self.estado()
+            cursor = conn.cursor()
+            cursor.execute("SELECT ISNULL(MAX(CIDMOVIMIENTO), 0), MIN(CFECHA) FROM admMovimientos "
+                           "WHERE CIDDOCUMENTODE IN (3, 4)")
+            watermark, primera = cursor.fetchone()
+
+            if estado is None or estado.get('conjunto') != conjunto or estado.get('version') != version_conjunto \
+                    or estado.get('formato') != FORMATO:
+                # Primera carga, cambió el conjunto de productos o el formato de los archivos: todo el histórico
+                meses = _meses_desde(_como_fecha(primera), hoy) if primera else []
+            else:
+                anterior = date.fromisoformat(estado['abierto'])
+                meses = set(_meses_desde(anterior, hoy))
+                cursor.execute("SELECT DISTINCT YEAR(CFECHA), MONTH(CFECHA) FROM admMovimientos "
+                               "WHERE CIDMOVIMIENTO > ? AND CIDDOCUMENTODE IN (3, 4)", (estado['watermark'],))
+                meses.update((int(anio), int(mes)) for anio, mes in cursor.fetchall())
+                meses = sorted(meses)
+            cursor.close()
+
+            for anio, mes in meses:
+                siguiente = date(*_mes_siguiente(anio, mes), 1)
+                df = run_query(conn, EXTRACCION_QUERY, {'conjunto': conjunto, 'desde': date(anio, mes, 1),
+                                                        'hasta': siguiente})
+                self._guardar(self._tipar(df), self._ruta_mes(anio, mes))
+
+            self._guardar(run_query(conn, PRODUCTOS_QUERY, {'conjunto': conjunto}), self._ruta_productos())
+
+            nuevo = {'conjunto': conjunto, 'version': version_conjunto, 'formato': FORMATO,
+                     'watermark': int(watermark), 'abierto': hoy.replace(day=1).isoformat(), 'sincronizado': time.strftime('%Y-%m-%d %H:%M:%S')}
+            with open(self._ruta_estado() + '.tmp', 'w') as archivo:
+                json.dump(nuevo, archivo)
+            os.replace(self._ruta_estado() + '.tmp', self._ruta_estado())
+            self._ultima_sync = time.perf_counter() - inicio
+
+        logger.info(f"Snapshot sincronizado: {len(meses)} meses en {self._ultima_sync:.1f} s (watermark {watermark})")
+        return meses
+
+    @staticmethod
+    def _tipar(df):
+        df = df.reindex(columns=COLUMNAS_HECHOS)
+        df['Fecha'] = pd.to_datetime(df['Fecha'])
+        for columna in ('CIDDOCUMENTODE', 'Modulo', 'CIDAGENTE', 'CIDPRODUCTO', 'CIDCLIENTEPROVEEDOR'):
+            df[columna] = df[columna].fillna(0).astype('int32')
+        df['Unidades'] = df['Unidades'].astype(float)
+        df['Agente'] = df['Agente'].astype('category')
+        return df
+
+    def _leer(self, ruta):
+        mtime = os.path.getmtime(ruta)
+        leido = self._leidos.get(ruta)
+        if leido is None or leido[0] != mtime:
+            leido = (mtime, pd.read_parquet(ruta))
+            self._leidos[ruta] = leido
+        return leido[1]
+
+    def hechos(self, desde=None, hasta=None):
+        """Daily fact rows in [desde, hasta) with product attributes and Kilos (Unidades * KilosPorUnidad)"""
+        archivos = sorted(f for f in os.listdir(self.directorio) if f.startswith('ventas_') and f.endswith('.parquet'))
+        partes = []
+        for nombre in archivos:
+            anio, mes = int(nombre[7:11]), int(nombre[12:14])
+            inicio_mes = date(anio, mes, 1)
+            if desde is not None and date(*_mes_siguiente(anio, mes), 1) <= desde:
+                continue
+            if hasta is not None and inicio_mes >= hasta:
+                continue
+            partes.append(self._leer(os.path.join(self.directorio, nombre)))
+        hechos = pd.concat(partes, ignore_index=True) if partes else self._tipar(pd.DataFrame(columns=COLUMNAS_HECHOS))
+        if desde is not None:
+            hechos = hechos[hechos['Fecha'] >= pd.Timestamp(desde)]
+        if hasta is not None:
+            hechos = hechos[hechos['Fecha'] < pd.Timestamp(hasta)]
+
+        productos = self._leer(self._ruta_productos())
+        hechos = hechos.merge(productos, on='CIDPRODUCTO', how='inner')
+        hechos['Kilos'] = hechos['Unidades'] * hechos['KilosPorUnidad'].astype(float)
+        return hechos
+
+    def stats(self):
+        estado = self.estado() or {}
+        archivos = [f for f in os.listdir(self.directorio)] if os.path.isdir(self.directorio) else []
+        return {
+            'directory': self.directorio,
+            'available': SNAPSHOT_DISPONIBLE,
+            'months': sum(1 for f in archivos if f.startswith('ventas_') and f.endswith('.parquet')),
+            'bytes': sum(os.path.getsize(os.path.join(self.directorio, f)) for f in archivos),
+            'last_sync': estado.get('sincronizado'),
+            'last_sync_seconds': self._ultima_sync,
+            'watermark': estado.get('watermark'),
+        }
+
+
+# Reportes sobre los hechos del snapshot (mismas columnas que las consultas de SQL Server)
+
+def _ventas_modulo_1(hechos):
+    """Sales invoices of the sales module (what rptVentasDiarias keeps with CIDDOCUMENTODE = 4)"""
+    return hechos[(hechos['CIDDOCUMENTODE'] == 4) & (hechos['Modulo'] == 1)]
+
+
+def _de_agentes(hechos, agente=None):
+    hechos = hechos[hechos['Agente'].isin(AGENTES_REPORTE)]
+    if agente and agente != 'Todos':
+        hechos = hechos[hechos['Agente'] == agente]
+    return hechos
+
+
+def _en_rangos(hechos, rangos):
+    if not rangos:
+        return hechos
+    mascara = False
+    for desde, hasta in rangos:
+        mascara = mascara | ((hechos['Fecha'] >= pd.Timestamp(desde)) & (hechos['Fecha'] < pd.Timestamp(hasta)))
+    return hechos[mascara]
+
+
+def reporte_anio(hechos, agente=None):
+    hechos = _ventas_modulo_1(hechos)
+    if agente and agente != 'Todos':
+        hechos = hechos[hechos['Agente'] == agente]
+    df = hechos.groupby([hechos['Fecha'].dt.year.rename('Año'), hechos['Fecha'].dt.month.rename('Mes')])['Kilos'] \
+        .sum().rename('KilosTotales').reset_index()
+    df['ToneladasTotales'] = df['KilosTotales'] / 1000.0
+    return df.sort_values(['Año', 'Mes']).reset_index(drop=True)
+
+
+def reporte_anio_grafica(hechos, year1=None, year2=None, start_month=1, end_month=12, agente=None):
+    hechos = _ventas_modulo_1(hechos)
+    if agente and agente != 'Todos':
+        hechos = hechos[hechos['Agente'] == agente]
+    anios = [int(a) for a in (year1, year2) if a]
+    if year1:
+        hechos = hechos[hechos['Fecha'].dt.year.isin(anios)]
+    meses = hechos['Fecha'].dt.month
+    hechos = hechos[(meses >= int(start_month)) & (meses <= int(end_month))]
+    df = hechos.groupby([hechos['Fecha'].dt.year.rename('Anio'), hechos['Fecha'].dt.month.rename('Mes')])['Kilos'] \
+        .sum().rename('ToneladasTotales').reset_index()
+    df['ToneladasTotales'] = df['ToneladasTotales'] / 1000.0
+    return df.sort_values(['Anio', 'Mes']).reset_index(drop=True)
+
+
+def ventas_mes(hechos, agente=None, anio=None, mes=None):
+    hechos = _de_agentes(_ventas_modulo_1(hechos), agente)
+    if anio and mes:
+        hechos = hechos[(hechos['Fecha'].dt.year == int(anio)) & (hechos['Fecha'].dt.month == int(mes))]
+    df = hechos.groupby([hechos['Fecha'].dt.year.rename('Anio'), hechos['Fecha'].dt.month.rename('Mes'),
+                         hechos['Agente'].astype(str)])['Kilos'].sum().rename('KilosTotales').reset_index()
+    df['ToneladasTotales'] = df['KilosTotales'] / 1000.0
+    return df.sort_values(['Anio', 'Mes', 'Agente']).reset_index(drop=True)
+
+
+def ventas_dia(hechos, rangos, agente=None):
+    hechos = _en_rangos(_de_agentes(hechos, agente), rangos)
+    hechos = hechos.assign(
+        Agente=hechos['Agente'].astype(str),
+        TipoAgente=hechos['Empresa'].where(hechos['Agente'] != 'MOLIENDAS', 'Moliendas'),
+        Toneladas=hechos['Kilos'] / 1000.0,
+    )
+    df = hechos.groupby(['RazonSocial', 'CCODIGOPRODUCTO', 'CNOMBREPRODUCTO', 'Fecha', 'Agente', 'Categoria',
+                         'TipoAgente'], dropna=False)[['Unidades', 'Toneladas']].sum().reset_index()
+    df = df.rename(columns={'RazonSocial': 'CRAZONSOCIAL'})
+    df['Fecha'] = df['Fecha'].dt.date
+    df = df[['CRAZONSOCIAL', 'CCODIGOPRODUCTO', 'CNOMBREPRODUCTO', 'Fecha', 'Agente', 'Categoria', 'TipoAgente',
+             'Unidades', 'Toneladas']]
+    return df.sort_values(['Fecha', 'Agente', 'CRAZONSOCIAL', 'CCODIGOPRODUCTO'],
+                          ascending=[False, True, True, True]).reset_index(drop=True)
+
+
+def ventas_dia_grafica(hechos, rangos, agente=None):
+    hechos = _en_rangos(_de_agentes(hechos, agente), rangos)
+    fecha = hechos['Fecha'].dt
+    df = hechos.groupby([fecha.year.rename('Anio'), fecha.month.rename('Mes'), fecha.day.rename('Dia')])['Kilos'] \
+        .sum().rename('ToneladasTotales').reset_index()
+    df['ToneladasTotales'] = df['ToneladasTotales'] / 1000.0
+    return df.sort_values(['Anio', 'Mes', 'Dia']).reset_index(drop=True)
+
+
+def cobertura_base(hechos, agente=None):
+    """Kilos per client, agent and month (the grain reportes.coberturas works on).
+
+    Clients are grouped by id; each one shows the RazonSocial of its latest document.
+    """
+    hechos = _de_agentes(hechos[hechos['CIDDOCUMENTODE'] == 4], agente)
+    df = hechos.groupby(['CIDCLIENTEPROVEEDOR', hechos['Agente'].astype(str),
+                         hechos['Fecha'].dt.month.rename('NumMes')])['Kilos'].sum().rename('KilosTotales').reset_index()
+    nombres = hechos.sort_values('Fecha', kind='stable').groupby('CIDCLIENTEPROVEEDOR')['RazonSocial'].last()
+    df.insert(1, 'RazonSocial', df['CIDCLIENTEPROVEEDOR'].map(nombres))
+    return df
+
+
+def serie_objetivos(hechos):
+    """Tonnage per (Agente, Anio, Mes), the input of reportes.objetivos.calcular_objetivos"""
+    hechos = _de_agentes(_ventas_modulo_1(hechos))
+    df = hechos.groupby([hechos['Agente'].astype(str), hechos['Fecha'].dt.year.rename('Anio'),
+                         hechos['Fecha'].dt.month.rename('Mes')])['Kilos'].sum().rename('Toneladas').reset_index()
+    df['Toneladas'] = df['Toneladas'] / 1000.0
+    return df[df['Toneladas'] != 0].reset_index(drop=True)
@@ -0,0 +1,173 @@
+"""
+Typed, compact report frames.
+
+Report frames come from the driver with object columns for names, dates and
+DECIMAL sums (Decimal objects) and int64/float64 for the rest. compactar()
+applies the schema declared for each report before the frame is cached:
+
+- CATEGORIA: repeated strings (agent, client, product, category) become
+  categoricals, one code per row and each distinct string stored once;
+- FECHA: dates are parsed once per distinct value into datetime.date and
+  kept as a categorical of them, so pages and the JSON API still see dates;
+- ENTERO: integers (years, months, ids) are downcast to the smallest type;
+- REAL: Decimal and other numeric objects become float64. Floats are not
+  downcast to float32: totals and graphs are summed from these columns.
+
+A column is only made categorical when each value repeats at least
+REPETICION_MINIMA times on average; columns missing from the frame or from
+the schema are left as they are. estadisticas records memory_usage(deep=True)
+before and after per report.
+
+Categorical gaps come out of to_dict() as NaN; the templates get their rows
+from registros(), which turns them into None like an object column.
+"""
+
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CATEGORIA = 'categoria'
+FECHA = 'fecha'
+ENTERO = 'entero'
+REAL = 'real'
+
+# Una columna se vuelve categórica si cada valor aparece, en promedio, al menos estas veces
+REPETICION_MINIMA = 2
+
+ESQUEMAS = {
+    'reporte_anio': {'Año': ENTERO, 'Mes': ENTERO, 'KilosTotales': REAL, 'ToneladasTotales': REAL},
+    'reporte_anio_grafica': {'Anio': ENTERO, 'Mes': ENTERO, 'ToneladasTotales': REAL},
+    # Con nombres (caché de reportes) o con ids y marca (mes abierto incremental)
+    'ventas_dia': {
+        'CRAZONSOCIAL': CATEGORIA, 'CCODIGOPRODUCTO': CATEGORIA, 'CNOMBREPRODUCTO': CATEGORIA,
+        'CIDPRODUCTO': ENTERO, 'Fecha': FECHA, 'Agente': CATEGORIA, 'CIDAGENTE': ENTERO,
+        'Categoria': CATEGORIA, 'TipoAgente': CATEGORIA, 'Unidades': REAL, 'Toneladas': REAL,
+        'UltimoMovimiento': ENTERO,
+    },
+    'ventas_dia_grafica': {'Anio': ENTERO, 'Mes': ENTERO, 'Dia': ENTERO, 'ToneladasTotales': REAL},
+    'ventas_mes': {'Anio': ENTERO, 'Mes': ENTERO, 'Agente': CATEGORIA, 'KilosTotales': REAL,
+                   'ToneladasTotales': REAL},
+    'objetivos': {'Agente': CATEGORIA, 'Anio': ENTERO, 'Mes': ENTERO, 'Objetivo': REAL, 'Avance': REAL,
+                  'PorcAvance': REAL, 'Tendencia': REAL, 'PromedioDiario': REAL},
+    'coberturas': {'CIDCLIENTEPROVEEDOR': ENTERO, 'RazonSocial': CATEGORIA, 'Agente': CATEGORIA, 'NumMes': ENTERO,
+                   'KilosTotales': REAL},
+}
+
+
+def _repetida(distintos, filas):
+    return filas > 0 and distintos * REPETICION_MINIMA <= filas
+
+
+def _categoria(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype) or serie.dtype != object:
+        return serie
+    if not _repetida(serie.nunique(dropna=True), len(serie)):
+        return serie
+    return serie.astype('category')
+
+
+def _fecha(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    # Cada fecha distinta se convierte una sola vez
+    codigos, distintas = pd.factorize(serie, use_na_sentinel=True)
+    fechas = pd.to_datetime(pd.Series(distintas, dtype=object)).dt.date.to_numpy(dtype=object)
+    valores = np.append(fechas, None)[codigos]
+    if not _repetida(len(fechas), len(serie)):
+        return pd.Series(valores, index=serie.index, dtype=object)
+    return pd.Series(pd.Categorical(valores), index=serie.index)
+
+
+def _entero(serie):
+    serie = pd.to_numeric(serie)
+    if serie.isna().any():
+        return serie
+    return pd.to_numeric(serie, downcast='integer')
+
+
+def _real(serie):
+    return pd.to_numeric(serie).astype(np.float64)
+
+
+_CONVERSIONES = {CATEGORIA: _categoria, FECHA: _fecha, ENTERO: _entero, REAL: _real}
+
+
+def compactar(df, esquema):
+    """New frame with the columns of `esquema` converted to their compact types"""
+    if not isinstance(df, pd.DataFrame) or not esquema:
+        return df
+    columnas = {}
+    for columna in df.columns:
+        tipo = esquema.get(columna)
+        columnas[columna] = df[columna] if tipo is None else _CONVERSIONES[tipo](df[columna])
+    return pd.DataFrame(columnas, index=df.index)
+
+
+def memoria(df):
+    """memory_usage(deep=True) of a frame, in bytes"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class EstadisticasCompactacion:
+    """Thread-safe bytes before and after compaction per report"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_reporte = {}
+
+    def registrar(self, nombre, antes, despues):
+        with self._lock:
+            entrada = self._por_reporte.setdefault(nombre, {'frames': 0, 'bytes_before': 0, 'bytes_after': 0})
+            entrada['frames'] += 1
+            entrada['bytes_before'] += antes
+            entrada['bytes_after'] += despues
+
+    def stats(self):
+        with self._lock:
+            return {
+                nombre: {**entrada, 'ratio': round(entrada['bytes_before'] / entrada['bytes_after'], 2)
+                         if entrada['bytes_after'] else None}
+                for nombre, entrada in self._por_reporte.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._por_reporte.clear()
+
+
+estadisticas = EstadisticasCompactacion()
+
+
+def compactar_resultado(valor, esquema, nombre=None):
+    """compactar() for a report result: a frame or a (page, total) tuple; records the memory saved"""
+    if isinstance(valor, tuple):
+        return tuple(compactar_resultado(v, esquema, nombre) for v in valor)
+    if not isinstance(valor, pd.DataFrame):
+        return valor
+    antes = memoria(valor)
+    compacto = compactar(valor, esquema)
+    despues = memoria(compacto)
+    if nombre is not None:
+        estadisticas.registrar(nombre, antes, despues)
+    logger.debug(f"{nombre or 'reporte'}: {len(compacto)} filas, {antes} -> {despues} bytes")
+    return compacto
+
+
+def compactador(nombre, esquema=None):
+    """Callable compacting the results of report `nombre` (with ESQUEMAS[nombre] by default)"""
+    esquema = ESQUEMAS[nombre] if esquema is None else esquema
+    return lambda valor: compactar_resultado(valor, esquema, nombre)
+
+
+def registros(df):
+    """Rows of a report frame for the templates, with None (not NaN) for categorical gaps"""
+    categoricas = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    if categoricas:
+        df = df.copy(deep=False)
+        for columna in categoricas:
+            df[columna] = df[columna].astype(object).where(df[columna].notna(), None)
+    return df.to_dict('records')
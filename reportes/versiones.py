@@ -0,0 +1,124 @@
+"""
+Data-version fingerprints for conditional GET on report pages, the JSON API and exports.
+
+A report response is identified by the report name, its parameters, whether
+it only covers closed periods and the version of the data behind it:
+
+- Closed periods (past months and years) only change through late captures
+  or edits of product attributes and sets, and every one of those invalidates
+  the report cache. The cache version (shared by the workers through
+  CacheCompartida) is therefore enough, and no SQL runs to check it.
+- Open periods also depend on the admMovimientos watermark (max CIDMOVIMIENTO,
+  max CFECHA) and on today's date, because default filters ("this month")
+  move with it. The watermark is re-read at most every `ttl` seconds.
+
+A cached result can be older than the data version at response time, so
+the fingerprint of a response is rebuilt from the versions of the results it
+actually served: etiqueta() is recorded with each result when it is computed
+(reportes.cache.versiones_servidas). A response mixing several versions gets
+an ETag no request will match again, and one served from an untagged result
+gets none.
+
+The ETag is a hash of those parts. Last-Modified is the moment this process
+first saw the current data version, so If-Modified-Since never answers 304
+for data that changed after the client fetched it.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from datetime import date, datetime, timezone
+
+from reportes.cache import normalizar_params
+
+logger = logging.getLogger(__name__)
+
+
+class VersionDatos:
+    """ETag and Last-Modified of report responses.
+
+    `leer_watermark()` returns (max CIDMOVIMIENTO, max CFECHA) and
+    `version_cache()` the report cache version; `codigo` identifies the
+    application build (templates and queries) so a deploy changes the ETags.
+    """
+
+    def __init__(self, leer_watermark, version_cache, ttl=30, codigo=''):
+        self.leer_watermark = leer_watermark
+        self.version_cache = version_cache
+        self.ttl = ttl
+        self.codigo = codigo
+        self._lock = threading.Lock()
+        self._watermark = None
+        self._leido = 0.0
+        self._vistas = {}
+
+    def watermark(self):
+        """Cached (movimiento, fecha) watermark, or None if it cannot be read"""
+        with self._lock:
+            if self._watermark is not None and time.monotonic() - self._leido < self.ttl:
+                return self._watermark
+            try:
+                movimiento, fecha = self.leer_watermark()
+            except Exception as e:
+                logger.warning(f"No se pudo leer el watermark de admMovimientos: {e}")
+                return None
+            self._watermark = (int(movimiento or 0), str(fecha or ''))
+            self._leido = time.monotonic()
+            return self._watermark
+
+    def invalidar(self):
+        """Force the next fingerprint of an open period to re-read the watermark"""
+        with self._lock:
+            self._leido = 0.0
+
+    def _desde(self, tipo, version):
+        """When this process first saw `version` of the closed or open data (UTC, whole seconds)"""
+        with self._lock:
+            vista = self._vistas.get(tipo)
+            if vista is None or vista[0] != version:
+                vista = self._vistas[tipo] = (version, datetime.now(timezone.utc).replace(microsecond=0))
+            return vista[1]
+
+    def etiqueta(self, cerrado):
+        """Data version to record with a result computed now: (cache version, watermark or None if closed)"""
+        if cerrado:
+            return self.version_cache(), None
+        watermark = self.watermark()
+        return None if watermark is None else (self.version_cache(), watermark)
+
+    def _version_servida(self, servidas, cerrado):
+        """(cache version, watermark) of the results served, or None if one of them is untagged"""
+        if any(etiqueta is None for etiqueta in servidas):
+            return None
+        caches = sorted({etiqueta[0] for etiqueta in servidas})
+        watermarks = sorted({etiqueta[1] for etiqueta in servidas if etiqueta[1] is not None})
+        cache = caches[0] if len(caches) == 1 else ('mezcla', tuple(caches))
+        if cerrado:
+            return cache, None
+        if not watermarks:
+            # Sólo resultados de periodos cerrados: el watermark no cambia la respuesta
+            watermark = self.watermark()
+        else:
+            watermark = watermarks[0] if len(watermarks) == 1 else ('mezcla', tuple(watermarks))
+        return None if watermark is None else (cache, watermark)
+
+    def huella(self, reporte, params, cerrado, hoy=None, servidas=None):
+        """(etag, last_modified) of a report response, or None when the data version is unknown.
+
+        Without `servidas` the current data version is used (the check before
+        computing a response); with it, the version of the results served.
+        """
+        if servidas:
+            etiqueta = self._version_servida(servidas, cerrado)
+        else:
+            etiqueta = self.etiqueta(cerrado)
+        if etiqueta is None:
+            return None
+        version = (etiqueta[0],)
+        if not cerrado:
+            version += (etiqueta[1], (hoy or date.today()).isoformat())
+        tipo = 'cerrado' if cerrado else 'abierto'
+        partes = (self.codigo, reporte, normalizar_params(params), tipo, version)
+        etag = hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()[:24]
+        return etag, self._desde(tipo, version)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Load test for the report pages.
+
+Sends concurrent GET requests to a running instance for a fixed time and
+prints throughput and latency percentiles per URL. Run it once against the
+development server (python app.py) and once against gunicorn
+(gunicorn -c gunicorn.conf.py app:app) with the same arguments to compare.
+
+    python scripts/load_test.py https://localhost:5000 --concurrency 16 --duration 60
+"""
+
+import argparse
+import ssl
+import statistics
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+
+RUTAS = [
+    '/reporte_anio',
+    '/reporte_anio?year1=2024&year2=2025',
+    '/ventas_agente_dia',
+    '/ventas_agente_mes',
+    '/objetivos_venta',
+    '/reporte_coberturas',
+]
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def cliente(base, rutas, hasta, resultados, errores, contexto, lock, indice):
+    i = indice
+    while time.monotonic() < hasta:
+        ruta = rutas[i % len(rutas)]
+        i += 1
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base + ruta, timeout=300, context=contexto) as respuesta:
+                respuesta.read()
+                ok = respuesta.status == 200
+        except Exception:
+            ok = False
+        duracion = time.perf_counter() - inicio
+        with lock:
+            if ok:
+                resultados[ruta].append(duracion)
+            else:
+                errores[ruta] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('base', help='e.g. https://localhost:5000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=int, default=60, help='seconds')
+    parser.add_argument('--path', action='append', help='URL path to request (repeatable); default: every report page')
+    args = parser.parse_args()
+
+    rutas = args.path or RUTAS
+    contexto = ssl._create_unverified_context()  # certificado autofirmado de cert.pem
+    resultados = defaultdict(list)
+    errores = defaultdict(int)
+    lock = threading.Lock()
+    hasta = time.monotonic() + args.duration
+
+    hilos = [threading.Thread(target=cliente, args=(args.base.rstrip('/'), rutas, hasta, resultados, errores,
+                                                    contexto, lock, i))
+             for i in range(args.concurrency)]
+    inicio = time.monotonic()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    transcurrido = time.monotonic() - inicio
+
+    total = sum(len(v) for v in resultados.values())
+    print(f"{args.base}  concurrencia={args.concurrency}  duración={transcurrido:.0f}s")
+    print(f"{'ruta':45} {'ok':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for ruta in rutas:
+        tiempos = resultados[ruta]
+        print(f"{ruta:45} {len(tiempos):6} {errores[ruta]:5} "
+              f"{percentil(tiempos, 50) * 1000:9.0f} {percentil(tiempos, 95) * 1000:9.0f} "
+              f"{percentil(tiempos, 99) * 1000:9.0f}")
+    todos = [t for v in resultados.values() for t in v]
+    print(f"total: {total} peticiones, {total / transcurrido:.1f} req/s, "
+          f"media {statistics.mean(todos) * 1000 if todos else 0:.0f} ms, errores {sum(errores.values())}")
+
+
+if __name__ == '__main__':
+    main()
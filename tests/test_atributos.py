@@ -0,0 +1,36 @@
+"""
+Pruebas de clasificación de atributos de producto (kilos, categoría, empresa)
+"""
+
+from reportes.atributos import clasificar_producto
+
+
+def test_kilos_por_presentacion():
+    assert clasificar_producto('AZUCAR ESTANDAR GRANULADA SACO 25 KG.')[0] == 25
+    assert clasificar_producto('AZUCAR REFINADO GRANULADO SACO  25 KG.')[0] == 25
+    assert clasificar_producto('AZUCAR REFINADA SACO 50KG')[0] == 50
+    assert clasificar_producto('AZUCAR ESTANDAR GRANULADA  C/10 BOLSAS 2 LBS')[0] == 0.907
+    assert clasificar_producto('AZUCAR GLASS 500 GR')[0] == 0.5
+    assert clasificar_producto('AZUCAR MASCABADO 50 LB')[0] == 22.68
+    assert clasificar_producto('SUPER SACO 1000 KG')[0] == 1000
+
+
+def test_orden_de_reglas_igual_al_case():
+    # '%1 KG%' se evalúa antes que '%1000 KG%'
+    assert clasificar_producto('AZUCAR 1 KG')[0] == 1
+    # '%25 KG%' se evalúa antes que '%5 KG%'
+    assert clasificar_producto('SACO 25 KG')[0] == 25
+    assert clasificar_producto('AZUCAR SIN PRESENTACION')[0] == 0
+
+
+def test_categoria_por_nombre_y_codigo():
+    assert clasificar_producto('AZUCAR C/10 BOLSAS 2 LBS', 'PESGR07')[1] == 'Empaquetado'
+    assert clasificar_producto('GLUCOSA DE MAIZ', 'PG3EN01')[1] == 'Glucosa'
+    assert clasificar_producto('AZUCAR REFINADA SACO 25 KG', 'PREGR10')[1] == 'Refinada Granulada'
+    assert clasificar_producto('AZUCAR ESTANDAR SACO 25 KG', 'PESGR10')[1] == 'Estandar Granulada'
+    assert clasificar_producto('AZUCAR ESTANDAR SACO 25 KG', 'MESCO25')[1] == 'Confeccion'
+    assert clasificar_producto('ZZZ', 'ZZZ')[1] == 'otro'
+
+
+def test_empresa_por_defecto():
+    assert clasificar_producto('SACO 25 KG')[2] == 'Switen'
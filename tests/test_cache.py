@@ -0,0 +1,148 @@
+"""
+Pruebas de la caché de resultados de reportes (reportes/cache.py)
+"""
+
+import threading
+
+import pandas as pd
+import pytest
+
+from reportes.cache import (CacheReportes, normalizar_params, refrescar_antes, resultados_vencidos,
+                            seguir_vencidos, tamano_resultado)
+from reportes.consultas import PresupuestoExcedido
+
+
+def frame(filas=10):
+    return pd.DataFrame({'Agente': ['MOLIENDAS'] * filas, 'Kilos': range(filas)})
+
+
+def test_decorator_caches_by_normalized_params():
+    cache = CacheReportes()
+    llamadas = []
+
+    @cache.report('ventas_mes')
+    def reporte(agente=None, anio=None, mes=None):
+        llamadas.append((agente, anio, mes))
+        return frame()
+
+    primero = reporte('Todos', 2024, 5)
+    assert reporte(None, '2024', 5) is primero
+    assert reporte(agente='MOLIENDAS', anio=2024, mes=5) is not primero
+    assert len(llamadas) == 2
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 2
+
+
+def test_open_period_expires_but_closed_period_does_not():
+    cache = CacheReportes(ttl_abierto=-1)
+    cache.set(('abierto', ()), frame())
+    cache.set(('cerrado', ()), frame(), cerrado=True)
+    assert cache.get(('abierto', ())) is None
+    assert cache.get(('cerrado', ())) is not None
+
+
+def test_expired_entry_is_still_available_as_stale():
+    cache = CacheReportes(ttl_abierto=-1)
+    df = frame()
+    cache.set(('abierto', ()), df)
+    valor, edad = cache.get_stale(('abierto', ()))
+    assert valor is df and edad >= 0
+    assert cache.get_stale(('otro', ())) == (None, None)
+
+
+def test_lru_eviction_respects_byte_budget():
+    tamano = tamano_resultado(frame())
+    cache = CacheReportes(max_bytes=tamano * 2)
+    cache.set(('a', ()), frame())
+    cache.set(('b', ()), frame())
+    cache.get(('a', ()))  # 'a' pasa a ser la más reciente
+    cache.set(('c', ()), frame())
+    assert cache.get(('b', ())) is None
+    assert cache.get(('a', ())) is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] <= cache.max_bytes
+
+
+def test_invalidate_by_report():
+    cache = CacheReportes()
+    cache.set(('coberturas', (('anio', 2023),)), frame(), cerrado=True)
+    cache.set(('ventas_mes', ()), frame())
+    assert cache.invalidar('coberturas') == 1
+    assert cache.get(('coberturas', (('anio', 2023),))) is None
+    assert cache.invalidar() == 1
+
+
+def test_paginated_result_size_counts_frame():
+    assert tamano_resultado((frame(100), 100)) > tamano_resultado(frame(1))
+    assert normalizar_params({'agente': 'Todos', 'page': '2', 'fecha': None}) == (('page', 2),)
+
+
+def test_budget_overrun_serves_the_stale_result():
+    cache = CacheReportes(ttl_abierto=-1)
+    lento = [False]
+
+    @cache.report('objetivos')
+    def reporte(agente=None):
+        if lento[0]:
+            raise PresupuestoExcedido('tiempo agotado')
+        return frame()
+
+    anterior = reporte('MOLIENDAS')
+    lento[0] = True
+    seguir_vencidos()
+    assert reporte('MOLIENDAS') is anterior
+    assert [v['report'] for v in resultados_vencidos()] == ['objetivos']
+    assert cache.stats()['budget_fallbacks'] == 1
+    with pytest.raises(PresupuestoExcedido):
+        reporte('MDLZ P2')  # sin resultado previo no hay respaldo
+
+
+def test_requests_waiting_on_an_overrun_get_the_fallback_without_recomputing():
+    cache = CacheReportes(ttl_abierto=-1, espera_excedido=60)
+    clave = ('coberturas', ())
+    cache.set(clave, frame())
+    llamadas = []
+    empezo, seguir = threading.Event(), threading.Event()
+
+    def lento():
+        llamadas.append(1)
+        empezo.set()
+        seguir.wait(5)
+        raise PresupuestoExcedido('tiempo agotado')
+
+    resultados = []
+    primero = threading.Thread(target=lambda: resultados.append(cache.obtener(clave, lento)))
+    primero.start()
+    empezo.wait(5)
+    esperando = [threading.Thread(target=lambda: resultados.append(cache.obtener(clave, lento))) for _ in range(3)]
+    for hilo in esperando:
+        hilo.start()
+    seguir.set()
+    for hilo in [primero, *esperando]:
+        hilo.join(5)
+
+    assert len(llamadas) == 1
+    assert len(resultados) == 4 and cache.stats()['budget_fallbacks'] == 4
+
+    # Pasada la espera se vuelve a calcular
+    cache.espera_excedido = 0
+    nuevo = frame(3)
+    assert cache.obtener(clave, lambda: nuevo) is nuevo
+
+
+def test_refresh_margin_recomputes_entries_about_to_expire():
+    cache = CacheReportes(ttl_abierto=60)
+    llamadas = []
+
+    @cache.report('ventas_dia', lambda p: p['cerrado'])
+    def reporte(cerrado=False):
+        llamadas.append(cerrado)
+        return frame()
+
+    reporte()
+    reporte(cerrado=True)
+    with refrescar_antes(120):
+        reporte()
+        reporte(cerrado=True)
+    reporte()
+    assert llamadas == [False, True, False]
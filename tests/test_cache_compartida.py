@@ -0,0 +1,125 @@
+"""
+Pruebas de la caché compartida entre workers (reportes/cache_compartida.py)
+"""
+
+import threading
+import time
+
+import pandas as pd
+
+from reportes.cache import CacheReportes, seguir_vencidos, versiones_servidas
+from reportes.cache_compartida import CacheCompartida
+
+
+def frame():
+    return pd.DataFrame({'Agente': ['MOLIENDAS', 'MDLZ P2'], 'Kilos': [10.5, 3.0]})
+
+
+def workers(tmp_path, n=2):
+    """Varias cachés en memoria sobre el mismo archivo, como los workers de gunicorn"""
+    ruta = str(tmp_path / 'cache.sqlite')
+    return [CacheReportes(compartida=CacheCompartida(ruta, espera=0.01), revisar_generacion=0) for _ in range(n)]
+
+
+def test_second_worker_reads_result_computed_by_first(tmp_path):
+    a, b = workers(tmp_path)
+    llamadas = []
+
+    def calcular():
+        llamadas.append(1)
+        return frame()
+
+    a.obtener(('reporte_anio', ()), calcular, cerrado=True)
+    resultado = b.obtener(('reporte_anio', ()), calcular, cerrado=True)
+    assert len(llamadas) == 1
+    pd.testing.assert_frame_equal(resultado, frame())
+    assert b.stats()['shared']['hits'] == 1
+
+
+def test_data_version_travels_with_the_shared_result(tmp_path):
+    a, b = workers(tmp_path)
+    a.etiquetar = lambda cerrado: ('g1', (100, '2025-03-10 00:00:00'))
+    b.etiquetar = lambda cerrado: ('g1', (101, '2025-03-10 00:05:00'))
+
+    a.obtener(('ventas_dia', ()), frame, cerrado=False)
+    seguir_vencidos()
+    b.obtener(('ventas_dia', ()), frame, cerrado=False)
+    # b sirve el resultado de a, calculado con el watermark anterior
+    assert versiones_servidas() == [('g1', (100, '2025-03-10 00:00:00'))]
+
+
+def test_only_one_worker_computes_a_missing_key(tmp_path):
+    caches = workers(tmp_path, 3)
+    llamadas = []
+    resultados = []
+
+    def calcular():
+        llamadas.append(1)
+        time.sleep(0.2)
+        return frame()
+
+    hilos = [threading.Thread(target=lambda c=c: resultados.append(c.obtener(('objetivos', ()), calcular)))
+             for c in caches]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert len(llamadas) == 1 and len(resultados) == 3
+
+
+def test_invalidation_reaches_other_workers_memory(tmp_path):
+    a, b = workers(tmp_path)
+    b.obtener(('coberturas', ()), frame, cerrado=True)
+    assert b.get(('coberturas', ())) is not None
+    a.invalidar()
+    assert b.get(('coberturas', ())) is None
+    assert b.get_stale(('coberturas', ())) == (None, None)
+
+
+def test_results_round_trip_without_pickle(tmp_path):
+    from datetime import date
+    from decimal import Decimal
+
+    from reportes.tipos import ESQUEMAS, compactar
+
+    detalle = compactar(pd.DataFrame({
+        'CRAZONSOCIAL': ['A', 'A', None, 'B'],
+        'Fecha': [date(2025, 3, 1)] * 4,
+        'CIDAGENTE': [3, 3, 7, 7],
+        'Toneladas': [1.5, float('nan'), 0.25, 2.0],
+    }), ESQUEMAS['ventas_dia'])
+    crudo = pd.DataFrame({'Unidades': [Decimal('1.25'), None], 'Cuando': pd.to_datetime(['2025-03-01', None])},
+                         index=[5, 9])
+    compartida = CacheCompartida(str(tmp_path / 'cache.sqlite'))
+    compartida.set(('ventas_dia', ()), (detalle, 4))
+    compartida.set(('otro', ()), crudo)
+
+    valor, _, vigente = compartida.get(('ventas_dia', ()))
+    assert vigente and valor[1] == 4
+    pd.testing.assert_frame_equal(valor[0], detalle)
+    pd.testing.assert_frame_equal(compartida.get(('otro', ()))[0], crudo)
+
+    # Una entrada en pickle (versión anterior o plantada) no se carga: cuenta como fallo
+    import pickle
+    conn = compartida._conexion()
+    conn.execute("UPDATE entradas SET valor = ? WHERE reporte = 'otro'", (pickle.dumps(crudo),))
+    assert compartida.get(('otro', ())) == (None, None, False)
+
+
+def test_refuses_files_other_users_can_write(tmp_path):
+    import os
+
+    import pytest
+
+    ruta = tmp_path / 'compartida' / 'cache.sqlite'
+    CacheCompartida(str(ruta))
+    assert os.stat(ruta.parent).st_mode & 0o777 == 0o700
+    assert os.stat(ruta).st_mode & 0o077 == 0
+
+    os.chmod(ruta, 0o666)
+    with pytest.raises(PermissionError):
+        CacheCompartida(str(ruta))
+    os.chmod(ruta, 0o600)
+    os.chmod(ruta.parent, 0o777)
+    with pytest.raises(PermissionError):
+        CacheCompartida(str(ruta))
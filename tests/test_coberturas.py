@@ -0,0 +1,66 @@
+"""
+Pruebas de las vistas de cobertura derivadas del escaneo agrupado (reportes/coberturas.py)
+"""
+
+import pandas as pd
+
+from reportes.coberturas import MESES, detalle_cobertura, matriz_cobertura
+from reportes.paginacion import pagina_de
+
+
+def grano():
+    return pd.DataFrame({
+        'CIDCLIENTEPROVEEDOR': [7, 7, 7, 8],
+        'RazonSocial': ['PANADERIA SOL', 'PANADERIA SOL', 'PANADERIA SOL', 'DULCES LUNA'],
+        'Agente': ['MOLIENDAS', 'MDLZ P2', 'MOLIENDAS', 'MOSTRADOR 1'],
+        'NumMes': [1, 1, 3, 12],
+        'KilosTotales': [100.0, 50.0, 25.0, 10.0],
+    })
+
+
+def test_detail_has_sold_rows_and_pending_months():
+    detalle = detalle_cobertura(grano(), 2024)
+    sol = detalle[detalle['RazonSocial'] == 'PANADERIA SOL']
+    assert len(sol) == 3 + 10  # 3 filas vendidas, 10 meses pendientes
+    enero = sol[sol['Mes'] == 'Enero']
+    assert enero['Agente'].tolist() == ['MDLZ P2', 'MOLIENDAS']
+    assert (enero['Estado'] == 'Vendido').all()
+    pendientes = sol[sol['Estado'] == 'Pendiente']
+    assert pendientes['Mes'].tolist() == [m for m in MESES if m not in ('Enero', 'Marzo')]
+    assert (pendientes['KilosTotales'] == 0).all() and pendientes['Agente'].isna().all()
+    assert detalle['RazonSocial'].iloc[0] == 'DULCES LUNA' and (detalle['Anio'] == 2024).all()
+
+
+def test_matrix_pivots_months_and_totals():
+    matriz = matriz_cobertura(grano())
+    assert matriz.columns.tolist() == ['CIDCLIENTEPROVEEDOR', 'RazonSocial', 'Agente'] + MESES + ['TotalAnual']
+    fila = matriz[(matriz['RazonSocial'] == 'PANADERIA SOL') & (matriz['Agente'] == 'MOLIENDAS')].iloc[0]
+    assert fila['Enero'] == 100.0 and fila['Marzo'] == 25.0 and fila['Febrero'] == 0.0
+    assert fila['TotalAnual'] == 125.0
+    assert matriz['TotalAnual'].sum() == grano()['KilosTotales'].sum()
+
+
+def test_clients_with_the_same_name_stay_apart():
+    homonimos = pd.concat([grano(), pd.DataFrame({
+        'CIDCLIENTEPROVEEDOR': [9], 'RazonSocial': ['PANADERIA SOL'], 'Agente': ['MOLIENDAS'], 'NumMes': [2],
+        'KilosTotales': [40.0],
+    })], ignore_index=True)
+
+    matriz = matriz_cobertura(homonimos)
+    sol = matriz[(matriz['RazonSocial'] == 'PANADERIA SOL') & (matriz['Agente'] == 'MOLIENDAS')]
+    assert sol['CIDCLIENTEPROVEEDOR'].tolist() == [7, 9]
+    assert sol['TotalAnual'].tolist() == [125.0, 40.0]
+
+    # Cada cliente tiene sus propios meses pendientes: febrero lo compró solo el 9
+    detalle = detalle_cobertura(homonimos, 2024)
+    febrero = detalle[detalle['Mes'] == 'Febrero'].set_index('CIDCLIENTEPROVEEDOR')['Estado'].to_dict()
+    assert febrero == {7: 'Pendiente', 8: 'Pendiente', 9: 'Vendido'}
+    assert len(detalle[detalle['CIDCLIENTEPROVEEDOR'] == 9]) == 12
+
+
+def test_empty_scan_and_in_process_pages():
+    vacio = grano().iloc[0:0]
+    assert detalle_cobertura(vacio, 2024).empty
+    assert matriz_cobertura(vacio).empty
+    pagina, total = pagina_de(detalle_cobertura(grano(), 2024), 2, 10)
+    assert total == 25 and len(pagina) == 10
@@ -0,0 +1,46 @@
+"""
+Pruebas de la codificación columnar de la API JSON (reportes/columnar.py)
+"""
+
+import json
+from datetime import date
+
+import pandas as pd
+
+from reportes.columnar import a_columnar, de_columnar, json_columnar
+
+
+def test_repeated_strings_are_dictionary_encoded():
+    df = pd.DataFrame({
+        'Agente': ['MOLIENDAS', 'MOSTRADOR 1', 'MOLIENDAS', 'MOLIENDAS'],
+        'CRAZONSOCIAL': ['A', 'B', 'C', 'D'],
+        'Fecha': [date(2025, 1, 2)] * 4,
+        'Toneladas': [1.5, 2.0, float('nan'), 0.25],
+    })
+    payload = a_columnar(df, report='ventas_dia')
+
+    assert payload['report'] == 'ventas_dia' and payload['rows'] == 4
+    assert payload['columns'] == ['Agente', 'CRAZONSOCIAL', 'Fecha', 'Toneladas']
+    assert payload['dictionaries']['Agente'] == ['MOLIENDAS', 'MOSTRADOR 1']
+    assert payload['data'][0] == [0, 1, 0, 0]
+    # Sin repetición no conviene el diccionario
+    assert 'CRAZONSOCIAL' not in payload['dictionaries'] and payload['data'][1] == ['A', 'B', 'C', 'D']
+    assert payload['data'][3] == [1.5, 2.0, None, 0.25]
+
+
+def test_json_round_trip():
+    df = pd.DataFrame({
+        'Agente': ['MDLZ P2', None, 'MDLZ P2', 'MDLZ P2'],
+        'Mes': [1, 2, 3, 4],
+        'Fecha': pd.to_datetime(['2025-01-01', '2025-01-02', '2025-01-02', '2025-01-03']),
+        'KilosTotales': [10.0, 20.5, 0.0, 3.25],
+    })
+    cuerpo = json_columnar(df, report='ventas_mes')
+    assert json.loads(cuerpo)['data'][2] == ['2025-01-01', '2025-01-02', '2025-01-02', '2025-01-03']
+
+    vuelta = de_columnar(cuerpo)
+    assert vuelta['Agente'].tolist() == ['MDLZ P2', None, 'MDLZ P2', 'MDLZ P2']
+    assert vuelta['Mes'].tolist() == [1, 2, 3, 4]
+    assert vuelta['KilosTotales'].tolist() == [10.0, 20.5, 0.0, 3.25]
+    # Más compacto que la lista de registros que usaban las plantillas
+    assert len(cuerpo) < len(df.to_json(orient='records', date_format='iso'))
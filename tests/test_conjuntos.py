@@ -0,0 +1,105 @@
+"""
+Pruebas de los conjuntos de productos (reportes/conjuntos.py)
+"""
+
+import pytest
+
+from reportes import conjuntos
+
+
+class FakeDB:
+    def __init__(self, productos):
+        self.productos = productos  # codigo -> CIDPRODUCTO
+        self.cabeceras = {}  # nombre -> version
+        self.miembros = {}  # nombre -> set de CIDPRODUCTO
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+        self.rowcount = -1
+
+    def execute(self, sql, params=()):
+        db = self.db
+        sql = ' '.join(sql.split())
+        self.rows = []
+        if sql.startswith('SELECT COUNT(*)'):
+            self.rows = [(int(params[0] in db.cabeceras),)]
+        elif sql.startswith('SELECT CCODIGOPRODUCTO, CIDPRODUCTO'):
+            self.rows = [(c, db.productos[c]) for c in params if c in db.productos]
+        elif sql.startswith('UPDATE rptConjuntos SET Version'):
+            nombre = params[1]
+            self.rowcount = int(nombre in db.cabeceras)
+            if self.rowcount:
+                db.cabeceras[nombre] += 1
+        elif sql.startswith('INSERT INTO rptConjuntos '):
+            db.cabeceras[params[0]] = 1
+        elif sql.startswith('DELETE FROM rptConjuntosProducto'):
+            db.miembros[params[0]] = set()
+        elif sql.startswith('SELECT Nombre, Version'):
+            self.rows = list(db.cabeceras.items())
+        elif sql.startswith('SELECT CIDPRODUCTO FROM rptConjuntosProducto'):
+            self.rows = [(cid,) for cid in db.miembros.get(params[0], ())]
+
+    def executemany(self, sql, filas):
+        for nombre, cid in filas:
+            self.db.miembros.setdefault(nombre, set()).add(cid)
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def cache_limpio(monkeypatch):
+    monkeypatch.setattr(conjuntos, '_cache', {})
+    monkeypatch.setattr(conjuntos, '_ultima_carga', 0.0)
+
+
+def test_default_set_is_seeded_from_codes():
+    productos = {codigo: i for i, codigo in enumerate(conjuntos.CODIGOS_REPORTABLES[:5], start=100)}
+    conn = FakeConnection(FakeDB(productos))
+    versiones = conjuntos.cargar_conjuntos(conn)
+    assert versiones == {conjuntos.CONJUNTO_REPORTABLES: 1}
+    assert conjuntos.get_conjunto() == frozenset(range(100, 105))
+
+
+def test_set_conjunto_bumps_version_and_reports_missing_codes():
+    db = FakeDB({'MESCO25': 1, 'MESCO30': 2, 'PAL0007': 3})
+    conn = FakeConnection(db)
+    conjuntos.cargar_conjuntos(conn)
+
+    version, faltantes = conjuntos.set_conjunto(conn, 'sacos', ['MESCO25', 'NOEXISTE'])
+    assert version == 1 and faltantes == ['NOEXISTE']
+    assert conjuntos.get_conjunto('sacos') == frozenset({1})
+
+    version, _ = conjuntos.set_conjunto(conn, 'sacos', ['MESCO30', 'PAL0007'])
+    assert version == 2
+    assert conjuntos.get_conjunto('sacos') == frozenset({2, 3})
+    assert conjuntos.version_conjuntos()['sacos'] == 2
+
+
+def test_unknown_set_is_empty():
+    assert conjuntos.get_conjunto('no-existe') == frozenset()
+
+
+def test_set_name_is_validated():
+    with pytest.raises(ValueError):
+        conjuntos.set_conjunto(FakeConnection(FakeDB({})), '', ['MESCO25'])
@@ -0,0 +1,121 @@
+"""
+Pruebas del armado de consultas parametrizadas (reportes/consultas.py)
+"""
+
+import threading
+
+import pytest
+
+from reportes.consultas import EstadisticasConsultas, PresupuestoExcedido, compilar, presupuesto, run_query
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = [('Agente',), ('Kilos',)]
+
+    def execute(self, query, *params):
+        self.conn.executed.append((query, list(params[0]) if params else []))
+
+    def fetchall(self):
+        return [('MOLIENDAS', 10.5), ('MDLZ P2', 3.0)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+def test_markers_become_placeholders_in_order():
+    sql, values = compilar("WHERE a = :agente AND y = :anio OR z = :agente", {'agente': 'MOLIENDAS', 'anio': 2024})
+    assert sql == "WHERE a = ? AND y = ? OR z = ?"
+    assert values == ['MOLIENDAS', 2024, 'MOLIENDAS']
+
+
+def test_literals_and_comments_are_left_alone():
+    sql, values = compilar("SELECT ':no' AS t -- hora 10:30\nWHERE x = :x", {'x': 1})
+    assert sql == "SELECT ':no' AS t -- hora 10:30\nWHERE x = ?"
+    assert values == [1]
+
+
+def test_list_values_expand():
+    sql, values = compilar("WHERE r.Anio IN (:anios)", {'anios': [2023, 2024]})
+    assert sql == "WHERE r.Anio IN (?, ?)"
+    assert values == [2023, 2024]
+
+
+def test_missing_parameter_raises():
+    with pytest.raises(KeyError):
+        compilar("WHERE a = :agente", {})
+
+
+def test_same_shape_reuses_statement():
+    stats = EstadisticasConsultas()
+    for agente in ('MOLIENDAS', 'MDLZ P2', 'MOSTRADOR 1'):
+        sql, _ = compilar("SELECT 1 WHERE a = :agente", {'agente': agente})
+        stats.registrar(sql, 0.01)
+    result = stats.stats()
+    assert result['executions'] == 3
+    assert result['distinct_statements'] == 1
+    assert result['reuse_rate'] == pytest.approx(2 / 3, abs=1e-4)
+
+
+def test_run_query_binds_values_and_builds_frame():
+    conn = FakeConnection()
+    df = run_query(conn, "SELECT Agente, Kilos FROM t WHERE Anio = :anio", {'anio': 2024})
+    assert conn.executed == [("SELECT Agente, Kilos FROM t WHERE Anio = ?", [2024])]
+    assert df.columns.tolist() == ['Agente', 'Kilos']
+    assert len(df) == 2
+
+
+class SlowCursor(FakeCursor):
+    """execute() blocks until cancel() is called, like a long statement on the server"""
+
+    def __init__(self, conn):
+        super().__init__(conn)
+        self.cancelado = threading.Event()
+
+    def execute(self, query, *params):
+        assert self.cancelado.wait(5)
+        raise RuntimeError('Operation canceled')
+
+    def cancel(self):
+        self.conn.cancelados += 1
+        self.cancelado.set()
+
+
+class SlowConnection(FakeConnection):
+    def __init__(self):
+        super().__init__()
+        self.timeout = 0
+        self.timeouts = []
+        self.cancelados = 0
+
+    def __setattr__(self, nombre, valor):
+        if nombre == 'timeout':
+            self.__dict__.setdefault('timeouts', []).append(valor)
+        super().__setattr__(nombre, valor)
+
+    def cursor(self):
+        return SlowCursor(self)
+
+
+def test_budget_sets_timeout_and_cancels_the_statement():
+    conn = SlowConnection()
+    with presupuesto(0.2):
+        with pytest.raises(PresupuestoExcedido):
+            run_query(conn, "SELECT Agente FROM t")
+    assert conn.cancelados == 1
+    assert conn.timeouts[-2:] == [1, 0]  # segundos restantes redondeados hacia arriba, luego sin límite
+
+
+def test_queries_without_budget_are_not_limited():
+    conn = FakeConnection()
+    with presupuesto(None):
+        assert len(run_query(conn, "SELECT Agente FROM t")) == 2
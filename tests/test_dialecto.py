@@ -0,0 +1,50 @@
+"""
+Pruebas del dialecto local y del generador de datos de los benchmarks (benchmarks/)
+"""
+
+from datetime import date
+
+from benchmarks.datos_sinteticos import AGENTES, generar
+from benchmarks.dialecto import conectar_local, traducir
+from reportes.consultas import run_query
+from reportes.paginacion import sql_paginado
+from reportes.rollup import DDL_ROLLUP
+
+
+def test_translation_of_hints_ddl_and_paging():
+    sql, es_script = traducir("SELECT r.Anio FROM dbo.rptVentasDiarias r WITH (NOLOCK) "
+                              "ORDER BY r.Anio OFFSET ? ROWS FETCH NEXT ? ROWS ONLY")
+    assert not es_script
+    assert sql == "SELECT r.Anio FROM rptVentasDiarias r ORDER BY r.Anio LIMIT ?, ?"
+
+    ddl, es_script = traducir(DDL_ROLLUP)
+    assert es_script
+    assert 'IF OBJECT_ID' not in ddl and 'INCLUDE' not in ddl and 'BEGIN' not in ddl
+    assert ddl.count('CREATE TABLE IF NOT EXISTS') == 2 and 'CREATE INDEX IF NOT EXISTS' in ddl
+
+
+def test_report_sql_runs_on_synthetic_data(tmp_path):
+    ruta = generar(str(tmp_path / 'erp.sqlite'), 600, anios=1, hoy=date(2025, 3, 10))
+    conn = conectar_local(ruta)
+    cursor = conn.cursor()
+    cursor.execute(DDL_ROLLUP)
+    cursor.execute("EXEC sp_getapplock @Resource = ?, @LockMode = 'Exclusive'", ('x',))
+
+    df = run_query(conn, """
+SELECT a.CNOMBREAGENTE AS Agente, YEAR(m.CFECHA) AS Anio, DATENAME(month, m.CFECHA) AS NombreMes,
+       EOMONTH(m.CFECHA) AS FinMes, ISNULL(SUM(m.CUNIDADES), 0) AS Unidades
+FROM admMovimientos m WITH (NOLOCK)
+JOIN admDocumentos d ON m.CIDDOCUMENTO = d.CIDDOCUMENTO
+JOIN admAgentes a ON d.CIDAGENTE = a.CIDAGENTE
+WHERE m.CFECHA >= :desde AND m.CFECHA < :hasta AND m.CIDDOCUMENTODE = 4
+GROUP BY a.CNOMBREAGENTE, YEAR(m.CFECHA), DATENAME(month, m.CFECHA), EOMONTH(m.CFECHA)""",
+                   {'desde': date(2025, 2, 1), 'hasta': date(2025, 3, 1)})
+    assert len(df) > 0
+    assert set(df['Agente']) <= set(AGENTES)
+    assert (df['Anio'] == 2025).all() and (df['NombreMes'] == 'February').all()
+    assert (df['FinMes'] == '2025-02-28').all()
+
+    sql, params = sql_paginado("SELECT CIDPRODUCTO FROM admProductos", 'CIDPRODUCTO', 2, 10)
+    pagina = run_query(conn, sql, params)
+    assert pagina['CIDPRODUCTO'].tolist() == list(range(11, 21))
+    assert (pagina['TotalRegistros'] > 100).all()
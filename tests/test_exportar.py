@@ -0,0 +1,76 @@
+"""
+Pruebas de las exportaciones en streaming (reportes/exportar.py)
+"""
+
+import csv
+import gzip
+import io
+import os
+
+from openpyxl import load_workbook
+
+from reportes.exportar import comprimir_gzip, escribir_xlsx, generar_csv, generar_html, leer_y_borrar
+
+
+class FakeCursor:
+    def __init__(self, filas):
+        self.description = [('Agente',), ('Kilos',)]
+        self.filas = list(filas)
+        self.lotes = []
+
+    def fetchmany(self, tamano):
+        lote, self.filas = self.filas[:tamano], self.filas[tamano:]
+        self.lotes.append(len(lote))
+        return lote
+
+
+def test_xlsx_is_written_in_batches():
+    cursor = FakeCursor([('MOLIENDAS', i * 1.5) for i in range(25)])
+    ruta, filas = escribir_xlsx(cursor, 'Ventas Diarias', tamano_lote=10)
+    try:
+        assert filas == 25
+        assert cursor.lotes == [10, 10, 5, 0]
+        hoja = load_workbook(ruta, read_only=True)['Ventas Diarias']
+        valores = list(hoja.values)
+        assert valores[0] == ('Agente', 'Kilos')
+        assert len(valores) == 26 and valores[-1] == ('MOLIENDAS', 36.0)
+    finally:
+        os.remove(ruta)
+
+
+def test_file_is_streamed_and_deleted():
+    ruta, _ = escribir_xlsx(FakeCursor([('MDLZ P2', 3.0)]), 'Reporte Anual')
+    contenido = b''.join(leer_y_borrar(ruta, tamano_bloque=512))
+    assert not os.path.exists(ruta)
+    assert load_workbook(io.BytesIO(contenido), read_only=True).sheetnames == ['Reporte Anual']
+
+
+def test_file_is_deleted_when_client_disconnects():
+    ruta, _ = escribir_xlsx(FakeCursor([('MDLZ P2', 3.0)] * 100), 'Reporte Anual')
+    bloques = leer_y_borrar(ruta, tamano_bloque=16)
+    next(bloques)
+    bloques.close()
+    assert not os.path.exists(ruta)
+
+
+def test_csv_yields_header_then_one_chunk_per_batch():
+    cursor = FakeCursor([('MOLIENDAS, S.A.', i) for i in range(5)])
+    bloques = list(generar_csv(cursor, tamano_lote=2))
+    assert len(bloques) == 4
+    filas = list(csv.reader(io.StringIO(b''.join(bloques).decode('utf-8-sig'))))
+    assert filas[0] == ['Agente', 'Kilos']
+    assert filas[1] == ['MOLIENDAS, S.A.', '0'] and len(filas) == 6
+
+
+def test_html_escapes_values_and_counts_rows_in_footer():
+    cursor = FakeCursor([('<b>MDLZ</b>', None), ('MOSTRADOR 1', 2.5)])
+    documento = b''.join(generar_html(cursor, 'Ventas Diarias', [('Agente', 'Todos')])).decode('utf-8')
+    assert '&lt;b&gt;MDLZ&lt;/b&gt;' in documento
+    assert '<td>MOSTRADOR 1</td><td>2.5</td>' in documento
+    assert '<strong>Total de Registros:</strong> 2' in documento
+    assert documento.rstrip().endswith('</html>')
+
+
+def test_gzip_stream_round_trips():
+    bloques = [b'Agente,Kilos\n'] + [b'MOLIENDAS,1\n'] * 1000
+    assert gzip.decompress(b''.join(comprimir_gzip(iter(bloques)))) == b''.join(bloques)
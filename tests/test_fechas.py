@@ -0,0 +1,64 @@
+"""
+Pruebas de los filtros de fecha por rangos (reportes/fechas.py)
+"""
+
+from datetime import date
+
+from reportes.fechas import movimientos_en, predicado, rango_anios, rango_dia, rango_mes, rangos_filtro, unir_rangos
+
+
+def test_rango_dia():
+    assert rango_dia('2024-05-31') == (date(2024, 5, 31), date(2024, 6, 1))
+
+
+def test_rango_mes_completo_y_por_dias():
+    assert rango_mes(2024, 12) == (date(2024, 12, 1), date(2025, 1, 1))
+    assert rango_mes(2024, 5, 3, 10) == (date(2024, 5, 3), date(2024, 5, 11))
+
+
+def test_rango_mes_se_recorta_al_largo_del_mes():
+    assert rango_mes(2023, 2, 1, 31) == (date(2023, 2, 1), date(2023, 3, 1))
+    desde, hasta = rango_mes(2023, 2, 30, 31)
+    assert desde == hasta  # rango vacío, como DAY(...) BETWEEN 30 AND 31 en febrero
+
+
+def test_rangos_anuales():
+    assert rango_anios(2022, 2023) == (date(2022, 1, 1), date(2024, 1, 1))
+
+
+def test_rangos_filtro_modos():
+    assert rangos_filtro() == []
+    assert rangos_filtro(fecha='2024-01-15') == [(date(2024, 1, 15), date(2024, 1, 16))]
+    assert rangos_filtro(None, 2024, 5, 1, 15, 2023, 5) == [
+        (date(2024, 5, 1), date(2024, 5, 16)),
+        (date(2023, 5, 1), date(2023, 5, 16)),
+    ]
+    # Sin ambos días se toma el mes completo
+    assert rangos_filtro(None, 2024, 5, 10, None) == [(date(2024, 5, 1), date(2024, 6, 1))]
+
+
+def test_comparar_un_mes_consigo_mismo_no_duplica_movimientos():
+    assert rangos_filtro(None, 2024, 5, None, None, 2024, 5) == [(date(2024, 5, 1), date(2024, 6, 1))]
+    sql, params = movimientos_en(rangos_filtro(None, 2024, 5, 1, 15, 2024, 5))
+    assert "UNION ALL" not in sql and set(params) == {'fecha1_desde', 'fecha1_hasta'}
+    assert unir_rangos([(date(2024, 5, 10), date(2024, 5, 20)), (date(2023, 5, 1), date(2023, 6, 1)),
+                        (date(2024, 5, 1), date(2024, 5, 12)), (date(2024, 5, 20), date(2024, 5, 25))]) == [
+        (date(2024, 5, 1), date(2024, 5, 20)),
+        (date(2023, 5, 1), date(2023, 6, 1)),
+        (date(2024, 5, 20), date(2024, 5, 25)),
+    ]
+
+
+def test_predicado_es_sargable():
+    sql, params = predicado('r.Fecha', (date(2024, 1, 1), date(2025, 1, 1)), 'actual')
+    assert sql == "r.Fecha >= :actual_desde AND r.Fecha < :actual_hasta"
+    assert params == {'actual_desde': date(2024, 1, 1), 'actual_hasta': date(2025, 1, 1)}
+
+
+def test_movimientos_en_comparacion_usa_union_all():
+    sql, params = movimientos_en([rango_mes(2024, 5), rango_mes(2023, 5)])
+    assert sql.count("FROM admMovimientos WHERE CFECHA >= :fecha") == 2
+    assert "UNION ALL" in sql
+    assert "YEAR(" not in sql
+    assert set(params) == {'fecha1_desde', 'fecha1_hasta', 'fecha2_desde', 'fecha2_hasta'}
+    assert movimientos_en([]) == ('admMovimientos', {})
@@ -0,0 +1,122 @@
+"""
+Pruebas del marco incremental del mes abierto (reportes/incremental.py)
+"""
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from reportes.cache import resultados_vencidos, seguir_vencidos, versiones_servidas
+from reportes.incremental import AcumuladoIncremental, combinar
+
+GRANO = ['Fecha', 'CRAZONSOCIAL', 'CIDPRODUCTO', 'CIDAGENTE']
+
+
+def filas(*registros):
+    return pd.DataFrame(registros, columns=GRANO + ['Toneladas', 'UltimoMovimiento'])
+
+
+def test_only_touched_groups_are_reaggregated():
+    base = filas((date(2025, 3, 1), 'A', 10, 3, 1.0, 5),
+                 (date(2025, 3, 1), None, 10, 3, 2.0, 6),
+                 (date(2025, 3, 2), 'B', 11, 7, 4.0, 8))
+    delta = filas((date(2025, 3, 1), None, 10, 3, 0.5, 12),
+                  (date(2025, 3, 3), 'A', 10, 3, 1.5, 13))
+    df = combinar(base, delta, GRANO, ['Toneladas'])
+
+    por_clave = {(fila.Fecha, fila.CRAZONSOCIAL, fila.CIDPRODUCTO): (fila.Toneladas, fila.UltimoMovimiento)
+                 for fila in df.itertuples()}
+    assert len(df) == 4
+    assert por_clave[(date(2025, 3, 1), 'A', 10)] == (1.0, 5)
+    assert por_clave[(date(2025, 3, 1), None, 10)] == (2.5, 12)
+    assert por_clave[(date(2025, 3, 3), 'A', 10)] == (1.5, 13)
+
+
+def test_reads_deltas_above_the_watermark_and_full_reads_on_version_change():
+    lecturas = []
+    movimientos = [filas((date(2025, 3, 1), 'A', 10, 3, 1.0, 5))]
+
+    def leer(periodo, desde):
+        lecturas.append((periodo, desde))
+        return movimientos.pop(0) if movimientos else filas()
+
+    acumulado = AcumuladoIncremental(leer, GRANO, ['Toneladas'], intervalo_minimo=0,
+                                     orden=(['Fecha', 'CIDAGENTE'], [False, True]))
+    assert acumulado.obtener((2025, 3), 'g1')['Toneladas'].tolist() == [1.0]
+
+    movimientos.append(filas((date(2025, 3, 2), 'A', 10, 3, 2.0, 9)))
+    df = acumulado.obtener((2025, 3), 'g1')
+    assert df['Fecha'].tolist() == [date(2025, 3, 2), date(2025, 3, 1)]
+    assert lecturas == [((2025, 3), None), ((2025, 3), 5)]
+    assert acumulado.stats()['watermark'] == 9
+
+    # Sin movimientos nuevos el marco no cambia
+    assert acumulado.obtener((2025, 3), 'g1') is df
+    assert lecturas[-1] == ((2025, 3), 9)
+
+    # Una invalidación de la caché de reportes o un mes nuevo obligan a leer todo
+    acumulado.obtener((2025, 3), 'g2')
+    acumulado.obtener((2025, 4), 'g2')
+    assert lecturas[-2:] == [((2025, 3), None), ((2025, 4), None)]
+    assert acumulado.stats()['full_reads'] == 3
+
+
+def test_records_the_data_version_of_the_frame_served():
+    watermark = [100]
+    fallar = []
+
+    def leer(periodo, desde):
+        if fallar:
+            raise RuntimeError('sin conexión')
+        return filas()
+
+    acumulado = AcumuladoIncremental(leer, GRANO, ['Toneladas'], intervalo_minimo=0,
+                                     etiquetar=lambda cerrado: ('g1', watermark[0]))
+    seguir_vencidos()
+    acumulado.obtener((2025, 3), 'g1')
+    watermark[0] = 101
+    acumulado.obtener((2025, 3), 'g1')
+    # Si la lectura de movimientos nuevos falla, el marco servido sigue siendo el de 101
+    watermark[0] = 102
+    fallar.append(1)
+    acumulado.obtener((2025, 3), 'g1')
+    assert versiones_servidas() == [('g1', 100), ('g1', 101), ('g1', 101)]
+
+
+def test_failed_full_read_serves_the_previous_frame_until_the_retry_window():
+    lecturas = []
+    fallar = []
+
+    def leer(periodo, desde):
+        lecturas.append(desde)
+        if fallar and desde is None:
+            raise RuntimeError('presupuesto excedido')
+        if desde is None:
+            return filas((date(2025, 3, 1), 'A', 10, 3, 1.0, 5))
+        return filas((date(2025, 3, 2), 'A', 10, 3, 2.0, desde + 1))
+
+    acumulado = AcumuladoIncremental(leer, GRANO, ['Toneladas'], intervalo_minimo=0, reintentar_cada=60,
+                                     nombre='ventas_dia')
+    acumulado.obtener((2025, 3), 'g1')
+    fallar.append(1)
+
+    seguir_vencidos()
+    assert len(acumulado.obtener((2025, 3), 'g2')) == 1
+    # Dentro de la espera no se repite la lectura completa, pero sí se leen los movimientos nuevos
+    df = acumulado.obtener((2025, 3), 'g2')
+    assert lecturas == [None, None, 5]
+    assert df['Toneladas'].sum() == 3.0
+    assert [vencido['report'] for vencido in resultados_vencidos()] == ['ventas_dia', 'ventas_dia']
+    assert acumulado.stats()['full_errors'] == 1
+
+    # Sin un marco del mismo periodo no hay nada que servir
+    with pytest.raises(RuntimeError):
+        acumulado.obtener((2025, 4), 'g2')
+
+    # Pasada la espera se vuelve a intentar la lectura completa
+    fallar.clear()
+    acumulado.reintentar_cada = 0
+    seguir_vencidos()
+    assert len(acumulado.obtener((2025, 3), 'g2')) == 1
+    assert lecturas[-1] is None and resultados_vencidos() == []
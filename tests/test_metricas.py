@@ -0,0 +1,46 @@
+"""
+Pruebas de los histogramas y la medición por reporte (reportes/metricas.py)
+"""
+
+import sqlite3
+
+from reportes import metricas
+from reportes.consultas import run_query
+
+
+def test_histogram_renders_cumulative_buckets():
+    histograma = metricas.Histograma('prueba_seconds', 'Prueba', ('report',), buckets=(0.1, 1.0))
+    for valor in (0.05, 0.5, 0.5, 3.0):
+        histograma.observar(valor, 'anio')
+    lineas = histograma.render()
+    assert 'prueba_seconds_bucket{report="anio",le="0.1"} 1' in lineas
+    assert 'prueba_seconds_bucket{report="anio",le="1"} 3' in lineas
+    assert 'prueba_seconds_bucket{report="anio",le="+Inf"} 4' in lineas
+    assert 'prueba_seconds_count{report="anio"} 4' in lineas
+    assert 'prueba_seconds_sum{report="anio"} 4.050000' in lineas
+
+
+def test_report_measurement_labels_queries_and_nested_calls():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(5)])
+
+    @metricas.medir_reporte('prueba_base')
+    def base():
+        return run_query(conn, "SELECT x FROM t WHERE x >= :minimo", {'minimo': 2})
+
+    @metricas.medir_reporte('prueba_derivado')
+    def derivado():
+        return base()['x'].sum()
+
+    antes = metricas.FILAS.contar('prueba_base')
+    metricas.iniciar_peticion()
+    assert derivado() == 9
+    consultas = metricas.terminar_peticion()
+
+    assert metricas.FILAS.contar('prueba_base') == antes + 1
+    assert metricas.FILAS.contar('prueba_derivado') == 0
+    assert metricas.REPORTE.contar('prueba_derivado') >= 1
+    assert len(consultas) == 1 and consultas[0]['report'] == 'prueba_base' and consultas[0]['rows'] == 3
+    assert consultas[0]['fingerprint'] in metricas.resumen_consultas(consultas)
+    assert '# TYPE report_rows_fetched histogram' in metricas.registro.render()
@@ -0,0 +1,101 @@
+"""
+Pruebas del motor de objetivos (reportes/objetivos.py)
+"""
+
+from datetime import date
+
+import pandas as pd
+
+from reportes import objetivos
+from reportes.objetivos import calcular_objetivos, resumen_objetivos, serie_mensual
+
+HOY = date(2025, 3, 15)
+
+
+def serie():
+    return pd.DataFrame({
+        'Agente': ['MOLIENDAS', 'MOLIENDAS', 'MOLIENDAS', 'MDLZ P2'],
+        'Anio': [2024, 2025, 2023, 2025],
+        'Mes': [3, 3, 3, 2],
+        'Toneladas': [10.0, 15.0, 8.0, 4.0],
+    })
+
+
+def test_target_is_same_month_previous_year():
+    df = calcular_objetivos(serie(), HOY)
+    fila = df[(df['Agente'] == 'MOLIENDAS') & (df['Anio'] == 2025)].iloc[0]
+    assert fila['Objetivo'] == 10.0 and fila['Avance'] == 15.0
+    assert fila['PorcAvance'] == 150.0
+    assert fila['PromedioDiario'] == 15.0 / 31
+    # 2024-03 tiene objetivo en 2023-03; 2023 no tiene objetivo porque 2022 no sirve de base
+    assert df[df['Agente'] == 'MOLIENDAS']['Anio'].tolist() == [2025, 2024, 2023]
+    assert df[df['Agente'] == 'MOLIENDAS']['Objetivo'].tolist() == [10.0, 8.0, 0.0]
+    assert df[df['Agente'] == 'MOLIENDAS']['Tendencia'].tolist() == [11.0, 11.0, 11.0]
+
+
+def test_no_target_gives_nan_progress_and_zero_in_summary():
+    df = calcular_objetivos(serie(), HOY)
+    mdlz = df[df['Agente'] == 'MDLZ P2'].iloc[0]
+    assert mdlz['Objetivo'] == 0.0 and pd.isna(mdlz['PorcAvance'])
+    resumen = resumen_objetivos(df)
+    assert resumen['Agente'].tolist() == ['MOLIENDAS', 'MDLZ P2']
+    assert resumen.iloc[1]['PromedioAvance'] == 0.0
+    assert resumen.iloc[0]['TotalVentas'] == 33.0 and resumen.iloc[0]['TotalRegistros'] == 3
+    assert resumen_objetivos(df, '2')['Agente'].tolist() == ['MDLZ P2']
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.filas = []
+
+    def execute(self, query, *params):
+        self.conn.executed.append(query)
+        if 'FROM rptObjetivosMensuales' in query and query.lstrip().startswith('SELECT'):
+            self.description = [('Agente',), ('Anio',), ('Mes',), ('Toneladas',)]
+            self.filas = self.conn.guardadas
+        elif 'FROM rptVentasDiarias' in query:
+            self.conn.desde_rollup = params[0][-2]
+            self.description = [('Agente',), ('Anio',), ('Mes',), ('Toneladas',)]
+            self.filas = self.conn.rollup
+
+    def executemany(self, query, filas):
+        self.conn.insertadas.extend(filas)
+
+    def fetchall(self):
+        return self.filas
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, guardadas, rollup):
+        self.guardadas = guardadas
+        self.rollup = rollup
+        self.executed = []
+        self.insertadas = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_only_missing_closed_months_are_read_from_rollup_and_stored(monkeypatch):
+    monkeypatch.setattr(objetivos, '_tabla_creada', True)
+    guardadas = [('MOLIENDAS', 2025, 1, 5.0)]
+    rollup = [('MOLIENDAS', 2025, 2, 7.0), ('MOLIENDAS', 2025, 3, 1.5)]
+    conn = FakeConnection(guardadas, rollup)
+    df = serie_mensual(conn, 'reportables', date(2025, 1, 1), HOY)
+
+    assert conn.desde_rollup == date(2025, 2, 1)
+    # febrero se guarda para todos los agentes; marzo (abierto) no
+    assert {(fila[1], fila[2]) for fila in conn.insertadas} == {(2025, 2)}
+    assert len(conn.insertadas) == len(objetivos.AGENTES_OBJETIVOS)
+    assert sorted(zip(df['Mes'], df['Toneladas'])) == [(1, 5.0), (2, 7.0), (3, 1.5)]
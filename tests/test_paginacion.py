@@ -0,0 +1,37 @@
+"""
+Pruebas de la paginación en SQL (reportes/paginacion.py)
+"""
+
+import pandas as pd
+
+from reportes.paginacion import COLUMNA_TOTAL, info_paginacion, separar_total, sql_paginado
+
+
+def test_sql_paginado_offset_and_fetch():
+    sql, params = sql_paginado("SELECT 1 AS x", 'x', page=3, per_page=50)
+    assert f"COUNT(*) OVER() AS {COLUMNA_TOTAL}" in sql
+    assert "ORDER BY x" in sql
+    assert "OFFSET :filas_omitidas ROWS FETCH NEXT :filas_pagina ROWS ONLY" in sql
+    assert params == {'filas_omitidas': 100, 'filas_pagina': 50}
+
+
+def test_sql_paginado_keeps_ctes_outside_derived_table():
+    sql, _ = sql_paginado("SELECT * FROM c", 'x', 1, 10, ctes="WITH c AS (SELECT 1 AS x)")
+    assert sql.startswith("WITH c AS")
+    assert sql.index("WITH c AS") < sql.index("FROM (")
+
+
+def test_separar_total():
+    df = pd.DataFrame({'x': [1, 2], COLUMNA_TOTAL: [7, 7]})
+    page, total = separar_total(df)
+    assert total == 7
+    assert page.columns.tolist() == ['x']
+
+    empty, total = separar_total(df.iloc[0:0])
+    assert total == 0 and empty.empty
+
+
+def test_info_paginacion():
+    info = info_paginacion(2, 25, 60)
+    assert info['pages'] == 3 and info['has_prev'] and info['has_next']
+    assert not info_paginacion(1, 25, 0)['has_next']
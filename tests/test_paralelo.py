@@ -0,0 +1,86 @@
+"""
+Pruebas del ejecutor de consultas en paralelo (reportes/paralelo.py)
+"""
+
+import threading
+import time
+
+import pytest
+
+from reportes.paralelo import EjecutorReportes
+
+
+def test_tasks_run_concurrently_and_report_timings():
+    ejecutor = EjecutorReportes(max_workers=2)
+    barrera = threading.Barrier(2, timeout=5)
+
+    def consulta(valor):
+        barrera.wait()  # solo pasa si ambas tareas corren al mismo tiempo
+        time.sleep(0.05)
+        return valor
+
+    resultados, tiempos = ejecutor.ejecutar({'detalle': lambda: consulta(1), 'grafica': lambda: consulta(2)})
+    assert resultados == {'detalle': 1, 'grafica': 2}
+    assert set(tiempos) == {'detalle', 'grafica'} and min(tiempos.values()) >= 0.05
+    stats = ejecutor.stats()
+    assert stats['fan_outs'] == 1 and stats['tasks'] == 2 and stats['saved_seconds'] > 0
+    ejecutor.shutdown()
+
+
+def test_first_task_runs_in_calling_thread():
+    ejecutor = EjecutorReportes(max_workers=1)
+    hilos = {}
+    ejecutor.ejecutar({'detalle': lambda: hilos.setdefault('detalle', threading.current_thread()),
+                       'matriz': lambda: hilos.setdefault('matriz', threading.current_thread())})
+    assert hilos['detalle'] is threading.current_thread()
+    assert hilos['matriz'] is not threading.current_thread()
+    ejecutor.shutdown()
+
+
+def test_error_is_raised_after_all_tasks_finish():
+    ejecutor = EjecutorReportes(max_workers=2)
+    terminadas = []
+
+    def lenta():
+        time.sleep(0.05)
+        terminadas.append('lenta')
+
+    def falla():
+        raise RuntimeError('timeout')
+
+    with pytest.raises(RuntimeError):
+        ejecutor.ejecutar({'falla': falla, 'lenta': lenta})
+    assert terminadas == ['lenta']
+    ejecutor.shutdown()
+
+
+def test_workers_get_their_own_connection_inside_a_request():
+    import contextvars
+    import itertools
+
+    from flask import Flask, g, has_request_context
+
+    aplicacion = Flask(__name__)
+    numeros = itertools.count()
+    peticion = contextvars.ContextVar('peticion', default=None)
+    ejecutor = EjecutorReportes(max_workers=2, propagar=(peticion,))
+
+    def conexion():
+        # Como app.get_db_connection: la de la petición, o una propia del pool fuera de ella
+        if has_request_context():
+            if 'conn' not in g:
+                g.conn = next(numeros)
+            return g.conn
+        return next(numeros)
+
+    def tarea():
+        return conexion(), has_request_context(), peticion.get()
+
+    with aplicacion.test_request_context('/'):
+        peticion.set('p1')
+        resultados, _ = ejecutor.ejecutar({'detalle': tarea, 'grafica': tarea, 'matriz': tarea})
+    conexiones = [conn for conn, _, _ in resultados.values()]
+    assert len(set(conexiones)) == 3
+    assert resultados['detalle'][1] and not resultados['grafica'][1] and not resultados['matriz'][1]
+    assert {valor for _, _, valor in resultados.values()} == {'p1'}
+    ejecutor.shutdown()
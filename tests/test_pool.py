@@ -0,0 +1,118 @@
+"""
+Pruebas del pool de conexiones (reportes/pool.py)
+"""
+
+import threading
+
+import pytest
+
+from reportes.pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, *params):
+        if not self.conn.alive:
+            raise RuntimeError('conexión perdida')
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def factory():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    return ConnectionPool(factory, **kwargs), created
+
+
+def test_reuses_released_connection():
+    pool, created = make_pool(max_size=2)
+    conn = pool.acquire()
+    raw = conn.raw
+    conn.close()
+    again = pool.acquire()
+    assert again.raw is raw
+    assert len(created) == 1
+    assert raw.rollbacks == 1
+    again.close()
+    assert pool.stats()['checkouts'] == 2
+
+
+def test_prewarm_opens_min_size():
+    pool, created = make_pool(max_size=4, min_size=3)
+    assert pool.prewarm() == 3
+    stats = pool.stats()
+    assert stats['idle'] == 3 and stats['created'] == 3 and stats['in_use'] == 0
+
+
+def test_dead_connection_is_replaced_on_checkout():
+    pool, created = make_pool(max_size=2, ping_after=0)
+    conn = pool.acquire()
+    conn.raw.alive = False
+    conn.close()
+    fresh = pool.acquire()
+    assert fresh.raw is not created[0]
+    assert created[0].closed
+    assert pool.stats()['failed_pings'] == 1
+
+
+def test_exhausted_pool_times_out():
+    pool, _ = make_pool(max_size=1)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.05)
+    conn.close()
+    assert pool.stats()['waits'] == 1
+
+
+def test_waiter_gets_connection_when_released():
+    pool, _ = make_pool(max_size=1)
+    conn = pool.acquire()
+    result = {}
+
+    def worker():
+        borrowed = pool.acquire(timeout=2)
+        result['raw'] = borrowed.raw
+        borrowed.close()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    conn.close()
+    thread.join()
+    assert result['raw'] is conn.raw
+
+
+def test_idle_connections_are_evicted():
+    pool, created = make_pool(max_size=3, min_size=0, max_idle=0)
+    first = pool.acquire()
+    second = pool.acquire()
+    first.close()
+    second.close()
+    pool.acquire().close()
+    assert pool.stats()['destroyed'] >= 1
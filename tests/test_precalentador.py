@@ -0,0 +1,58 @@
+"""
+Pruebas del precalentador de la caché de reportes (reportes/precalentador.py)
+"""
+
+import threading
+import time
+
+from reportes.precalentador import Precalentador
+
+
+def test_concurrency_cap_and_status():
+    activos = []
+    maximo = []
+    lock = threading.Lock()
+
+    def trabajo():
+        with lock:
+            activos.append(1)
+            maximo.append(len(activos))
+        time.sleep(0.05)
+        with lock:
+            activos.pop()
+
+    def falla():
+        raise RuntimeError('sin conexión')
+
+    precalentador = Precalentador(intervalo=60, max_concurrentes=2, jitter=0.5, semilla=1)
+    for agente in ('MOLIENDAS', 'MDLZ P2', 'MOSTRADOR 1', 'Todos'):
+        precalentador.agregar(f'ventas_dia:{agente}', trabajo)
+    precalentador.agregar('objetivos', falla)
+
+    assert precalentador.ejecutar_todos() == 4
+    assert max(maximo) == 2
+
+    trabajos = {t['name']: t for t in precalentador.estado()['jobs']}
+    assert trabajos['ventas_dia:Todos']['runs'] == 1 and trabajos['ventas_dia:Todos']['last_error'] is None
+    assert trabajos['ventas_dia:Todos']['last_duration_seconds'] >= 0.05
+    assert trabajos['objetivos']['failures'] == 1 and 'sin conexión' in trabajos['objetivos']['last_error']
+    # Siguiente pasada dentro de intervalo ± jitter
+    assert all(30 <= t['next_run_in_seconds'] <= 90 for t in trabajos.values())
+    precalentador.detener()
+
+
+def test_scheduler_only_runs_due_jobs():
+    llamadas = []
+    precalentador = Precalentador(intervalo=3600, max_concurrentes=1, jitter=0)
+    precalentador.agregar('coberturas:Todos', lambda: llamadas.append('coberturas'))
+
+    # Sin jitter la primera pasada es inmediata; después espera el intervalo completo
+    for futuro in precalentador.ejecutar_pendientes():
+        futuro.result()
+    assert precalentador.ejecutar_pendientes() == []
+    assert llamadas == ['coberturas']
+
+    precalentador.iniciar()
+    assert precalentador.estado()['running']
+    precalentador.detener()
+    assert not precalentador.estado()['running'] and llamadas == ['coberturas']
@@ -0,0 +1,72 @@
+"""
+Pruebas de los catálogos de referencia en memoria (reportes/referencia.py)
+"""
+
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from reportes import referencia
+from reportes.referencia import (CursorConNombres, adjuntar_nombres, documentos_venta, ids_agentes,
+                                 opciones_agente, sync_referencia)
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    monkeypatch.setattr(referencia, '_datos', referencia._VACIA)
+    monkeypatch.setattr(referencia, '_ultima_sincronizacion', 0.0)
+    conn = sqlite3.connect(':memory:')
+    conn.executescript("""
+        CREATE TABLE admAgentes (CIDAGENTE INTEGER, CNOMBREAGENTE TEXT);
+        CREATE TABLE admProductos (CIDPRODUCTO INTEGER, CCODIGOPRODUCTO TEXT, CNOMBREPRODUCTO TEXT);
+        CREATE TABLE admDocumentosModelo (CIDDOCUMENTODE INTEGER, CDESCRIPCION TEXT, CMODULO INTEGER);
+        CREATE TABLE admClientes (CIDCLIENTEPROVEEDOR INTEGER, CRAZONSOCIAL TEXT);
+        INSERT INTO admAgentes VALUES (0, '(Ninguno)'), (3, 'MOLIENDAS'), (7, 'MDLZ P2'), (9, 'OFICINA');
+        INSERT INTO admProductos VALUES (10, 'PREGR25', 'AZUCAR REFINADA SACO 25 KG');
+        INSERT INTO admDocumentosModelo VALUES (3, 'Remisión', 1), (4, 'Factura', 1), (19, 'Compra', 2);
+        INSERT INTO admClientes VALUES (1, 'PANADERIA SAN JOSE');
+    """)
+    # sqlite no conoce la pista de bloqueo de SQL Server
+    for nombre in ('AGENTES_QUERY', 'PRODUCTOS_QUERY', 'MODELOS_QUERY', 'CLIENTES_QUERY'):
+        monkeypatch.setattr(referencia, nombre, getattr(referencia, nombre).replace(' WITH (NOLOCK)', ''))
+    sync_referencia(conn)
+    return conn
+
+
+def test_filters_and_dropdown_come_from_the_catalogs(conn):
+    assert opciones_agente() == ['MOLIENDAS', 'MDLZ P2', 'Todos']
+    assert opciones_agente(todos_primero=True)[0] == 'Todos'
+    assert ids_agentes() == [3, 7]
+    assert ids_agentes('MDLZ P2') == [7]
+    # Un agente desconocido no debe coincidir con "(Ninguno)"
+    assert ids_agentes('NADIE') == [referencia.ID_INEXISTENTE]
+    assert documentos_venta() == [4, 3]
+
+
+def test_names_replace_ids_in_frames_and_export_cursors(conn):
+    df = pd.DataFrame({'CRAZONSOCIAL': ['X', 'Y'], 'CIDPRODUCTO': [10, 10], 'CIDAGENTE': [3, 7],
+                       'Toneladas': [1.5, 2.0]})
+    nombres = adjuntar_nombres(df)
+    assert list(nombres.columns) == ['CRAZONSOCIAL', 'CCODIGOPRODUCTO', 'CNOMBREPRODUCTO', 'Agente', 'Toneladas']
+    assert nombres['Agente'].tolist() == ['MOLIENDAS', 'MDLZ P2']
+    assert nombres['CCODIGOPRODUCTO'].tolist() == ['PREGR25', 'PREGR25']
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 AS CIDCLIENTEPROVEEDOR, 3 AS CIDAGENTE, 2.5 AS KilosTotales")
+    exportacion = CursorConNombres(cursor)
+    assert [columna[0] for columna in exportacion.description] == ['RazonSocial', 'Agente', 'KilosTotales']
+    assert exportacion.fetchmany(10) == [('PANADERIA SAN JOSE', 'MOLIENDAS', 2.5)]
+    exportacion.close()
+
+
+def test_unknown_id_rereads_the_catalogs_once(conn, monkeypatch):
+    conn.execute("INSERT INTO admClientes VALUES (2, 'DULCERIA LA LUNA')")
+    df = pd.DataFrame({'CIDCLIENTEPROVEEDOR': [1, 2, 99], 'CIDAGENTE': [3, 3, 3]})
+
+    # Dentro del intervalo mínimo no se vuelve a leer
+    monkeypatch.setattr(referencia, 'REFRESCO_MINIMO', 3600)
+    assert adjuntar_nombres(df, conn)['RazonSocial'].tolist() == ['PANADERIA SAN JOSE', None, None]
+
+    monkeypatch.setattr(referencia, 'REFRESCO_MINIMO', 0)
+    assert adjuntar_nombres(df, conn)['RazonSocial'].tolist() == ['PANADERIA SAN JOSE', 'DULCERIA LA LUNA', None]
@@ -0,0 +1,133 @@
+"""
+Pruebas del refresco incremental del rollup diario (reportes/rollup.py)
+"""
+
+from datetime import date
+
+import pytest
+
+from reportes import rollup
+from reportes.rollup import FECHA_MAXIMA, FECHA_MINIMA, NOMBRE_ROLLUP, TABLA_ROLLUP, refresh_rollup
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.filas = []
+
+    def execute(self, query, params=()):
+        self.conn.executed.append((query, params))
+        if 'sp_getapplock' in query:
+            self.conn.bloqueos.append(params[0])
+        elif 'MAX(CIDMOVIMIENTO)' in query:
+            self.filas = [(max((m[0] for m in self.conn.movimientos), default=0),)]
+        elif query.startswith('SELECT UltimoMovimiento'):
+            self.filas = [] if self.conn.estado is None else [self.conn.estado]
+        elif query.startswith('SELECT DISTINCT'):
+            watermark, antes_de = params
+            self.filas = [(dia,) for dia in sorted({fecha for movimiento, fecha, documento in self.conn.movimientos
+                                                    if movimiento > watermark and fecha < antes_de
+                                                    and documento in (3, 4)})]
+        elif query.startswith(f'DELETE FROM {TABLA_ROLLUP}'):
+            self.conn.reconstruidos.append(params)
+        elif query.startswith(f'INSERT INTO {rollup.TABLA_ESTADO}'):
+            self.conn.estado = (params[1], params[2])
+        elif query.startswith(f'UPDATE {rollup.TABLA_ESTADO}'):
+            self.conn.estado = (params[0], params[1])
+
+    def fetchone(self):
+        return self.filas[0] if self.filas else None
+
+    def fetchall(self):
+        return self.filas
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    """admMovimientos como (CIDMOVIMIENTO, fecha, CIDDOCUMENTODE) y la fila de rptRollupEstado"""
+
+    def __init__(self, movimientos=(), estado=None):
+        self.movimientos = list(movimientos)
+        self.estado = estado
+        self.executed = []
+        self.bloqueos = []
+        self.reconstruidos = []
+        self.commits = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits.append(len(self.executed))
+
+
+@pytest.fixture(autouse=True)
+def sin_suscriptores(monkeypatch):
+    monkeypatch.setattr(rollup, '_suscriptores', [])
+
+
+def test_first_build_covers_the_whole_history():
+    conn = FakeConn([(1, date(2024, 5, 3), 4), (7, date(2025, 3, 2), 4)])
+    rangos = refresh_rollup(conn, hoy=date(2025, 3, 15))
+
+    assert rangos == [(FECHA_MINIMA, FECHA_MAXIMA)]
+    assert conn.reconstruidos == [(FECHA_MINIMA, FECHA_MAXIMA)]
+    assert conn.estado == (7, date(2025, 3, 1))
+    assert not any(query.startswith('SELECT DISTINCT') for query, _ in conn.executed)
+
+
+def test_refresh_only_rebuilds_the_open_month_above_the_watermark():
+    conn = FakeConn([(5, date(2025, 2, 20), 4), (12, date(2025, 3, 14), 4), (13, date(2025, 3, 15), 3)],
+                    estado=(10, date(2025, 3, 1)))
+    rangos = refresh_rollup(conn, hoy=date(2025, 3, 15))
+
+    assert rangos == [(date(2025, 3, 1), FECHA_MAXIMA)]
+    assert conn.reconstruidos == rangos
+    assert conn.estado == (13, date(2025, 3, 1))
+    tardios = [params for query, params in conn.executed if query.startswith('SELECT DISTINCT')]
+    assert tardios == [(10, date(2025, 3, 1))]
+
+
+def test_late_movement_in_a_closed_month_rebuilds_its_day_and_notifies():
+    recibidos = []
+    rollup.suscribir_refresco(lambda rangos: 1 / 0)
+    rollup.suscribir_refresco(recibidos.append)
+    conn = FakeConn([(5, date(2025, 1, 20), 4), (11, date(2025, 1, 20), 3), (12, date(2025, 2, 3), 4),
+                     (13, date(2025, 2, 4), 17), (14, date(2025, 3, 10), 4)],
+                    estado=(10, date(2025, 3, 1)))
+    rangos = refresh_rollup(conn, hoy=date(2025, 3, 15))
+
+    # Un documento que no es venta (17) no reconstruye su día
+    assert rangos == [(date(2025, 1, 20), date(2025, 1, 21)), (date(2025, 2, 3), date(2025, 2, 4)),
+                      (date(2025, 3, 1), FECHA_MAXIMA)]
+    assert conn.reconstruidos == rangos
+    # Un suscriptor que falla no impide avisar a los demás
+    assert recibidos == [rangos]
+
+
+def test_month_rollover_rebuilds_the_previous_month_once():
+    # El driver puede devolver InicioMesAbierto como texto
+    conn = FakeConn([(12, date(2025, 3, 31), 4), (13, date(2025, 4, 1), 4)],
+                    estado=(11, '2025-03-01 00:00:00'))
+    assert refresh_rollup(conn, hoy=date(2025, 4, 1)) == [(date(2025, 3, 1), FECHA_MAXIMA)]
+    assert conn.estado == (13, date(2025, 4, 1))
+
+    assert refresh_rollup(conn, hoy=date(2025, 4, 2)) == [(date(2025, 4, 1), FECHA_MAXIMA)]
+
+
+def test_refresh_runs_under_the_application_lock():
+    conn = FakeConn([(12, date(2025, 3, 14), 4)], estado=(10, date(2025, 3, 1)))
+    refresh_rollup(conn, hoy=date(2025, 3, 15))
+    consultas = [query for query, _ in conn.executed]
+
+    assert conn.bloqueos == [TABLA_ROLLUP]
+    bloqueo = next(i for i, query in enumerate(consultas) if 'sp_getapplock' in query)
+    assert "@LockOwner = 'Transaction'" in consultas[bloqueo]
+    # El DDL se confirma antes de tomar el bloqueo; todo lo demás ocurre dentro de la transacción
+    assert conn.commits[0] <= bloqueo
+    assert 'MAX(CIDMOVIMIENTO)' in consultas[bloqueo + 1]
+    actualizacion = next(i for i, query in enumerate(consultas) if query.startswith('UPDATE'))
+    assert conn.executed[actualizacion][1][2] == NOMBRE_ROLLUP
+    assert conn.commits[-1] == len(consultas) and len(conn.commits) == 2
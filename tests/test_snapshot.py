@@ -0,0 +1,67 @@
+"""
+Pruebas de los reportes calculados sobre el snapshot local (reportes/snapshot.py)
+"""
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from reportes import snapshot
+
+
+def hechos():
+    return pd.DataFrame({
+        'Fecha': pd.to_datetime(['2024-01-05', '2024-01-05', '2024-02-10', '2025-01-03', '2025-01-03']),
+        'CIDDOCUMENTODE': [4, 3, 4, 4, 4],
+        'Modulo': [1, 1, 2, 1, 1],
+        'CIDAGENTE': [1, 2, 1, 3, 1],
+        'Agente': pd.Categorical(['MOLIENDAS', 'MDLZ P2', 'MOLIENDAS', 'OTRO AGENTE', 'MOLIENDAS']),
+        'CIDPRODUCTO': [10, 10, 11, 10, 11],
+        'CIDCLIENTEPROVEEDOR': [7, 8, 7, 8, 7],
+        'RazonSocial': ['PANADERIA SOL', 'DULCES LUNA', 'PANADERIA SOL', 'DULCES LUNA', 'PANADERIA SOL'],
+        'Unidades': [10.0, 4.0, 2.0, 5.0, 1.0],
+        'CCODIGOPRODUCTO': ['HAR25', 'HAR25', 'AZU50', 'HAR25', 'AZU50'],
+        'CNOMBREPRODUCTO': ['HARINA 25', 'HARINA 25', 'AZUCAR 50', 'HARINA 25', 'AZUCAR 50'],
+        'Categoria': ['Harina', 'Harina', 'Azucar', 'Harina', 'Azucar'],
+        'Empresa': ['Moli', 'Moli', 'Alimento', 'Moli', 'Alimento'],
+        'Kilos': [250.0, 100.0, 100.0, 125.0, 50.0],
+    })
+
+
+def test_year_report_counts_sales_module_invoices_of_every_agent():
+    df = snapshot.reporte_anio(hechos())
+    assert df.columns.tolist() == ['Año', 'Mes', 'KilosTotales', 'ToneladasTotales']
+    # Remisión (tipo 3) y factura de módulo 2 fuera; OTRO AGENTE sí cuenta, como en el rollup
+    assert df[['Año', 'Mes']].values.tolist() == [[2024, 1], [2025, 1]]
+    assert df['KilosTotales'].tolist() == [250.0, 175.0]
+    assert df['ToneladasTotales'].tolist() == [0.25, 0.175]
+
+
+def test_daily_report_filters_ranges_and_report_agents():
+    rangos = [(date(2024, 1, 1), date(2024, 2, 1))]
+    df = snapshot.ventas_dia(hechos(), rangos)
+    assert df['Agente'].tolist() == ['MDLZ P2', 'MOLIENDAS']
+    assert df['TipoAgente'].tolist() == ['Moli', 'Moliendas']
+    assert df['Toneladas'].tolist() == [0.1, 0.25]
+    assert df['Fecha'].tolist() == [date(2024, 1, 5)] * 2
+
+    grafica = snapshot.ventas_dia_grafica(hechos(), [], 'MOLIENDAS')
+    assert grafica[['Anio', 'Mes', 'Dia']].values.tolist() == [[2024, 1, 5], [2024, 2, 10], [2025, 1, 3]]
+
+
+def test_coverage_and_objectives_series():
+    cobertura = snapshot.cobertura_base(hechos())
+    assert cobertura.columns.tolist() == ['CIDCLIENTEPROVEEDOR', 'RazonSocial', 'Agente', 'NumMes', 'KilosTotales']
+    sol = cobertura[cobertura['RazonSocial'] == 'PANADERIA SOL']
+    assert sol.set_index('NumMes')['KilosTotales'].to_dict() == {1: 300.0, 2: 100.0}
+
+    serie = snapshot.serie_objetivos(hechos())
+    assert serie.values.tolist() == [['MOLIENDAS', 2024, 1, 0.25], ['MOLIENDAS', 2025, 1, 0.05]]
+
+
+def test_sync_requires_pyarrow(tmp_path):
+    if snapshot.SNAPSHOT_DISPONIBLE:
+        pytest.skip("pyarrow instalado")
+    with pytest.raises(RuntimeError):
+        snapshot.SnapshotVentas(str(tmp_path)).sincronizar(None, 'REPORTABLES', 1)
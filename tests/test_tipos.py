@@ -0,0 +1,61 @@
+"""
+Pruebas de los marcos compactos de reportes (reportes/tipos.py)
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import pandas as pd
+
+from reportes.cache import CacheReportes
+from reportes.tipos import ESQUEMAS, compactador, compactar, memoria, registros
+
+
+def detalle_diario(filas=600):
+    return pd.DataFrame({
+        'CRAZONSOCIAL': [f'CLIENTE {i % 40:03d}' if i % 97 else None for i in range(filas)],
+        'CNOMBREPRODUCTO': [f'PRODUCTO {i % 12}' for i in range(filas)],
+        'Fecha': [f'2025-03-{1 + i % 28:02d}' if i % 2 else date(2025, 3, 1 + i % 28) for i in range(filas)],
+        'Agente': ['MOLIENDAS' if i % 3 else 'MOSTRADOR 1' for i in range(filas)],
+        'Unidades': [Decimal(i) / 4 for i in range(filas)],
+        'Toneladas': [i / 1000.0 for i in range(filas)],
+    })
+
+
+def test_schema_types_and_memory():
+    original = detalle_diario()
+    df = compactar(original, ESQUEMAS['ventas_dia'])
+
+    assert isinstance(df['CRAZONSOCIAL'].dtype, pd.CategoricalDtype)
+    assert isinstance(df['Agente'].dtype, pd.CategoricalDtype)
+    assert df['Unidades'].dtype == 'float64' and df['Unidades'].iloc[6] == 1.5
+    # Fechas en texto o date quedan como date, una categoría por día
+    assert list(df['Fecha'].cat.categories) == [date(2025, 3, d) for d in range(1, 29)]
+    assert df['Fecha'].iloc[3] == date(2025, 3, 4)
+    assert memoria(df) * 4 < memoria(original)
+
+    filas = registros(df.head(1))
+    assert filas[0]['CRAZONSOCIAL'] is None and filas[0]['Agente'] == 'MOSTRADOR 1'
+
+
+def test_integers_are_downcast_and_unique_strings_kept():
+    df = compactar(pd.DataFrame({'Anio': [2024, 2025], 'Mes': [1, 12], 'Agente': ['A', 'B']}),
+                   ESQUEMAS['ventas_mes'])
+    assert str(df['Anio'].dtype) == 'int16' and str(df['Mes'].dtype) == 'int8'
+    assert df['Agente'].dtype == object
+
+
+def test_cache_stores_the_prepared_result():
+    cache = CacheReportes()
+    llamadas = []
+
+    @cache.report('ventas_dia', preparar=compactador('ventas_dia'))
+    def reporte(agente=None):
+        llamadas.append(agente)
+        return detalle_diario(), 600
+
+    df, total = reporte('Todos')
+    assert total == 600 and isinstance(df['Agente'].dtype, pd.CategoricalDtype)
+    assert reporte('Todos')[0] is df
+    assert llamadas == ['Todos']
+    assert cache.stats()['bytes'] < memoria(detalle_diario()) / 4
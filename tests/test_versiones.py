@@ -0,0 +1,107 @@
+"""
+Pruebas de las huellas de versión de datos para GET condicional (reportes/versiones.py)
+"""
+
+from datetime import date
+
+from reportes.cache import CacheReportes, seguir_vencidos, versiones_servidas
+from reportes.versiones import VersionDatos
+
+
+def test_closed_periods_do_not_read_the_watermark():
+    lecturas = []
+    cache = CacheReportes()
+
+    def leer():
+        lecturas.append(1)
+        return 100, '2025-03-10 00:00:00'
+
+    versiones = VersionDatos(leer, cache.version, ttl=60)
+    etag, modificado = versiones.huella('ventas_mes', {'anio': 2024, 'mes': 3}, cerrado=True)
+    assert lecturas == []
+    assert versiones.huella('ventas_mes', {'anio': '2024', 'mes': '3', 'agente': 'Todos'}, True) == (etag, modificado)
+    assert versiones.huella('ventas_mes', {'anio': 2024, 'mes': 4}, True)[0] != etag
+
+    # Una captura tardía invalida la caché y cambia la versión de los periodos cerrados
+    cache.invalidar()
+    assert versiones.huella('ventas_mes', {'anio': 2024, 'mes': 3}, True)[0] != etag
+
+
+def test_open_periods_follow_the_watermark_and_the_day():
+    watermark = [(100, '2025-03-10 00:00:00')]
+    lecturas = []
+
+    def leer():
+        lecturas.append(1)
+        return watermark[0]
+
+    versiones = VersionDatos(leer, lambda: 'g1', ttl=60)
+    hoy = date(2025, 3, 10)
+    etag, _ = versiones.huella('reporte_anio', {}, False, hoy=hoy)
+    assert versiones.huella('reporte_anio', {}, False, hoy=hoy)[0] == etag
+    assert len(lecturas) == 1
+
+    watermark[0] = (101, '2025-03-10 00:00:00')
+    assert versiones.huella('reporte_anio', {}, False, hoy=hoy)[0] == etag
+    versiones.invalidar()
+    assert versiones.huella('reporte_anio', {}, False, hoy=hoy)[0] != etag
+    assert versiones.huella('reporte_anio', {}, False, hoy=date(2025, 3, 11))[0] != etag
+
+
+def test_unknown_watermark_disables_validation_of_open_periods():
+    def leer():
+        raise RuntimeError('sin conexión')
+
+    versiones = VersionDatos(leer, lambda: 'g1')
+    assert versiones.huella('ventas_dia', {}, False) is None
+    assert versiones.huella('ventas_dia', {'anio1': 2024, 'mes1': 1}, True) is not None
+
+
+def test_etag_follows_the_version_of_the_cached_result_served():
+    watermark = [(100, '2025-03-10 00:00:00')]
+    cache = CacheReportes(ttl_abierto=120)
+    versiones = VersionDatos(lambda: watermark[0], cache.version, ttl=60)
+    cache.etiquetar = versiones.etiqueta
+    hoy = date(2025, 3, 10)
+
+    seguir_vencidos()
+    assert cache.obtener(('reporte_anio',), lambda: 'con 100', cerrado=False) == 'con 100'
+    etag, _ = versiones.huella('reporte_anio', {}, False, hoy=hoy, servidas=versiones_servidas())
+    assert etag == versiones.huella('reporte_anio', {}, False, hoy=hoy)[0]
+
+    # Llega un movimiento nuevo mientras el resultado sigue vigente en la caché
+    watermark[0] = (101, '2025-03-10 00:05:00')
+    versiones.invalidar()
+    nueva = versiones.huella('reporte_anio', {}, False, hoy=hoy)[0]
+    assert nueva != etag
+
+    seguir_vencidos()
+    assert cache.obtener(('reporte_anio',), lambda: 'con 101', cerrado=False) == 'con 100'
+    servida = versiones.huella('reporte_anio', {}, False, hoy=hoy, servidas=versiones_servidas())[0]
+    # La respuesta lleva la versión del resultado servido, no la del watermark nuevo
+    assert servida == etag
+    assert servida != nueva
+
+    # Al recalcularse, el resultado lleva la versión nueva
+    cache.invalidar()
+    seguir_vencidos()
+    assert cache.obtener(('reporte_anio',), lambda: 'con 101', cerrado=False) == 'con 101'
+    recalculada = versiones.huella('reporte_anio', {}, False, hoy=hoy, servidas=versiones_servidas())[0]
+    assert recalculada == versiones.huella('reporte_anio', {}, False, hoy=hoy)[0]
+    assert recalculada not in (etag, nueva)
+
+
+def test_mixed_or_untagged_results_never_validate_as_current():
+    watermark = [(100, '2025-03-10 00:00:00')]
+    versiones = VersionDatos(lambda: watermark[0], lambda: 'g1', ttl=0)
+    hoy = date(2025, 3, 10)
+    vieja = ('g1', (100, '2025-03-10 00:00:00'))
+    watermark[0] = (101, '2025-03-10 00:05:00')
+    nueva = versiones.etiqueta(False)
+
+    mezcla = versiones.huella('ventas_dia', {}, False, hoy=hoy, servidas=[vieja, nueva])[0]
+    assert mezcla not in (versiones.huella('ventas_dia', {}, False, hoy=hoy)[0],
+                          versiones.huella('ventas_dia', {}, False, hoy=hoy, servidas=[vieja])[0])
+    assert versiones.huella('ventas_dia', {}, False, hoy=hoy, servidas=[vieja, None]) is None
+    # Resultados de periodos cerrados no leen el watermark
+    assert versiones.etiqueta(True) == ('g1', None)